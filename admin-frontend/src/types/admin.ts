@@ -1,6 +1,7 @@
 export interface TableInfo {
   name: string;
   rowCount: number;
+  rowCountEstimated?: boolean;
   canView: boolean;
 }
 
@@ -21,6 +22,8 @@ export interface PaginationInfo {
   pageSize: number;
   total: number;
   totalPages: number;
+  totalEstimated?: boolean;
+  nextCursor?: string | null;
 }
 
 export interface TableData {
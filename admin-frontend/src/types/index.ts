@@ -16,6 +16,7 @@ export interface OverviewStats {
   messages_count: number;
   templates_count: number;
   responses_count: number;
+  estimated?: boolean;
 }
 
 export interface User {
@@ -167,6 +168,7 @@ export interface SessionMessagesResponse {
   total: number;
   limit: number;
   offset: number;
+  nextCursor?: string | null;
 }
 
 export interface CalibrationLog {
@@ -11,10 +11,13 @@ from app.api.endpoints.admin import (
     user_detail,
     scales,
     export as db_export,
+    export_jobs,
     sessions,
     research as admin_research,
     config as admin_config,
     auth as admin_auth,
+    llm_usage,
+    performance,
 )
 
 # 创建 admin 主路由
@@ -32,5 +35,8 @@ admin_router.include_router(sessions.router, tags=["Admin - Sessions"])
 admin_router.include_router(analytics.router, tags=["Admin - Analytics"])
 admin_router.include_router(scales.router, tags=["Admin - Scale Management"])
 admin_router.include_router(db_export.router, tags=["Admin - Data Export"])
+admin_router.include_router(export_jobs.router, tags=["Admin - Data Export"])
 admin_router.include_router(admin_research.router, tags=["Admin - Research Management"])
 admin_router.include_router(admin_config.router, tags=["Admin - Model Config"])
+admin_router.include_router(llm_usage.router, tags=["Admin - LLM Usage"])
+admin_router.include_router(performance.router, tags=["Admin - Performance"])
@@ -1,54 +1,120 @@
 """
 数据分析统计 API 端点
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy import select, func
+from datetime import date, timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime, timedelta
 
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
-from app.models.sql.user import User
-from app.models.sql.message import ChatMessage
 from app.schemas.base import SuccessResponse
 from app.schemas.admin.analytics import (
     AnalyticsOverviewResponse,
     SystemOverview,
     UserActivity
 )
+from app.services.activity_rollup import refresh_days, refresh_incremental, utc_today
 
 router = APIRouter(tags=["Admin - Analytics"])
 
+# 趋势最多返回的天数（按日时约两年）
+MAX_RANGE_DAYS = 731
+
+# 概览总数：均来自汇总表，消息数最多滞后一个汇总周期
+_TOTALS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM users) AS total_users,
+        (SELECT COALESCE(SUM(messages), 0) FROM daily_activity) AS total_messages,
+        (SELECT COUNT(DISTINCT user_id) FROM daily_active_users WHERE day >= :since) AS active_7d
+"""
+
+# 按日趋势：汇总表主键范围读取，缺失的日期补 0
+_DAILY_TREND_SQL = """
+    SELECT d.day::date AS bucket,
+           COALESCE(a.active_users, 0), COALESCE(a.messages, 0),
+           COALESCE(a.new_users, 0), COALESCE(a.concepts, 0)
+    FROM generate_series(CAST(:start AS date)::timestamp, CAST(:end AS date)::timestamp, interval '1 day') AS d(day)
+    LEFT JOIN daily_activity a ON a.day = d.day
+    ORDER BY 1
+"""
+
+# 按周趋势：计数按周累加，活跃用户与不同概念数从明细表去重
+_WEEKLY_TREND_SQL = """
+    SELECT w.bucket,
+           COALESCE(u.active_users, 0), COALESCE(a.messages, 0),
+           COALESCE(a.new_users, 0), COALESCE(c.concepts, 0)
+    FROM (
+        SELECT generate_series(
+            date_trunc('week', CAST(:start AS date)::timestamp), CAST(:end AS date)::timestamp, interval '1 week'
+        )::date AS bucket
+    ) w
+    LEFT JOIN (
+        SELECT date_trunc('week', day::timestamp)::date AS bucket,
+               SUM(messages) AS messages, SUM(new_users) AS new_users
+        FROM daily_activity
+        WHERE day BETWEEN CAST(:start AS date) AND CAST(:end AS date)
+        GROUP BY 1
+    ) a ON a.bucket = w.bucket
+    LEFT JOIN (
+        SELECT date_trunc('week', day::timestamp)::date AS bucket, COUNT(DISTINCT user_id) AS active_users
+        FROM daily_active_users
+        WHERE day BETWEEN CAST(:start AS date) AND CAST(:end AS date)
+        GROUP BY 1
+    ) u ON u.bucket = w.bucket
+    LEFT JOIN (
+        SELECT date_trunc('week', day::timestamp)::date AS bucket, COUNT(DISTINCT concept) AS concepts
+        FROM daily_concepts
+        WHERE day BETWEEN CAST(:start AS date) AND CAST(:end AS date)
+        GROUP BY 1
+    ) c ON c.bucket = w.bucket
+    ORDER BY 1
+"""
+
+
+def _resolve_range(start: Optional[date], end: Optional[date]) -> tuple[date, date]:
+    """默认最近 7 天（含今天）"""
+    end = end or utc_today()
+    start = start or end - timedelta(days=6)
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be earlier than start")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range exceeds {MAX_RANGE_DAYS} days")
+    return start, end
+
 
 @router.get("/analytics/overview", dependencies=[Depends(verify_admin_key)])
 async def get_analytics_overview(
+    start: Optional[date] = Query(None, description="起始日期（UTC，含），默认结束日期前 6 天"),
+    end: Optional[date] = Query(None, description="结束日期（UTC，含），默认今天"),
+    granularity: Literal["day", "week"] = Query("day", description="趋势粒度：day | week"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[AnalyticsOverviewResponse]:
     """
     获取系统概览统计
 
+    数据来自每日汇总表（daily_activity），由后台任务定期刷新，
+    当天数据最多滞后 ANALYTICS_ROLLUP_INTERVAL_S 秒。
+
+    Args:
+        start / end: 趋势日期区间
+        granularity: 按日或按周（周一开始）汇总
+
     Returns:
         系统统计数据和活跃度趋势
     """
-    # 总用户数
-    total_users_result = await db.execute(select(func.count(User.id)))
-    total_users = total_users_result.scalar()
+    start, end = _resolve_range(start, end)
 
-    # 总消息数
-    total_messages_result = await db.execute(select(func.count(ChatMessage.id)))
-    total_messages = total_messages_result.scalar()
+    totals = (await db.execute(
+        text(_TOTALS_SQL), {"since": utc_today() - timedelta(days=6)}
+    )).one()
+    total_users, total_messages, active_users = totals
 
     # 人均消息数
     avg_messages = total_messages / total_users if total_users > 0 else 0
 
-    # 7天活跃用户数（简化：有消息的用户）
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    active_users_result = await db.execute(
-        select(func.count(func.distinct(ChatMessage.user_id)))
-        .where(ChatMessage.timestamp >= seven_days_ago)
-    )
-    active_users = active_users_result.scalar()
-
     overview = SystemOverview(
         totalUsers=total_users,
         totalMessages=total_messages,
@@ -57,34 +123,46 @@ async def get_analytics_overview(
         activeUsersLast7Days=active_users
     )
 
-    # 活跃度趋势（简化：最近7天的消息数）
-    activity_trend = []
-    for i in range(7):
-        date = datetime.utcnow() - timedelta(days=6-i)
-        date_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        date_end = date_start + timedelta(days=1)
-
-        msg_count_result = await db.execute(
-            select(func.count(ChatMessage.id))
-            .where(ChatMessage.timestamp >= date_start)
-            .where(ChatMessage.timestamp < date_end)
-        )
-        msg_count = msg_count_result.scalar()
-
-        active_user_count_result = await db.execute(
-            select(func.count(func.distinct(ChatMessage.user_id)))
-            .where(ChatMessage.timestamp >= date_start)
-            .where(ChatMessage.timestamp < date_end)
+    trend_sql = _WEEKLY_TREND_SQL if granularity == "week" else _DAILY_TREND_SQL
+    result = await db.execute(text(trend_sql), {"start": start, "end": end})
+    activity_trend = [
+        UserActivity(
+            date=bucket.strftime("%Y-%m-%d"),
+            activeUsers=active,
+            totalMessages=messages,
+            newUsers=new_users,
+            concepts=concepts
         )
-        active_user_count = active_user_count_result.scalar()
-
-        activity_trend.append(UserActivity(
-            date=date.strftime("%Y-%m-%d"),
-            activeUsers=active_user_count,
-            totalMessages=msg_count
-        ))
+        for bucket, active, messages, new_users, concepts in result.all()
+    ]
 
     return SuccessResponse(data=AnalyticsOverviewResponse(
         overview=overview,
-        activityTrend=activity_trend
+        activityTrend=activity_trend,
+        granularity=granularity,
+        startDate=start.isoformat(),
+        endDate=end.isoformat()
     ))
+
+
+@router.post("/analytics/rollup/refresh", dependencies=[Depends(verify_admin_key)])
+async def refresh_activity_rollup(
+    start: Optional[date] = Query(None, description="重算起始日期（UTC，含）；不传则增量汇总"),
+    end: Optional[date] = Query(None, description="重算结束日期（UTC，含），默认今天"),
+    db: AsyncSession = Depends(get_db)
+) -> SuccessResponse[dict]:
+    """
+    立即刷新每日汇总
+
+    不传 start 时与后台任务相同（增量）；传 start 时重算指定区间，
+    用于删除用户 / 导入历史数据之后校正。
+    """
+    if start is None:
+        days = await refresh_incremental(db)
+    else:
+        end = end or utc_today()
+        if end < start:
+            raise HTTPException(status_code=400, detail="end must not be earlier than start")
+        days = await refresh_days(db, start, end)
+    await db.commit()
+    return SuccessResponse(data={"refreshed": True, "days": days})
@@ -2,14 +2,20 @@
 数据浏览器 API 端点
 提供数据库表的可视化和导出功能
 """
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy import inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import decode_cursor, paginate_rows
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
 from app.schemas.base import SuccessResponse
+from app.services import research_datasets
+from app.services.data_export import export_table_stream
+from app.services.row_counts import row_counter
 from app.schemas.admin.explorer import (
     TableListResponse,
     TableSchemaResponse,
@@ -27,9 +33,21 @@ ALLOWED_TABLES = ["users", "chat_messages", "profile_snapshots", "calibration_lo
 # 黑名单：敏感字段（不返回给前端）
 SENSITIVE_FIELDS = ["hashed_password", "password", "token", "api_key", "secret", "refresh_token"]
 
+# 各表默认排序列（均有索引），未指定 order_by 时使用
+DEFAULT_SORT = {
+    "users": "created_at",
+    "chat_messages": "timestamp",
+    "profile_snapshots": "created_at",
+    "calibration_logs": "timestamp",
+}
+
+# 无法用于游标比较的列类型（排序仍可用，但只能 OFFSET 分页）
+_NON_KEYSET_TYPES = {"json", "jsonb", "ARRAY", "USER-DEFINED", "bytea"}
+
 
 @router.get("/tables", dependencies=[Depends(verify_admin_key)])
 async def list_tables(
+    exact: bool = Query(False, description="是否精确计数（默认使用缓存或统计信息估算）"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[TableListResponse]:
     """
@@ -48,17 +66,19 @@ async def list_tables(
     """))
     all_tables = [row[0] for row in result]
 
-    tables_info = []
-    for table in ALLOWED_TABLES:
-        if table in all_tables:
-            # 获取表的行数
-            count_result = await db.execute(text(f"SELECT COUNT(*) FROM {table}"))
-            count = count_result.scalar()
-            tables_info.append(TableInfo(
-                name=table,
-                rowCount=count,
-                canView=True
-            ))
+    # 获取表的行数（一次批量取估算值 / 缓存值）
+    visible = [table for table in ALLOWED_TABLES if table in all_tables]
+    counts = await row_counter.count(db, visible, exact=exact)
+
+    tables_info = [
+        TableInfo(
+            name=table,
+            rowCount=counts[table].count,
+            rowCountEstimated=counts[table].estimated,
+            canView=True
+        )
+        for table in visible
+    ]
 
     return SuccessResponse(data=TableListResponse(tables=tables_info))
 
@@ -132,9 +152,11 @@ async def get_table_schema(
 @router.get("/tables/{table_name}/data", dependencies=[Depends(verify_admin_key)])
 async def get_table_data(
     table_name: str,
-    page: int = Query(1, ge=1, description="页码"),
+    page: int = Query(1, ge=1, description="页码（兼容旧客户端，建议使用 cursor）"),
     page_size: int = Query(50, ge=1, le=100, description="每页行数"),
-    order_by: str = Query(None, description="排序字段"),
+    order_by: str = Query(None, description="排序字段（升序）"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 pagination.nextCursor）"),
+    exact: bool = Query(False, description="是否精确计数总行数"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[TableDataResponse]:
     """
@@ -144,7 +166,9 @@ async def get_table_data(
         table_name: 表名
         page: 页码（从 1 开始）
         page_size: 每页行数（1-100）
-        order_by: 排序字段（可选）
+        order_by: 排序字段（可选，默认按表的时间列）
+        cursor: 分页游标；传入时忽略 page
+        exact: 是否精确计数总行数（默认估算，见 pagination.totalEstimated）
 
     Returns:
         包含数据行和分页信息的响应
@@ -161,21 +185,52 @@ async def get_table_data(
     offset = (page - 1) * page_size
 
     # 获取总行数
-    result = await db.execute(text(f"SELECT COUNT(*) FROM {table_name}"))
-    total = result.scalar()
-
-    # 构建查询（防止 SQL 注入：只允许白名单表和列）
-    order_clause = ""
-    if order_by:
-        # 简单验证：order_by 应该是有效的列名（字母数字下划线）
-        if order_by.replace("_", "").isalnum():
-            order_clause = f"ORDER BY {order_by}"
+    row_count = (await row_counter.count(db, [table_name], exact=exact))[table_name]
+    total = row_count.count
 
-    query = f"SELECT * FROM {table_name} {order_clause} LIMIT {page_size} OFFSET {offset}"
-    result = await db.execute(text(query))
+    # 构建查询（防止 SQL 注入：只允许白名单表和该表实际存在的列）
+    columns_result = await db.execute(text("""
+        SELECT column_name, data_type, is_nullable
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = :table_name
+    """), {"table_name": table_name})
+    columns = {row[0]: (row[1], row[2] == "YES") for row in columns_result}
+
+    sort_col = order_by if order_by in columns else DEFAULT_SORT[table_name]
+    sort_type, sort_nullable = columns[sort_col]
+    # 排序键 (sort_col, id) 全序；可空列或不可比较的类型退回 OFFSET 分页
+    keyset = not sort_nullable and sort_type not in _NON_KEYSET_TYPES
+    cursor_key = f"{table_name}.{sort_col}"
+
+    params = {"limit": page_size + 1}
+    where_clause = ""
+    offset_clause = ""
+    if cursor:
+        if not keyset:
+            raise HTTPException(status_code=400, detail=f"Column '{sort_col}' does not support cursor pagination")
+        value, row_id = decode_cursor(cursor, cursor_key)
+        # 参数先按 text 传入再转换为列类型
+        where_clause = (
+            f"WHERE ({sort_col}, id) > "
+            f"(CAST(CAST(:cursor_value AS text) AS {sort_type}), CAST(CAST(:cursor_id AS text) AS uuid))"
+        )
+        params.update(cursor_value=str(value), cursor_id=row_id)
+    elif offset:
+        offset_clause = f"OFFSET {offset}"
+
+    query = (
+        f"SELECT * FROM {table_name} {where_clause} "
+        f"ORDER BY {sort_col}, id LIMIT :limit {offset_clause}"
+    )
+    result = await db.execute(text(query), params)
+    raw_rows, next_cursor = paginate_rows(
+        result.mappings().all(), page_size, cursor_key, lambda r: (r[sort_col], r["id"])
+    )
+    if not keyset:
+        next_cursor = None
 
     rows = []
-    for row in result.mappings():
+    for row in raw_rows:
         # 过滤敏感字段
         row_dict = {
             k: (str(v) if not isinstance(v, (int, float, bool, type(None))) else v)
@@ -194,7 +249,9 @@ async def get_table_data(
             page=page,
             pageSize=page_size,
             total=total,
-            totalPages=total_pages
+            totalPages=total_pages,
+            totalEstimated=row_count.estimated,
+            nextCursor=next_cursor
         )
     ))
 
@@ -202,16 +259,16 @@ async def get_table_data(
 @router.get("/tables/{table_name}/export", dependencies=[Depends(verify_admin_key)])
 async def export_table(
     table_name: str,
-    db: AsyncSession = Depends(get_db)
-) -> JSONResponse:
+    format: str = Query("json", description="导出格式：json | ndjson"),
+    gzip: bool = Query(False, description="是否 gzip 压缩（作为 .gz 附件下载）"),
+) -> StreamingResponse:
     """
-    导出表数据为 JSON
+    导出表数据（服务端游标分批读取，流式输出）
 
     Args:
         table_name: 表名
-
-    Returns:
-        JSON 格式的完整表数据
+        format: json（{"table", "data": [...], "rowCount"} 文档）| ndjson（每行一个 JSON 对象）
+        gzip: 是否即时 gzip 压缩
 
     Raises:
         HTTPException: 403 如果表不在白名单中
@@ -221,23 +278,8 @@ async def export_table(
             status_code=403,
             detail=f"Table '{table_name}' is not allowed for export"
         )
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="Only 'json' and 'ndjson' formats are supported")
 
-    # 获取所有数据
-    result = await db.execute(text(f"SELECT * FROM {table_name}"))
-    rows = [dict(row._mapping) for row in result]
-
-    # 过滤敏感字段并转换为可序列化格式
-    rows_filtered = [
-        {
-            k: (str(v) if not isinstance(v, (int, float, bool, type(None))) else v)
-            for k, v in row.items()
-            if k not in SENSITIVE_FIELDS
-        }
-        for row in rows
-    ]
-
-    return JSONResponse(content={
-        "table": table_name,
-        "rowCount": len(rows_filtered),
-        "data": rows_filtered
-    })
+    dataset = research_datasets.table(table_name, hidden_fields=SENSITIVE_FIELDS)
+    return export_table_stream(dataset, format, {"table": table_name}, compress=gzip)
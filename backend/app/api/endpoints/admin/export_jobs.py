@@ -0,0 +1,165 @@
+"""
+Admin 后台导出任务 API 端点
+
+提交导出规格 → 返回任务 ID → 轮询进度 → 完成后下载 gzip 结果文件（支持 Range 断点续传）
+"""
+import json
+from typing import Callable, Dict
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.endpoints.admin.export import (
+    ALLOWED_TABLES,
+    SENSITIVE_FIELDS,
+    build_filter_clause,
+    build_order_clause,
+)
+from app.core.security import verify_admin_key
+from app.db.postgres import get_db
+from app.schemas.admin.export_jobs import ExportJobInfo, ExportJobListResponse, ExportJobRequest
+from app.schemas.base import SuccessResponse
+from app.services import research_datasets
+from app.services.export_jobs import DONE, ExportJob, ExportQueueFull, export_jobs
+from app.services.research_datasets import Dataset
+from app.services.row_counts import row_counter
+
+router = APIRouter(tags=["Admin - Data Export"])
+
+
+def _require_user(spec: ExportJobRequest) -> str:
+    if not spec.userId:
+        raise HTTPException(status_code=400, detail=f"userId is required for dataset '{spec.dataset}'")
+    return spec.userId
+
+
+# 研究数据集：名称 -> 由导出规格构造数据集
+DATASET_BUILDERS: Dict[str, Callable[[ExportJobRequest], Dataset]] = {
+    "learner_profiles": lambda spec: research_datasets.learner_profiles(spec.userIds),
+    "scale_responses": lambda spec: research_datasets.scale_responses(spec.userIds),
+    "conversations": lambda spec: research_datasets.conversations(),
+    "learning_trajectory": lambda spec: research_datasets.learning_trajectory(),
+    "user_conversations": lambda spec: research_datasets.user_conversations(_require_user(spec)),
+    "user_trajectory": lambda spec: research_datasets.user_trajectory(_require_user(spec)),
+}
+
+
+def build_dataset(spec: ExportJobRequest) -> Dataset:
+    """
+    按导出规格构造数据集（校验与同步导出端点一致）
+
+    Raises:
+        HTTPException: 400 规格无效，403 表不在白名单中
+    """
+    if spec.kind == "dataset":
+        builder = DATASET_BUILDERS.get(spec.dataset or "")
+        if builder is None:
+            raise HTTPException(status_code=400, detail=f"Unknown dataset: {spec.dataset}")
+        return builder(spec)
+
+    table = spec.table or ""
+    if table not in ALLOWED_TABLES:
+        raise HTTPException(status_code=403, detail=f"Table '{table}' is not allowed for export")
+    filters_json = json.dumps(spec.filters) if spec.filters else None
+    where_clause, params = build_filter_clause(filters_json, table)
+    order_clause = build_order_clause(spec.orderBy, spec.order, table)
+    return research_datasets.table(table, where_clause, params, order_clause, SENSITIVE_FIELDS)
+
+
+def _job_info(job: ExportJob) -> ExportJobInfo:
+    return ExportJobInfo(
+        id=job.id,
+        dataset=job.dataset,
+        format=job.format,
+        status=job.status,
+        rowsWritten=job.rows_written,
+        bytesWritten=job.bytes_written,
+        estimatedRows=job.estimated_rows,
+        progress=job.progress,
+        error=job.error,
+        filename=job.filename,
+        fileSize=job.path.stat().st_size if job.path is not None and job.path.exists() else None,
+        createdAt=job.created_at,
+        startedAt=job.started_at,
+        finishedAt=job.finished_at,
+        expiresAt=job.expires_at,
+    )
+
+
+def _get_job(job_id: str) -> ExportJob:
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    return job
+
+
+@router.post("/export/jobs", dependencies=[Depends(verify_admin_key)], status_code=202)
+async def submit_export_job(
+    spec: ExportJobRequest,
+    db: AsyncSession = Depends(get_db),
+) -> SuccessResponse[ExportJobInfo]:
+    """
+    提交后台导出任务
+
+    立即返回任务 ID；任务在后台执行（受并发上限约束），结果写入 gzip 文件。
+    进度按主表行数估算（表统计信息，不做全表计数）。
+
+    Raises:
+        HTTPException: 429 排队 + 执行中的任务已达上限
+    """
+    dataset = build_dataset(spec)
+
+    estimated_rows = None
+    if dataset.source_table:
+        counts = await row_counter.count(db, [dataset.source_table])
+        estimated_rows = counts[dataset.source_table].count
+
+    try:
+        job = export_jobs.submit(
+            dataset,
+            spec.format,
+            spec.model_dump(exclude_none=True),
+            estimated_rows=estimated_rows,
+        )
+    except ExportQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return SuccessResponse(data=_job_info(job))
+
+
+@router.get("/export/jobs", dependencies=[Depends(verify_admin_key)])
+async def list_export_jobs() -> SuccessResponse[ExportJobListResponse]:
+    """列出未过期的导出任务"""
+    return SuccessResponse(data=ExportJobListResponse(
+        jobs=[_job_info(job) for job in export_jobs.list_jobs()],
+        pending=export_jobs.pending_count(),
+        concurrency=export_jobs.concurrency,
+    ))
+
+
+@router.get("/export/jobs/{job_id}", dependencies=[Depends(verify_admin_key)])
+async def get_export_job(job_id: str) -> SuccessResponse[ExportJobInfo]:
+    """查询导出任务状态与进度"""
+    return SuccessResponse(data=_job_info(_get_job(job_id)))
+
+
+@router.get("/export/jobs/{job_id}/download", dependencies=[Depends(verify_admin_key)])
+async def download_export_job(job_id: str) -> FileResponse:
+    """
+    下载导出结果（gzip 文件，支持 Range 请求断点续传）
+
+    Raises:
+        HTTPException: 404 任务不存在或已过期，409 任务尚未完成或失败
+    """
+    job = _get_job(job_id)
+    if job.status != DONE or job.path is None or not job.path.exists():
+        raise HTTPException(status_code=409, detail=f"Export job is {job.status}")
+    return FileResponse(job.path, media_type="application/gzip", filename=job.filename)
+
+
+@router.delete("/export/jobs/{job_id}", dependencies=[Depends(verify_admin_key)])
+async def delete_export_job(job_id: str) -> SuccessResponse[dict]:
+    """取消（如仍在执行）并删除导出任务及其结果文件"""
+    if not await export_jobs.remove(job_id):
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    return SuccessResponse(data={"id": job_id, "deleted": True})
@@ -0,0 +1,140 @@
+"""
+Admin LLM 用量统计 API 端点
+按天 / 用户 / 角色汇总 llm_call_logs 中的 token 用量、缓存命中与延迟
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, func, cast, Date
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.security import verify_admin_key
+from app.db.postgres import get_db
+from app.models.sql.llm_call_log import LLMCallLog
+from app.models.sql.user import User
+from app.schemas.base import SuccessResponse
+from app.schemas.admin.llm_usage import LLMUsageBucket, LLMUsageSummaryResponse
+
+router = APIRouter(tags=["Admin - LLM Usage"])
+
+GROUP_BY_OPTIONS = ("day", "user", "role")
+
+
+def _aggregate_columns():
+    """各分组通用的聚合列"""
+    return (
+        func.count().label("calls"),
+        func.count().filter(LLMCallLog.outcome != "ok").label("errors"),
+        func.coalesce(func.sum(LLMCallLog.retries), 0).label("retries"),
+        func.coalesce(func.sum(LLMCallLog.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(LLMCallLog.completion_tokens), 0).label("completion_tokens"),
+        func.coalesce(func.sum(LLMCallLog.cached_tokens), 0).label("cached_tokens"),
+        func.coalesce(func.avg(LLMCallLog.latency_ms), 0).label("avg_latency"),
+        func.coalesce(
+            func.percentile_cont(0.95).within_group(LLMCallLog.latency_ms), 0
+        ).label("p95_latency"),
+    )
+
+
+def _to_bucket(key: str, row, label: Optional[str] = None) -> LLMUsageBucket:
+    """将聚合行转换为响应模型"""
+    prompt_tokens = int(row.prompt_tokens)
+    return LLMUsageBucket(
+        key=key,
+        label=label,
+        calls=row.calls,
+        errors=row.errors,
+        retries=int(row.retries),
+        promptTokens=prompt_tokens,
+        completionTokens=int(row.completion_tokens),
+        cachedTokens=int(row.cached_tokens),
+        cacheHitRatio=round(int(row.cached_tokens) / prompt_tokens, 4) if prompt_tokens else 0.0,
+        avgLatencyMs=round(float(row.avg_latency), 1),
+        p95LatencyMs=round(float(row.p95_latency), 1),
+    )
+
+
+@router.get("/llm-usage/summary", dependencies=[Depends(verify_admin_key)])
+async def get_llm_usage_summary(
+    group_by: str = Query("day", description="分组方式：day | user | role"),
+    start: Optional[datetime] = Query(None, description="起始时间（默认 7 天前）"),
+    end: Optional[datetime] = Query(None, description="结束时间（默认当前时间）"),
+    role: Optional[str] = Query(None, description="按调用角色过滤"),
+    user_id: Optional[UUID] = Query(None, description="按用户过滤"),
+    limit: int = Query(100, ge=1, le=1000, description="最多返回的分组数"),
+    db: AsyncSession = Depends(get_db)
+) -> SuccessResponse[LLMUsageSummaryResponse]:
+    """
+    LLM 用量汇总
+
+    Args:
+        group_by: 分组方式
+        start: 起始时间
+        end: 结束时间
+        role: 调用角色过滤
+        user_id: 用户过滤
+        limit: 最多返回的分组数
+
+    Returns:
+        区间总计与分组明细
+    """
+    if group_by not in GROUP_BY_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {GROUP_BY_OPTIONS}")
+
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=7)
+
+    conditions = [LLMCallLog.created_at >= start, LLMCallLog.created_at < end]
+    if role:
+        conditions.append(LLMCallLog.role == role)
+    if user_id:
+        conditions.append(LLMCallLog.user_id == user_id)
+
+    # 区间总计
+    total_row = (await db.execute(select(*_aggregate_columns()).where(*conditions))).one()
+    total = _to_bucket("total", total_row)
+
+    # 分组明细
+    if group_by == "day":
+        day = cast(LLMCallLog.created_at, Date)
+        result = await db.execute(
+            select(day.label("key"), *_aggregate_columns())
+            .where(*conditions)
+            .group_by(day)
+            .order_by(day)
+            .limit(limit)
+        )
+        buckets = [_to_bucket(row.key.isoformat(), row) for row in result.all()]
+
+    elif group_by == "role":
+        result = await db.execute(
+            select(LLMCallLog.role.label("key"), *_aggregate_columns())
+            .where(*conditions)
+            .group_by(LLMCallLog.role)
+            .order_by(func.sum(LLMCallLog.prompt_tokens + LLMCallLog.completion_tokens).desc())
+            .limit(limit)
+        )
+        buckets = [_to_bucket(row.key, row) for row in result.all()]
+
+    else:
+        result = await db.execute(
+            select(LLMCallLog.user_id.label("key"), User.name, *_aggregate_columns())
+            .outerjoin(User, User.id == LLMCallLog.user_id)
+            .where(*conditions)
+            .group_by(LLMCallLog.user_id, User.name)
+            .order_by(func.sum(LLMCallLog.prompt_tokens + LLMCallLog.completion_tokens).desc())
+            .limit(limit)
+        )
+        buckets = [
+            _to_bucket(str(row.key) if row.key else "anonymous", row, label=row.name)
+            for row in result.all()
+        ]
+
+    return SuccessResponse(data=LLMUsageSummaryResponse(
+        groupBy=group_by,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        total=total,
+        buckets=buckets,
+    ))
@@ -1,20 +1,21 @@
 """
 Admin 概览 API 端点
 """
-from fastapi import APIRouter, Depends
-from sqlalchemy import text, select, func
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
 from app.schemas.base import SuccessResponse
 from app.schemas.admin.overview import OverviewStats
+from app.services.row_counts import row_counter
 
 router = APIRouter(tags=["Admin - Overview"])
 
 
 @router.get("/overview", dependencies=[Depends(verify_admin_key)])
 async def get_overview(
+    exact: bool = Query(False, description="是否精确计数（默认使用缓存或统计信息估算）"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[OverviewStats]:
     """
@@ -22,22 +23,26 @@ async def get_overview(
 
     需要 Admin Key 认证（X-ADMIN-KEY Header）
 
+    Args:
+        exact: 是否精确计数
+
     Returns:
         系统各项统计数据
     """
-    # 获取各表行数
-    users_count = await db.scalar(text("SELECT COUNT(*) FROM users"))
-    sessions_count = await db.scalar(text("SELECT COUNT(*) FROM chat_sessions")) or 0
-    messages_count = await db.scalar(text("SELECT COUNT(*) FROM chat_messages"))
-    templates_count = await db.scalar(text("SELECT COUNT(*) FROM scale_templates")) or 0
-    responses_count = await db.scalar(text("SELECT COUNT(*) FROM scale_responses")) or 0
+    # 获取各表行数（默认不做全表 COUNT）
+    counts = await row_counter.count(
+        db,
+        ["users", "chat_sessions", "chat_messages", "scale_templates", "scale_responses"],
+        exact=exact
+    )
 
     stats = OverviewStats(
-        users_count=users_count or 0,
-        sessions_count=sessions_count,
-        messages_count=messages_count or 0,
-        templates_count=templates_count,
-        responses_count=responses_count
+        users_count=counts["users"].count,
+        sessions_count=counts["chat_sessions"].count,
+        messages_count=counts["chat_messages"].count,
+        templates_count=counts["scale_templates"].count,
+        responses_count=counts["scale_responses"].count,
+        estimated=any(c.estimated for c in counts.values())
     )
 
     return SuccessResponse(data=stats)
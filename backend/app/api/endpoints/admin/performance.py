@@ -0,0 +1,112 @@
+"""
+Admin 性能观测 API 端点
+查看进程内各阶段耗时分布（由 app.core.timing 的 span 累计）、SQL 语句统计、事件循环延迟与按需请求剖析结果
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+
+from app.core.security import verify_admin_key
+from app.core.timing import get_stage_stats
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import profile_store
+from app.db import query_stats
+from app.schemas.base import SuccessResponse
+from app.schemas.admin.performance import (
+    StageStats,
+    StageStatsResponse,
+    StatementStatsItem,
+    RouteQueryStatsItem,
+    QueryStatsResponse,
+    EventLoopStatsResponse,
+    ProfileItem,
+)
+
+router = APIRouter(tags=["Admin - Performance"])
+
+
+@router.get("/performance/stages", dependencies=[Depends(verify_admin_key)])
+async def get_performance_stages() -> SuccessResponse[StageStatsResponse]:
+    """
+    各阶段耗时分布
+
+    统计自进程启动起累计，重启后清零；分位数为直方图桶上界估算值。
+    """
+    stages = [StageStats(stage=name, **stats) for name, stats in get_stage_stats().items()]
+    return SuccessResponse(data=StageStatsResponse(stages=stages))
+
+
+QUERY_SORT_OPTIONS = ("total", "mean", "max", "count")
+
+
+@router.get("/performance/queries", dependencies=[Depends(verify_admin_key)])
+async def get_performance_queries(
+    sort: str = Query("total", description="排序：total | mean | max | count"),
+    limit: int = Query(50, ge=1, le=500, description="返回的语句条数"),
+    route: Optional[str] = Query(None, description="只看某个路由模板，如 /api/admin/users"),
+) -> SuccessResponse[QueryStatsResponse]:
+    """
+    SQL 语句统计
+
+    - statements：按 路由 + 语句 聚合的慢查询 / 高频查询 Top-N
+    - routes：各路由平均每请求的语句数，用于定位 N+1
+    """
+    if sort not in QUERY_SORT_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {QUERY_SORT_OPTIONS}")
+
+    return SuccessResponse(data=QueryStatsResponse(
+        sort=sort,
+        statements=[StatementStatsItem(**s) for s in query_stats.get_statement_stats(sort, limit, route)],
+        routes=[RouteQueryStatsItem(**r) for r in query_stats.get_route_stats()],
+    ))
+
+
+@router.delete("/performance/queries", dependencies=[Depends(verify_admin_key)])
+async def reset_performance_queries() -> SuccessResponse[dict]:
+    """清空 SQL 语句统计（优化后重新观察）"""
+    query_stats.reset_stats()
+    return SuccessResponse(data={"reset": True})
+
+
+@router.get("/performance/event-loop", dependencies=[Depends(verify_admin_key)])
+async def get_performance_event_loop() -> SuccessResponse[EventLoopStatsResponse]:
+    """
+    事件循环延迟与阻塞事件
+
+    延迟持续偏高说明有同步代码（密码哈希、大 JSON 序列化、CSV 生成等）占用了事件循环；
+    DEBUG 模式下 blockedEvents 给出阻塞发生时的调用栈。
+    """
+    return SuccessResponse(data=EventLoopStatsResponse(**loop_monitor.snapshot()))
+
+
+@router.get("/performance/profiles", dependencies=[Depends(verify_admin_key)])
+async def list_performance_profiles() -> SuccessResponse[List[ProfileItem]]:
+    """
+    最近的请求剖析结果（新的在前）
+
+    需 PROFILING_ENABLED=true；在目标请求上附加 X-Profile: sample | cprofile 与管理员凭证即可触发。
+    """
+    return SuccessResponse(data=[ProfileItem(**p) for p in profile_store.list()])
+
+
+@router.get("/performance/profiles/{profile_id}", dependencies=[Depends(verify_admin_key)])
+async def download_performance_profile(profile_id: str) -> Response:
+    """
+    下载剖析结果
+
+    - sample：folded stacks 文本（flamegraph.pl / speedscope）
+    - cprofile：pstats 二进制文件（python -m pstats / snakeviz）
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if profile["mode"] == "cprofile":
+        filename, media_type = f"profile-{profile_id}.prof", "application/octet-stream"
+    else:
+        filename, media_type = f"profile-{profile_id}.folded", "text/plain; charset=utf-8"
+    return Response(
+        content=profile["content"],
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,12 +1,14 @@
 """
 Admin 量表管理 API 端点
 """
+from typing import Optional
 from uuid import UUID
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import keyset_after, paginate_rows
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
 from app.schemas.base import SuccessResponse
@@ -18,6 +20,7 @@ from app.schemas.admin.scale_management import (
     ScaleTemplatesResponse
 )
 from app.models.sql.scale import ScaleTemplate, ScaleResponse, ScaleStatus
+from app.services.activity_stats import rebuild_activity_stats
 
 router = APIRouter(tags=["Admin - Scale Management"])
 
@@ -246,7 +249,8 @@ async def archive_scale_template(
 async def get_scale_responses(
     template_id: UUID,
     limit: int = Query(2000, ge=1, le=5000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 nextCursor）"),
+    offset: int = Query(0, ge=0, description="偏移量（兼容旧客户端，建议使用 cursor）"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[dict]:
     """
@@ -255,6 +259,7 @@ async def get_scale_responses(
     Args:
         template_id: 模板 ID
         limit: 限制数量
+        cursor: 分页游标；传入时忽略 offset
         offset: 偏移量
 
     Returns:
@@ -270,13 +275,22 @@ async def get_scale_responses(
     ) or 0
 
     # 查询响应（JOIN 用户表获取姓名和学号）
-    result = await db.execute(
+    stmt = (
         select(ScaleResponse, User.name, User.student_id)
         .join(User, ScaleResponse.user_id == User.id)
         .where(ScaleResponse.template_id == template_id)
-        .order_by(ScaleResponse.created_at.desc())
-        .limit(limit)
-        .offset(offset)
+        .order_by(ScaleResponse.created_at.desc(), ScaleResponse.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(
+            keyset_after(ScaleResponse.created_at, ScaleResponse.id, cursor, "created_at")
+        )
+    elif offset:
+        stmt = stmt.offset(offset)
+    result = await db.execute(stmt)
+    rows, next_cursor = paginate_rows(
+        result.all(), limit, "created_at", lambda row: (row[0].created_at, row[0].id)
     )
 
     response_items = [
@@ -290,14 +304,15 @@ async def get_scale_responses(
             "started_at": resp.started_at.isoformat() if resp.started_at else None,
             "created_at": resp.created_at.isoformat()
         }
-        for resp, name, student_id in result.all()
+        for resp, name, student_id in rows
     ]
 
     return SuccessResponse(data={
         "responses": response_items,
         "total": total,
         "limit": limit,
-        "offset": offset
+        "offset": 0 if cursor else offset,
+        "nextCursor": next_cursor
     })
 
 
@@ -319,8 +334,14 @@ async def delete_scale(
 
     # 删除关联响应
     from sqlalchemy import delete as sql_delete
-    await db.execute(sql_delete(ScaleResponse).where(ScaleResponse.template_id == tid))
+    deleted = await db.execute(
+        sql_delete(ScaleResponse)
+        .where(ScaleResponse.template_id == tid)
+        .returning(ScaleResponse.user_id)
+    )
+    affected_users = {row[0] for row in deleted.all()}
     await db.delete(template)
+    await rebuild_activity_stats(db, affected_users)
     await db.commit()
 
     return SuccessResponse(data={"deleted": True, "template_id": template_id})
@@ -341,9 +362,11 @@ async def delete_scale_responses_batch(
     result = await db.execute(
         sql_delete(ScaleResponse)
         .where(ScaleResponse.id.in_(uuids))
-        .returning(ScaleResponse.id)
+        .returning(ScaleResponse.id, ScaleResponse.user_id)
     )
-    deleted_ids = [str(row[0]) for row in result.all()]
+    rows = result.all()
+    deleted_ids = [str(row[0]) for row in rows]
+    await rebuild_activity_stats(db, {row[1] for row in rows})
     await db.commit()
 
     return SuccessResponse(data={"deleted": True, "count": len(deleted_ids)})
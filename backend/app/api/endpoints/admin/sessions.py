@@ -1,11 +1,13 @@
 """
 Admin 会话管理 API 端点
 """
+from typing import Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, text
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import keyset_after, paginate_rows
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
 from app.schemas.base import SuccessResponse
@@ -19,6 +21,8 @@ from app.schemas.admin.sessions import (
 from app.models.sql.chat_session import ChatSession
 from app.models.sql.message import ChatMessage
 from app.models.sql.user import User
+from app.services.activity_stats import rebuild_activity_stats
+from app.services.conversation_context import conversation_cache
 
 router = APIRouter(tags=["Admin - Sessions"])
 
@@ -45,7 +49,7 @@ async def get_sessions(
     # 查询总数
     total = await db.scalar(select(func.count()).select_from(ChatSession)) or 0
 
-    # 查询会话（关联用户信息）
+    # 查询会话（关联用户信息；消息数 / 最后消息时间读取会话摘要列，不聚合消息表）
     result = await db.execute(
         select(ChatSession, User)
         .join(User, ChatSession.user_id == User.id)
@@ -56,41 +60,19 @@ async def get_sessions(
     rows = result.all()
 
     # 构造会话列表
-    sessions = []
-    for session, user in rows:
-        # 统计消息数量（这里需要检查 chat_messages 表是否有 session_id 字段）
-        # 暂时通过时间范围来估算（这不精确，后续需要数据库迁移添加 session_id）
-        message_count_result = await db.execute(
-            text("""
-                SELECT COUNT(*)
-                FROM chat_messages
-                WHERE user_id = :user_id
-            """),
-            {"user_id": session.user_id}
-        )
-        message_count = message_count_result.scalar() or 0
-
-        # 获取最后一条消息的时间作为 updated_at
-        last_message_result = await db.execute(
-            text("""
-                SELECT MAX(timestamp)
-                FROM chat_messages
-                WHERE user_id = :user_id
-            """),
-            {"user_id": session.user_id}
-        )
-        updated_at = last_message_result.scalar()
-
-        sessions.append(SessionItem(
+    sessions = [
+        SessionItem(
             id=session.id,
             user_id=session.user_id,
             user_name=user.name,
             student_id=user.student_id,
             user_email=user.email,
-            message_count=message_count,
+            message_count=session.message_count,
             created_at=session.created_at,
-            updated_at=updated_at
-        ))
+            updated_at=session.last_message_at
+        )
+        for session, user in rows
+    ]
 
     response = SessionsListResponse(
         sessions=sessions,
@@ -129,37 +111,15 @@ async def get_session_detail(
 
     session, user = row
 
-    # 统计消息数量
-    message_count_result = await db.execute(
-        text("""
-            SELECT COUNT(*)
-            FROM chat_messages
-            WHERE user_id = :user_id
-        """),
-        {"user_id": session.user_id}
-    )
-    message_count = message_count_result.scalar() or 0
-
-    # 获取最后一条消息的时间
-    last_message_result = await db.execute(
-        text("""
-            SELECT MAX(timestamp)
-            FROM chat_messages
-            WHERE user_id = :user_id
-        """),
-        {"user_id": session.user_id}
-    )
-    updated_at = last_message_result.scalar()
-
     session_detail = SessionDetail(
         id=session.id,
         user_id=session.user_id,
         user_name=user.name,
         student_id=user.student_id,
         user_email=user.email,
-        message_count=message_count,
+        message_count=session.message_count,
         created_at=session.created_at,
-        updated_at=updated_at
+        updated_at=session.last_message_at
     )
 
     return SuccessResponse(data=session_detail)
@@ -169,18 +129,17 @@ async def get_session_detail(
 async def get_session_messages(
     session_id: UUID,
     limit: int = Query(100, ge=1, le=500, description="限制数量"),
-    offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 nextCursor）"),
+    offset: int = Query(0, ge=0, description="偏移量（兼容旧客户端，建议使用 cursor）"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[SessionMessagesResponse]:
     """
-    获取会话消息列表
-
-    注意：当前实现返回该用户的所有消息（因为 chat_messages 表暂无 session_id 字段）
-    后续需要数据库迁移添加 session_id 外键
+    获取会话消息列表（按 session_id 过滤，(session_id, timestamp) 索引范围扫描）
 
     Args:
         session_id: 会话 ID
         limit: 限制数量
+        cursor: 分页游标；传入时忽略 offset
         offset: 偏移量
 
     Returns:
@@ -191,19 +150,27 @@ async def get_session_messages(
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    # 查询该用户的所有消息（暂时无法按 session_id 过滤）
     total = await db.scalar(
-        select(func.count()).select_from(ChatMessage).where(ChatMessage.user_id == session.user_id)
+        select(func.count()).select_from(ChatMessage).where(ChatMessage.session_id == session_id)
     ) or 0
 
-    result = await db.execute(
+    # 按时间正序，多取一行判断是否有下一页
+    stmt = (
         select(ChatMessage)
-        .where(ChatMessage.user_id == session.user_id)
-        .order_by(ChatMessage.timestamp.asc())
-        .limit(limit)
-        .offset(offset)
+        .where(ChatMessage.session_id == session_id)
+        .order_by(ChatMessage.timestamp.asc(), ChatMessage.id.asc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(
+            keyset_after(ChatMessage.timestamp, ChatMessage.id, cursor, "timestamp", descending=False)
+        )
+    elif offset:
+        stmt = stmt.offset(offset)
+    result = await db.execute(stmt)
+    messages, next_cursor = paginate_rows(
+        result.scalars().all(), limit, "timestamp", lambda m: (m.timestamp, m.id)
     )
-    messages = result.scalars().all()
 
     message_items = [
         SessionMessageItem(
@@ -220,7 +187,8 @@ async def get_session_messages(
         messages=message_items,
         total=total,
         limit=limit,
-        offset=offset
+        offset=0 if cursor else offset,
+        nextCursor=next_cursor
     )
 
     return SuccessResponse(data=response)
@@ -245,6 +213,8 @@ async def delete_session(
     from sqlalchemy import delete as sql_delete
     await db.execute(sql_delete(ChatMessage).where(ChatMessage.session_id == sid))
     await db.delete(session)
+    await rebuild_activity_stats(db, [session.user_id])
     await db.commit()
+    conversation_cache.invalidate(session.user_id)
 
     return SuccessResponse(data={"deleted": True, "session_id": session_id})
@@ -1,11 +1,13 @@
 """
 Admin 用户详情 API 端点
 """
+from typing import Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, text
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.pagination import keyset_after, paginate_rows
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
 from app.schemas.base import SuccessResponse
@@ -24,6 +26,7 @@ from app.schemas.admin.user_detail import (
     UserGraphResponse,
 )
 from app.models.sql.user import User
+from app.models.sql.user_activity import UserActivityStats
 from app.models.sql.message import ChatMessage
 from app.models.sql.profile import ProfileSnapshot
 from app.models.sql.scale import ScaleResponse, ScaleTemplate
@@ -47,26 +50,18 @@ async def get_user_detail(
     Returns:
         用户详细信息
     """
-    # 查询用户
-    result = await db.execute(select(User).where(User.id == user_id))
-    user = result.scalar_one_or_none()
+    # 查询用户及其活动统计（各项数量由写入时维护，无需在此聚合）
+    result = await db.execute(
+        select(User, UserActivityStats)
+        .outerjoin(UserActivityStats, UserActivityStats.user_id == User.id)
+        .where(User.id == user_id)
+    )
+    row = result.first()
 
-    if not user:
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
 
-    # 统计各项数量
-    messages_count = await db.scalar(
-        select(func.count()).select_from(ChatMessage).where(ChatMessage.user_id == user_id)
-    ) or 0
-
-    sessions_count = await db.scalar(
-        text("SELECT COUNT(*) FROM chat_sessions WHERE user_id = :user_id"),
-        {"user_id": user_id}
-    ) or 0
-
-    responses_count = await db.scalar(
-        select(func.count()).select_from(ScaleResponse).where(ScaleResponse.user_id == user_id)
-    ) or 0
+    user, stats = row
 
     user_detail = UserDetail(
         id=user.id,
@@ -76,10 +71,10 @@ async def get_user_detail(
         role=user.role,
         is_active=user.is_active,
         created_at=user.created_at,
-        last_active_at=user.last_active_at,
-        messages_count=messages_count,
-        sessions_count=sessions_count,
-        responses_count=responses_count
+        last_active_at=(stats.last_active_at if stats else None) or user.last_active_at,
+        messages_count=stats.message_count if stats else 0,
+        sessions_count=stats.session_count if stats else 0,
+        responses_count=stats.scale_response_count if stats else 0
     )
 
     return SuccessResponse(data=user_detail)
@@ -89,34 +84,42 @@ async def get_user_detail(
 async def get_user_messages(
     user_id: UUID,
     limit: int = Query(50, ge=1, le=500, description="限制数量"),
-    offset: int = Query(0, ge=0, description="偏移量"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 nextCursor）"),
+    offset: int = Query(0, ge=0, description="偏移量（兼容旧客户端，建议使用 cursor）"),
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[UserMessagesResponse]:
     """
-    获取用户消息列表
+    获取用户消息列表（按时间倒序）
 
     Args:
         user_id: 用户 ID
         limit: 限制数量
+        cursor: 分页游标；传入时忽略 offset
         offset: 偏移量
 
     Returns:
         用户消息列表
     """
-    # 查询总数
+    # 查询总数（写入时维护的计数）
     total = await db.scalar(
-        select(func.count()).select_from(ChatMessage).where(ChatMessage.user_id == user_id)
+        select(UserActivityStats.message_count).where(UserActivityStats.user_id == user_id)
     ) or 0
 
-    # 查询消息
-    result = await db.execute(
+    # 查询消息（多取一行判断是否有下一页）
+    stmt = (
         select(ChatMessage)
         .where(ChatMessage.user_id == user_id)
-        .order_by(ChatMessage.timestamp.desc())
-        .limit(limit)
-        .offset(offset)
+        .order_by(ChatMessage.timestamp.desc(), ChatMessage.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(keyset_after(ChatMessage.timestamp, ChatMessage.id, cursor, "timestamp"))
+    elif offset:
+        stmt = stmt.offset(offset)
+    result = await db.execute(stmt)
+    messages, next_cursor = paginate_rows(
+        result.scalars().all(), limit, "timestamp", lambda m: (m.timestamp, m.id)
     )
-    messages = result.scalars().all()
 
     message_items = [
         MessageItem(
@@ -133,7 +136,8 @@ async def get_user_messages(
         messages=message_items,
         total=total,
         limit=limit,
-        offset=offset
+        offset=0 if cursor else offset,
+        nextCursor=next_cursor
     )
 
     return SuccessResponse(data=response)
@@ -11,8 +11,10 @@ from typing import Optional
 from app.core.security import verify_admin_key
 from app.db.postgres import get_db
 from app.models.sql.user import User
-from app.models.sql.message import ChatMessage
+from app.models.sql.user_activity import UserActivityStats
 from app.schemas.base import SuccessResponse
+from app.services.activity_stats import rebuild_activity_stats
+from app.services.conversation_context import conversation_cache
 from app.schemas.admin.user_management import UserListResponse, UserSummary
 
 router = APIRouter(tags=["Admin - User Management"])
@@ -26,7 +28,9 @@ async def list_users(
     db: AsyncSession = Depends(get_db)
 ) -> SuccessResponse[UserListResponse]:
     """获取用户列表（分页 + 搜索）"""
-    base_stmt = select(User)
+    base_stmt = select(User, UserActivityStats).outerjoin(
+        UserActivityStats, UserActivityStats.user_id == User.id
+    )
     count_stmt = select(func.count(User.id))
 
     # 支持按 student_id、name、email 搜索
@@ -46,23 +50,10 @@ async def list_users(
     offset = (page - 1) * page_size
     stmt = base_stmt.offset(offset).limit(page_size).order_by(User.created_at.desc())
     result = await db.execute(stmt)
-    users = result.scalars().all()
 
+    # 消息数与最后活跃时间来自 user_activity_stats（与用户同一条查询取出）
     user_summaries = []
-    for user in users:
-        msg_count_result = await db.execute(
-            select(func.count(ChatMessage.id)).where(ChatMessage.user_id == user.id)
-        )
-        msg_count = msg_count_result.scalar() or 0
-
-        last_msg_result = await db.execute(
-            select(ChatMessage.timestamp)
-            .where(ChatMessage.user_id == user.id)
-            .order_by(ChatMessage.timestamp.desc())
-            .limit(1)
-        )
-        last_active = last_msg_result.scalar()
-
+    for user, stats in result.all():
         user_summaries.append(UserSummary(
             id=str(user.id),
             student_id=user.student_id,
@@ -71,8 +62,8 @@ async def list_users(
             role=getattr(user, "role", "user") or "user",
             is_active=getattr(user, "is_active", True) if hasattr(user, "is_active") else True,
             created_at=user.created_at,
-            message_count=msg_count,
-            last_active_at=last_active
+            message_count=stats.message_count if stats else 0,
+            last_active_at=stats.last_active_at if stats else None
         ))
 
     return SuccessResponse(data=UserListResponse(
@@ -83,6 +74,20 @@ async def list_users(
     ))
 
 
+@router.post("/users/activity-stats/rebuild", dependencies=[Depends(verify_admin_key)])
+async def rebuild_user_activity_stats(
+    db: AsyncSession = Depends(get_db)
+) -> SuccessResponse[dict]:
+    """
+    从明细表全量重建用户活动统计
+
+    统计在写入时增量维护，正常情况下无需调用；用于手工修改数据或导入数据之后校正。
+    """
+    count = await rebuild_activity_stats(db)
+    await db.commit()
+    return SuccessResponse(data={"rebuilt": True, "users": count})
+
+
 class UpdateUserRequest(BaseModel):
     name: Optional[str] = None
     is_active: Optional[bool] = None
@@ -180,5 +185,6 @@ async def delete_user(
     await db.execute(sql_delete(ProfileSnapshot).where(ProfileSnapshot.user_id == uid))
     await db.delete(user)
     await db.commit()
+    conversation_cache.invalidate(uid)
 
     return SuccessResponse(data={"deleted": True, "user_id": user_id})
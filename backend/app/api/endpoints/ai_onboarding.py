@@ -16,7 +16,7 @@ from app.db.postgres import get_db
 router = APIRouter()
 
 # LLM Provider 实例（全局单例）
-llm_provider = get_provider()
+llm_provider = get_provider(role="onboarding")
 
 
 # 通用响应包装
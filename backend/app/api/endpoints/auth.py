@@ -22,6 +22,9 @@ from app.models.sql.user import User
 from app.models.sql.profile import ProfileSnapshot
 from app.db.postgres import get_db
 from app.core.config import settings
+from app.core.context import current_user_id
+from app.services.activity_stats import record_activity
+from app.services.profile_current import set_current_profile
 
 router = APIRouter()
 
@@ -56,19 +59,16 @@ async def get_current_user(
     import logging
     logger = logging.getLogger(__name__)
 
-    logger.info(f"[AUTH] Authorization header: {authorization[:50] if authorization else 'None'}...")
-
+    # 每个认证请求都会经过这里：只在失败时记录，不记录 token 内容
     if not authorization or not authorization.startswith("Bearer "):
         logger.warning("[AUTH] No valid Authorization header")
         raise HTTPException(status_code=401, detail="Not authenticated")
 
     token = authorization.split(" ")[1]
-    logger.info(f"[AUTH] Extracted token: {token[:20]}...")
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: str = payload.get("sub")
-        logger.info(f"[AUTH] Decoded user_id: {user_id}")
 
         if user_id is None:
             logger.warning("[AUTH] No user_id in token payload")
@@ -86,10 +86,12 @@ async def get_current_user(
     user = result.scalar_one_or_none()
 
     if user is None:
-        logger.warning(f"[AUTH] User not found in database: {user_id}")
+        logger.warning("[AUTH] User not found in database: %s", user_id)
         raise HTTPException(status_code=401, detail="User not found")
 
-    logger.info(f"[AUTH] ✅ Authentication successful for user: {user.student_id}")
+    # 之后的日志会自动带上 user_id（见 app.core.logging.ContextFilter）
+    current_user_id.set(user.id)
+    logger.debug("[AUTH] Authenticated user: %s", user.student_id)
     return user
 
 
@@ -288,6 +290,8 @@ async def register(data: RegisterRequest, db: AsyncSession = Depends(get_db)):
         )
 
         db.add(initial_snapshot)
+        await record_activity(db, new_user.id, profile_at=initial_snapshot.created_at)
+        await set_current_profile(db, new_user.id, 50, 50, 50, at=initial_snapshot.created_at)
         await db.commit()
         logger.info(f"[REGISTER] Initial profile snapshot created for user {new_user.id}")
 
@@ -449,6 +453,12 @@ async def register_with_scale(data: RegisterWithScaleRequest, db: AsyncSession =
             }
         )
         db.add(scale_resp)
+        await record_activity(
+            db, new_user.id, scale_responses=1, profile_at=initial_snapshot.created_at
+        )
+        await set_current_profile(
+            db, new_user.id, cognition, affect, behavior, at=initial_snapshot.created_at
+        )
 
         # ── 标记 onboarding 完成，一次性 commit ──────────────────────────────
         new_user.has_completed_onboarding = True
@@ -554,6 +564,11 @@ async def save_user_profile(
     )
 
     db.add(new_profile)
+    await record_activity(db, user_id, profile_at=new_profile.created_at)
+    await set_current_profile(
+        db, user_id, new_profile.cognition, new_profile.affect, new_profile.behavior,
+        at=new_profile.created_at
+    )
     await db.commit()
     await db.refresh(new_profile)
 
@@ -2,19 +2,28 @@
 Chat Endpoint - 对话接口（完整实现）
 """
 import logging
-from uuid import UUID
+import time
+from collections import deque
+from uuid import UUID, uuid4
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from fastapi import APIRouter, HTTPException, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.timing import span, record_duration, current_timings
 from app.db.postgres import get_db
 from app.schemas.base import SuccessResponse
 from app.schemas.chat import ChatRequest, ChatResponse, ChatMessage as ChatMessageSchema
+from app.schemas.profile import ProfileDelta, UserProfile
 from app.services.profile_service import ProfileService
 from app.services.graph_service import GraphService
 from app.services.text_analyzer import TextAnalyzer
 from app.services.llm_config import get_chat_provider
+from app.services.activity_stats import record_activity
+from app.services.chat_sessions import SESSION_GAP, record_session_message
+from app.services.conversation_context import ConversationContext, conversation_cache
+from app.api.pagination import keyset_after, paginate_rows
 from app.models.sql.message import ChatMessage, MessageRole
 from app.models.sql.chat_session import ChatSession
 from app.models.sql.user import User
@@ -23,25 +32,94 @@ from app.api.endpoints.auth import get_current_user
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 对话历史窗口（消息条数）：超出上限时按 HISTORY_WINDOW_STEP 整块丢弃最早的消息，
+# 而不是每轮滑动一条，使相邻轮次发送给 LLM 的历史前缀保持一致，便于命中上游 prompt 缓存
+HISTORY_WINDOW_MAX = 12
+HISTORY_WINDOW_STEP = 6
+# 单个会话最多读取的历史消息数
+HISTORY_FETCH_LIMIT = 200
 
-async def get_or_create_active_session(db: AsyncSession, user_id: UUID) -> ChatSession:
-    """获取最近 30 分钟内的活跃会话，不存在则创建新会话"""
+
+async def get_or_create_active_session(db: AsyncSession, user_id: UUID) -> Tuple[ChatSession, bool]:
+    """
+    获取活跃会话（最近一个会话在 30 分钟内有过消息），不存在则暂存新会话
+
+    与会话列表的切分规则一致：相邻消息间隔超过 SESSION_GAP 才开始新会话。
+    新会话的主键与创建时间在客户端生成，只加入数据库会话，随本轮消息一起写入
+    （见 save_chat_turn），会话数也在那时计入活动统计。
+
+    Returns:
+        (会话, 是否为新会话)
+    """
     from sqlalchemy import select
-    cutoff = datetime.now(timezone.utc) - timedelta(minutes=30)
+    now = datetime.now(timezone.utc)
     result = await db.execute(
         select(ChatSession)
-        .where(ChatSession.user_id == user_id, ChatSession.created_at >= cutoff)
+        .where(ChatSession.user_id == user_id)
         .order_by(ChatSession.created_at.desc())
         .limit(1)
     )
     session = result.scalar_one_or_none()
-    if not session:
-        session = ChatSession(user_id=user_id)
-        db.add(session)
-        await db.commit()
-        await db.refresh(session)
-        logger.info(f"Created new chat session for user {user_id}: {session.id}")
-    return session
+    if session is not None and (session.last_message_at or session.created_at) >= now - SESSION_GAP:
+        return session, False
+
+    session = ChatSession(id=uuid4(), user_id=user_id, created_at=now)
+    db.add(session)
+    logger.info(f"Starting new chat session for user {user_id}: {session.id}")
+    return session, True
+
+
+async def save_chat_turn(
+    db: AsyncSession,
+    context: ConversationContext,
+    messages: List[ChatMessage],
+    delta: Optional[ProfileDelta] = None,
+) -> Optional[UserProfile]:
+    """
+    写入本轮对话并提交（每轮只提交一次）
+
+    此前的步骤只把新会话暂存在数据库会话中；这里依次执行：
+    画像增量（一条 UPSERT，CTE 追加快照）→ INSERT 会话 / 消息 → 活动统计 UPSERT →
+    会话摘要 UPDATE → COMMIT。主键与时间戳都在客户端生成，不需要 refresh()。
+    提交成功后才追加到上下文缓存。
+
+    Args:
+        db: 数据库会话
+        context: 本轮对话上下文
+        messages: 本轮新消息（按时间顺序，第一条为用户消息）
+        delta: 本轮的画像增量（快照时间取用户消息时间）
+
+    Returns:
+        更新后的画像（未传 delta 时为 None）
+    """
+    profile = None
+    if delta is not None:
+        profile = await ProfileService(db).apply_delta(
+            user_id=context.user_id,
+            delta_cognition=delta.cognition,
+            delta_affect=delta.affect,
+            delta_behavior=delta.behavior,
+            at=messages[0].timestamp,
+        )
+
+    db.add_all(messages)
+    await record_activity(
+        db,
+        context.user_id,
+        messages=len(messages),
+        sessions=1 if context.session_pending else 0,
+        active_at=messages[-1].timestamp,
+        profile_at=messages[0].timestamp if delta is not None else None,
+    )
+    await record_session_message(db, *messages)
+    await db.commit()
+
+    for message in messages:
+        context.append(message.role.value, message.text, message.timestamp)
+    if context.session_pending:
+        context.session_pending = False
+        conversation_cache.put(context)
+    return profile
 
 
 def build_assistant_system_prompt(
@@ -172,6 +250,66 @@ async def get_recent_messages(
     ]
 
 
+async def get_session_history(
+    db: AsyncSession,
+    session_id: UUID,
+    limit: int = HISTORY_FETCH_LIMIT
+) -> List[Dict[str, str]]:
+    """
+    获取当前会话内的对话历史（按时间正序；走 (session_id, timestamp) 索引）
+
+    Args:
+        db: 数据库会话
+        session_id: 会话 ID
+        limit: 最多返回的消息数量
+
+    Returns:
+        消息列表 [{"role": "user"|"assistant", "text": "..."}]
+    """
+    from sqlalchemy import select, desc
+
+    query = (
+        select(ChatMessage)
+        .where(ChatMessage.session_id == session_id)
+        .order_by(desc(ChatMessage.timestamp))
+        .limit(limit)
+    )
+
+    result = await db.execute(query)
+    messages = result.scalars().all()
+
+    return [
+        {"role": msg.role.value, "text": msg.text}
+        for msg in reversed(messages)
+    ]
+
+
+def stable_history_window(
+    messages: List[Dict[str, str]],
+    max_len: int = HISTORY_WINDOW_MAX,
+    step: int = HISTORY_WINDOW_STEP,
+) -> List[Dict[str, str]]:
+    """
+    截取缓存友好的历史窗口
+
+    窗口起点只在超出 max_len 时以 step 为单位整块前移，
+    两次前移之间历史是只追加的，上一轮的消息前缀在下一轮保持不变。
+
+    Args:
+        messages: 会话内全部历史消息（按时间正序）
+        max_len: 窗口最大消息数
+        step: 每次前移丢弃的消息数
+
+    Returns:
+        窗口内的消息列表
+    """
+    if len(messages) <= max_len:
+        return messages
+    overflow = len(messages) - max_len
+    drop = -(-overflow // step) * step
+    return messages[drop:]
+
+
 async def get_cross_session_context(
     db: AsyncSession,
     user_id: UUID,
@@ -246,6 +384,38 @@ async def get_cross_session_context(
     return None
 
 
+async def get_conversation_context(db: AsyncSession, user_id: UUID) -> ConversationContext:
+    """
+    获取本轮对话的上下文
+
+    缓存命中且会话仍在继续时直接返回（不访问数据库）；否则从数据库加载活跃会话、
+    会话内历史与上次会话摘要，并放入缓存。
+    """
+    context = conversation_cache.get(user_id)
+    if context is not None and context.is_active(datetime.now(timezone.utc)):
+        return context
+
+    # 上次会话摘要须在创建新会话、保存本条消息之前读取
+    previous_session = await get_cross_session_context(db, user_id)
+    session, created = await get_or_create_active_session(db, user_id)
+    history = [] if created else await get_session_history(db, session.id)
+    context = ConversationContext(
+        user_id=user_id,
+        session_id=session.id,
+        session_created_at=session.created_at,
+        last_message_at=session.last_message_at or session.created_at,
+        history=deque(history, maxlen=HISTORY_FETCH_LIMIT),
+        # 新会话首轮沿用最近几条消息以保持话题连续
+        fallback=[] if history else await get_recent_messages(db, user_id, limit=3),
+        previous_session=previous_session,
+        session_pending=created,
+    )
+    # 新会话尚未写入：提交后再放入缓存（见 save_chat_turn），缓存中只有已提交的状态
+    if not created:
+        conversation_cache.put(context)
+    return context
+
+
 @router.get("/greeting")
 async def get_greeting(
     language: str = Query("zh", description="语言 zh|en"),
@@ -274,20 +444,17 @@ async def get_greeting(
             return {"success": True, "data": {"message": msg, "hasContext": False}}
 
         # 有跨会话上下文 - 让 LLM 生成个性化问候（带用户名）
-        llm = get_provider()
+        llm = get_chat_provider(role="greeting")
         system = (
             f"你是一个温暖的学习伙伴。根据上次会话的内容，用一句简短友好的话问候回来的用户{name_part}，自然地提及上次的话题。不超过50个字。"
             if language == "zh"
             else f"You are a warm learning companion. Greet {user_name or 'the user'} with one short friendly sentence that naturally references their previous topic. Keep it under 30 words."
         )
-        import asyncio
-        greeting = await asyncio.wait_for(
-            llm.complete(
-                system_prompt=system,
-                user_prompt=context,
-                temperature=0.8,
-                max_tokens=100
-            ),
+        greeting = await llm.complete(
+            system_prompt=system,
+            user_prompt=context,
+            temperature=0.8,
+            max_tokens=100,
             timeout=15.0,
         )
 
@@ -301,114 +468,90 @@ async def get_greeting(
 
 @router.get("/sessions")
 async def get_chat_sessions(
+    limit: int = Query(50, ge=1, le=200, description="每页会话数"),
+    cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 nextCursor）"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """
-    获取用户的历史对话会话列表
+    获取用户的历史对话会话列表（最新的在前，游标分页）
 
-    按 30 分钟间隔将消息分组成会话，返回每个会话的元数据
+    会话摘要随消息写入增量维护（app.services.chat_sessions），这里只读取摘要列，
+    不再加载消息。
     """
-    user_id = current_user.id
-
-    from sqlalchemy import select, asc
+    from sqlalchemy import select
 
-    query = (
-        select(ChatMessage)
-        .where(ChatMessage.user_id == user_id)
-        .order_by(asc(ChatMessage.timestamp))
+    stmt = (
+        select(
+            ChatSession.id,
+            ChatSession.created_at,
+            ChatSession.started_at,
+            ChatSession.last_message_at,
+            ChatSession.message_count,
+            ChatSession.title,
+            ChatSession.preview,
+        )
+        .where(ChatSession.user_id == current_user.id, ChatSession.message_count > 0)
+        .order_by(ChatSession.created_at.desc(), ChatSession.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        stmt = stmt.where(keyset_after(ChatSession.created_at, ChatSession.id, cursor, "created_at"))
+    result = await db.execute(stmt)
+    rows, next_cursor = paginate_rows(
+        result.all(), limit, "created_at", lambda r: (r.created_at, r.id)
     )
-    result = await db.execute(query)
-    messages = result.scalars().all()
-
-    if not messages:
-        return {"success": True, "data": {"sessions": []}}
-
-    SESSION_GAP = timedelta(minutes=30)
-    sessions = []
-    current_session_msgs = [messages[0]]
-
-    for msg in messages[1:]:
-        prev_ts = current_session_msgs[-1].timestamp
-        curr_ts = msg.timestamp
-        if prev_ts.tzinfo is None:
-            prev_ts = prev_ts.replace(tzinfo=timezone.utc)
-        if curr_ts.tzinfo is None:
-            curr_ts = curr_ts.replace(tzinfo=timezone.utc)
-
-        if curr_ts - prev_ts > SESSION_GAP:
-            sessions.append(current_session_msgs)
-            current_session_msgs = [msg]
-        else:
-            current_session_msgs.append(msg)
-
-    sessions.append(current_session_msgs)
 
     session_list = []
-    for idx, sess_msgs in enumerate(reversed(sessions)):
-        first_msg = sess_msgs[0]
-        last_msg = sess_msgs[-1]
-
-        title = ""
-        for m in sess_msgs:
-            if m.role.value == "user":
-                title = m.text[:40] + ("..." if len(m.text) > 40 else "")
-                break
-        if not title:
-            title = f"会话 {len(sessions) - idx}"
-
-        preview = last_msg.text[:60] + ("..." if len(last_msg.text) > 60 else "")
-
-        start_ts = first_msg.timestamp
-        end_ts = last_msg.timestamp
-        if start_ts.tzinfo is None:
-            start_ts = start_ts.replace(tzinfo=timezone.utc)
-        if end_ts.tzinfo is None:
-            end_ts = end_ts.replace(tzinfo=timezone.utc)
-
+    for row in rows:
+        start_ts = row.started_at or row.created_at
+        end_ts = row.last_message_at or start_ts
         session_list.append({
+            "id": str(row.id),
             "sessionStart": start_ts.isoformat(),
             "sessionEnd": end_ts.isoformat(),
-            "title": title,
-            "preview": preview,
-            "messageCount": len(sess_msgs),
+            "title": row.title or f"会话 {start_ts:%Y-%m-%d %H:%M}",
+            "preview": row.preview or "",
+            "messageCount": row.message_count,
         })
 
-    return {"success": True, "data": {"sessions": session_list}}
+    return {"success": True, "data": {"sessions": session_list, "nextCursor": next_cursor}}
 
 
 @router.get("/sessions/messages")
 async def get_session_messages(
-    sessionStart: str = Query(..., description="会话开始时间 (ISO)"),
-    sessionEnd: str = Query(..., description="会话结束时间 (ISO)"),
+    sessionId: Optional[UUID] = Query(None, description="会话 ID（优先使用）"),
+    sessionStart: Optional[str] = Query(None, description="会话开始时间 (ISO)，未传 sessionId 时必填"),
+    sessionEnd: Optional[str] = Query(None, description="会话结束时间 (ISO)，未传 sessionId 时必填"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """获取特定会话的所有消息"""
+    """获取特定会话的所有消息（按 sessionId 走 (session_id, timestamp) 索引；兼容按时间范围查询）"""
     user_id = current_user.id
 
     from sqlalchemy import select, asc
     from datetime import datetime as dt
 
-    try:
-        start_dt = dt.fromisoformat(sessionStart.replace("Z", "+00:00"))
-        end_dt = dt.fromisoformat(sessionEnd.replace("Z", "+00:00"))
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid datetime format")
-
-    start_dt = start_dt - timedelta(seconds=1)
-    end_dt = end_dt + timedelta(seconds=1)
-
-    query = (
-        select(ChatMessage)
-        .where(
-            ChatMessage.user_id == user_id,
+    query = select(ChatMessage).where(ChatMessage.user_id == user_id)
+    if sessionId is not None:
+        query = query.where(ChatMessage.session_id == sessionId)
+    else:
+        if not sessionStart or not sessionEnd:
+            raise HTTPException(status_code=400, detail="sessionId or sessionStart/sessionEnd is required")
+        try:
+            start_dt = dt.fromisoformat(sessionStart.replace("Z", "+00:00"))
+            end_dt = dt.fromisoformat(sessionEnd.replace("Z", "+00:00"))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid datetime format")
+
+        start_dt = start_dt - timedelta(seconds=1)
+        end_dt = end_dt + timedelta(seconds=1)
+        query = query.where(
             ChatMessage.timestamp >= start_dt,
             ChatMessage.timestamp <= end_dt,
         )
-        .order_by(asc(ChatMessage.timestamp))
-    )
-    result = await db.execute(query)
+
+    result = await db.execute(query.order_by(asc(ChatMessage.timestamp)))
     messages = result.scalars().all()
 
     msg_list = [
@@ -435,79 +578,82 @@ async def chat(
 
     流程：
     1. 获取当前认证用户
-    2. 保存用户消息
+    2. 创建用户消息
     3. 分析消息（intent、emotion、concepts、delta）
     4. 更新画像
     5. 更新知识图谱
     6. 生成 AI 回复
-    7. 保存 AI 回复
+    7. 保存本轮对话
     8. 返回响应
-    """
-    logger.info(f"Received chat request from user: {current_user.id}")
 
+    PostgreSQL 的写入（画像增量与快照、新会话、两条消息、活动统计、会话摘要）在第 7 步作为
+    一个事务一次刷出、提交一次；生成回复失败时只提交用户这一半（消息与画像增量）。
+    """
+    # 逐步日志为 DEBUG，每轮对话只输出一条 INFO 汇总；user_id / request_id 由日志上下文自动附带
     try:
         # ========== 1. 获取认证用户 ==========
         user = current_user
         user_id = user.id
 
-        logger.info(f"User identified: {user.email} (id={user_id})")
-
-        # 创建/获取活跃会话（供管理后台 Conversations 页面使用）
+        # 活跃会话与对话历史（不含本条消息）：缓存命中时不访问数据库
         profile_service = ProfileService(db)
-        await get_or_create_active_session(db, user_id)
+        with span("chat.session"):
+            context = await get_conversation_context(db, user_id)
+            first_turn = context.is_first_turn
+            recent_messages = context.recent_messages()
 
-        # ========== 2. 保存用户消息 ==========
+        # ========== 2. 创建用户消息（第 7 步随 AI 回复一起写入） ==========
         user_message = ChatMessage(
+            id=uuid4(),
             user_id=user_id,
+            session_id=context.session_id,
             role=MessageRole.USER,
             text=request.message,
             timestamp=datetime.now(timezone.utc),
-            analysis=None  # 用户消息没有分析结果
+            analysis=None,  # 用户消息没有分析结果
+            timings=None
         )
-        db.add(user_message)
-        await db.commit()
-        await db.refresh(user_message)
-
-        logger.info(f"User message saved: {user_message.id}")
 
         # ========== 3. 分析消息 ==========
         analyzer = TextAnalyzer()
 
-        # 获取对话历史作为上下文
-        recent_messages = await get_recent_messages(db, user_id, limit=5)
-
-        analysis = await analyzer.analyze(
-            user_message=request.message,
-            recent_messages=recent_messages
-        )
+        with span("chat.analysis"):
+            analysis = await analyzer.analyze(
+                user_message=request.message,
+                recent_messages=recent_messages
+            )
 
-        logger.info(
-            f"Analysis complete: intent={analysis.intent}, emotion={analysis.emotion}, "
-            f"concepts={len(analysis.detectedConcepts)}"
+        logger.debug(
+            "Analysis complete: intent=%s, emotion=%s, concepts=%d",
+            analysis.intent, analysis.emotion, len(analysis.detectedConcepts)
         )
 
         # ========== 4. 更新画像 ==========
-        updated_profile = await profile_service.apply_delta(
-            user_id=user_id,
-            delta_cognition=analysis.delta.cognition,
-            delta_affect=analysis.delta.affect,
-            delta_behavior=analysis.delta.behavior
+        # 这里只预估本轮画像用于构建 prompt；增量在第 7 步随本轮写入原子地应用
+        with span("chat.profile"):
+            current_profile = await profile_service.get_profile(user_id)
+        updated_profile = ProfileService.add_delta(
+            current_profile,
+            analysis.delta.cognition,
+            analysis.delta.affect,
+            analysis.delta.behavior
         )
 
-        logger.info(
-            f"Profile updated: C={updated_profile.cognition}, "
-            f"A={updated_profile.affect}, B={updated_profile.behavior}"
+        logger.debug(
+            "Profile estimated: C=%s, A=%s, B=%s",
+            updated_profile.cognition, updated_profile.affect, updated_profile.behavior
         )
 
         # ========== 5. 更新知识图谱 ==========
         if analysis.detectedConcepts:
             try:
                 graph_service = GraphService()
-                await graph_service.upsert_concepts(
-                    user_id=str(user_id),
-                    concepts=analysis.detectedConcepts
-                )
-                logger.info(f"Knowledge graph updated with {len(analysis.detectedConcepts)} concepts")
+                with span("chat.graph_upsert"):
+                    await graph_service.upsert_concepts(
+                        user_id=str(user_id),
+                        concepts=analysis.detectedConcepts
+                    )
+                logger.debug("Knowledge graph updated with %d concepts", len(analysis.detectedConcepts))
             except Exception as graph_error:
                 logger.warning(f"Failed to update knowledge graph: {graph_error}")
                 # 继续处理，不因为图谱更新失败而中断
@@ -517,7 +663,8 @@ async def chat(
         current_graph = []
         try:
             graph_service = GraphService()
-            graph_data = await graph_service.get_graph(str(user_id))
+            with span("chat.graph_fetch"):
+                graph_data = await graph_service.get_graph(str(user_id))
             if graph_data.nodes:
                 current_graph = [
                     {
@@ -530,46 +677,43 @@ async def chat(
         except Exception as e:
             logger.warning(f"Failed to fetch knowledge graph: {e}, using empty graph")
 
-        # 构建个性化 system prompt
+        # 构建缓存友好的消息列表：
+        #   [静态 system prompt] + [会话内只追加的历史] + [本轮动态上下文 + 学生消息]
+        # 画像、情绪、知识图谱、代码等每轮变化的内容只放在最后一条消息里，不破坏前缀缓存
         from app.services.personalization_service import PersonalizationService
 
+        prompt_start = time.perf_counter()
+        lang = request.language or "zh"
         personalization_service = PersonalizationService()
-        system_prompt = personalization_service.build_personalized_prompt(
+        system_prompt = personalization_service.build_static_system_prompt(lang)
+
+        # 研究模式：注入教师教学提示（课程上下文与学习目标，整节课不变，放在 system prompt 中）
+        if request.isResearchMode and request.taskPrompt:
+            teacher_hint = {
+                "zh": f"\n\n**本节课教学目标（教师设定）：**\n{request.taskPrompt}\n在辅导过程中，请围绕以上学习目标给予引导，帮助学生达成教师期望的理解和能力。\n",
+                "en": f"\n\n**Lesson Learning Objectives (set by teacher):**\n{request.taskPrompt}\nGuide the student in alignment with these objectives to help them achieve the understanding and skills the teacher expects.\n",
+            }[lang]
+            system_prompt += teacher_hint
+
+        turn_context = personalization_service.build_turn_context(
             user_profile=updated_profile,
             knowledge_graph=current_graph,
             emotion=analysis.emotion,
-            language=request.language or "zh"
+            language=lang
         )
 
-        # 注入跨会话上下文（让 AI 能自然引用上次讨论内容）
-        cross_session_ctx = await get_cross_session_context(db, user_id)
-        if cross_session_ctx:
-            system_prompt += f"\n上次对话涉及：{cross_session_ctx}，如自然可提及。"
+        # 新会话首轮注入跨会话上下文（让 AI 能自然引用上次讨论内容）
+        if first_turn and context.previous_session:
+            turn_context += f"\n上次对话涉及：{context.previous_session}，如自然可提及。"
 
         # 研究模式：注入学生当前代码
         if request.isResearchMode and request.currentCode:
             code_snippet = request.currentCode[:3000]
-            lang = request.language or "zh"
             code_context = {
                 "zh": f"\n\n**学生当前代码：**\n```\n{code_snippet}\n```\n请根据以上代码内容理解学生进度，给出引导性提问，帮助学生自己发现和解决问题，不要直接给出完整答案。\n",
                 "en": f"\n\n**Student's current code:**\n```\n{code_snippet}\n```\nUse this code to understand the student's progress. Ask guiding questions to help them discover and solve problems themselves. Do not provide complete code answers directly.\n",
             }[lang]
-            system_prompt += code_context
-
-        # 研究模式：注入教师教学提示（课程上下文与学习目标）
-        if request.isResearchMode and request.taskPrompt:
-            lang = request.language or "zh"
-            teacher_hint = {
-                "zh": f"\n\n**本节课教学目标（教师设定）：**\n{request.taskPrompt}\n在辅导过程中，请围绕以上学习目标给予引导，帮助学生达成教师期望的理解和能力。\n",
-                "en": f"\n\n**Lesson Learning Objectives (set by teacher):**\n{request.taskPrompt}\nGuide the student in alignment with these objectives to help them achieve the understanding and skills the teacher expects.\n",
-            }[lang]
-            system_prompt += teacher_hint
-
-        # 构建 user prompt（包含历史对话）
-        conversation_context = "\n".join([
-            f"{'学生' if msg['role'] == 'user' else '老师'}: {msg['text']}"
-            for msg in recent_messages[-3:]  # 只取最近 3 条
-        ])
+            turn_context += code_context
 
         # 检测学生是否表达了"理解/完成"
         understanding_keywords = ["理解了", "懂了", "明白了", "好的", "知道了", "完成了", "我会了",
@@ -582,61 +726,72 @@ async def chat(
         else:
             verification_hint = ""
 
-        user_prompt = f"""对话记录：
-{conversation_context}
-
-学生说：{request.message}{verification_hint}"""
+        llm_messages = [{"role": "system", "content": system_prompt}]
+        llm_messages.extend(
+            {"role": msg["role"], "content": msg["text"]}
+            for msg in stable_history_window(recent_messages)
+        )
+        llm_messages.append({
+            "role": "user",
+            "content": f"{turn_context}\n\n学生说：{request.message}{verification_hint}",
+        })
+        record_duration("chat.prompt", (time.perf_counter() - prompt_start) * 1000)
 
         # 调用 LLM 生成回复（30 秒超时，失败自动重试一次）
-        import asyncio
         llm_provider = get_chat_provider()
-        last_llm_error: Exception | None = None
         assistant_reply = ""
-        for attempt in range(2):
-            try:
-                assistant_reply = await asyncio.wait_for(
-                    llm_provider.complete(
-                        system_prompt=system_prompt,
-                        user_prompt=user_prompt,
-                        temperature=0.7,
-                        max_tokens=300
-                    ),
+        try:
+            with span("chat.llm_reply"):
+                assistant_reply = await llm_provider.chat(
+                    messages=llm_messages,
+                    temperature=0.7,
+                    max_tokens=300,
                     timeout=30.0,
+                    max_retries=1,
                 )
-                break
-            except (asyncio.TimeoutError, Exception) as llm_err:
-                last_llm_error = llm_err
-                logger.warning(f"LLM attempt {attempt + 1} failed: {llm_err}")
-                if attempt == 0:
-                    await asyncio.sleep(1)
+        except Exception as llm_err:
+            logger.warning(f"LLM reply failed after retry: {llm_err}")
         if not assistant_reply:
+            # 保留学生这一半（消息与画像增量），与生成回复前即已保存的行为一致
+            await save_chat_turn(db, context, [user_message], delta=analysis.delta)
             raise HTTPException(status_code=503, detail="AI service temporarily unavailable, please retry")
 
-        logger.info(f"AI reply generated: {len(assistant_reply)} characters")
+        logger.debug("AI reply generated: %d characters", len(assistant_reply))
 
-        # ========== 7. 保存 AI 回复 ==========
+        # ========== 7. 保存本轮对话 ==========
+        # 可选：将本轮各阶段耗时随回复一起持久化，用于离线分析
+        timings = current_timings()
         assistant_message = ChatMessage(
+            id=uuid4(),
             user_id=user_id,
+            session_id=context.session_id,
             role=MessageRole.ASSISTANT,
             text=assistant_reply,
             timestamp=datetime.now(timezone.utc),
-            analysis=analysis.model_dump()  # 保存分析结果
+            analysis=analysis.model_dump(),  # 保存分析结果
+            timings=timings.as_dict() if settings.PERSIST_CHAT_TIMINGS and timings else None
         )
-        db.add(assistant_message)
-        await db.commit()
-        await db.refresh(assistant_message)
+        with span("chat.save"):
+            updated_profile = await save_chat_turn(
+                db, context, [user_message, assistant_message], delta=analysis.delta
+            )
 
-        logger.info(f"Assistant message saved: {assistant_message.id}")
+        logger.debug("Chat turn saved: %s, %s", user_message.id, assistant_message.id)
 
         # ========== 8. 更新知识图谱（基于对话内容） ==========
-        updated_graph = await personalization_service.update_graph_from_conversation(
-            user_id=str(user_id),
-            message=request.message,
-            current_graph=current_graph,
-            user_profile=updated_profile
-        )
+        with span("chat.graph_update"):
+            updated_graph = await personalization_service.update_graph_from_conversation(
+                user_id=str(user_id),
+                message=request.message,
+                current_graph=current_graph,
+                user_profile=updated_profile
+            )
 
-        logger.info(f"Knowledge graph updated: {len(updated_graph)} concepts")
+        logger.info(
+            "Chat turn done: intent=%s, emotion=%s, concepts=%d, reply_chars=%d, graph_nodes=%d",
+            analysis.intent, analysis.emotion, len(analysis.detectedConcepts),
+            len(assistant_reply), len(updated_graph)
+        )
 
         # ========== 9. 返回响应 ==========
         response = ChatResponse(
@@ -651,6 +806,7 @@ async def chat(
     except Exception as e:
         logger.error(f"Chat endpoint failed: {e}", exc_info=True)
         await db.rollback()
+        conversation_cache.invalidate(current_user.id)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to process chat request: {str(e)}"
@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.endpoints.auth import get_current_user, save_user_profile
 from app.db.postgres import get_db
+from app.services.activity_stats import record_activity
 from app.models.sql.scale import ScaleTemplate as ScaleTemplateModel, ScaleStatus, ScaleResponse as ScaleResponseModel
 
 router = APIRouter()
@@ -316,6 +317,7 @@ async def submit_scale_answers(
             }
         )
         db.add(scale_resp)
+        await record_activity(db, current_user.id, scale_responses=1)
         await db.commit()
         logger.info(f"Scale response saved for user {current_user.id}, template {template_id}")
     except Exception as e:
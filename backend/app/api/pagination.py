@@ -0,0 +1,107 @@
+"""
+游标分页（keyset pagination）
+
+OFFSET 分页需要先扫描并丢弃前面所有行，页越深越慢；并发插入时还会导致行重复或遗漏。
+游标分页记住上一页最后一行的排序键 (sort_value, id)，下一页从该位置之后继续：
+
+    WHERE (sort_col, id) < (:last_value, :last_id)   -- 降序
+    ORDER BY sort_col DESC, id DESC
+    LIMIT :limit + 1                                 -- 多取一行判断是否还有下一页
+
+id 作为第二排序键保证排序全序（时间戳相同的行也不会丢失 / 重复）。
+游标对客户端是不透明字符串（base64url 编码的 JSON），其中带有排序字段名，
+换了排序方式的旧游标会被拒绝。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+from sqlalchemy.sql import ColumnElement
+
+T = TypeVar("T")
+
+
+def encode_cursor(key: str, value: Any, row_id: Any) -> str:
+    """编码游标：排序字段名 + 排序值 + 行 ID"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif value is not None and not isinstance(value, (int, float, bool, str)):
+        value = str(value)
+    payload = json.dumps({"k": key, "v": value, "id": str(row_id)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key: str) -> Tuple[Any, str]:
+    """
+    解码游标
+
+    Returns:
+        (排序值, 行 ID 字符串)
+
+    Raises:
+        HTTPException: 400 游标格式错误或与当前排序字段不符
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["k"] != key:
+            raise ValueError("sort key mismatch")
+        return payload["v"], payload["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+
+def keyset_after(
+    sort_col,
+    id_col,
+    cursor: str,
+    key: str,
+    descending: bool = True,
+    parse: Callable[[Any], Any] = datetime.fromisoformat,
+) -> ColumnElement:
+    """
+    ORM 查询的游标条件：(sort_col, id_col) 在游标之后
+
+    Args:
+        sort_col / id_col: 排序列与主键列
+        cursor: 客户端传入的游标
+        key: 排序字段名（须与生成游标时一致）
+        descending: 是否降序
+        parse: 将游标中的排序值还原为列类型（默认 ISO 时间）
+    """
+    value, row_id = decode_cursor(cursor, key)
+    try:
+        bound = (parse(value), UUID(row_id))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    keys = tuple_(sort_col, id_col)
+    return keys < tuple_(*bound) if descending else keys > tuple_(*bound)
+
+
+def paginate_rows(
+    rows: Sequence[T],
+    limit: int,
+    key: str,
+    cursor_of: Callable[[T], Tuple[Any, Any]],
+) -> Tuple[List[T], Optional[str]]:
+    """
+    截取一页并生成下一页游标（查询时应多取一行：LIMIT limit + 1）
+
+    Args:
+        rows: 查询结果
+        limit: 每页数量
+        key: 排序字段名
+        cursor_of: 从一行取出 (排序值, 行 ID)
+
+    Returns:
+        (本页行, 下一页游标；没有更多数据时为 None)
+    """
+    page = list(rows[:limit])
+    if len(rows) <= limit or not page:
+        return page, None
+    value, row_id = cursor_of(page[-1])
+    return page, encode_cursor(key, value, row_id)
@@ -64,6 +64,116 @@ class Settings(BaseSettings):
     LMSTUDIO_BASE_URL: str = "http://localhost:1234/v1"
     LMSTUDIO_MODEL: str = "local-model"
 
+    # LLM HTTP 连接池配置（同一上游共享）
+    LLM_HTTP_MAX_CONNECTIONS: int = Field(
+        default=100,
+        description="到单个 LLM 上游的最大并发连接数"
+    )
+    LLM_HTTP_MAX_KEEPALIVE: int = Field(
+        default=20,
+        description="到单个 LLM 上游保持的空闲 keep-alive 连接数"
+    )
+
+    # 性能观测
+    METRICS_ENABLED: bool = Field(
+        default=True,
+        description="是否开放 /metrics（Prometheus 文本格式）"
+    )
+    PERSIST_CHAT_TIMINGS: bool = Field(
+        default=False,
+        description="是否将每轮对话的分阶段耗时写入 chat_messages.timings"
+    )
+    LOOP_MONITOR_ENABLED: bool = Field(
+        default=True,
+        description="是否监控事件循环调度延迟（DEBUG 模式下额外抓取阻塞时的调用栈）"
+    )
+    LOOP_MONITOR_INTERVAL_MS: float = Field(
+        default=100.0,
+        description="事件循环延迟探测间隔（毫秒）"
+    )
+    LOOP_BLOCK_THRESHOLD_MS: float = Field(
+        default=100.0,
+        description="事件循环阻塞判定阈值（毫秒）"
+    )
+    PROFILING_ENABLED: bool = Field(
+        default=False,
+        description="是否允许管理员通过 X-Profile 请求头剖析单个请求"
+    )
+    PROFILE_SAMPLE_INTERVAL_MS: float = Field(
+        default=5.0,
+        description="采样剖析的调用栈采样间隔（毫秒）"
+    )
+    PROFILE_MIN_INTERVAL_S: float = Field(
+        default=10.0,
+        description="两次请求剖析之间的最小间隔（秒），同一时间只允许一个剖析"
+    )
+    SQL_STATS_ENABLED: bool = Field(
+        default=True,
+        description="是否统计每条 SQL 语句的耗时（按路由聚合，供 /admin/performance/queries 查看）"
+    )
+    SLOW_QUERY_MS: float = Field(
+        default=500.0,
+        description="慢查询日志阈值（毫秒），<= 0 关闭"
+    )
+
+    # 分析汇总
+    ANALYTICS_ROLLUP_INTERVAL_S: float = Field(
+        default=300.0,
+        description="每日活跃度汇总任务的刷新间隔（秒），<= 0 不启动后台任务"
+    )
+    ROW_COUNT_CACHE_TTL_S: float = Field(
+        default=300.0,
+        description="管理后台表行数精确计数的缓存时间（秒），过期后先返回估算值并在后台重新计数"
+    )
+    ROW_COUNT_EXACT_BELOW: int = Field(
+        default=10000,
+        description="估算行数低于该值的表直接精确计数（小表统计信息常滞后，COUNT 代价也低），<= 0 关闭"
+    )
+
+    # 会话
+    SESSION_BACKFILL_BATCH_USERS: int = Field(
+        default=100,
+        description="历史消息 session_id 回填每批处理的用户数（每批一个事务），<= 0 不启动回填任务"
+    )
+    CHAT_CONTEXT_CACHE_MAX_USERS: int = Field(
+        default=2000,
+        description="对话上下文缓存最多保存的用户数（LRU 淘汰），<= 0 关闭缓存"
+    )
+    CHAT_CONTEXT_CACHE_TTL_S: float = Field(
+        default=600.0,
+        description="对话上下文缓存条目从数据库加载后的有效期（秒），过期后重新加载"
+    )
+
+    # 数据导出
+    EXPORT_BATCH_SIZE: int = Field(
+        default=2000,
+        description="流式导出时每批从服务端游标读取的行数"
+    )
+    EXPORT_USE_COPY: bool = Field(
+        default=True,
+        description="研究数据集导出是否使用 COPY ... TO STDOUT（关闭时全部走服务端游标 + Python 编码）"
+    )
+    EXPORT_SPOOL_DIR: str = Field(
+        default="",
+        description="后台导出任务的 gzip 结果文件目录（留空为系统临时目录下的 cognisync-exports）"
+    )
+    EXPORT_JOB_CONCURRENCY: int = Field(
+        default=2,
+        description="同时执行的后台导出任务数（每个任务占用一个数据库连接）"
+    )
+    EXPORT_JOB_MAX_PENDING: int = Field(
+        default=20,
+        description="排队 + 执行中的导出任务上限，超出时拒绝提交（429）"
+    )
+    EXPORT_JOB_TTL_S: float = Field(
+        default=86400.0,
+        description="导出结果文件的保留时间（秒），过期后自动删除"
+    )
+    EXPORT_BUNDLE_PARALLELISM: int = Field(
+        default=4,
+        description="研究数据包导出时并行查询的连接数（另占一个连接持有快照）"
+    )
+
     # DeepSeek 配置
     DEEPSEEK_API_KEY: str = "sk-your-key-here"
     DEEPSEEK_BASE_URL: str = "https://api.deepseek.com/v1"
@@ -102,6 +212,14 @@ class Settings(BaseSettings):
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"  # json | text
+    LOG_QUEUE_SIZE: int = Field(
+        default=10000,
+        description="日志队列容量（格式化与输出在后台线程进行），满时丢弃"
+    )
+    LOG_RATE_LIMIT_PER_SEC: float = Field(
+        default=20.0,
+        description="每个 logger 每秒最多输出的 INFO/DEBUG 日志条数，<= 0 不限流"
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
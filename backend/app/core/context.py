@@ -0,0 +1,60 @@
+"""
+请求上下文 - 基于 contextvars 的请求级变量
+在同一请求（同一 asyncio 任务）内跨层传递，无需逐层传参
+"""
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+# 当前请求的认证用户 ID（由 get_current_user 设置）
+current_user_id: ContextVar[Optional[uuid.UUID]] = ContextVar("current_user_id", default=None)
+
+# 当前请求 ID（由 RequestContextMiddleware 设置，沿用调用方的 X-Request-ID 或新生成）
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+# 调用方传入的请求 ID 最大长度（超出则重新生成，防止日志被注入超长内容）
+MAX_REQUEST_ID_LENGTH = 64
+
+
+class RequestContextMiddleware:
+    """
+    纯 ASGI 中间件：为每个 HTTP 请求设置 request_id，并通过 X-Request-ID 响应头返回
+
+    日志记录在入队时读取 request_id / user_id（见 app.core.logging.ContextFilter），
+    业务代码无需再把用户信息拼进日志字符串。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if candidate and len(candidate) <= MAX_REQUEST_ID_LENGTH and candidate.isprintable():
+                    request_id = candidate
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex[:16]
+
+        request_token = current_request_id.set(request_id)
+        user_token = current_user_id.set(None)
+        encoded = request_id.encode("latin-1")
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", encoded))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            current_user_id.reset(user_token)
+            current_request_id.reset(request_token)
@@ -1,13 +1,28 @@
 """
 日志配置 - 支持结构化日志（JSON）和文本日志
+
+日志管道：
+    logger → ContextFilter / RateLimitFilter → NonBlockingQueueHandler ─(队列)→ QueueListener 线程 → StreamHandler
+
+- 事件循环上只做过滤与入队：消息格式化（含 JSON 序列化）与 I/O 都在后台线程完成
+- request_id / user_id 在入队时从 contextvars 注入一次（后台线程读不到请求上下文）
+- 热路径 INFO 日志按 logger 限流，WARNING 及以上不受影响
+- 队列满时丢弃并计数，不阻塞请求
 """
+import atexit
 import logging
+import queue
 import sys
-from typing import Any
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
 import json
-from datetime import datetime
+from datetime import datetime, timezone
 
 from app.core.config import settings
+from app.core.context import current_request_id, current_user_id
+from app.core.metrics import register_counter_callback, register_gauge_callback
 
 
 class JSONFormatter(logging.Formatter):
@@ -15,7 +30,8 @@ class JSONFormatter(logging.Formatter):
 
     def format(self, record: logging.LogRecord) -> str:
         log_data = {
-            "timestamp": datetime.utcnow().isoformat() + "Z",
+            # 格式化在后台线程进行，使用记录创建时间而非当前时间
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat().replace("+00:00", "Z"),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -24,6 +40,14 @@ class JSONFormatter(logging.Formatter):
             "line": record.lineno,
         }
 
+        # 请求上下文（由 ContextFilter 注入）
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            log_data["request_id"] = request_id
+        user_id = getattr(record, "user_id", None)
+        if user_id:
+            log_data["user_id"] = user_id
+
         # 添加异常信息
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
@@ -32,7 +56,7 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, "extra"):
             log_data.update(record.extra)
 
-        return json.dumps(log_data, ensure_ascii=False)
+        return json.dumps(log_data, ensure_ascii=False, default=str)
 
 
 class TextFormatter(logging.Formatter):
@@ -53,17 +77,104 @@ class TextFormatter(logging.Formatter):
         return super().format(record)
 
 
+class ContextFilter(logging.Filter):
+    """将当前请求的 request_id / user_id 注入日志记录（未在请求中时为 "-"）"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        request_id = current_request_id.get()
+        user_id = current_user_id.get()
+        record.request_id = request_id or "-"
+        record.user_id = str(user_id) if user_id else "-"
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    按 logger 对 INFO 及以下级别限流（令牌桶）
+
+    每个 logger 每秒最多放行 rate 条、允许 burst 条突发；被丢弃的条数会注明在该 logger
+    下一条被放行的日志末尾，便于察觉。
+    WARNING 及以上级别总是放行。
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        # {logger name: [tokens, last refill time, suppressed count]}
+        self._buckets: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(record.name)
+            if bucket is None:
+                bucket = self._buckets[record.name] = [self.burst, now, 0]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                bucket[2] += 1
+                self.suppressed_total += 1
+                return False
+            bucket[0] = tokens - 1
+            suppressed, bucket[2] = bucket[2], 0
+
+        if suppressed:
+            record.msg = f"{record.msg} (suppressed {suppressed} similar records)"
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    入队时不做格式化的 QueueHandler
+
+    标准库 QueueHandler.prepare() 会在调用线程上完整格式化记录（为了可跨进程序列化），
+    这里队列只在进程内使用，只在入队时合并 %-style 参数（参数可能是 ORM 对象，
+    不能在其他线程中访问），时间戳、JSON 序列化与 I/O 推迟到监听线程。
+    队列满时丢弃并计数。
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+_rate_limiter: Optional[RateLimitFilter] = None
+
+
 def setup_logging():
     """配置全局日志"""
+    global _listener, _queue_handler, _rate_limiter
 
     # 获取根 logger
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
 
-    # 清除已有的 handlers
+    # 清除已有的 handlers（重复调用时先停掉旧的监听线程）
+    shutdown_logging()
     root_logger.handlers.clear()
 
-    # 创建 console handler
+    # 创建 console handler（在监听线程中执行）
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.DEBUG)
 
@@ -72,15 +183,48 @@ def setup_logging():
         formatter = JSONFormatter()
     else:
         formatter = TextFormatter(
-            fmt="%(asctime)s | %(levelname)-8s | %(name)s:%(funcName)s:%(lineno)d | %(message)s",
+            fmt="%(asctime)s | %(levelname)-8s | %(request_id)s | %(name)s:%(funcName)s:%(lineno)d | %(message)s",
             datefmt="%Y-%m-%d %H:%M:%S",
         )
 
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+
+    # 入队侧：注入上下文 + 限流，然后交给后台线程
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(ContextFilter())
+    _rate_limiter = RateLimitFilter(rate=settings.LOG_RATE_LIMIT_PER_SEC)
+    _queue_handler.addFilter(_rate_limiter)
+    root_logger.addHandler(_queue_handler)
+
+    _listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.unregister(shutdown_logging)
+    atexit.register(shutdown_logging)
 
     # 禁用第三方库的日志噪音
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     logging.getLogger("neo4j").setLevel(logging.WARNING)
     logging.getLogger("asyncio").setLevel(logging.WARNING)
+
+
+def shutdown_logging() -> None:
+    """停止监听线程并写出队列中剩余的日志（应用关闭时调用，可重复调用）"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logging_stats() -> Tuple[int, int, int]:
+    """(队列长度, 因队列满丢弃数, 限流丢弃数)"""
+    if _queue_handler is None:
+        return 0, 0, 0
+    suppressed = _rate_limiter.suppressed_total if _rate_limiter is not None else 0
+    return _queue_handler.queue.qsize(), _queue_handler.dropped, suppressed
+
+
+register_gauge_callback("cognisync_log_queue_depth", "待输出的日志条数", lambda: get_logging_stats()[0])
+register_counter_callback("cognisync_log_dropped", "因日志队列已满丢弃的条数", lambda: get_logging_stats()[1])
+register_counter_callback("cognisync_log_suppressed", "被限流丢弃的 INFO 日志条数", lambda: get_logging_stats()[2])
@@ -0,0 +1,152 @@
+"""
+事件循环延迟监控 - 发现阻塞事件循环的同步代码
+
+两部分：
+1. 循环内的探测任务：每隔 interval 秒 sleep 一次，实际唤醒时间与预期之差即调度延迟，
+   计入 cognisync_event_loop_lag_seconds 直方图
+2. 看门狗线程（仅 capture_stacks=True 时启动）：探测任务超过 block_threshold 秒没有心跳，
+   说明循环正被同步代码占用，此时抓取事件循环线程的调用栈，记录日志并保留最近若干条
+
+抓栈依赖 sys._current_frames()，只建议在调试环境开启；延迟指标本身开销可忽略。
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = REGISTRY.histogram(
+    "cognisync_event_loop_lag_seconds", "事件循环调度延迟（秒）",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_BLOCKED = REGISTRY.counter(
+    "cognisync_event_loop_blocked", "事件循环被阻塞超过阈值的次数"
+)
+LOOP_BLOCKED.inc(0)
+
+
+class LoopLagMonitor:
+    """
+    事件循环延迟监控
+
+    - start(): 在运行中的事件循环上启动探测任务（及可选的看门狗线程）
+    - stop(): 停止
+    - snapshot(): 最近延迟统计与阻塞事件（供 admin 端点使用）
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.1,
+        block_threshold: float = 0.1,
+        capture_stacks: bool = False,
+        max_events: int = 50,
+    ):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.capture_stacks = capture_stacks
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.events: Deque[Dict] = deque(maxlen=max_events)
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """启动监控（应用启动时调用）"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopping.clear()
+        self._task = asyncio.create_task(self._probe(), name="event-loop-lag-monitor")
+        if self.capture_stacks:
+            self._watchdog = threading.Thread(target=self._watch, name="event-loop-watchdog", daemon=True)
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        """停止监控（应用关闭时调用）"""
+        self._stopping.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1.0)
+            self._watchdog = None
+
+    async def _probe(self) -> None:
+        """探测任务：测量 sleep 的超时唤醒量"""
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.last_lag = lag
+            if lag > self.max_lag:
+                self.max_lag = lag
+            LOOP_LAG.observe(lag)
+            if lag >= self.block_threshold and not self.capture_stacks:
+                # 未开启看门狗时只能事后计数，无法得知阻塞位置
+                LOOP_BLOCKED.inc()
+
+    def _watch(self) -> None:
+        """看门狗线程：心跳超时时抓取事件循环线程的调用栈（每次阻塞只抓一次）"""
+        reported_heartbeat = None
+        check_interval = max(self.block_threshold / 2, 0.01)
+        while not self._stopping.wait(check_interval):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.block_threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else ""
+            LOOP_BLOCKED.inc()
+            self.events.append({
+                "detectedAt": datetime.now(timezone.utc).isoformat(),
+                "blockedMs": round(stalled * 1000, 1),
+                "stack": stack,
+            })
+            logger.warning(
+                f"Event loop blocked for at least {stalled * 1000:.0f}ms, stack:\n{stack}"
+            )
+
+    def snapshot(self) -> Dict:
+        """当前状态快照"""
+        return {
+            "running": self.running,
+            "captureStacks": self.capture_stacks,
+            "intervalMs": self.interval * 1000,
+            "blockThresholdMs": self.block_threshold * 1000,
+            "lastLagMs": round(self.last_lag * 1000, 2),
+            "maxLagMs": round(self.max_lag * 1000, 2),
+            "blockedEvents": list(self.events),
+        }
+
+
+# 全局实例（单例）：调试模式下开启看门狗抓栈
+loop_monitor = LoopLagMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    block_threshold=settings.LOOP_BLOCK_THRESHOLD_MS / 1000,
+    capture_stacks=settings.DEBUG,
+)
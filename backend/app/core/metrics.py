@@ -0,0 +1,420 @@
+"""
+运行指标注册表 - Prometheus 文本格式导出
+
+不引入 prometheus_client 依赖，只实现本服务用到的三种类型：
+- Counter：单调递增计数（可由回调在抓取时读取累计值，如日志丢弃数）
+- Gauge：当前值（可由回调在抓取时计算，如连接池占用、队列长度）
+- Histogram：固定桶直方图（秒）
+
+热路径开销：
+- labels(...) 返回的子指标会被缓存（预绑定），调用方应持有子指标引用重复使用
+- observe/inc 只做整数/浮点累加，无锁（单 worker 进程、单事件循环）
+- 文本格式化只在 /metrics 被抓取时进行
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认延迟桶（秒）
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+LabelValues = Tuple[str, ...]
+Sample = Tuple[str, LabelValues, float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类：管理带标签的子指标"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """获取（或创建）某组标签值对应的子指标；返回值可长期持有复用"""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _default_child(self):
+        """无标签指标直接操作的子指标"""
+        return self.labels()
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for sample_name, label_values, value in self.samples():
+            names = self.labelnames
+            if sample_name.endswith("_bucket"):
+                names = self.labelnames + ("le",)
+            lines.append(f"{sample_name}{_format_labels(names, label_values)} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器；传入 callback 时在抓取时读取累计值（返回 {标签值元组: 值}）"""
+
+    type_name = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default_child().inc(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        if self.callback is not None:
+            for values, value in self.callback().items():
+                yield f"{self.name}_total", values, value
+            return
+        for values, child in self._children.items():
+            yield f"{self.name}_total", values, child.value
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+
+class Gauge(_Metric):
+    """当前值；传入 callback 时在抓取时计算（返回 {标签值元组: 值}）"""
+
+    type_name = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default_child().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default_child().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default_child().dec(amount)
+
+    def samples(self) -> Iterable[Sample]:
+        if self.callback is not None:
+            for values, value in self.callback().items():
+                yield self.name, values, value
+            return
+        for values, child in self._children.items():
+            yield self.name, values, child.value
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    """固定桶直方图（导出时转换为累计桶）"""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default_child().observe(value)
+
+    def samples(self) -> Iterable[Sample]:
+        for values, child in self._children.items():
+            cumulative = 0
+            for upper, n in zip(self.buckets + (float("inf"),), child.counts):
+                cumulative += n
+                yield f"{self.name}_bucket", values + (_format_value(upper),), cumulative
+            yield f"{self.name}_sum", values, child.sum
+            yield f"{self.name}_count", values, child.count
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]) -> None:
+        """注册自定义收集器（抓取时调用，直接返回文本行）"""
+        self._collectors.append(collector)
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """生成 Prometheus 文本格式（text/plain; version=0.0.4）"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ==================== HTTP ====================
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "cognisync_http_requests", "HTTP 请求数", ("method", "route", "status")
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "cognisync_http_request_duration_seconds", "HTTP 请求耗时（秒）", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "cognisync_http_requests_in_flight", "正在处理的 HTTP 请求数"
+)
+HTTP_IN_FLIGHT.set(0)
+
+# ==================== PostgreSQL ====================
+
+DB_POOL_WAIT = REGISTRY.histogram(
+    "cognisync_db_pool_wait_seconds", "从连接池获取连接的等待时间（秒）",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "cognisync_db_query_duration_seconds", "单条 SQL 语句执行耗时（秒）",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+# ==================== Neo4j ====================
+
+NEO4J_QUERY_DURATION = REGISTRY.histogram(
+    "cognisync_neo4j_query_duration_seconds", "Neo4j 查询耗时（秒，含会话获取连接）", ("kind",)
+)
+NEO4J_SESSIONS_IN_USE = REGISTRY.gauge(
+    "cognisync_neo4j_sessions_in_use", "正在使用的 Neo4j 会话数"
+)
+NEO4J_SESSIONS_IN_USE.set(0)
+
+# ==================== LLM ====================
+
+LLM_REQUESTS = REGISTRY.counter(
+    "cognisync_llm_requests", "LLM 调用数", ("provider", "role", "outcome")
+)
+LLM_DURATION = REGISTRY.histogram(
+    "cognisync_llm_request_duration_seconds", "LLM 调用耗时（秒，含重试）", ("provider", "role"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "cognisync_llm_tokens", "LLM token 数", ("provider", "role", "type")
+)
+LLM_RETRIES = REGISTRY.counter(
+    "cognisync_llm_retries", "LLM 重试次数", ("provider", "role")
+)
+
+# ==================== 对话 ====================
+
+CHAT_CONTEXT_LOOKUPS = REGISTRY.counter(
+    "cognisync_chat_context_cache_lookups", "对话上下文缓存查询次数", ("result",)
+)
+
+
+def register_gauge_callback(
+    name: str,
+    documentation: str,
+    callback: Callable[[], float],
+) -> Gauge:
+    """注册无标签、抓取时求值的 Gauge（连接池占用、后台队列长度等）"""
+    return REGISTRY.gauge(name, documentation, callback=lambda: {(): float(callback())})
+
+
+def register_counter_callback(
+    name: str,
+    documentation: str,
+    callback: Callable[[], float],
+) -> Counter:
+    """注册无标签、抓取时读取累计值的 Counter（样本名追加 _total，如日志丢弃数）"""
+    return REGISTRY.counter(name, documentation, callback=lambda: {(): float(callback())})
+
+
+def _render_stage_histograms() -> List[str]:
+    """将 app.core.timing 的阶段直方图（毫秒）导出为秒级 histogram"""
+    from app.core.timing import BUCKETS_MS, get_histograms
+
+    name = "cognisync_stage_duration_seconds"
+    lines = [
+        f"# HELP {name} 请求内各阶段耗时（秒，来自 span 计时）",
+        f"# TYPE {name} histogram",
+    ]
+    for stage, histogram in sorted(get_histograms().items()):
+        cumulative = 0
+        for upper_ms, n in zip(BUCKETS_MS, histogram.counts):
+            cumulative += n
+            le = _format_value(upper_ms / 1000 if upper_ms != float("inf") else upper_ms)
+            lines.append(f'{name}_bucket{_format_labels(("stage", "le"), (stage, le))} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(("stage",), (stage,))} {_format_value(histogram.sum / 1000)}')
+        lines.append(f'{name}_count{_format_labels(("stage",), (stage,))} {histogram.count}')
+    return lines
+
+
+REGISTRY.register_collector(_render_stage_histograms)
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件：记录每个 HTTP 请求的耗时、状态码与在途请求数
+
+    route 标签取匹配到的路由模板（如 /api/chat/{session_id}），未匹配的请求统一记为 <unmatched>，
+    避免路径参数导致标签基数膨胀。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            HTTP_DURATION.labels(method, path).observe(time.perf_counter() - start)
+            HTTP_REQUESTS.labels(method, path, str(status)).inc()
@@ -0,0 +1,206 @@
+"""
+按需请求剖析 - 管理员对单个请求开启 profiler
+
+用法：在任意请求上附加
+    X-Profile: sample      （默认）采样事件循环线程调用栈，输出 folded stacks，
+                           可直接用 flamegraph.pl / speedscope 打开
+    X-Profile: cprofile    cProfile 确定性剖析，输出 pstats 文件（snakeviz 等工具查看）
+并携带管理员凭证（X-ADMIN-KEY 或管理员 JWT，规则同 verify_admin_key）。
+被剖析请求的响应不变，只额外返回 X-Profile-Id 响应头；结果通过
+GET /admin/performance/profiles/{id} 下载。
+
+注意：单 worker 下事件循环线程同时在处理其他请求，剖析结果会混入并发请求的栈，
+建议在低峰期使用。
+
+开销：
+- PROFILING_ENABLED=False 时不注册中间件，零开销
+- 注册后，未带 X-Profile 头的请求只多一次请求头查找
+- 同一时间只允许一个剖析，且两次剖析之间至少间隔 PROFILE_MIN_INTERVAL_S 秒
+"""
+import cProfile
+import logging
+import marshal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter as TallyCounter, OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from app.core.security import is_admin_request
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("sample", "cprofile")
+
+# 保留的剖析结果数
+MAX_PROFILES = 20
+
+
+class StackSampler:
+    """后台线程按固定间隔采样目标线程的调用栈，累计为 folded stacks"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: TallyCounter = TallyCounter()
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._thread.join(timeout=1.0)
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names: List[str] = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.samples[";".join(reversed(names))] += 1
+
+    def folded(self) -> str:
+        """folded stacks 文本：每行 "frame;frame;frame count" """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfileStore:
+    """最近的剖析结果（内存，有上限）"""
+
+    def __init__(self, max_profiles: int = MAX_PROFILES):
+        self.max_profiles = max_profiles
+        self._profiles: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def add(self, meta: Dict, content: bytes) -> str:
+        profile_id = uuid.uuid4().hex[:12]
+        self._profiles[profile_id] = {**meta, "id": profile_id, "content": content}
+        while len(self._profiles) > self.max_profiles:
+            self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict]:
+        """不含内容的元信息列表（新的在前）"""
+        return [
+            {k: v for k, v in p.items() if k != "content"}
+            for p in reversed(self._profiles.values())
+        ]
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """
+    纯 ASGI 中间件：对带 X-Profile 头且通过管理员校验的请求开启 profiler
+    """
+
+    def __init__(self, app, sample_interval: float = 0.005, min_interval: float = 10.0):
+        self.app = app
+        self.sample_interval = sample_interval
+        self.min_interval = min_interval
+        self._active = False
+        self._last_started: Optional[float] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = None
+        api_key = authorization = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                mode = value.decode("latin-1").strip().lower() or "sample"
+            elif name == b"x-admin-key":
+                api_key = value.decode("latin-1")
+            elif name == b"authorization":
+                authorization = value.decode("latin-1")
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = self._check(mode, api_key, authorization)
+        if status != "ok":
+            await self.app(scope, receive, self._with_headers(send, [(b"x-profile-status", status.encode())]))
+            return
+
+        self._active = True
+        self._last_started = time.monotonic()
+        profile_id: Optional[str] = None
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+
+        if mode == "cprofile":
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+
+        def finish() -> str:
+            """停止 profiler 并保存结果（在响应头发出前调用一次）"""
+            nonlocal profile_id
+            if profile_id is not None:
+                return profile_id
+            if mode == "cprofile":
+                profiler.disable()
+                profiler.create_stats()
+                content = marshal.dumps(profiler.stats)
+            else:
+                sampler.stop()
+                content = sampler.folded().encode("utf-8")
+            profile_id = profile_store.add({
+                "mode": mode,
+                "method": scope["method"],
+                "path": scope["path"],
+                "startedAt": started_at.isoformat(),
+                "durationMs": round((time.perf_counter() - start) * 1000, 1),
+            }, content)
+            logger.info(f"Profiled {scope['method']} {scope['path']} ({mode}) -> {profile_id}")
+            return profile_id
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                pid = finish()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-status", b"ok"))
+                headers.append((b"x-profile-id", pid.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            finish()
+            self._active = False
+
+    def _check(self, mode: str, api_key: Optional[str], authorization: Optional[str]) -> str:
+        """返回 ok 或拒绝原因（通过 X-Profile-Status 响应头告知调用方）"""
+        if mode not in PROFILE_MODES:
+            return "invalid-mode"
+        if not is_admin_request(api_key, authorization):
+            return "unauthorized"
+        if self._active or (
+            self._last_started is not None and time.monotonic() - self._last_started < self.min_interval
+        ):
+            return "rate-limited"
+        return "ok"
+
+    @staticmethod
+    def _with_headers(send, extra):
+        async def wrapped(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": list(message.get("headers", [])) + extra}
+            await send(message)
+        return wrapped
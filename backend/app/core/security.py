@@ -10,6 +10,31 @@ from app.core.config import settings
 admin_key_header = APIKeyHeader(name="X-ADMIN-KEY", auto_error=False)
 
 
+def is_admin_jwt(authorization: Optional[str]) -> bool:
+    """Bearer token 是否为有效的管理员 JWT（role="admin"），无需查数据库"""
+    if not authorization or not authorization.startswith("Bearer "):
+        return False
+    import jwt
+    token = authorization.split(" ")[1]
+    secret = settings.JWT_SECRET or "cognisync-dev-secret-key-change-in-production"
+    try:
+        payload = jwt.decode(token, secret, algorithms=["HS256"])
+    except Exception:
+        return False
+    return payload.get("role") == "admin"
+
+
+def is_admin_request(api_key: Optional[str], authorization: Optional[str]) -> bool:
+    """
+    不抛异常的管理员校验（供中间件使用）
+
+    与 verify_admin_key 规则一致：管理员 JWT 或与服务端 ADMIN_KEY 一致的 X-ADMIN-KEY。
+    """
+    if is_admin_jwt(authorization):
+        return True
+    return bool(settings.ADMIN_KEY) and api_key == settings.ADMIN_KEY
+
+
 async def verify_admin_key(
     api_key: str = Security(admin_key_header),
     authorization: Optional[str] = Header(None),
@@ -22,17 +47,9 @@ async def verify_admin_key(
     X-ADMIN-KEY 验证：与服务端配置的 ADMIN_KEY 比对。
     """
     # ── 1. 优先检查 Bearer JWT（含 role="admin" 声明）──
-    if authorization and authorization.startswith("Bearer "):
-        import jwt
-        token = authorization.split(" ")[1]
-        secret = settings.JWT_SECRET or "cognisync-dev-secret-key-change-in-production"
-        try:
-            payload = jwt.decode(token, secret, algorithms=["HS256"])
-            if payload.get("role") == "admin":
-                return True
-        except Exception:
-            # token 无效/过期时继续尝试 X-ADMIN-KEY
-            pass
+    # token 无效/过期时继续尝试 X-ADMIN-KEY
+    if is_admin_jwt(authorization):
+        return True
 
     # ── 2. 回退到 X-ADMIN-KEY ──
     if not settings.ADMIN_KEY:
@@ -0,0 +1,166 @@
+"""
+分阶段计时 - 轻量级 span 工具
+
+用法：
+    with span("analysis"):
+        ...
+
+每个 span 的耗时会：
+1. 记入当前请求的 RequestTimings（由 ServerTimingMiddleware 创建），以 Server-Timing 响应头返回
+2. 累加到进程内的阶段直方图（固定桶，无锁；单 worker 进程、单事件循环）
+
+不在请求上下文中（脚本、后台任务）时只记直方图。
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+# 直方图桶上界（毫秒）
+BUCKETS_MS: Tuple[float, ...] = (
+    1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf")
+)
+
+
+class StageHistogram:
+    """固定桶直方图（累计计数 + 总和）"""
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts: List[int] = [0] * len(BUCKETS_MS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect_left(BUCKETS_MS, value_ms)] += 1
+        self.sum += value_ms
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """按桶上界估算分位数（毫秒）"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for upper, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= target:
+                return upper if upper != float("inf") else BUCKETS_MS[-2]
+        return BUCKETS_MS[-2]
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "meanMs": round(self.sum / self.count, 2) if self.count else 0.0,
+            "p50Ms": self.quantile(0.5),
+            "p95Ms": self.quantile(0.95),
+            "p99Ms": self.quantile(0.99),
+        }
+
+
+# 进程内阶段直方图：{stage: StageHistogram}
+_histograms: Dict[str, StageHistogram] = {}
+
+
+class RequestTimings:
+    """单个请求内各阶段的耗时（同名阶段累加）"""
+
+    __slots__ = ("spans", "start")
+
+    def __init__(self):
+        self.spans: Dict[str, float] = {}
+        self.start = time.perf_counter()
+
+    def add(self, name: str, duration_ms: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def as_dict(self) -> Dict[str, float]:
+        """各阶段耗时（毫秒，保留 1 位小数）"""
+        return {name: round(ms, 1) for name, ms in self.spans.items()}
+
+    def server_timing_header(self) -> str:
+        """格式化为 Server-Timing 响应头"""
+        entries = [f"{name};dur={ms:.1f}" for name, ms in self.spans.items()]
+        entries.append(f"total;dur={self.total_ms():.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """当前请求的计时容器（不在请求上下文中时为 None）"""
+    return _current.get()
+
+
+def record_duration(name: str, duration_ms: float) -> None:
+    """记录一个阶段耗时（span 之外的手动计时使用）"""
+    histogram = _histograms.get(name)
+    if histogram is None:
+        histogram = _histograms[name] = StageHistogram()
+    histogram.observe(duration_ms)
+
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, duration_ms)
+
+
+class span:
+    """计时上下文管理器：with span("graph.upsert"): ..."""
+
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> "span":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        record_duration(self.name, (time.perf_counter() - self._start) * 1000)
+
+
+def get_stage_stats() -> Dict[str, Dict[str, float]]:
+    """各阶段直方图快照"""
+    return {name: h.snapshot() for name, h in sorted(_histograms.items())}
+
+
+def get_histograms() -> Dict[str, StageHistogram]:
+    """原始直方图（供指标导出使用）"""
+    return _histograms
+
+
+class ServerTimingMiddleware:
+    """
+    纯 ASGI 中间件：为每个 HTTP 请求创建计时容器，并在响应头中附加 Server-Timing
+
+    使用纯 ASGI 而非 BaseHTTPMiddleware，避免额外的任务与内存开销。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.server_timing_header().encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
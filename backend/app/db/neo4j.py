@@ -3,11 +3,13 @@ Neo4j 数据库连接管理 - 用于知识图谱存储
 使用 AsyncGraphDatabase 实现异步操作
 """
 import logging
+import time
 from typing import Optional, Dict, Any, List
 from contextlib import asynccontextmanager
 from neo4j import AsyncGraphDatabase, AsyncDriver, AsyncSession
 
 from app.core.config import settings
+from app.core.metrics import NEO4J_QUERY_DURATION, NEO4J_SESSIONS_IN_USE
 
 logger = logging.getLogger(__name__)
 
@@ -89,12 +91,21 @@ async def get_session():
         AsyncSession
     """
     driver = get_driver()
-    async with driver.session() as session:
-        try:
-            yield session
-        except Exception as e:
-            logger.error(f"Neo4j session error: {e}")
-            raise
+    NEO4J_SESSIONS_IN_USE.inc()
+    try:
+        async with driver.session() as session:
+            try:
+                yield session
+            except Exception as e:
+                logger.error(f"Neo4j session error: {e}")
+                raise
+    finally:
+        NEO4J_SESSIONS_IN_USE.dec()
+
+
+# 预绑定的查询耗时子指标（连接在首次 run 时才从池中获取，因此包含获取连接的等待）
+_read_duration = NEO4J_QUERY_DURATION.labels("read")
+_write_duration = NEO4J_QUERY_DURATION.labels("write")
 
 
 async def execute_query(
@@ -113,9 +124,13 @@ async def execute_query(
     Returns:
         查询结果列表
     """
-    async with get_session() as session:
-        result = await session.run(query, parameters or {})
-        return [dict(record) for record in await result.data()]
+    start = time.perf_counter()
+    try:
+        async with get_session() as session:
+            result = await session.run(query, parameters or {})
+            return [dict(record) for record in await result.data()]
+    finally:
+        _read_duration.observe(time.perf_counter() - start)
 
 
 async def execute_write(
@@ -134,17 +149,21 @@ async def execute_write(
     Returns:
         执行结果统计信息
     """
-    async with get_session() as session:
-        result = await session.run(query, parameters or {})
-        summary = await result.consume()
-
-        return {
-            "nodes_created": summary.counters.nodes_created,
-            "relationships_created": summary.counters.relationships_created,
-            "properties_set": summary.counters.properties_set,
-            "nodes_deleted": summary.counters.nodes_deleted,
-            "relationships_deleted": summary.counters.relationships_deleted,
-        }
+    start = time.perf_counter()
+    try:
+        async with get_session() as session:
+            result = await session.run(query, parameters or {})
+            summary = await result.consume()
+    finally:
+        _write_duration.observe(time.perf_counter() - start)
+
+    return {
+        "nodes_created": summary.counters.nodes_created,
+        "relationships_created": summary.counters.relationships_created,
+        "properties_set": summary.counters.properties_set,
+        "nodes_deleted": summary.counters.nodes_deleted,
+        "relationships_deleted": summary.counters.relationships_deleted,
+    }
 
 
 async def check_constraint_exists(constraint_name: str) -> bool:
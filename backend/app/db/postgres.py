@@ -2,7 +2,9 @@
 PostgreSQL 数据库连接管理 - 使用 SQLAlchemy 异步引擎
 """
 import logging
+import time
 from typing import AsyncGenerator
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncSession,
@@ -11,13 +13,27 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.core.config import settings
+from app.core.metrics import DB_POOL_WAIT, register_gauge_callback
 
 logger = logging.getLogger(__name__)
 
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """记录连接获取等待时间的连接池（用于 cognisync_db_pool_wait_seconds 指标）"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
 # 创建异步引擎
 engine: AsyncEngine = create_async_engine(
     settings.DATABASE_URL,
     echo=settings.DEBUG,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
     pool_size=10,
     max_overflow=20,
@@ -33,6 +49,22 @@ async_session_factory = async_sessionmaker(
     autocommit=False,
 )
 
+# SQL 语句计时（按路由聚合的慢查询 / 高频查询统计）
+if settings.SQL_STATS_ENABLED:
+    from app.db import query_stats
+    query_stats.install(engine, slow_query_ms=settings.SLOW_QUERY_MS)
+
+# 连接池状态（抓取时读取）
+register_gauge_callback(
+    "cognisync_db_pool_size", "连接池常驻连接数", lambda: engine.pool.size()
+)
+register_gauge_callback(
+    "cognisync_db_pool_checked_out", "已借出的连接数", lambda: engine.pool.checkedout()
+)
+register_gauge_callback(
+    "cognisync_db_pool_overflow", "超出常驻大小的溢出连接数（为负表示尚未建满）", lambda: engine.pool.overflow()
+)
+
 
 async def init_db():
     """
@@ -66,6 +98,24 @@ async def init_db():
         # 迁移：为 scale_templates 添加 activated_at 列
         await _migrate_scale_activated_at()
 
+        # 迁移：为 chat_messages 添加 timings 列
+        await _migrate_message_timings()
+
+        # 迁移：为 chat_messages 添加 session_id 外键与 (session_id, timestamp) 索引
+        await _migrate_message_session_id()
+
+        # 迁移：为 chat_sessions 添加会话摘要列，并补齐尚无摘要的会话
+        await _migrate_session_summaries()
+
+        # 迁移：游标分页所需的组合索引
+        await _migrate_keyset_indexes()
+
+        # 迁移：每用户当前画像（profile_current），补齐尚无当前画像的用户
+        await _migrate_profile_current()
+
+        # 迁移：每日概念明细（daily_concepts），为已汇总的日期补齐
+        await _migrate_daily_concepts()
+
         # 打印已创建的表
         async with engine.begin() as conn:
             def get_table_names(sync_conn):
@@ -82,6 +132,9 @@ async def init_db():
         # 种子：默认量表 v1.0（幂等，已存在则跳过）
         await _seed_default_scale()
 
+        # 回填：为尚无活动统计行的用户（升级前的历史用户、脚本导入的用户）重建统计
+        await _backfill_user_activity_stats()
+
     except Exception as e:
         logger.error(f"❌ Database initialization failed: {e}")
         raise
@@ -242,6 +295,162 @@ async def _migrate_scale_activated_at():
     )
 
 
+async def _migrate_message_timings():
+    """幂等迁移：为 chat_messages 添加 timings 列（对话各阶段耗时）"""
+    from sqlalchemy import text
+
+    async def run_sql(sql: str, label: str):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(sql))
+            logger.info(f"  ✅ {label}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ {label} (skipped): {e}")
+
+    await run_sql(
+        "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS timings JSONB;",
+        "ADD COLUMN timings to chat_messages"
+    )
+
+
+async def _migrate_message_session_id():
+    """
+    幂等迁移：为 chat_messages 添加 session_id 外键与 (session_id, timestamp) 索引
+
+    历史消息的 session_id 为空，由 app.services.session_backfill 在后台分批回填。
+    """
+    from sqlalchemy import text
+
+    async def run_sql(sql: str, label: str):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(sql))
+            logger.info(f"  ✅ {label}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ {label} (skipped): {e}")
+
+    await run_sql(
+        "ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS session_id UUID "
+        "REFERENCES chat_sessions (id) ON DELETE CASCADE;",
+        "ADD COLUMN session_id to chat_messages"
+    )
+    await run_sql(
+        "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_timestamp "
+        "ON chat_messages (session_id, timestamp);",
+        "CREATE INDEX ix_chat_messages_session_timestamp"
+    )
+
+
+async def _migrate_session_summaries():
+    """幂等迁移：为 chat_sessions 添加摘要列（起止时间、消息数、标题、预览）并补齐"""
+    from sqlalchemy import text
+    from app.services.chat_sessions import rebuild_session_summaries
+
+    async def run_sql(sql: str, label: str):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(sql))
+            logger.info(f"  ✅ {label}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ {label} (skipped): {e}")
+
+    await run_sql(
+        "ALTER TABLE chat_sessions "
+        "ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITH TIME ZONE, "
+        "ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP WITH TIME ZONE, "
+        "ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0, "
+        "ADD COLUMN IF NOT EXISTS title VARCHAR(100), "
+        "ADD COLUMN IF NOT EXISTS preview VARCHAR(100);",
+        "ADD COLUMN summary columns to chat_sessions"
+    )
+
+    # 已有消息、尚无摘要的会话（摘要列上线前写入的会话）
+    try:
+        async with async_session_factory() as session:
+            count = await rebuild_session_summaries(session)
+            await session.commit()
+        if count:
+            logger.info(f"  ✅ Rebuilt summaries for {count} chat sessions")
+    except Exception as e:
+        logger.warning(f"  ⚠️ Rebuild chat session summaries (skipped): {e}")
+
+
+async def _migrate_keyset_indexes():
+    """幂等迁移：为按模板分页的量表响应列表添加 (template_id, created_at, id) 索引"""
+    from sqlalchemy import text
+
+    async def run_sql(sql: str, label: str):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(sql))
+            logger.info(f"  ✅ {label}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ {label} (skipped): {e}")
+
+    await run_sql(
+        "CREATE INDEX IF NOT EXISTS ix_scale_responses_template_created "
+        "ON scale_responses (template_id, created_at, id);",
+        "CREATE INDEX ix_scale_responses_template_created"
+    )
+
+
+async def _migrate_profile_current():
+    """幂等回填：为尚无当前画像的用户从最新的 system 快照建立 profile_current 行"""
+    from app.services.profile_current import rebuild_current_profiles
+
+    try:
+        async with async_session_factory() as session:
+            count = await rebuild_current_profiles(session)
+            await session.commit()
+        if count:
+            logger.info(f"  ✅ Backfilled current profiles for {count} users")
+    except Exception as e:
+        logger.warning(f"  ⚠️ Backfill current profiles (skipped): {e}")
+
+
+async def _migrate_daily_concepts():
+    """幂等回填：daily_concepts 为空而 daily_activity 已有概念数时，重算这些日期的汇总"""
+    from sqlalchemy import text
+    from app.services.activity_rollup import refresh_days
+
+    try:
+        async with async_session_factory() as session:
+            if await session.scalar(text("SELECT EXISTS (SELECT 1 FROM daily_concepts)")):
+                return
+            first, last = (await session.execute(text(
+                "SELECT MIN(day), MAX(day) FROM daily_activity WHERE concepts > 0"
+            ))).one()
+            if first is None:
+                return
+            days = await refresh_days(session, first, last)
+            await session.commit()
+        logger.info(f"  ✅ Backfilled daily concepts for {days} days")
+    except Exception as e:
+        logger.warning(f"  ⚠️ Backfill daily concepts (skipped): {e}")
+
+
+async def _backfill_user_activity_stats():
+    """幂等回填：只处理 user_activity_stats 中缺行的用户，已有统计的用户不受影响"""
+    from sqlalchemy import text
+    from app.services.activity_stats import rebuild_activity_stats
+
+    try:
+        async with async_session_factory() as session:
+            result = await session.execute(text("""
+                SELECT u.id FROM users u
+                LEFT JOIN user_activity_stats s ON s.user_id = u.id
+                WHERE s.user_id IS NULL
+            """))
+            missing = [row[0] for row in result.all()]
+            if not missing:
+                return
+            count = await rebuild_activity_stats(session, missing)
+            await session.commit()
+        logger.info(f"  ✅ Backfilled activity stats for {count} users")
+    except Exception as e:
+        logger.warning(f"  ⚠️ Backfill user activity stats (skipped): {e}")
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     依赖注入：获取数据库会话
@@ -0,0 +1,244 @@
+"""
+SQL 语句计时 - 基于 SQLAlchemy cursor 事件
+
+install(engine) 后，每条语句的耗时与影响行数会：
+1. 计入当前请求（由 QueryStatsMiddleware 创建），按路由汇总每请求查询数，用于发现 N+1
+2. 计入进程内的语句统计表（按 路由 + 语句文本 聚合，有上限，超出时淘汰总耗时最小的条目）
+
+事件回调在 SQLAlchemy 的 greenlet 中执行，greenlet 继承调用方的 contextvars 上下文，
+因此可以直接读取当前请求的状态。
+"""
+import logging
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import DB_QUERY_DURATION
+
+logger = logging.getLogger(__name__)
+
+# 语句统计表最多保留的条目数
+MAX_STATEMENTS = 500
+# 语句文本最大长度（IN 列表展开等会让文本变长）
+MAX_STATEMENT_LENGTH = 1000
+
+NO_ROUTE = "<background>"
+
+_whitespace = re.compile(r"\s+")
+
+
+class StatementStats:
+    """单条语句（同一路由下）的累计统计"""
+
+    __slots__ = ("route", "statement", "count", "total_ms", "max_ms", "rows")
+
+    def __init__(self, route: str, statement: str):
+        self.route = route
+        self.statement = statement
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def as_dict(self) -> Dict:
+        return {
+            "route": self.route,
+            "statement": self.statement,
+            "count": self.count,
+            "totalMs": round(self.total_ms, 1),
+            "meanMs": round(self.total_ms / self.count, 2) if self.count else 0.0,
+            "maxMs": round(self.max_ms, 1),
+            "rows": self.rows,
+        }
+
+
+class RouteQueryStats:
+    """单个路由的每请求查询数统计"""
+
+    __slots__ = ("route", "requests", "queries", "max_queries", "total_ms")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.total_ms = 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "route": self.route,
+            "requests": self.requests,
+            "queriesPerRequest": round(self.queries / self.requests, 2) if self.requests else 0.0,
+            "maxQueries": self.max_queries,
+            "dbMsPerRequest": round(self.total_ms / self.requests, 1) if self.requests else 0.0,
+        }
+
+
+class RequestQueries:
+    """当前请求内的查询计数"""
+
+    __slots__ = ("scope", "count", "total_ms")
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.count = 0
+        self.total_ms = 0.0
+
+    @property
+    def route(self) -> str:
+        """路由模板（路由匹配完成后由 Starlette 写入 scope）"""
+        route = self.scope.get("route")
+        return getattr(route, "path", None) or "<unmatched>"
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+_statements: Dict[Tuple[str, str], StatementStats] = {}
+_routes: Dict[str, RouteQueryStats] = {}
+
+# 慢查询日志阈值（毫秒），由 install() 设置；<= 0 表示不记录
+_slow_query_ms = 0.0
+
+
+def _normalize(statement: str) -> str:
+    text = _whitespace.sub(" ", statement).strip()
+    if len(text) > MAX_STATEMENT_LENGTH:
+        text = text[:MAX_STATEMENT_LENGTH] + " …"
+    return text
+
+
+def _evict() -> None:
+    """淘汰总耗时最小的条目（仅在表满时发生）"""
+    victim = min(_statements, key=lambda k: _statements[k].total_ms)
+    del _statements[victim]
+
+
+def _record(statement: str, duration_ms: float, rowcount: int) -> None:
+    DB_QUERY_DURATION.observe(duration_ms / 1000)
+    request = _current.get()
+    route = request.route if request is not None else NO_ROUTE
+    if request is not None:
+        request.count += 1
+        request.total_ms += duration_ms
+
+    key = (route, statement)
+    stats = _statements.get(key)
+    if stats is None:
+        normalized = _normalize(statement)
+        if len(_statements) >= MAX_STATEMENTS:
+            _evict()
+        stats = _statements[key] = StatementStats(route, normalized)
+    stats.count += 1
+    stats.total_ms += duration_ms
+    if duration_ms > stats.max_ms:
+        stats.max_ms = duration_ms
+    if rowcount > 0:
+        stats.rows += rowcount
+
+    if 0 < _slow_query_ms <= duration_ms:
+        logger.warning(f"Slow query ({duration_ms:.0f}ms, route={route}): {stats.statement[:200]}")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    rowcount = getattr(cursor, "rowcount", -1)
+    _record(statement, duration_ms, rowcount if isinstance(rowcount, int) else -1)
+
+
+def install(engine: Union[AsyncEngine, Engine], slow_query_ms: float = 0.0) -> None:
+    """在引擎上注册语句计时事件（异步引擎注册在其底层同步引擎上）"""
+    global _slow_query_ms
+    _slow_query_ms = slow_query_ms
+    sync_engine = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def get_statement_stats(sort: str = "total", limit: int = 50, route: Optional[str] = None) -> List[Dict]:
+    """
+    语句统计 Top-N
+
+    Args:
+        sort: 排序字段：total（总耗时）| mean（平均耗时）| max（最大耗时）| count（执行次数）
+        limit: 返回条数
+        route: 只看某个路由
+    """
+    keys = {
+        "total": lambda s: s.total_ms,
+        "mean": lambda s: s.total_ms / s.count if s.count else 0.0,
+        "max": lambda s: s.max_ms,
+        "count": lambda s: s.count,
+    }
+    items = [s for s in _statements.values() if route is None or s.route == route]
+    items.sort(key=keys[sort], reverse=True)
+    return [s.as_dict() for s in items[:limit]]
+
+
+def get_route_stats() -> List[Dict]:
+    """各路由的每请求查询数（按平均查询数降序，排在前面的多半是 N+1）"""
+    items = sorted(
+        _routes.values(),
+        key=lambda r: r.queries / r.requests if r.requests else 0.0,
+        reverse=True,
+    )
+    return [r.as_dict() for r in items]
+
+
+def reset_stats() -> None:
+    """清空统计"""
+    _statements.clear()
+    _routes.clear()
+
+
+class QueryStatsMiddleware:
+    """
+    纯 ASGI 中间件：为每个 HTTP 请求建立查询计数，并在请求结束时按路由汇总
+
+    add_header=True 时（调试模式）在响应头附加 X-Query-Count / X-Query-Time-Ms，
+    只统计响应头发出之前执行的查询。
+    """
+
+    def __init__(self, app, add_header: bool = False):
+        self.app = app
+        self.add_header = add_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        queries = RequestQueries(scope)
+        token = _current.set(queries)
+
+        async def send_with_count(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-query-count", str(queries.count).encode("latin-1")))
+                headers.append((b"x-query-time-ms", f"{queries.total_ms:.1f}".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_count if self.add_header else send)
+        finally:
+            _current.reset(token)
+            route = queries.route
+            stats = _routes.get(route)
+            if stats is None:
+                stats = _routes[route] = RouteQueryStats(route)
+            stats.requests += 1
+            stats.queries += queries.count
+            stats.total_ms += queries.total_ms
+            if queries.count > stats.max_queries:
+                stats.max_queries = queries.count
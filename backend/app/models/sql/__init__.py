@@ -4,13 +4,16 @@ SQL Models - 导出所有模型
 from app.models.sql.base import Base, metadata
 from app.models.sql.user import User
 from app.models.sql.message import ChatMessage, MessageRole
-from app.models.sql.profile import ProfileSnapshot, ProfileSource
+from app.models.sql.profile import ProfileSnapshot, ProfileSource, CurrentProfile
 from app.models.sql.calibration_log import CalibrationLog, Dimension, ConflictLevel
 from app.models.sql.chat_session import ChatSession
 from app.models.sql.onboarding import OnboardingSession
 from app.models.sql.scale import ScaleTemplate, ScaleResponse, ScaleStatus
 from app.models.sql.research import ResearchTask, ResearchTaskSubmission, ResearchTaskStatus
 from app.models.sql.system_config import SystemConfig
+from app.models.sql.llm_call_log import LLMCallLog
+from app.models.sql.user_activity import UserActivityStats
+from app.models.sql.daily_activity import DailyActivity, DailyActiveUser, DailyConcept
 
 __all__ = [
     "Base",
@@ -20,6 +23,7 @@ __all__ = [
     "MessageRole",
     "ProfileSnapshot",
     "ProfileSource",
+    "CurrentProfile",
     "CalibrationLog",
     "Dimension",
     "ConflictLevel",
@@ -32,4 +36,9 @@ __all__ = [
     "ResearchTaskSubmission",
     "ResearchTaskStatus",
     "SystemConfig",
+    "LLMCallLog",
+    "UserActivityStats",
+    "DailyActivity",
+    "DailyActiveUser",
+    "DailyConcept",
 ]
@@ -3,7 +3,8 @@ ChatSession Model - 会话表
 """
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import ForeignKey, Index
+from typing import Optional
+from sqlalchemy import ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
 
@@ -13,7 +14,7 @@ from app.models.sql.base import Base, UUIDMixin
 class ChatSession(Base, UUIDMixin):
     """
     会话表
-    用于组织对话消息
+    用于组织对话消息；会话摘要（起止时间、消息数、标题、预览）随消息写入增量维护
     """
     __tablename__ = "chat_sessions"
     __table_args__ = (
@@ -36,6 +37,38 @@ class ChatSession(Base, UUIDMixin):
         comment="会话创建时间"
     )
 
+    started_at: Mapped[Optional[datetime]] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        comment="第一条消息时间"
+    )
+
+    last_message_at: Mapped[Optional[datetime]] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        comment="最后一条消息时间"
+    )
+
+    message_count: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        server_default="0",
+        nullable=False,
+        comment="消息数"
+    )
+
+    title: Mapped[Optional[str]] = mapped_column(
+        String(100),
+        nullable=True,
+        comment="标题（第一条用户消息摘要）"
+    )
+
+    preview: Mapped[Optional[str]] = mapped_column(
+        String(100),
+        nullable=True,
+        comment="预览（最后一条消息摘要）"
+    )
+
     # 关系
     user: Mapped["User"] = relationship(
         "User",
@@ -0,0 +1,127 @@
+"""
+DailyActivity Model - 每日活跃度汇总表
+由后台任务（app.services.activity_rollup）从明细表增量汇总，供分析概览读取
+日期按 UTC 划分
+"""
+import uuid
+from datetime import date, datetime, timezone
+from sqlalchemy import Date, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+
+from app.models.sql.base import Base
+
+
+class DailyActivity(Base):
+    """
+    每日活跃度汇总（每天一行）
+    """
+    __tablename__ = "daily_activity"
+    __table_args__ = {"comment": "每日活跃度汇总表"}
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        comment="日期（UTC）"
+    )
+
+    active_users: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="当日发送过消息的用户数"
+    )
+
+    messages: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="当日消息数"
+    )
+
+    new_users: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="当日注册用户数"
+    )
+
+    concepts: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="当日对话中检测到的不同概念数"
+    )
+
+    refreshed_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        comment="本行最后汇总时间"
+    )
+
+    def __repr__(self) -> str:
+        return f"<DailyActivity(day={self.day}, active_users={self.active_users}, messages={self.messages})>"
+
+
+class DailyActiveUser(Base):
+    """
+    每日活跃用户明细（每天每个活跃用户一行）
+    按周等更粗粒度统计活跃用户时需要去重，不能直接累加每日活跃数
+    """
+    __tablename__ = "daily_active_users"
+    __table_args__ = {"comment": "每日活跃用户明细表"}
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        comment="日期（UTC）"
+    )
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户 ID"
+    )
+
+    messages: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="该用户当日消息数"
+    )
+
+    def __repr__(self) -> str:
+        return f"<DailyActiveUser(day={self.day}, user_id={self.user_id})>"
+
+
+class DailyConcept(Base):
+    """
+    每日概念明细（每天每个检测到的概念一行）
+    按周统计不同概念数时需要去重，不能直接累加每日的不同概念数
+    """
+    __tablename__ = "daily_concepts"
+    __table_args__ = {"comment": "每日概念明细表"}
+
+    day: Mapped[date] = mapped_column(
+        Date,
+        primary_key=True,
+        comment="日期（UTC）"
+    )
+
+    concept: Mapped[str] = mapped_column(
+        String(200),
+        primary_key=True,
+        comment="概念"
+    )
+
+    mentions: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="当日提及该概念的消息数"
+    )
+
+    def __repr__(self) -> str:
+        return f"<DailyConcept(day={self.day}, concept={self.concept})>"
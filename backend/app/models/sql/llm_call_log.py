@@ -0,0 +1,106 @@
+"""
+LLMCallLog Model - LLM 调用记录表
+每次 Provider 调用追加一行（只追加、不更新），用于 token 用量与延迟统计
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import BigInteger, Integer, SmallInteger, String, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+
+from app.models.sql.base import Base
+
+
+class LLMCallLog(Base):
+    """
+    LLM 调用记录表
+    紧凑的只追加表：自增主键、不设外键，由后台任务批量写入
+    """
+    __tablename__ = "llm_call_logs"
+    __table_args__ = (
+        Index("ix_llm_call_logs_created_at", "created_at"),
+        Index("ix_llm_call_logs_user_created", "user_id", "created_at"),
+        {"comment": "LLM 调用记录表"}
+    )
+
+    id: Mapped[int] = mapped_column(
+        BigInteger,
+        primary_key=True,
+        autoincrement=True,
+        comment="自增主键"
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        comment="调用开始时间"
+    )
+
+    user_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        nullable=True,
+        comment="发起调用的用户 ID（无用户上下文时为空）"
+    )
+
+    role: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        comment="调用角色: analysis | chat | greeting | onboarding | ..."
+    )
+
+    provider: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        comment="LLM 提供者: mock | openai | deepseek | ollama | lmstudio"
+    )
+
+    model: Mapped[str] = mapped_column(
+        String(100),
+        nullable=False,
+        comment="模型名称"
+    )
+
+    prompt_tokens: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="输入 token 数"
+    )
+
+    completion_tokens: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="输出 token 数"
+    )
+
+    cached_tokens: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="命中上游 prompt 缓存的输入 token 数"
+    )
+
+    latency_ms: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="总耗时（毫秒，含重试）"
+    )
+
+    retries: Mapped[int] = mapped_column(
+        SmallInteger,
+        default=0,
+        nullable=False,
+        comment="重试次数"
+    )
+
+    outcome: Mapped[str] = mapped_column(
+        String(16),
+        nullable=False,
+        comment="调用结果: ok | error | timeout"
+    )
+
+    def __repr__(self) -> str:
+        return f"<LLMCallLog(id={self.id}, role={self.role}, outcome={self.outcome})>"
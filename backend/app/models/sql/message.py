@@ -26,6 +26,7 @@ class ChatMessage(Base, UUIDMixin):
     __tablename__ = "chat_messages"
     __table_args__ = (
         Index("ix_chat_messages_user_timestamp", "user_id", "timestamp"),
+        Index("ix_chat_messages_session_timestamp", "session_id", "timestamp"),
         {"comment": "聊天消息表"}
     )
 
@@ -37,6 +38,13 @@ class ChatMessage(Base, UUIDMixin):
         comment="用户 ID（外键）"
     )
 
+    session_id: Mapped[Optional[uuid.UUID]] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("chat_sessions.id", ondelete="CASCADE"),
+        nullable=True,
+        comment="会话 ID（外键；历史消息由后台任务按时间间隔回填）"
+    )
+
     role: Mapped[MessageRole] = mapped_column(
         Enum(MessageRole, name="message_role", native_enum=False),
         nullable=False,
@@ -63,6 +71,12 @@ class ChatMessage(Base, UUIDMixin):
         comment="消息分析结果（JSON）：intent, emotion, detectedConcepts, delta"
     )
 
+    timings: Mapped[Optional[Dict[str, Any]]] = mapped_column(
+        JSONB,
+        nullable=True,
+        comment="本轮各阶段耗时（毫秒，JSON），仅 PERSIST_CHAT_TIMINGS 开启时写入 AI 回复"
+    )
+
     # 关系
     user: Mapped["User"] = relationship(
         "User",
@@ -78,3 +78,51 @@ class ProfileSnapshot(Base, UUIDMixin):
             f"<ProfileSnapshot(id={self.id}, user_id={self.user_id}, "
             f"source={self.source}, cognition={self.cognition})>"
         )
+
+
+class CurrentProfile(Base):
+    """
+    当前画像表
+    每个用户一行的最新 system 画像；对话增量在一条 UPSERT 中原子累加并 clamp，
+    同一语句追加 profile_snapshots 历史（app.services.profile_current）
+    """
+    __tablename__ = "profile_current"
+    __table_args__ = {"comment": "当前画像表（每用户一行的最新 system 画像）"}
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户 ID（主键 + 外键）"
+    )
+
+    cognition: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="认知维度 [0-100]"
+    )
+
+    affect: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="情感维度 [0-100]"
+    )
+
+    behavior: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        comment="行为维度 [0-100]"
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        comment="最后更新时间（与对应快照的 created_at 一致）"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<CurrentProfile(user_id={self.user_id}, cognition={self.cognition}, "
+            f"affect={self.affect}, behavior={self.behavior})>"
+        )
@@ -110,6 +110,7 @@ class ScaleResponse(Base, UUIDMixin):
     __table_args__ = (
         Index("ix_scale_responses_user_template", "user_id", "template_id"),
         Index("ix_scale_responses_created", "created_at"),
+        Index("ix_scale_responses_template_created", "template_id", "created_at", "id"),
         {"comment": "量表响应表"}
     )
 
@@ -87,47 +87,53 @@ class User(Base, UUIDMixin):
         comment="最后活跃时间"
     )
 
-    # 关系
+    # 关系（集合不随用户加载：数量无上限，需要时显式查询；删除依赖数据库 ON DELETE CASCADE）
     messages: Mapped[list["ChatMessage"]] = relationship(
         "ChatMessage",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise_on_sql"
     )
 
     profile_snapshots: Mapped[list["ProfileSnapshot"]] = relationship(
         "ProfileSnapshot",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise_on_sql"
     )
 
     calibration_logs: Mapped[list["CalibrationLog"]] = relationship(
         "CalibrationLog",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise_on_sql"
     )
 
     sessions: Mapped[list["ChatSession"]] = relationship(
         "ChatSession",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise_on_sql"
     )
 
     scale_responses: Mapped[list["ScaleResponse"]] = relationship(
         "ScaleResponse",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise_on_sql"
     )
 
     onboarding_sessions: Mapped[list["OnboardingSession"]] = relationship(
         "OnboardingSession",
         back_populates="user",
         cascade="all, delete-orphan",
-        lazy="selectin"
+        passive_deletes=True,
+        lazy="raise_on_sql"
     )
 
     def __repr__(self) -> str:
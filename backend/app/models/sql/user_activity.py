@@ -0,0 +1,75 @@
+"""
+UserActivityStats Model - 用户活动统计表
+每个用户一行的物化计数，写入消息 / 会话 / 量表 / 画像时增量维护，
+供管理后台列表与详情页直接读取，避免每次浏览都聚合 chat_messages
+"""
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from sqlalchemy import ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, TIMESTAMP
+
+from app.models.sql.base import Base
+
+
+class UserActivityStats(Base):
+    """
+    用户活动统计表
+    增量维护（app.services.activity_stats.record_activity），可随时全量重建
+    """
+    __tablename__ = "user_activity_stats"
+    __table_args__ = {"comment": "用户活动统计表（物化计数）"}
+
+    user_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("users.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="用户 ID（主键 + 外键）"
+    )
+
+    message_count: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="消息数（含用户与 AI 消息）"
+    )
+
+    session_count: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="会话数"
+    )
+
+    scale_response_count: Mapped[int] = mapped_column(
+        Integer,
+        default=0,
+        nullable=False,
+        comment="量表作答数"
+    )
+
+    last_active_at: Mapped[Optional[datetime]] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        comment="最后一条消息时间"
+    )
+
+    last_profile_at: Mapped[Optional[datetime]] = mapped_column(
+        TIMESTAMP(timezone=True),
+        nullable=True,
+        comment="最新画像快照时间"
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        TIMESTAMP(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        nullable=False,
+        comment="本行最后更新时间"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<UserActivityStats(user_id={self.user_id}, messages={self.message_count}, "
+            f"sessions={self.session_count})>"
+        )
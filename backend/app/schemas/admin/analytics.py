@@ -1,7 +1,7 @@
 """
 分析统计 Schema 定义
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 
@@ -16,10 +16,12 @@ class SystemOverview(BaseModel):
 
 
 class UserActivity(BaseModel):
-    """用户活跃度"""
-    date: str = Field(..., description="日期")
-    activeUsers: int = Field(..., description="活跃用户数")
+    """用户活跃度（按日或按周的一个时间桶）"""
+    date: str = Field(..., description="日期（按周时为该周周一）")
+    activeUsers: int = Field(..., description="活跃用户数（按周时为周内去重用户数）")
     totalMessages: int = Field(..., description="消息总数")
+    newUsers: int = Field(0, description="新注册用户数")
+    concepts: int = Field(0, description="检测到的不同概念数（按周时为各日之和）")
 
 
 class ConceptMastery(BaseModel):
@@ -34,6 +36,9 @@ class AnalyticsOverviewResponse(BaseModel):
     """分析概览响应"""
     overview: SystemOverview
     activityTrend: List[UserActivity]
+    granularity: str = Field("day", description="趋势粒度：day | week")
+    startDate: Optional[str] = Field(None, description="趋势起始日期（UTC，含）")
+    endDate: Optional[str] = Field(None, description="趋势结束日期（UTC，含）")
 
 
 class AnalyticsConceptsResponse(BaseModel):
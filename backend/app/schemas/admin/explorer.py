@@ -9,6 +9,7 @@ class TableInfo(BaseModel):
     """表信息"""
     name: str = Field(..., description="表名")
     rowCount: int = Field(..., description="行数")
+    rowCountEstimated: bool = Field(default=False, description="行数是否为估算值")
     canView: bool = Field(default=True, description="是否可查看")
 
 
@@ -37,6 +38,8 @@ class PaginationInfo(BaseModel):
     pageSize: int = Field(..., description="每页行数", ge=1, le=100)
     total: int = Field(..., description="总行数")
     totalPages: int = Field(..., description="总页数")
+    totalEstimated: bool = Field(default=False, description="总行数是否为估算值")
+    nextCursor: Optional[str] = Field(default=None, description="下一页游标，没有更多数据时为空")
 
 
 class TableDataResponse(BaseModel):
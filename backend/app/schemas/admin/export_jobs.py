@@ -0,0 +1,51 @@
+"""
+后台导出任务 Schema 定义
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional
+from pydantic import BaseModel, Field
+
+
+class ExportJobRequest(BaseModel):
+    """导出规格"""
+    kind: Literal["dataset", "table"] = Field(..., description="导出对象：dataset 研究数据集 | table 原始表")
+    dataset: Optional[str] = Field(
+        None,
+        description="研究数据集名（kind=dataset）：learner_profiles | scale_responses | conversations | "
+                    "learning_trajectory | user_conversations | user_trajectory"
+    )
+    userIds: Optional[List[str]] = Field(None, description="限定用户（learner_profiles / scale_responses）")
+    userId: Optional[str] = Field(None, description="单个用户（user_conversations / user_trajectory）")
+    table: Optional[str] = Field(None, description="表名（kind=table，须在导出白名单中）")
+    filters: Optional[Dict[str, Any]] = Field(
+        None, description='过滤条件（kind=table），格式同 /db/export：{"列名": {"op": "eq", "value": ...}}'
+    )
+    orderBy: Optional[str] = Field(None, description="排序字段（kind=table）")
+    order: str = Field("desc", description="排序方向：asc | desc")
+    format: Literal["csv", "json"] = Field("csv", description="输出格式（结果文件均为 gzip 压缩）")
+
+
+class ExportJobInfo(BaseModel):
+    """导出任务状态"""
+    id: str = Field(..., description="任务 ID")
+    dataset: str = Field(..., description="数据集 / 表名")
+    format: str = Field(..., description="输出格式")
+    status: str = Field(..., description="状态：queued | running | done | failed | cancelled")
+    rowsWritten: int = Field(..., description="已写入行数")
+    bytesWritten: int = Field(..., description="已写入字节数（压缩前）")
+    estimatedRows: Optional[int] = Field(None, description="按表统计信息估算的总行数")
+    progress: Optional[float] = Field(None, description="完成比例 0~1（无法估算时为空）")
+    error: Optional[str] = Field(None, description="失败原因")
+    filename: str = Field(..., description="下载文件名")
+    fileSize: Optional[int] = Field(None, description="结果文件大小（压缩后字节数，完成后可用）")
+    createdAt: datetime = Field(..., description="提交时间")
+    startedAt: Optional[datetime] = Field(None, description="开始执行时间")
+    finishedAt: Optional[datetime] = Field(None, description="结束时间")
+    expiresAt: Optional[datetime] = Field(None, description="结果文件过期时间")
+
+
+class ExportJobListResponse(BaseModel):
+    """导出任务列表"""
+    jobs: List[ExportJobInfo] = Field(..., description="任务列表（最新的在前）")
+    pending: int = Field(..., description="排队 + 执行中的任务数")
+    concurrency: int = Field(..., description="同时执行的任务上限")
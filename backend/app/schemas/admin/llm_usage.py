@@ -0,0 +1,29 @@
+"""
+LLM 用量统计 Schema 定义
+"""
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+class LLMUsageBucket(BaseModel):
+    """单个分组的用量汇总"""
+    key: str = Field(..., description="分组键（日期 / 用户 ID / 角色）")
+    label: Optional[str] = Field(None, description="显示名称（按用户分组时为用户名）")
+    calls: int = Field(..., description="调用次数")
+    errors: int = Field(..., description="失败次数（error + timeout）")
+    retries: int = Field(..., description="重试总次数")
+    promptTokens: int = Field(..., description="输入 token 总数")
+    completionTokens: int = Field(..., description="输出 token 总数")
+    cachedTokens: int = Field(..., description="命中缓存的输入 token 总数")
+    cacheHitRatio: float = Field(..., description="缓存命中率 cachedTokens / promptTokens")
+    avgLatencyMs: float = Field(..., description="平均耗时（毫秒）")
+    p95LatencyMs: float = Field(..., description="P95 耗时（毫秒）")
+
+
+class LLMUsageSummaryResponse(BaseModel):
+    """用量汇总响应"""
+    groupBy: str = Field(..., description="分组方式：day | user | role")
+    start: str = Field(..., description="统计起始时间（ISO 8601）")
+    end: str = Field(..., description="统计结束时间（ISO 8601）")
+    total: LLMUsageBucket = Field(..., description="区间总计")
+    buckets: List[LLMUsageBucket] = Field(..., description="分组明细")
@@ -11,6 +11,7 @@ class OverviewStats(BaseModel):
     messages_count: int = Field(..., description="消息总数")
     templates_count: int = Field(..., description="量表模板总数")
     responses_count: int = Field(..., description="量表响应总数")
+    estimated: bool = Field(False, description="是否包含基于统计信息的估算值（传 exact=true 获取精确计数）")
 
     class Config:
         json_schema_extra = {
@@ -19,6 +20,7 @@ class OverviewStats(BaseModel):
                 "sessions_count": 450,
                 "messages_count": 3200,
                 "templates_count": 5,
-                "responses_count": 280
+                "responses_count": 280,
+                "estimated": False
             }
         }
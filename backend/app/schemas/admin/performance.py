@@ -0,0 +1,75 @@
+"""
+性能观测 Schema 定义
+"""
+from typing import List
+from pydantic import BaseModel, Field
+
+
+class StageStats(BaseModel):
+    """单个阶段的耗时分布（按直方图桶上界估算）"""
+    stage: str = Field(..., description="阶段名称，如 chat.analysis、llm.chat")
+    count: int = Field(..., description="样本数")
+    meanMs: float = Field(..., description="平均耗时（毫秒）")
+    p50Ms: float = Field(..., description="P50 耗时（毫秒）")
+    p95Ms: float = Field(..., description="P95 耗时（毫秒）")
+    p99Ms: float = Field(..., description="P99 耗时（毫秒）")
+
+
+class StageStatsResponse(BaseModel):
+    """各阶段耗时分布响应"""
+    stages: List[StageStats] = Field(..., description="各阶段统计（自进程启动起累计）")
+
+
+class StatementStatsItem(BaseModel):
+    """单条 SQL 语句（按路由）的累计统计"""
+    route: str = Field(..., description="路由模板；非请求上下文中执行的语句为 <background>")
+    statement: str = Field(..., description="语句文本（参数化，空白已折叠）")
+    count: int = Field(..., description="执行次数")
+    totalMs: float = Field(..., description="总耗时（毫秒）")
+    meanMs: float = Field(..., description="平均耗时（毫秒）")
+    maxMs: float = Field(..., description="最大耗时（毫秒）")
+    rows: int = Field(..., description="驱动报告的影响行数合计（SELECT 可能为 0）")
+
+
+class RouteQueryStatsItem(BaseModel):
+    """单个路由的每请求查询数"""
+    route: str = Field(..., description="路由模板")
+    requests: int = Field(..., description="请求数")
+    queriesPerRequest: float = Field(..., description="平均每请求 SQL 语句数（偏高通常意味着 N+1）")
+    maxQueries: int = Field(..., description="单个请求的最大语句数")
+    dbMsPerRequest: float = Field(..., description="平均每请求 SQL 耗时（毫秒）")
+
+
+class QueryStatsResponse(BaseModel):
+    """SQL 统计响应"""
+    sort: str = Field(..., description="语句排序字段")
+    statements: List[StatementStatsItem] = Field(..., description="语句 Top-N")
+    routes: List[RouteQueryStatsItem] = Field(..., description="各路由每请求查询数")
+
+
+class LoopBlockEvent(BaseModel):
+    """一次事件循环阻塞"""
+    detectedAt: str = Field(..., description="检测时间（ISO 8601）")
+    blockedMs: float = Field(..., description="检测时已阻塞的时长（毫秒，实际阻塞可能更长）")
+    stack: str = Field(..., description="事件循环线程当时的调用栈")
+
+
+class EventLoopStatsResponse(BaseModel):
+    """事件循环延迟监控状态"""
+    running: bool = Field(..., description="监控是否在运行")
+    captureStacks: bool = Field(..., description="是否开启阻塞抓栈（DEBUG 模式）")
+    intervalMs: float = Field(..., description="探测间隔（毫秒）")
+    blockThresholdMs: float = Field(..., description="阻塞判定阈值（毫秒）")
+    lastLagMs: float = Field(..., description="最近一次调度延迟（毫秒）")
+    maxLagMs: float = Field(..., description="启动以来最大调度延迟（毫秒）")
+    blockedEvents: List[LoopBlockEvent] = Field(..., description="最近的阻塞事件（仅开启抓栈时记录）")
+
+
+class ProfileItem(BaseModel):
+    """一次请求剖析的元信息"""
+    id: str = Field(..., description="剖析 ID（与被剖析请求的 X-Profile-Id 响应头一致）")
+    mode: str = Field(..., description="剖析方式：sample（folded stacks）| cprofile（pstats）")
+    method: str = Field(..., description="HTTP 方法")
+    path: str = Field(..., description="请求路径")
+    startedAt: str = Field(..., description="开始时间（ISO 8601）")
+    durationMs: float = Field(..., description="剖析时长（毫秒，至响应头发出）")
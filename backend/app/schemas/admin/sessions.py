@@ -63,3 +63,4 @@ class SessionMessagesResponse(BaseModel):
     total: int = Field(..., description="总数")
     limit: int = Field(..., description="限制数量")
     offset: int = Field(..., description="偏移量")
+    nextCursor: Optional[str] = Field(None, description="下一页游标，没有更多数据时为空")
@@ -57,6 +57,7 @@ class UserMessagesResponse(BaseModel):
     total: int
     limit: int
     offset: int
+    nextCursor: Optional[str] = Field(None, description="下一页游标，没有更多数据时为空")
 
 
 class UserProfilesResponse(BaseModel):
@@ -0,0 +1,208 @@
+"""
+Activity Rollup - 每日活跃度汇总（daily_activity / daily_active_users / daily_concepts）
+
+分析概览过去每次请求都对 chat_messages 做 16 次范围扫描。现在由后台任务按天汇总：
+
+- refresh_days(start, end): 集合式重算一段日期（每张表一条语句），可重复执行
+- refresh_incremental(): 从已汇总的最后一天的前一天重算到今天；首次运行时从最早的数据开始
+  （前一天也重算，覆盖跨零点写入的消息）
+- DailyRollupJob: 每隔 interval 秒执行一次 refresh_incremental()
+
+日期一律按 UTC 划分。删除用户 / 消息后历史汇总不会自动变化，可通过
+POST /admin/analytics/rollup/refresh 重算指定区间。
+"""
+import asyncio
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+_REFRESH_DAILY_SQL = """
+    INSERT INTO daily_activity (day, active_users, messages, new_users, concepts, refreshed_at)
+    SELECT
+        d.day::date,
+        COALESCE(m.active_users, 0),
+        COALESCE(m.messages, 0),
+        COALESCE(u.new_users, 0),
+        COALESCE(c.concepts, 0),
+        now()
+    FROM generate_series(CAST(:start AS date)::timestamp, CAST(:end AS date)::timestamp, interval '1 day') AS d(day)
+    LEFT JOIN (
+        SELECT (timestamp AT TIME ZONE 'UTC')::date AS day,
+               COUNT(*) AS messages,
+               COUNT(DISTINCT user_id) AS active_users
+        FROM chat_messages
+        WHERE timestamp >= :start_ts
+          AND timestamp < :end_ts
+        GROUP BY 1
+    ) m ON m.day = d.day
+    LEFT JOIN (
+        SELECT (created_at AT TIME ZONE 'UTC')::date AS day, COUNT(*) AS new_users
+        FROM users
+        WHERE created_at >= :start_ts
+          AND created_at < :end_ts
+        GROUP BY 1
+    ) u ON u.day = d.day
+    LEFT JOIN (
+        SELECT (cm.timestamp AT TIME ZONE 'UTC')::date AS day, COUNT(DISTINCT concept) AS concepts
+        FROM chat_messages cm
+        CROSS JOIN LATERAL jsonb_array_elements_text(cm.analysis -> 'detectedConcepts') AS concept
+        WHERE cm.timestamp >= :start_ts
+          AND cm.timestamp < :end_ts
+          AND jsonb_typeof(cm.analysis -> 'detectedConcepts') = 'array'
+        GROUP BY 1
+    ) c ON c.day = d.day
+    ON CONFLICT (day) DO UPDATE SET
+        active_users = EXCLUDED.active_users,
+        messages = EXCLUDED.messages,
+        new_users = EXCLUDED.new_users,
+        concepts = EXCLUDED.concepts,
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+_DELETE_ACTIVE_USERS_SQL = """
+    DELETE FROM daily_active_users
+    WHERE day BETWEEN CAST(:start AS date) AND CAST(:end AS date)
+"""
+
+_REFRESH_ACTIVE_USERS_SQL = """
+    INSERT INTO daily_active_users (day, user_id, messages)
+    SELECT (timestamp AT TIME ZONE 'UTC')::date, user_id, COUNT(*)
+    FROM chat_messages
+    WHERE timestamp >= :start_ts
+      AND timestamp < :end_ts
+    GROUP BY 1, 2
+"""
+
+_DELETE_CONCEPTS_SQL = """
+    DELETE FROM daily_concepts
+    WHERE day BETWEEN CAST(:start AS date) AND CAST(:end AS date)
+"""
+
+_REFRESH_CONCEPTS_SQL = """
+    INSERT INTO daily_concepts (day, concept, mentions)
+    SELECT (cm.timestamp AT TIME ZONE 'UTC')::date, left(concept, 200), COUNT(DISTINCT cm.id)
+    FROM chat_messages cm
+    CROSS JOIN LATERAL jsonb_array_elements_text(cm.analysis -> 'detectedConcepts') AS concept
+    WHERE cm.timestamp >= :start_ts
+      AND cm.timestamp < :end_ts
+      AND jsonb_typeof(cm.analysis -> 'detectedConcepts') = 'array'
+    GROUP BY 1, 2
+"""
+
+# 最早有数据的日期（尚无汇总时作为起点）
+_FIRST_DAY_SQL = """
+    SELECT LEAST(
+        (SELECT MIN(timestamp) FROM chat_messages),
+        (SELECT MIN(created_at) FROM users)
+    )
+"""
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def refresh_days(db: AsyncSession, start: date, end: date) -> int:
+    """
+    重算 [start, end] 区间（含两端）的每日汇总（不提交）
+
+    Returns:
+        重算的天数
+    """
+    if end < start:
+        return 0
+    params = {
+        "start": start,
+        "end": end,
+        "start_ts": datetime.combine(start, time.min, tzinfo=timezone.utc),
+        "end_ts": datetime.combine(end + timedelta(days=1), time.min, tzinfo=timezone.utc),
+    }
+    await db.execute(text(_REFRESH_DAILY_SQL), params)
+    await db.execute(text(_DELETE_ACTIVE_USERS_SQL), params)
+    await db.execute(text(_REFRESH_ACTIVE_USERS_SQL), params)
+    await db.execute(text(_DELETE_CONCEPTS_SQL), params)
+    await db.execute(text(_REFRESH_CONCEPTS_SQL), params)
+    return (end - start).days + 1
+
+
+async def refresh_incremental(db: AsyncSession) -> int:
+    """
+    增量汇总：从最后已汇总日期的前一天到今天（不提交）
+
+    Returns:
+        重算的天数
+    """
+    today = utc_today()
+    last_day = await db.scalar(text("SELECT MAX(day) FROM daily_activity"))
+    if last_day is not None:
+        start = min(last_day, today) - timedelta(days=1)
+    else:
+        first = await db.scalar(text(_FIRST_DAY_SQL))
+        start = first.astimezone(timezone.utc).date() if first is not None else today
+    return await refresh_days(db, start, today)
+
+
+class DailyRollupJob:
+    """
+    定时汇总任务
+
+    - start(): 启动后台任务（立即执行一次，之后每 interval 秒一次）
+    - stop(): 停止
+    - 失败只记日志，下个周期重试
+    """
+
+    def __init__(self, interval: float = 300.0):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.last_run_at: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """启动后台汇总任务（应用启动时调用）"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="daily-activity-rollup")
+
+    async def stop(self) -> None:
+        """停止后台任务（应用关闭时调用）"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> int:
+        """执行一次增量汇总"""
+        from app.db.postgres import async_session_factory
+
+        async with async_session_factory() as session:
+            days = await refresh_incremental(session)
+            await session.commit()
+        self.last_run_at = datetime.now(timezone.utc)
+        logger.debug(f"Daily activity rollup refreshed {days} day(s)")
+        return days
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.warning(f"Daily activity rollup failed: {e}")
+            await asyncio.sleep(self.interval)
+
+
+# 全局实例（单例）
+rollup_job = DailyRollupJob(interval=settings.ANALYTICS_ROLLUP_INTERVAL_S)
@@ -0,0 +1,150 @@
+"""
+Activity Stats - 用户活动统计（user_activity_stats）维护
+
+管理后台的用户列表 / 详情 / 会话列表需要每个用户的消息数、会话数、最后活跃时间等，
+过去每次浏览都对 chat_messages 做 COUNT / MAX（每个用户一次）。现在改为：
+
+- 写入时增量维护：record_activity() 在调用方的事务中 UPSERT 一行，与业务写入同时提交
+- 删除 / 迁移等批量变更后按用户重建：rebuild_activity_stats(user_ids)
+- 需要时全量重建（启动时表为空 / 管理端点）：rebuild_activity_stats()
+
+last_* 字段用 GREATEST 合并，重复或乱序写入不会让时间倒退。
+"""
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql.user_activity import UserActivityStats
+
+logger = logging.getLogger(__name__)
+
+
+async def record_activity(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    *,
+    messages: int = 0,
+    sessions: int = 0,
+    scale_responses: int = 0,
+    active_at: Optional[datetime] = None,
+    profile_at: Optional[datetime] = None,
+) -> None:
+    """
+    增量更新用户活动统计（不提交，随调用方事务一起提交）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户 ID
+        messages / sessions / scale_responses: 各计数的增量
+        active_at: 最新消息时间
+        profile_at: 最新画像快照时间
+    """
+    # 先刷出调用方挂起的 INSERT（如新用户本身），避免外键检查失败
+    await db.flush()
+
+    table = UserActivityStats.__table__
+    stmt = insert(table).values(
+        user_id=user_id,
+        message_count=messages,
+        session_count=sessions,
+        scale_response_count=scale_responses,
+        last_active_at=active_at,
+        last_profile_at=profile_at,
+        updated_at=datetime.now(timezone.utc),
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            "message_count": table.c.message_count + excluded.message_count,
+            "session_count": table.c.session_count + excluded.session_count,
+            "scale_response_count": table.c.scale_response_count + excluded.scale_response_count,
+            # GREATEST 忽略 NULL
+            "last_active_at": func.greatest(table.c.last_active_at, excluded.last_active_at),
+            "last_profile_at": func.greatest(table.c.last_profile_at, excluded.last_profile_at),
+            "updated_at": excluded.updated_at,
+        },
+    )
+    await db.execute(stmt)
+
+
+# 集合式重建：一条 INSERT ... SELECT，按用户聚合各子表
+_REBUILD_SQL = """
+    INSERT INTO user_activity_stats (
+        user_id, message_count, session_count, scale_response_count,
+        last_active_at, last_profile_at, updated_at
+    )
+    SELECT
+        u.id,
+        COALESCE(m.cnt, 0),
+        COALESCE(s.cnt, 0),
+        COALESCE(r.cnt, 0),
+        m.last_at,
+        p.last_at,
+        now()
+    FROM users u
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS cnt, MAX(timestamp) AS last_at
+        FROM chat_messages {filter_where} GROUP BY user_id
+    ) m ON m.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS cnt
+        FROM chat_sessions {filter_where} GROUP BY user_id
+    ) s ON s.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, COUNT(*) AS cnt
+        FROM scale_responses {filter_where} GROUP BY user_id
+    ) r ON r.user_id = u.id
+    LEFT JOIN (
+        SELECT user_id, MAX(created_at) AS last_at
+        FROM profile_snapshots {filter_where} GROUP BY user_id
+    ) p ON p.user_id = u.id
+    {user_where}
+    ON CONFLICT (user_id) DO UPDATE SET
+        message_count = EXCLUDED.message_count,
+        session_count = EXCLUDED.session_count,
+        scale_response_count = EXCLUDED.scale_response_count,
+        last_active_at = EXCLUDED.last_active_at,
+        last_profile_at = EXCLUDED.last_profile_at,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+async def rebuild_activity_stats(
+    db: AsyncSession,
+    user_ids: Optional[Iterable[uuid.UUID]] = None,
+) -> int:
+    """
+    从明细表重建活动统计（不提交）
+
+    Args:
+        db: 数据库会话
+        user_ids: 只重建这些用户；None 表示全部用户
+
+    Returns:
+        重建的行数
+    """
+    await db.flush()
+
+    if user_ids is None:
+        sql = _REBUILD_SQL.format(filter_where="", user_where="")
+        params = {}
+    else:
+        ids = [str(uid) for uid in user_ids]
+        if not ids:
+            return 0
+        sql = _REBUILD_SQL.format(
+            filter_where="WHERE user_id = ANY(CAST(:ids AS uuid[]))",
+            user_where="WHERE u.id = ANY(CAST(:ids AS uuid[]))",
+        )
+        params = {"ids": ids}
+
+    result = await db.execute(text(sql), params)
+    count = result.rowcount or 0
+    logger.debug(f"Rebuilt activity stats for {count} users")
+    return count
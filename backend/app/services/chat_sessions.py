@@ -0,0 +1,129 @@
+"""
+Chat Sessions - 会话摘要（chat_sessions）维护
+
+会话列表过去每次都读取用户的全部消息（含全文与 JSONB 分析结果），在 Python 中按 30 分钟
+间隔切分。现在会话摘要保存在 chat_sessions 中：
+
+- 写入时增量维护：record_session_message() 在调用方的事务中一条 UPDATE（每轮对话一条）更新起止时间、
+  消息数、标题（最早的用户消息）与预览（最后一条消息）
+- 回填 / 迁移后按会话重建：rebuild_session_summaries(session_ids)
+- 启动时补齐尚无摘要的会话：rebuild_session_summaries()
+
+last_message_at 用 GREATEST、started_at 用 LEAST 合并，乱序写入不会让时间倒退，标题 / 预览也与重建结果一致。
+"""
+import uuid
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import case, func, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql.chat_session import ChatSession
+from app.models.sql.message import ChatMessage, MessageRole
+
+# 相邻消息间隔超过此值视为新会话
+SESSION_GAP = timedelta(minutes=30)
+
+TITLE_CHARS = 40
+PREVIEW_CHARS = 60
+
+
+def snippet(content: str, max_chars: int) -> str:
+    """截取摘要，超出部分以 ... 结尾"""
+    return content[:max_chars] + ("..." if len(content) > max_chars else "")
+
+
+async def record_session_message(db: AsyncSession, *messages: ChatMessage) -> None:
+    """
+    按新消息更新所属会话的摘要（不提交，随调用方事务一起提交）
+
+    一轮对话的用户消息与 AI 回复合并为一条 UPDATE。
+
+    Args:
+        db: 数据库会话
+        messages: 同一会话、已设置 session_id 的新消息
+    """
+    ordered = sorted(messages, key=lambda m: m.timestamp)
+    first, last = ordered[0], ordered[-1]
+    table = ChatSession.__table__
+    values = {
+        "started_at": func.least(table.c.started_at, first.timestamp),
+        "last_message_at": func.greatest(table.c.last_message_at, last.timestamp),
+        "message_count": table.c.message_count + len(ordered),
+        # 预览取时间最新的消息
+        "preview": case(
+            (func.coalesce(table.c.last_message_at <= last.timestamp, True), snippet(last.text, PREVIEW_CHARS)),
+            else_=table.c.preview,
+        ),
+    }
+    first_user = next((m for m in ordered if m.role == MessageRole.USER), None)
+    if first_user is not None:
+        # 标题取时间最早的用户消息（与重建一致）：乱序写入的更早一轮会替换标题
+        title = snippet(first_user.text, TITLE_CHARS)
+        values["title"] = case(
+            (func.coalesce(table.c.started_at > first_user.timestamp, False), title),
+            else_=func.coalesce(table.c.title, title),
+        )
+    await db.execute(update(table).where(table.c.id == first.session_id).values(**values))
+
+
+# 集合式重建：按会话聚合消息，标题 / 预览取第一条用户消息 / 最后一条消息
+_REBUILD_SQL = """
+    UPDATE chat_sessions s SET
+        started_at = agg.started_at,
+        last_message_at = agg.last_message_at,
+        message_count = agg.message_count,
+        title = (
+            SELECT CASE WHEN char_length(m.text) > :title_chars
+                        THEN left(m.text, :title_chars) || '...' ELSE m.text END
+            FROM chat_messages m
+            WHERE m.session_id = s.id AND m.role = 'USER'
+            ORDER BY m.timestamp, m.id
+            LIMIT 1
+        ),
+        preview = (
+            SELECT CASE WHEN char_length(m.text) > :preview_chars
+                        THEN left(m.text, :preview_chars) || '...' ELSE m.text END
+            FROM chat_messages m
+            WHERE m.session_id = s.id
+            ORDER BY m.timestamp DESC, m.id DESC
+            LIMIT 1
+        )
+    FROM (
+        SELECT session_id,
+               MIN(timestamp) AS started_at,
+               MAX(timestamp) AS last_message_at,
+               COUNT(*) AS message_count
+        FROM chat_messages
+        WHERE {session_filter}
+        GROUP BY session_id
+    ) agg
+    WHERE s.id = agg.session_id
+"""
+
+
+async def rebuild_session_summaries(
+    db: AsyncSession,
+    session_ids: Optional[Iterable[uuid.UUID]] = None,
+) -> int:
+    """
+    从消息表重建会话摘要（不提交）
+
+    Args:
+        db: 数据库会话
+        session_ids: 只重建这些会话；None 表示有消息但尚无摘要（message_count = 0）的会话
+
+    Returns:
+        重建的会话数
+    """
+    params = {"title_chars": TITLE_CHARS, "preview_chars": PREVIEW_CHARS}
+    if session_ids is None:
+        session_filter = "session_id IN (SELECT id FROM chat_sessions WHERE message_count = 0)"
+    else:
+        ids = [str(sid) for sid in session_ids]
+        if not ids:
+            return 0
+        session_filter = "session_id = ANY(CAST(:ids AS uuid[]))"
+        params["ids"] = ids
+    result = await db.execute(text(_REBUILD_SQL.format(session_filter=session_filter)), params)
+    return result.rowcount or 0
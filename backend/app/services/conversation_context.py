@@ -0,0 +1,122 @@
+"""
+Conversation Context - 对话热路径的每用户上下文缓存
+
+每轮对话过去都要读数据库取上下文：活跃会话、会话内历史、跨会话摘要（重新扫描最近消息的
+JSONB 分析结果），而这些数据都是服务端自己刚写入的。现在按用户在内存中保存：
+
+- 当前会话 ID 与最后消息时间
+- 会话内历史消息（环形缓冲，最多 HISTORY_LIMIT 条）
+- 新会话首轮使用的上下文：最近几条消息、上次会话的概念摘要
+
+写穿（write-through）：本轮消息提交后追加到缓存，稳态下一轮对话不需要任何上下文读取。
+未命中、条目过期（加载后超过 TTL）或会话已超过 30 分钟间隔时回退到数据库重新加载。
+缓存按 LRU 淘汰，只在单进程内有效（与其他内存状态一样，部署为单 worker）；
+管理端删除消息 / 会话 / 用户后调用 invalidate()。
+"""
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import CHAT_CONTEXT_LOOKUPS, register_gauge_callback
+from app.services.chat_sessions import SESSION_GAP
+
+# 会话内最多缓存的历史消息数（与对话接口单个会话读取的上限一致）
+HISTORY_LIMIT = 200
+
+
+@dataclass
+class ConversationContext:
+    """一个用户的对话上下文"""
+    user_id: uuid.UUID
+    session_id: uuid.UUID
+    session_created_at: datetime
+    last_message_at: datetime
+    # 当前会话内的消息 [{"role": "user"|"assistant", "text": "..."}]，按时间正序
+    history: Deque[Dict[str, str]] = field(default_factory=lambda: deque(maxlen=HISTORY_LIMIT))
+    # 新会话首轮沿用的最近消息（会话内已有历史后不再使用）
+    fallback: List[Dict[str, str]] = field(default_factory=list)
+    # 上次会话的摘要（仅新会话首轮注入）
+    previous_session: Optional[str] = None
+    # 会话行尚未写入（新会话首轮随本轮消息一起插入并计入会话数）
+    session_pending: bool = False
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    def is_active(self, now: datetime) -> bool:
+        """会话是否仍在继续（最后一条消息在 SESSION_GAP 之内）"""
+        return now - self.last_message_at < SESSION_GAP
+
+    @property
+    def is_first_turn(self) -> bool:
+        return not self.history
+
+    def recent_messages(self) -> List[Dict[str, str]]:
+        """本轮的对话历史：会话内历史，新会话首轮为最近几条消息"""
+        return list(self.history) or list(self.fallback)
+
+    def append(self, role: str, content: str, timestamp: datetime) -> None:
+        """追加一条已提交的消息"""
+        self.history.append({"role": role, "text": content})
+        if timestamp > self.last_message_at:
+            self.last_message_at = timestamp
+
+
+class ConversationContextCache:
+    """
+    每用户对话上下文的 LRU + TTL 缓存
+
+    - get(): 命中且未过期时返回上下文（并移到最近使用端）
+    - put(): 放入从数据库加载的上下文，超出容量时淘汰最久未使用的用户
+    - invalidate(): 丢弃某个用户（或全部）的上下文
+    """
+
+    def __init__(self, max_users: int = 2000, ttl: float = 600.0):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries: "OrderedDict[uuid.UUID, ConversationContext]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_users > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: uuid.UUID) -> Optional[ConversationContext]:
+        context = self._entries.get(user_id)
+        if context is not None and time.monotonic() - context.loaded_at > self.ttl:
+            del self._entries[user_id]
+            context = None
+        if context is None:
+            CHAT_CONTEXT_LOOKUPS.labels("miss").inc()
+            return None
+        self._entries.move_to_end(user_id)
+        CHAT_CONTEXT_LOOKUPS.labels("hit").inc()
+        return context
+
+    def put(self, context: ConversationContext) -> None:
+        if not self.enabled:
+            return
+        self._entries[context.user_id] = context
+        self._entries.move_to_end(context.user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: Optional[uuid.UUID] = None) -> None:
+        if user_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(user_id, None)
+
+
+# 全局实例（单例）
+conversation_cache = ConversationContextCache(
+    max_users=settings.CHAT_CONTEXT_CACHE_MAX_USERS,
+    ttl=settings.CHAT_CONTEXT_CACHE_TTL_S,
+)
+register_gauge_callback(
+    "cognisync_chat_context_cache_users", "对话上下文缓存中的用户数", lambda: len(conversation_cache)
+)
@@ -0,0 +1,434 @@
+"""
+Data Export - 流式数据导出
+
+通过服务端游标分批读取数据集（app.services.research_datasets），逐批编码为 CSV / JSON / NDJSON
+（JSON 使用 orjson）并以分块传输输出，可选即时 gzip 压缩：内存占用只与批大小有关，与导出总行数无关，因此不再需要行数上限。
+
+两条导出路径：
+- COPY：转换全部在 SQL 中完成的数据集用 COPY (...) TO STDOUT WITH CSV，由 PostgreSQL 直接
+  编码，asyncpg 收到的字节原样转发给 HTTP 响应，Python 不再逐行逐值处理
+- 游标：需要 Python 逐行转换的数据集，按批读取并用 csv 模块编码
+
+两条路径输出相同的文本：COPY 查询外包一层 SELECT，按列类型把时间格式化为与 datetime.isoformat()
+相同的 ISO 8601（会话时区固定为 UTC）、布尔值格式化为 True / False、空字符串按空值输出（不加引号）；
+行尾统一为 \n（PostgreSQL COPY 不支持 \r\n）。
+
+导出使用独立的数据库连接而不是请求的 AsyncSession：StreamingResponse 的生成器在端点函数
+返回之后才开始执行，此时依赖注入的会话可能已经关闭。
+"""
+import asyncio
+import contextlib
+import csv
+import io
+import zlib
+from datetime import date, datetime, timezone
+from typing import Any, AsyncIterator, Callable, Iterable, List, Mapping, Optional, Tuple
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.services.research_datasets import Dataset
+
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8-sig"
+
+
+def csv_value(value: Any) -> Any:
+    """CSV 单元格格式：时间转 ISO 字符串，空值转空字符串"""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class CsvEncoder:
+    """按固定列顺序增量编码 CSV，复用同一个缓冲区"""
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+    def header(self) -> bytes:
+        self._writer.writerow(self.columns)
+        return self._drain()
+
+    def rows(self, rows: Iterable[Mapping[str, Any]]) -> bytes:
+        columns = self.columns
+        self._writer.writerows(
+            [csv_value(row.get(c)) for c in columns] for row in rows
+        )
+        return self._drain()
+
+
+def _json_default(value: Any) -> str:
+    """orjson 不支持的类型（Decimal 等）转字符串"""
+    return str(value)
+
+
+def _as_dict(row: Mapping[str, Any]) -> dict:
+    return row if type(row) is dict else dict(row)
+
+
+class JsonArrayEncoder:
+    """
+    增量编码 JSON 数组：[ {...}, {...} ]
+
+    使用 orjson 序列化（时间输出 ISO 8601、UUID 输出字符串，无需逐值判断类型）
+    """
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+        self._first = True
+
+    def header(self) -> bytes:
+        return b"["
+
+    def rows(self, rows: Iterable[Mapping[str, Any]]) -> bytes:
+        parts = [orjson.dumps(_as_dict(row), default=_json_default) for row in rows]
+        if not parts:
+            return b""
+        data = b",".join(parts)
+        if not self._first:
+            data = b"," + data
+        self._first = False
+        return data
+
+    def footer(self) -> bytes:
+        return b"]"
+
+
+class NdjsonEncoder:
+    """增量编码 NDJSON：每行一个 JSON 对象"""
+
+    _OPTIONS = orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS
+
+    def __init__(self, columns: List[str]):
+        self.columns = columns
+
+    def header(self) -> bytes:
+        return b""
+
+    def rows(self, rows: Iterable[Mapping[str, Any]]) -> bytes:
+        dumps, options = orjson.dumps, self._OPTIONS
+        return b"".join(
+            dumps(_as_dict(row), default=_json_default, option=options) for row in rows
+        )
+
+
+ENCODERS = {"csv": CsvEncoder, "json": JsonArrayEncoder, "ndjson": NdjsonEncoder}
+
+MEDIA_TYPES = {
+    "csv": CSV_MEDIA_TYPE,
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+@contextlib.asynccontextmanager
+async def open_batches(
+    dataset: Dataset,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[Tuple[List[str], AsyncIterator[List[Mapping[str, Any]]]]]:
+    """
+    打开服务端游标，返回 (输出列, 逐批行的异步迭代器)，行已经过 dataset.transform
+
+    Args:
+        dataset: 数据集定义
+        batch_size: 每批行数（默认 settings.EXPORT_BATCH_SIZE）
+    """
+    from app.db.postgres import engine
+
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            text(dataset.sql),
+            dataset.params,
+            execution_options={"yield_per": batch_size},
+        )
+        keys = list(result.keys())
+        columns = await dataset.columns(conn, keys) if dataset.columns else keys
+
+        async def batches() -> AsyncIterator[List[Mapping[str, Any]]]:
+            transform = dataset.transform
+            async for batch in result.mappings().partitions(batch_size):
+                if transform is not None:
+                    batch = [transform(row) for row in batch]
+                yield batch
+
+        yield columns, batches()
+
+
+async def stream_rows(
+    dataset: Dataset,
+    fmt: str = "csv",
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[int], None]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    以服务端游标读取数据集并逐批产出编码后的字节
+
+    Args:
+        dataset: 数据集定义
+        fmt: 输出格式（ENCODERS 的键）
+        batch_size: 每批行数（默认 settings.EXPORT_BATCH_SIZE）
+        on_batch: 每批编码后以该批行数回调（用于进度统计）
+
+    Yields:
+        表头，以及每批行编码后的字节
+    """
+    async with open_batches(dataset, batch_size) as (columns, batches):
+        encoder = ENCODERS[fmt](columns)
+        yield encoder.header()
+
+        async for batch in batches:
+            yield encoder.rows(batch)
+            if on_batch is not None:
+                on_batch(len(batch))
+
+        footer = getattr(encoder, "footer", None)
+        if footer is not None:
+            yield footer()
+
+
+def stream_csv(dataset: Dataset, batch_size: Optional[int] = None) -> AsyncIterator[bytes]:
+    """以服务端游标读取数据集并逐批产出 CSV 字节"""
+    return stream_rows(dataset, "csv", batch_size)
+
+
+async def stream_json_document(
+    dataset: Dataset,
+    meta: Mapping[str, Any],
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    流式输出 {...meta, "data": [...], "rowCount": N}
+
+    与原先一次性构造的 JSON 响应结构相同；rowCount 放在 data 之后，边读边输出即可得到。
+    """
+    count = 0
+
+    def on_batch(n: int) -> None:
+        nonlocal count
+        count += n
+
+    head = orjson.dumps(dict(meta), default=_json_default)[:-1]
+    yield head + (b',"data":' if meta else b'"data":')
+    async for chunk in stream_rows(dataset, "json", batch_size, on_batch):
+        yield chunk
+    yield b',"rowCount":' + str(count).encode() + b"}"
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """边读边压缩为 gzip（压缩在线程中执行，不阻塞事件循环）"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    async for chunk in chunks:
+        out = await asyncio.to_thread(compressor.compress, chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+# 与游标路径（csv_value + csv 模块）输出相同文本的列格式，按 PostgreSQL 类型名；其余类型原样输出
+_ISO_SECONDS = (
+    "to_char({c}, 'YYYY-MM-DD\"T\"HH24:MI:SS')"
+    " || CASE WHEN to_char({c}, 'US') <> '000000' THEN to_char({c}, '.US') ELSE '' END"
+)
+_COPY_COLUMN_FORMATS = {
+    "timestamptz": _ISO_SECONDS + " || to_char({c}, 'TZH:TZM')",
+    "timestamp": _ISO_SECONDS,
+    "bool": "CASE WHEN {c} THEN 'True' WHEN NOT {c} THEN 'False' END",
+    "text": "NULLIF({c}, '')",
+    "varchar": "NULLIF({c}, '')",
+    "bpchar": "NULLIF({c}, '')",
+}
+
+
+async def _format_copy_query(driver: Any, query: str) -> str:
+    """
+    按查询结果的列类型包一层 SELECT，使 COPY 输出与游标路径一致
+
+    时间：datetime.isoformat() 的格式（微秒为 0 时省略，时区为 +00:00）；布尔：True / False；
+    空字符串：转为空值，COPY 不再输出带引号的 ""。
+    """
+    statement = await driver.prepare(query)
+    columns = []
+    formatted = False
+    for attr in statement.get_attributes():
+        ident = '"' + attr.name.replace('"', '""') + '"'
+        template = _COPY_COLUMN_FORMATS.get(attr.type.name)
+        if template is None:
+            columns.append(f"q.{ident}")
+        else:
+            columns.append(template.format(c=f"q.{ident}") + f" AS {ident}")
+            formatted = True
+    if not formatted:
+        return query
+    return f"SELECT {', '.join(columns)} FROM ({query}) AS q"
+
+
+async def prepare_copy(conn: AsyncConnection, dataset: Dataset) -> Tuple[Any, str, List[Any]]:
+    """
+    在连接的当前事务中固定时区为 UTC 并构造 COPY 查询
+
+    Returns:
+        (asyncpg 连接, 位置参数形式的查询, 参数列表)；COPY 须在同一事务中执行
+    """
+    # 经 SQLAlchemy 开启事务（如尚未开启）并固定时区
+    await conn.execute(text("SET LOCAL TimeZone = 'UTC'"))
+    sql, params = await dataset.build_copy_query(conn)
+    compiled = text(sql).compile(dialect=conn.dialect)
+    args = [params[name] for name in compiled.positiontup or ()]
+    raw = await conn.get_raw_connection()
+    driver = raw.driver_connection
+    return driver, await _format_copy_query(driver, str(compiled)), args
+
+
+async def copy_to_file(conn: AsyncConnection, dataset: Dataset, path: str) -> int:
+    """
+    用 COPY (...) TO STDOUT WITH CSV HEADER 将数据集写入文件（asyncpg 在线程中写文件）
+
+    Returns:
+        导出行数（取自 COPY 的命令状态）
+    """
+    driver, query, args = await prepare_copy(conn, dataset)
+    status = await driver.copy_from_query(query, *args, output=path, format="csv", header=True)
+    return int(status.split()[-1])
+
+
+async def stream_copy(dataset: Dataset, max_pending: int = 8) -> AsyncIterator[bytes]:
+    """
+    用 COPY (...) TO STDOUT WITH CSV HEADER 导出数据集，产出 PostgreSQL 编码好的 CSV 字节
+
+    asyncpg 的 copy_from_query 通过回调交付数据块，这里经有界队列转为异步生成器：
+    HTTP 客户端读得慢时队列写满，COPY 随之暂停，内存占用有上限。
+
+    Args:
+        dataset: 数据集定义（须 copyable）
+        max_pending: 队列中最多缓存的数据块数
+    """
+    from app.db.postgres import engine
+
+    async with engine.connect() as conn:
+        driver, query, args = await prepare_copy(conn, dataset)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+
+        async def sink(chunk) -> None:
+            await queue.put(bytes(chunk))
+
+        async def run_copy() -> None:
+            try:
+                await driver.copy_from_query(
+                    query, *args, output=sink, format="csv", header=True
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+
+        task = asyncio.create_task(run_copy())
+        try:
+            while (chunk := await queue.get()) is not None:
+                yield chunk
+            await task
+        finally:
+            if not task.done():
+                # 客户端断开：中止 COPY，连接处于协议中途，不能归还连接池
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+                await conn.invalidate()
+
+
+class ChunkSink(io.RawIOBase):
+    """收集写入字节的不可 seek 文件对象，供 ParquetWriter / zipfile 等写入后取走"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def csv_stream_response(chunks: AsyncIterator[bytes], filename: str) -> StreamingResponse:
+    """CSV 附件下载响应（分块传输）"""
+    return attachment_response(chunks, filename, CSV_MEDIA_TYPE)
+
+
+def attachment_response(
+    chunks: AsyncIterator[bytes],
+    filename: str,
+    media_type: str,
+    compress: bool = False,
+) -> StreamingResponse:
+    """附件下载响应（分块传输）；compress=True 时即时 gzip 压缩，文件名追加 .gz"""
+    if compress:
+        chunks = gzip_chunks(chunks)
+        filename = f"{filename}.gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+def export_table_stream(
+    dataset: Dataset,
+    fmt: str,
+    meta: Mapping[str, Any],
+    compress: bool = False,
+) -> StreamingResponse:
+    """
+    原始表导出响应
+
+    - json: 与原 JSON 响应结构相同的文档（compress 时作为 .json.gz 附件）
+    - ndjson: 每行一个 JSON 对象的附件
+    """
+    if fmt == "ndjson":
+        chunks = stream_rows(dataset, "ndjson")
+    else:
+        chunks = stream_json_document(dataset, meta)
+    if fmt == "json" and not compress:
+        return StreamingResponse(chunks, media_type=MEDIA_TYPES["json"])
+    date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return attachment_response(chunks, f"{dataset.name}_{date_str}.{fmt}", MEDIA_TYPES[fmt], compress)
+
+
+def export_csv(dataset: Dataset) -> StreamingResponse:
+    """
+    将数据集以 CSV 流式导出，文件名为 <数据集名>_<UTC 日期>.csv
+
+    可以完全在 SQL 中转换的数据集走 COPY（settings.EXPORT_USE_COPY），其余走服务端游标。
+    """
+    date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    if settings.EXPORT_USE_COPY and dataset.copyable:
+        chunks = stream_copy(dataset)
+    else:
+        chunks = stream_csv(dataset)
+    return csv_stream_response(chunks, f"{dataset.name}_{date_str}.csv")
@@ -0,0 +1,269 @@
+"""
+Export Jobs - 后台导出任务
+
+大表导出在请求内执行会超过反向代理超时，并长时间占用数据库连接。改为任务模式：
+- submit(): 管理员提交导出规格后立即返回任务 ID
+- 后台按并发上限执行，服务端游标分批读取，写入 gzip 压缩的临时文件（spool），实时更新进度
+- 完成后通过下载端点取回（FileResponse 支持 Range，可断点续传）
+- 结果文件超过 EXPORT_JOB_TTL_S 自动删除
+
+任务状态只保存在进程内存中（后端为单进程部署），重启后未下载的结果文件在启动时清理
+（只删除本模块写入的任务文件，不清空目录）。
+"""
+import asyncio
+import gzip
+import logging
+import os
+import re
+import tempfile
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import register_gauge_callback
+from app.services.data_export import stream_rows
+from app.services.research_datasets import Dataset
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+# 本管理器写入的文件：<任务 ID>.part（写入中）与 <任务 ID>.<格式>.gz（结果）
+_SPOOL_FILE = re.compile(r"^[0-9a-f]{32}\.(part|[a-z0-9]+\.gz)$")
+
+
+class ExportQueueFull(RuntimeError):
+    """排队 + 执行中的任务数已达上限"""
+
+
+@dataclass
+class ExportJob:
+    """一个后台导出任务"""
+    id: str
+    dataset: str
+    format: str
+    spec: Dict[str, Any]
+    filename: str
+    status: str = QUEUED
+    rows_written: int = 0
+    bytes_written: int = 0
+    # 按主表行数估算的总行数（无法估算时为 None）
+    estimated_rows: Optional[int] = None
+    error: Optional[str] = None
+    path: Optional[Path] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+    _task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def progress(self) -> Optional[float]:
+        """完成比例 0~1（完成时为 1，无法估算时为 None）"""
+        if self.status == DONE:
+            return 1.0
+        if not self.estimated_rows:
+            return None
+        return min(self.rows_written / self.estimated_rows, 0.99)
+
+
+class ExportJobManager:
+    """
+    导出任务管理器
+
+    - 并发上限：信号量控制同时执行的任务数，其余排队
+    - 提交上限：排队 + 执行中的任务超过 max_pending 时拒绝
+    - 过期清理：后台任务定期删除过期的结果文件和任务记录
+    """
+
+    def __init__(
+        self,
+        spool_dir: Optional[str] = None,
+        concurrency: int = 2,
+        max_pending: int = 20,
+        ttl: float = 86400.0,
+    ):
+        self.spool_dir = Path(spool_dir or os.path.join(tempfile.gettempdir(), "cognisync-exports"))
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.jobs: Dict[str, ExportJob] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._sweeper: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._sweeper is not None and not self._sweeper.done()
+
+    def pending_count(self) -> int:
+        """排队 + 执行中的任务数"""
+        return sum(1 for job in self.jobs.values() if job.status in (QUEUED, RUNNING))
+
+    def start(self) -> None:
+        """清理上次运行遗留的文件并启动过期清理任务（应用启动时调用）"""
+        if self.running:
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_files()
+        self._sweeper = asyncio.create_task(self._sweep_loop(), name="export-job-sweeper")
+
+    async def stop(self) -> None:
+        """取消所有未完成的任务并停止清理任务（应用关闭时调用）"""
+        tasks = [job._task for job in self.jobs.values() if job._task and not job._task.done()]
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._sweeper = None
+
+    def submit(
+        self,
+        dataset: Dataset,
+        fmt: str,
+        spec: Dict[str, Any],
+        estimated_rows: Optional[int] = None,
+    ) -> ExportJob:
+        """
+        提交导出任务
+
+        Raises:
+            ExportQueueFull: 排队 + 执行中的任务已达上限
+        """
+        if self.pending_count() >= self.max_pending:
+            raise ExportQueueFull(f"Too many pending export jobs (limit {self.max_pending})")
+
+        job_id = uuid.uuid4().hex
+        date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        job = ExportJob(
+            id=job_id,
+            dataset=dataset.name,
+            format=fmt,
+            spec=spec,
+            filename=f"{dataset.name}_{date_str}.{fmt}.gz",
+            estimated_rows=estimated_rows,
+        )
+        self.jobs[job_id] = job
+        job._task = asyncio.create_task(self._run(job, dataset), name=f"export-job-{job_id[:8]}")
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[ExportJob]:
+        """全部任务（最新的在前）"""
+        return sorted(self.jobs.values(), key=lambda j: j.created_at, reverse=True)
+
+    async def remove(self, job_id: str) -> bool:
+        """取消（如仍在执行）并删除任务及其结果文件"""
+        job = self.jobs.pop(job_id, None)
+        if job is None:
+            return False
+        if job._task is not None and not job._task.done():
+            job._task.cancel()
+            await asyncio.gather(job._task, return_exceptions=True)
+        self._delete_file(job)
+        return True
+
+    def _remove_stale_files(self) -> None:
+        """
+        删除上次运行遗留的结果 / 临时文件
+
+        目录可能由运维指定为已有目录（如共享数据卷），只删除文件名符合任务文件格式的文件，
+        不删除目录本身或其他文件。
+        """
+        for path in self.spool_dir.iterdir():
+            if path.is_file() and _SPOOL_FILE.match(path.name):
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.warning(f"Failed to remove stale export file {path}: {e}")
+
+    async def _run(self, job: ExportJob, dataset: Dataset) -> None:
+        part = self.spool_dir / f"{job.id}.part"
+        try:
+            async with self._semaphore:
+                job.status = RUNNING
+                job.started_at = datetime.now(timezone.utc)
+                self.spool_dir.mkdir(parents=True, exist_ok=True)
+                await self._write(job, dataset, part)
+                job.path = self.spool_dir / f"{job.id}.{job.format}.gz"
+                part.rename(job.path)
+                job.status = DONE
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+            part.unlink(missing_ok=True)
+            raise
+        except Exception as e:
+            logger.warning(f"Export job {job.id} ({job.dataset}) failed: {e}")
+            job.status = FAILED
+            job.error = str(e)
+            part.unlink(missing_ok=True)
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+            job.expires_at = job.finished_at + timedelta(seconds=self.ttl)
+
+    async def _write(self, job: ExportJob, dataset: Dataset, part: Path) -> None:
+        """逐批写入 gzip 文件；压缩与磁盘写入放在线程中，不阻塞事件循环"""
+        def on_batch(rows: int) -> None:
+            job.rows_written += rows
+
+        out = await asyncio.to_thread(gzip.open, part, "wb", 6)
+        try:
+            async for chunk in stream_rows(dataset, job.format, on_batch=on_batch):
+                await asyncio.to_thread(out.write, chunk)
+                job.bytes_written += len(chunk)
+        finally:
+            await asyncio.to_thread(out.close)
+
+    def _delete_file(self, job: ExportJob) -> None:
+        if job.path is not None:
+            job.path.unlink(missing_ok=True)
+            job.path = None
+
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        """删除过期的任务与结果文件，返回删除的任务数"""
+        now = now or datetime.now(timezone.utc)
+        expired = [
+            job for job in self.jobs.values()
+            if job.status in FINISHED_STATES and job.expires_at is not None and job.expires_at <= now
+        ]
+        for job in expired:
+            self._delete_file(job)
+            self.jobs.pop(job.id, None)
+        return len(expired)
+
+    async def _sweep_loop(self) -> None:
+        interval = max(min(self.ttl / 10, 600.0), 1.0)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"Expired {removed} export job(s)")
+            except Exception as e:
+                logger.warning(f"Export job sweep failed: {e}")
+
+
+# 全局实例（单例）
+export_jobs = ExportJobManager(
+    spool_dir=settings.EXPORT_SPOOL_DIR,
+    concurrency=settings.EXPORT_JOB_CONCURRENCY,
+    max_pending=settings.EXPORT_JOB_MAX_PENDING,
+    ttl=settings.EXPORT_JOB_TTL_S,
+)
+
+register_gauge_callback(
+    "cognisync_export_jobs_pending", "排队 + 执行中的后台导出任务数", export_jobs.pending_count
+)
@@ -175,7 +175,7 @@ class GraphService:
         Returns:
             GraphData 对象（包含 nodes 和 edges，edges 带 relType 和 weight）
         """
-        logger.info(f"Fetching knowledge graph for user {user_id}")
+        logger.debug("Fetching knowledge graph for user %s", user_id)
 
         # 1. 获取节点（Student 的所有 INTERACTED_WITH 关系）
         nodes_query = """
@@ -242,7 +242,7 @@ class GraphService:
             for row in (rel_edges_result or [])
         ]
 
-        logger.info(f"Retrieved graph for user {user_id}: {len(nodes)} nodes, {len(edges)} edges")
+        logger.debug("Retrieved graph for user %s: %d nodes, %d edges", user_id, len(nodes), len(edges))
 
         return GraphData(nodes=nodes, edges=edges)
 
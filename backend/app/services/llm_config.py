@@ -63,12 +63,12 @@ def _get_role_config(role: str) -> dict:
         return {"provider": "mock"}
 
 
-def _build_provider(config: dict) -> BaseProvider:
-    """根据配置字典构建 LLM Provider 实例"""
+def _build_provider(config: dict, role: str) -> BaseProvider:
+    """根据配置字典构建 LLM Provider 实例（role 用于用量统计）"""
     provider_type = config.get("provider", "mock")
 
     if provider_type == "mock":
-        return MockProvider()
+        return MockProvider(role=role)
 
     api_key = config.get("api_key", "") or "no-key"
     base_url = config.get("base_url", "")
@@ -76,12 +76,14 @@ def _build_provider(config: dict) -> BaseProvider:
 
     if not base_url or not model:
         logger.warning(f"Incomplete LLM config for provider={provider_type}, falling back to mock")
-        return MockProvider()
+        return MockProvider(role=role)
 
     return OpenAICompatibleProvider(
         base_url=base_url,
         api_key=api_key,
         model=model,
+        name=provider_type,
+        role=role,
     )
 
 
@@ -89,14 +91,19 @@ def get_analysis_provider() -> BaseProvider:
     """获取语义分析专用 LLM Provider（低温度、结构化 JSON 输出）"""
     config = _get_role_config("analysis")
     logger.debug(f"Analysis provider: {config.get('provider')} / {config.get('model')}")
-    return _build_provider(config)
+    return _build_provider(config, role="analysis")
 
 
-def get_chat_provider() -> BaseProvider:
-    """获取 AI 对话专用 LLM Provider（较高温度、自然语言回复）"""
+def get_chat_provider(role: str = "chat") -> BaseProvider:
+    """
+    获取 AI 对话专用 LLM Provider（较高温度、自然语言回复）
+
+    Args:
+        role: 用量统计中的调用角色（如开场问候使用 "greeting"）
+    """
     config = _get_role_config("chat")
     logger.debug(f"Chat provider: {config.get('provider')} / {config.get('model')}")
-    return _build_provider(config)
+    return _build_provider(config, role=role)
 
 
 def update_cache(role: str, config: dict) -> None:
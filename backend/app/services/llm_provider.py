@@ -2,41 +2,308 @@
 LLM Provider - 统一的 LLM 接口封装
 支持 OpenAI、Ollama、LM Studio 等 OpenAI 兼容接口，以及 Mock 模式
 """
+import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Optional, Dict, Any, List
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 import httpx
 import json
 
 from app.core.config import settings
+from app.core.context import current_user_id
+from app.core.timing import record_duration
+from app.core.metrics import LLM_DURATION, LLM_REQUESTS, LLM_RETRIES, LLM_TOKENS
+from app.services.llm_usage import LLMCallRecord, usage_recorder
 
 logger = logging.getLogger(__name__)
 
+# 对话消息格式：[{"role": "system" | "user" | "assistant", "content": "..."}]
+ChatMessages = List[Dict[str, str]]
+
+
+@dataclass
+class LLMUsage:
+    """单次调用的 token 用量（含上游 prompt 缓存命中数）"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+
+    @classmethod
+    def from_response(cls, usage: Optional[Dict[str, Any]]) -> "LLMUsage":
+        """
+        解析 OpenAI 兼容接口返回的 usage 字段
+
+        缓存命中数的位置因提供者而异：
+        - OpenAI:   usage.prompt_tokens_details.cached_tokens
+        - DeepSeek: usage.prompt_cache_hit_tokens
+        - Ollama / LM Studio: 不返回，记为 0
+        """
+        if not usage:
+            return cls()
+
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens") or usage.get("prompt_cache_hit_tokens") or 0
+
+        return cls(
+            prompt_tokens=int(usage.get("prompt_tokens") or 0),
+            completion_tokens=int(usage.get("completion_tokens") or 0),
+            cached_tokens=int(cached),
+        )
+
+
+# 进程内累计的缓存命中统计：{model: {"calls", "prompt_tokens", "cached_tokens", "completion_tokens"}}
+_cache_stats: Dict[str, Dict[str, int]] = {}
+
+
+def _record_cache_stats(model: str, usage: LLMUsage) -> None:
+    """累加缓存命中统计（用于评估 prompt 缓存带来的延迟与成本收益）"""
+    stats = _cache_stats.setdefault(
+        model, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    )
+    stats["calls"] += 1
+    stats["prompt_tokens"] += usage.prompt_tokens
+    stats["cached_tokens"] += usage.cached_tokens
+    stats["completion_tokens"] += usage.completion_tokens
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """返回各模型的累计 token 用量及 prompt 缓存命中率"""
+    return {
+        model: {
+            **stats,
+            "cache_hit_ratio": round(stats["cached_tokens"] / stats["prompt_tokens"], 4)
+            if stats["prompt_tokens"] else 0.0,
+        }
+        for model, stats in _cache_stats.items()
+    }
+
+
+class LLMRateLimitError(RuntimeError):
+    """上游返回 429 限流（retry_after 为建议的等待秒数）"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# 进程内共享的 HTTP 客户端：{(base_url, api_key, timeout): AsyncClient}
+# Provider 实例按请求创建，共享客户端使到同一上游的连接可以复用（keep-alive）
+_shared_clients: Dict[Tuple[str, str, int], httpx.AsyncClient] = {}
+
+
+def _get_shared_client(base_url: str, api_key: str, timeout: int) -> httpx.AsyncClient:
+    """获取（或创建）指向同一上游的共享 HTTP 客户端"""
+    key = (base_url, api_key, timeout)
+    client = _shared_clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+            ),
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+        _shared_clients[key] = client
+    return client
+
+
+async def close_shared_clients() -> None:
+    """关闭所有共享 HTTP 客户端（应用关闭时调用）"""
+    clients = list(_shared_clients.values())
+    _shared_clients.clear()
+    for client in clients:
+        await client.aclose()
+
 
 class BaseProvider(ABC):
     """LLM Provider 基类"""
 
+    # 提供者名称与模型（用于用量统计）
+    name: str = "base"
+    model: str = ""
+
+    # 调用角色（analysis / chat / greeting / onboarding ...），由工厂函数设置
+    role: str = "default"
+
+    # 最近一次调用的 token 用量（提供者不返回 usage 时为 None）
+    last_usage: Optional[LLMUsage] = None
+
+    async def chat(
+        self,
+        messages: ChatMessages,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+        timeout: Optional[float] = None,
+        max_retries: int = 0,
+        retry_delay: float = 1.0,
+    ) -> str:
+        """
+        多轮对话生成
+
+        为了命中上游的 prompt / KV 缓存（DeepSeek 上下文缓存、OpenAI prompt caching、
+        Ollama keep-alive），调用方应保持消息布局稳定：静态 system prompt 在最前，
+        其后是只追加的历史消息，每轮变化的内容放在最后一条消息中。
+
+        每次调用（含重试）记录一条用量日志：角色、模型、token 数、耗时、重试次数和结果。
+
+        Args:
+            messages: 消息列表 [{"role": "system"|"user"|"assistant", "content": "..."}]
+            temperature: 温度参数 (0-2)
+            max_tokens: 最大 token 数
+            timeout: 单次尝试的超时秒数（None 表示只使用 HTTP 客户端超时）
+            max_retries: 失败后的重试次数
+            retry_delay: 重试间隔秒数（429 时优先使用上游的 Retry-After）
+
+        Returns:
+            生成的文本
+        """
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        self.last_usage = None
+        outcome = "error"
+        attempt = 0
+        delay = retry_delay
+
+        try:
+            for attempt in range(max_retries + 1):
+                try:
+                    call = self._chat(messages, temperature, max_tokens)
+                    content = await (asyncio.wait_for(call, timeout) if timeout else call)
+                    outcome = "ok"
+                    return content
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    logger.warning(f"LLM attempt {attempt + 1} timed out after {timeout}s (role={self.role})")
+                    if attempt == max_retries:
+                        raise
+                except Exception as e:
+                    outcome = "error"
+                    logger.warning(f"LLM attempt {attempt + 1} failed (role={self.role}): {e}")
+                    if attempt == max_retries:
+                        raise
+                    delay = getattr(e, "retry_after", None) or retry_delay
+                await asyncio.sleep(delay)
+                delay = retry_delay
+        finally:
+            self._record_call(started_at, start, outcome, retries=attempt)
+
+    async def stream_chat(
+        self,
+        messages: ChatMessages,
+        temperature: float = 0.7,
+        max_tokens: int = 1000,
+    ) -> AsyncIterator[str]:
+        """
+        流式对话生成：逐段产出文本增量
+
+        流一旦开始便无法透明重试，因此不支持 max_retries；调用方可用 asyncio.timeout 控制总时长。
+        结束（含中途失败）时记录一条用量日志。
+
+        Args:
+            messages: 消息列表（布局要求同 chat）
+            temperature: 温度参数 (0-2)
+            max_tokens: 最大 token 数
+
+        Yields:
+            文本增量
+        """
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        self.last_usage = None
+        outcome = "error"
+        try:
+            async for delta in self._stream_chat(messages, temperature, max_tokens):
+                yield delta
+            outcome = "ok"
+        except asyncio.CancelledError:
+            outcome = "timeout"
+            raise
+        finally:
+            self._record_call(started_at, start, outcome, retries=0)
+
+    def _record_call(self, started_at: datetime, start: float, outcome: str, retries: int) -> None:
+        """将本次调用写入用量记录队列"""
+        usage = self.last_usage or LLMUsage()
+        latency_ms = (time.perf_counter() - start) * 1000
+        record_duration(f"llm.{self.role}", latency_ms)
+        LLM_DURATION.labels(self.name, self.role).observe(latency_ms / 1000)
+        LLM_REQUESTS.labels(self.name, self.role, outcome).inc()
+        if retries:
+            LLM_RETRIES.labels(self.name, self.role).inc(retries)
+        if usage.prompt_tokens:
+            LLM_TOKENS.labels(self.name, self.role, "prompt").inc(usage.prompt_tokens)
+            LLM_TOKENS.labels(self.name, self.role, "completion").inc(usage.completion_tokens)
+            LLM_TOKENS.labels(self.name, self.role, "cached").inc(usage.cached_tokens)
+        usage_recorder.record(LLMCallRecord(
+            role=self.role,
+            provider=self.name,
+            model=self.model,
+            latency_ms=int(latency_ms),
+            outcome=outcome,
+            prompt_tokens=usage.prompt_tokens,
+            completion_tokens=usage.completion_tokens,
+            cached_tokens=usage.cached_tokens,
+            retries=retries,
+            user_id=current_user_id.get(),
+            created_at=started_at,
+        ))
+
     @abstractmethod
+    async def _chat(
+        self,
+        messages: ChatMessages,
+        temperature: float,
+        max_tokens: int,
+    ) -> str:
+        """单次调用实现（由子类提供，成功时应设置 self.last_usage）"""
+        pass
+
+    async def _stream_chat(
+        self,
+        messages: ChatMessages,
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[str]:
+        """流式调用实现（默认退化为一次性返回完整结果）"""
+        yield await self._chat(messages, temperature, max_tokens)
+
     async def complete(
         self,
         system_prompt: str,
         user_prompt: str,
         temperature: float = 0.7,
         max_tokens: int = 1000,
+        **kwargs: Any,
     ) -> str:
         """
-        完成文本生成
+        完成文本生成（单轮，等价于只有 system + user 两条消息的 chat）
 
         Args:
             system_prompt: 系统提示词
             user_prompt: 用户提示词
             temperature: 温度参数 (0-2)
             max_tokens: 最大 token 数
+            **kwargs: 透传给 chat() 的 timeout / max_retries / retry_delay
 
         Returns:
             生成的文本
         """
-        pass
+        return await self.chat(
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs,
+        )
 
     @abstractmethod
     async def health_check(self) -> bool:
@@ -56,38 +323,32 @@ class OpenAICompatibleProvider(BaseProvider):
         api_key: str,
         model: str,
         timeout: int = 60,
+        name: str = "openai",
+        role: str = "default",
     ):
         self.base_url = base_url.rstrip("/")
         self.api_key = api_key
         self.model = model
         self.timeout = timeout
+        self.name = name
+        self.role = role
 
-        # 创建 HTTP 客户端
-        self.client = httpx.AsyncClient(
-            timeout=httpx.Timeout(timeout),
-            headers={
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-            },
-        )
+        # 使用共享 HTTP 客户端（连接池复用）
+        self.client = _get_shared_client(self.base_url, api_key, timeout)
 
         logger.info(f"Initialized OpenAICompatibleProvider: {base_url} | {model}")
 
-    async def complete(
+    async def _chat(
         self,
-        system_prompt: str,
-        user_prompt: str,
-        temperature: float = 0.7,
-        max_tokens: int = 1000,
+        messages: ChatMessages,
+        temperature: float,
+        max_tokens: int,
     ) -> str:
         """调用 OpenAI 兼容的聊天完成接口"""
 
         payload = {
             "model": self.model,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
+            "messages": messages,
             "temperature": temperature,
             "max_tokens": max_tokens,
         }
@@ -104,16 +365,20 @@ class OpenAICompatibleProvider(BaseProvider):
             # 提取生成的文本
             content = data["choices"][0]["message"]["content"]
 
+            # 记录 token 用量（含 prompt 缓存命中数）
+            self.last_usage = LLMUsage.from_response(data.get("usage"))
+            _record_cache_stats(self.model, self.last_usage)
+
             logger.debug(
-                f"LLM response received: {len(content)} chars, "
-                f"model={self.model}, tokens={data.get('usage', {})}"
+                f"LLM response received: {len(content)} chars, model={self.model}, "
+                f"prompt={self.last_usage.prompt_tokens} (cached={self.last_usage.cached_tokens}), "
+                f"completion={self.last_usage.completion_tokens}"
             )
 
             return content
 
         except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error from LLM API: {e.response.status_code} - {e.response.text}")
-            raise RuntimeError(f"LLM API request failed: {e}")
+            self._raise_for_http_error(e)
 
         except httpx.RequestError as e:
             logger.error(f"Request error: {e}")
@@ -123,6 +388,74 @@ class OpenAICompatibleProvider(BaseProvider):
             logger.error(f"Unexpected API response format: {e}")
             raise RuntimeError(f"Invalid LLM API response: {e}")
 
+    async def _stream_chat(
+        self,
+        messages: ChatMessages,
+        temperature: float,
+        max_tokens: int,
+    ) -> AsyncIterator[str]:
+        """调用 OpenAI 兼容接口的 SSE 流式模式"""
+
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+            # 请求在最后一个分片中附带 usage（Ollama / LM Studio 会忽略）
+            "stream_options": {"include_usage": True},
+        }
+
+        try:
+            async with self.client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                json=payload,
+            ) as response:
+                if response.is_error:
+                    await response.aread()
+                    response.raise_for_status()
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+
+                    chunk = json.loads(data)
+                    if chunk.get("usage"):
+                        self.last_usage = LLMUsage.from_response(chunk["usage"])
+                        _record_cache_stats(self.model, self.last_usage)
+
+                    for choice in chunk.get("choices") or []:
+                        content = (choice.get("delta") or {}).get("content")
+                        if content:
+                            yield content
+
+        except httpx.HTTPStatusError as e:
+            self._raise_for_http_error(e)
+
+        except httpx.RequestError as e:
+            logger.error(f"Request error: {e}")
+            raise RuntimeError(f"Failed to connect to LLM API: {e}")
+
+        except json.JSONDecodeError as e:
+            logger.error(f"Unexpected stream chunk format: {e}")
+            raise RuntimeError(f"Invalid LLM API stream: {e}")
+
+    def _raise_for_http_error(self, e: httpx.HTTPStatusError) -> None:
+        """将 HTTP 错误转换为 Provider 异常（429 携带 Retry-After）"""
+        logger.error(f"HTTP error from LLM API: {e.response.status_code} - {e.response.text}")
+        if e.response.status_code == 429:
+            retry_after = e.response.headers.get("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise LLMRateLimitError(f"LLM API rate limited: {e}", retry_after=retry_after)
+        raise RuntimeError(f"LLM API request failed: {e}")
+
     async def health_check(self) -> bool:
         """检查 LLM API 是否可用"""
         try:
@@ -143,8 +476,13 @@ class OpenAICompatibleProvider(BaseProvider):
             return False
 
     async def close(self):
-        """关闭 HTTP 客户端"""
-        await self.client.aclose()
+        """
+        释放 HTTP 客户端
+
+        客户端在 Provider 实例之间共享，由 close_shared_clients() 在应用关闭时统一关闭，
+        这里不关闭，避免影响其他实例。
+        """
+        pass
 
 
 class MockProvider(BaseProvider):
@@ -153,19 +491,23 @@ class MockProvider(BaseProvider):
     返回固定的 JSON 格式响应
     """
 
-    def __init__(self):
+    name = "mock"
+    model = "mock"
+
+    def __init__(self, role: str = "default"):
+        self.role = role
         logger.info("Initialized MockProvider (offline mode)")
 
-    async def complete(
+    async def _chat(
         self,
-        system_prompt: str,
-        user_prompt: str,
-        temperature: float = 0.7,
-        max_tokens: int = 1000,
+        messages: ChatMessages,
+        temperature: float,
+        max_tokens: int,
     ) -> str:
         """返回模拟的 JSON 响应"""
 
         # 根据用户消息内容生成不同的模拟响应
+        user_prompt = "\n".join(m["content"] for m in messages if m.get("role") == "user")
         mock_response = self._generate_mock_response(user_prompt)
 
         logger.debug(f"Mock LLM response: {mock_response}")
@@ -242,23 +584,28 @@ class MockProvider(BaseProvider):
         return True
 
 
-def get_provider() -> BaseProvider:
+def get_provider(role: str = "default") -> BaseProvider:
     """
     工厂函数：根据配置返回对应的 Provider
 
+    Args:
+        role: 调用角色（用于用量统计）
+
     Returns:
         BaseProvider 实例
     """
     provider_type = settings.LLM_PROVIDER.lower()
 
     if provider_type == "mock":
-        return MockProvider()
+        return MockProvider(role=role)
 
     elif provider_type == "openai":
         return OpenAICompatibleProvider(
             base_url=settings.OPENAI_BASE_URL,
             api_key=settings.OPENAI_API_KEY,
             model=settings.OPENAI_MODEL,
+            name="openai",
+            role=role,
         )
 
     elif provider_type == "deepseek":
@@ -266,6 +613,8 @@ def get_provider() -> BaseProvider:
             base_url=settings.DEEPSEEK_BASE_URL,
             api_key=settings.DEEPSEEK_API_KEY,
             model=settings.DEEPSEEK_MODEL,
+            name="deepseek",
+            role=role,
         )
 
     elif provider_type == "ollama":
@@ -273,6 +622,8 @@ def get_provider() -> BaseProvider:
             base_url=settings.OLLAMA_BASE_URL,
             api_key="ollama",  # Ollama 不需要真实 API key
             model=settings.OLLAMA_MODEL,
+            name="ollama",
+            role=role,
         )
 
     elif provider_type == "lmstudio":
@@ -280,8 +631,10 @@ def get_provider() -> BaseProvider:
             base_url=settings.LMSTUDIO_BASE_URL,
             api_key="lmstudio",  # LM Studio 不需要真实 API key
             model=settings.LMSTUDIO_MODEL,
+            name="lmstudio",
+            role=role,
         )
 
     else:
         logger.warning(f"Unknown provider type: {provider_type}, falling back to mock")
-        return MockProvider()
+        return MockProvider(role=role)
@@ -0,0 +1,153 @@
+"""
+LLM Usage Recorder - LLM 调用用量记录
+
+每次 Provider 调用生成一条记录放入内存队列，由后台任务批量写入 llm_call_logs 表，
+不占用请求的热路径（不额外开数据库连接、不等待写入）。
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.core.metrics import register_counter_callback, register_gauge_callback
+
+logger = logging.getLogger(__name__)
+
+# 停止信号：后台任务取到后写入手中的一批并退出
+_STOP = object()
+
+
+@dataclass
+class LLMCallRecord:
+    """单次 LLM 调用记录（字段与 llm_call_logs 表一致）"""
+    role: str
+    provider: str
+    model: str
+    latency_ms: int
+    outcome: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    retries: int = 0
+    user_id: Optional[uuid.UUID] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+
+class LLMUsageRecorder:
+    """
+    批量写入器
+
+    - record(): 非阻塞入队；队列满时丢弃并计数（统计数据允许少量丢失）
+    - 后台任务每凑满 batch_size 条或每隔 flush_interval 秒写入一次
+    - stop() 通过队列发送停止信号，后台任务写完手中的一批后自行退出，不会丢弃已取出的记录
+    - 未调用 start() 时（脚本、单元测试）record() 直接忽略
+    """
+
+    def __init__(self, batch_size: int = 200, flush_interval: float = 2.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.dropped = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def queue_size(self) -> int:
+        """当前待写入的记录数"""
+        return self._queue.qsize()
+
+    def record(self, rec: LLMCallRecord) -> None:
+        """记录一次调用（非阻塞）"""
+        if not self.running or self._stopping:
+            return
+        try:
+            self._queue.put_nowait(rec)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"LLM usage queue full, dropped {self.dropped} records so far")
+
+    def start(self) -> None:
+        """启动后台写入任务（应用启动时调用）"""
+        if not self.running:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run(), name="llm-usage-recorder")
+
+    async def stop(self) -> None:
+        """停止后台任务并写入剩余记录（应用关闭时调用）"""
+        if self._task is None:
+            return
+        self._stopping = True
+        if not self._task.done():
+            await self._queue.put(_STOP)
+        try:
+            await self._task
+        except Exception as e:
+            logger.warning(f"LLM usage recorder stopped with error: {e}")
+        self._task = None
+
+        # 后台任务异常退出时队列中可能仍有记录
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for i in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[i:i + self.batch_size])
+
+    async def _run(self) -> None:
+        """后台循环：攒批后写入，取到停止信号时写入手中的一批并退出"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            batch: List[LLMCallRecord] = [item]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[LLMCallRecord]) -> None:
+        """一次 executemany 写入整批记录，失败只记日志"""
+        from sqlalchemy import insert
+
+        from app.db.postgres import async_session_factory
+        from app.models.sql.llm_call_log import LLMCallLog
+
+        try:
+            async with async_session_factory() as session:
+                await session.execute(insert(LLMCallLog), [asdict(rec) for rec in batch])
+                await session.commit()
+            logger.debug(f"Flushed {len(batch)} LLM usage records")
+        except Exception as e:
+            logger.warning(f"Failed to write {len(batch)} LLM usage records: {e}")
+
+
+# 全局实例（单例）
+usage_recorder = LLMUsageRecorder()
+
+register_gauge_callback(
+    "cognisync_llm_usage_queue_depth", "LLM 用量记录待写入队列长度", usage_recorder.queue_size
+)
+register_counter_callback(
+    "cognisync_llm_usage_dropped", "因队列已满丢弃的 LLM 用量记录数", lambda: usage_recorder.dropped
+)
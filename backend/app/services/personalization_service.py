@@ -16,7 +16,7 @@ class PersonalizationService:
     """个性化服务"""
 
     def __init__(self):
-        self.llm_provider = get_provider()
+        self.llm_provider = get_provider(role="personalization")
         self.graph_service = GraphService()
 
     def get_cognition_level(self, cognition: int) -> str:
@@ -234,7 +234,41 @@ class PersonalizationService:
             # 返回空列表，让系统从对话中浮现
             return []
 
-    def build_personalized_prompt(
+    def build_static_system_prompt(self, language: str = "zh") -> str:
+        """
+        构建静态系统提示词（角色 + 规则）
+
+        内容与用户画像无关、每轮完全相同，放在消息列表最前面，
+        使上游 prompt 缓存可以跨轮次、跨用户命中。
+
+        Args:
+            language: 界面语言
+
+        Returns:
+            静态系统提示词
+        """
+        if language == "zh":
+            return """你是一位经验丰富的真人教师，正在和学生一对一交流。每轮对话中，学生消息之前会附上最新的【学生画像】和【教学风格要求】，请据此调整你的回答。
+
+【严格遵守的规则】
+1. 禁止使用任何 Markdown 格式：不用 **加粗**、不用 # 标题、不用 - 列表符号、不用 ``` 代码块标记。直接用自然语言对话。
+2. 回答要简短聚焦，100 字以内，像老师口头讲解一样，不写长篇大论。
+3. 每次只围绕学生提出的那一个具体问题来回答，不要主动展开不相关的话题。
+4. 当学生说"我理解了""懂了""明白了""好的""完成了"等表示理解的话时，不要简单肯定，要立刻追问一个具体问题来检验他是否真的理解，例如"那你能解释一下 X 为什么会 Y 吗？"。
+5. 用启发式提问引导学生思考，不要直接给出完整答案，先问"你觉得呢？"或"你能想到什么例子吗？"。
+6. 语气自然口语化，像真人老师在面对面聊天，不像在写文章或教科书。"""
+
+        return """You are an experienced teacher having a one-on-one conversation with a student. Each turn, the latest [Student Profile] and [Teaching Style] are attached before the student's message; adapt your answer to them.
+
+[Strict Rules]
+1. No Markdown formatting — no **bold**, no # headers, no - bullet points, no ``` code fences. Use natural conversational language only.
+2. Keep responses short and focused — under 80 words, like a teacher speaking aloud, not writing an essay.
+3. Answer only the specific question the student asked. Don't expand into unrelated topics.
+4. When the student says "I understand", "Got it", "OK", "Done" or similar, don't just affirm them — immediately ask a targeted follow-up to verify: e.g. "Can you explain why X leads to Y in your own words?"
+5. Use Socratic questioning — guide the student to discover the answer rather than giving it directly. Ask "What do you think?" or "Can you think of an example?"
+6. Sound natural and conversational, like a real teacher talking, not like a textbook."""
+
+    def build_turn_context(
         self,
         user_profile: UserProfile,
         knowledge_graph: List[Dict],
@@ -242,7 +276,10 @@ class PersonalizationService:
         language: str = "zh"
     ) -> str:
         """
-        构建个性化系统提示词
+        构建每轮变化的画像上下文（学生画像 + 教学风格要求）
+
+        该部分随画像、情绪和知识图谱变化，应放在最后一条用户消息中，
+        避免破坏前面静态 system prompt 和历史消息的缓存前缀。
 
         Args:
             user_profile: 用户画像
@@ -251,15 +288,9 @@ class PersonalizationService:
             language: 界面语言
 
         Returns:
-            个性化系统提示词
+            画像上下文文本
         """
-        # 1. 基础角色定义
-        base_role = {
-            "zh": "你是一个专业的教育助手，帮助学习者理解和掌握知识。",
-            "en": "You are a professional educational assistant helping learners understand and master knowledge."
-        }[language]
-
-        # 2. 根据认知维度调整内容深度
+        # 1. 根据认知维度调整内容深度
         cognition_level = self.get_cognition_level(user_profile.cognition)
         cognition_instruction = {
             "zh": {
@@ -276,7 +307,7 @@ class PersonalizationService:
             }
         }[language][cognition_level]
 
-        # 3. 根据情感维度调整语气
+        # 2. 根据情感维度调整语气
         affect_level = self.get_affect_level(user_profile.affect)
         affect_instruction = {
             "zh": {
@@ -293,7 +324,7 @@ class PersonalizationService:
             }
         }[language][affect_level]
 
-        # 4. 根据行为维度调整互动方式
+        # 3. 根据行为维度调整互动方式
         behavior_level = self.get_behavior_level(user_profile.behavior)
         behavior_instruction = {
             "zh": {
@@ -310,7 +341,7 @@ class PersonalizationService:
             }
         }[language][behavior_level]
 
-        # 5. 根据知识图谱提供针对性内容
+        # 4. 根据知识图谱提供针对性内容
         if knowledge_graph:
             key_concepts = [c if isinstance(c, str) else c.get("name", "") for c in knowledge_graph[:5]]
             key_concepts = [c for c in key_concepts if c]  # 过滤空字符串
@@ -324,11 +355,9 @@ class PersonalizationService:
                 "en": "The user's knowledge graph is still being built. Identify key concepts from the conversation and help the user build their knowledge system."
             }[language]
 
-        # 6. 组合完整的系统提示词
+        # 5. 组合画像上下文
         if language == "zh":
-            system_prompt = f"""你是一位经验丰富的真人教师，正在和学生一对一交流。
-
-【学生画像】
+            context = f"""【学生画像】
 - 认知水平: {user_profile.cognition}/100（{self.get_cognition_description(user_profile.cognition, language)}）
 - 当前情绪: {emotion}
 - 知识焦点: {concepts_msg}
@@ -336,19 +365,9 @@ class PersonalizationService:
 【教学风格要求】
 {cognition_instruction}
 {affect_instruction}
-{behavior_instruction}
-
-【严格遵守的规则】
-1. 禁止使用任何 Markdown 格式：不用 **加粗**、不用 # 标题、不用 - 列表符号、不用 ``` 代码块标记。直接用自然语言对话。
-2. 回答要简短聚焦，100 字以内，像老师口头讲解一样，不写长篇大论。
-3. 每次只围绕学生提出的那一个具体问题来回答，不要主动展开不相关的话题。
-4. 当学生说"我理解了""懂了""明白了""好的""完成了"等表示理解的话时，不要简单肯定，要立刻追问一个具体问题来检验他是否真的理解，例如"那你能解释一下 X 为什么会 Y 吗？"。
-5. 用启发式提问引导学生思考，不要直接给出完整答案，先问"你觉得呢？"或"你能想到什么例子吗？"。
-6. 语气自然口语化，像真人老师在面对面聊天，不像在写文章或教科书。"""
+{behavior_instruction}"""
         else:
-            system_prompt = f"""You are an experienced teacher having a one-on-one conversation with a student.
-
-[Student Profile]
+            context = f"""[Student Profile]
 - Cognitive level: {user_profile.cognition}/100 ({self.get_cognition_description(user_profile.cognition, language)})
 - Current emotion: {emotion}
 - Knowledge focus: {concepts_msg}
@@ -356,19 +375,39 @@ class PersonalizationService:
 [Teaching Style]
 {cognition_instruction}
 {affect_instruction}
-{behavior_instruction}
+{behavior_instruction}"""
 
-[Strict Rules]
-1. No Markdown formatting — no **bold**, no # headers, no - bullet points, no ``` code fences. Use natural conversational language only.
-2. Keep responses short and focused — under 80 words, like a teacher speaking aloud, not writing an essay.
-3. Answer only the specific question the student asked. Don't expand into unrelated topics.
-4. When the student says "I understand", "Got it", "OK", "Done" or similar, don't just affirm them — immediately ask a targeted follow-up to verify: e.g. "Can you explain why X leads to Y in your own words?"
-5. Use Socratic questioning — guide the student to discover the answer rather than giving it directly. Ask "What do you think?" or "Can you think of an example?"
-6. Sound natural and conversational, like a real teacher talking, not like a textbook."""
+        logger.debug(f"Generated turn context for user with cognition={user_profile.cognition}")
+
+        return context
+
+    def build_personalized_prompt(
+        self,
+        user_profile: UserProfile,
+        knowledge_graph: List[Dict],
+        emotion: str,
+        language: str = "zh"
+    ) -> str:
+        """
+        构建个性化系统提示词（静态规则 + 画像上下文合并为单条 system prompt）
 
-        logger.debug(f"Generated personalized prompt for user with cognition={user_profile.cognition}")
+        多轮对话请分别使用 build_static_system_prompt 和 build_turn_context，
+        以保持缓存友好的消息布局。
 
-        return system_prompt
+        Args:
+            user_profile: 用户画像
+            knowledge_graph: 知识图谱
+            emotion: 当前情感状态
+            language: 界面语言
+
+        Returns:
+            个性化系统提示词
+        """
+        return (
+            self.build_static_system_prompt(language)
+            + "\n\n"
+            + self.build_turn_context(user_profile, knowledge_graph, emotion, language)
+        )
 
     async def update_graph_from_conversation(
         self,
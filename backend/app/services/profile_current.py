@@ -0,0 +1,176 @@
+"""
+Profile Current - 当前画像（profile_current）维护
+
+对话增量过去是读-改-写：读取最新快照（ORDER BY created_at DESC LIMIT 1）、在 Python 中
+相加并 clamp、再插入新快照。两次往返，同一学生的两轮对话重叠时后写入的会覆盖先写入的增量。
+现在每个用户一行当前画像：
+
+- 对话增量：apply_profile_delta() 一条语句完成——UPSERT 当前画像
+  （x = LEAST(100, GREATEST(0, x + :d))，行锁保证并发增量不丢失），
+  同一语句的 CTE 以 RETURNING 的新值追加 profile_snapshots 历史
+- 直接写入画像（注册、量表初始化）：set_current_profile()
+- 迁移 / 回填：rebuild_current_profiles() 取每个用户最新的 system 快照
+
+都不提交，随调用方事务一起提交。
+"""
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.sql.profile import CurrentProfile
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProfileValues:
+    """当前画像的一行"""
+    cognition: int
+    affect: int
+    behavior: int
+    updated_at: datetime
+
+
+# 尚无当前画像的用户从默认值开始累加；快照 source 存枚举名（非原生枚举）
+_APPLY_DELTA_SQL = """
+    WITH cur AS (
+        INSERT INTO profile_current AS p (user_id, cognition, affect, behavior, updated_at)
+        VALUES (
+            CAST(:user_id AS uuid),
+            LEAST(100, GREATEST(0, CAST(:default AS integer) + :d_cognition)),
+            LEAST(100, GREATEST(0, CAST(:default AS integer) + :d_affect)),
+            LEAST(100, GREATEST(0, CAST(:default AS integer) + :d_behavior)),
+            CAST(:at AS timestamptz)
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            cognition = LEAST(100, GREATEST(0, p.cognition + :d_cognition)),
+            affect = LEAST(100, GREATEST(0, p.affect + :d_affect)),
+            behavior = LEAST(100, GREATEST(0, p.behavior + :d_behavior)),
+            updated_at = EXCLUDED.updated_at
+        RETURNING p.cognition, p.affect, p.behavior, p.updated_at
+    ), snapshot AS (
+        INSERT INTO profile_snapshots (id, user_id, cognition, affect, behavior, source, created_at)
+        SELECT CAST(:snapshot_id AS uuid), CAST(:user_id AS uuid),
+               cognition, affect, behavior, 'SYSTEM', updated_at
+        FROM cur
+    )
+    SELECT cognition, affect, behavior, updated_at FROM cur
+"""
+
+
+async def apply_profile_delta(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    delta_cognition: int,
+    delta_affect: int,
+    delta_behavior: int,
+    at: datetime,
+    default: int = 50,
+) -> ProfileValues:
+    """
+    原子地应用画像增量并追加快照（一条语句，不提交）
+
+    Args:
+        db: 数据库会话
+        user_id: 用户 ID
+        delta_cognition / delta_affect / delta_behavior: 各维度增量
+        at: 更新时间（同时作为快照的 created_at）
+        default: 尚无当前画像时的初始值
+
+    Returns:
+        更新后的当前画像
+    """
+    result = await db.execute(text(_APPLY_DELTA_SQL), {
+        "user_id": str(user_id),
+        "snapshot_id": str(uuid.uuid4()),
+        "default": default,
+        "d_cognition": delta_cognition,
+        "d_affect": delta_affect,
+        "d_behavior": delta_behavior,
+        "at": at,
+    })
+    return ProfileValues(*result.one())
+
+
+async def set_current_profile(
+    db: AsyncSession,
+    user_id: uuid.UUID,
+    cognition: int,
+    affect: int,
+    behavior: int,
+    at: datetime,
+) -> None:
+    """
+    直接写入当前画像（调用方另行写入对应的快照；不提交）
+    """
+    # 先刷出调用方挂起的 INSERT（如新用户本身），避免外键检查失败
+    await db.flush()
+
+    table = CurrentProfile.__table__
+    stmt = insert(table).values(
+        user_id=user_id, cognition=cognition, affect=affect, behavior=behavior, updated_at=at
+    )
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            "cognition": excluded.cognition,
+            "affect": excluded.affect,
+            "behavior": excluded.behavior,
+            "updated_at": excluded.updated_at,
+        },
+    )
+    await db.execute(stmt)
+
+
+# 集合式重建：每个用户最新的 system 快照
+_REBUILD_SQL = """
+    INSERT INTO profile_current (user_id, cognition, affect, behavior, updated_at)
+    SELECT DISTINCT ON (user_id) user_id, cognition, affect, behavior, created_at
+    FROM profile_snapshots s
+    WHERE source = 'SYSTEM' {filter_where}
+    ORDER BY user_id, created_at DESC
+    ON CONFLICT (user_id) DO UPDATE SET
+        cognition = EXCLUDED.cognition,
+        affect = EXCLUDED.affect,
+        behavior = EXCLUDED.behavior,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+async def rebuild_current_profiles(
+    db: AsyncSession,
+    user_ids: Optional[Iterable[uuid.UUID]] = None,
+) -> int:
+    """
+    从快照重建当前画像（不提交）
+
+    Args:
+        db: 数据库会话
+        user_ids: 只重建这些用户；None 表示尚无当前画像的用户
+
+    Returns:
+        重建的行数
+    """
+    await db.flush()
+
+    if user_ids is None:
+        filter_where = "AND NOT EXISTS (SELECT 1 FROM profile_current c WHERE c.user_id = s.user_id)"
+        params = {}
+    else:
+        ids = [str(uid) for uid in user_ids]
+        if not ids:
+            return 0
+        filter_where = "AND user_id = ANY(CAST(:ids AS uuid[]))"
+        params = {"ids": ids}
+
+    result = await db.execute(text(_REBUILD_SQL.format(filter_where=filter_where)), params)
+    count = result.rowcount or 0
+    logger.debug(f"Rebuilt current profiles for {count} users")
+    return count
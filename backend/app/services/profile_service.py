@@ -4,23 +4,34 @@ Profile Service - 学习者画像服务（PostgreSQL）
 """
 import logging
 from typing import Optional
-from datetime import datetime
-from uuid import UUID
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
 from sqlalchemy import select, desc, update as sql_update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.sql.user import User
-from app.models.sql.profile import ProfileSnapshot, ProfileSource
+from app.models.sql.profile import ProfileSnapshot, ProfileSource, CurrentProfile
 from app.models.sql.calibration_log import CalibrationLog, Dimension, ConflictLevel
 from app.models.sql.message import ChatMessage
 from app.models.sql.chat_session import ChatSession
 from app.models.sql.scale import ScaleResponse
 from app.schemas.profile import UserProfile, ProfileChange
 from app.schemas.calibration import calculate_conflict_level
+from app.services.activity_stats import record_activity, rebuild_activity_stats
+from app.services.profile_current import (
+    apply_profile_delta,
+    rebuild_current_profiles,
+    set_current_profile,
+)
 
 logger = logging.getLogger(__name__)
 
 
+def _utc_iso(ts: datetime) -> str:
+    """带时区的时间转换为与快照一致的 ISO 8601 UTC 字符串（以 Z 结尾）"""
+    return ts.astimezone(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
 class ProfileService:
     """学习者画像服务"""
 
@@ -42,8 +53,10 @@ class ProfileService:
         Returns:
             UserProfile（与前端契约对齐）
         """
-        # 获取最新的 system snapshot
-        profile = await self._get_latest_profile(user_id, ProfileSource.SYSTEM)
+        # 当前画像（主键查询）；尚未建立当前画像的用户回退到最新的 system snapshot
+        profile = await self._get_current_profile(user_id)
+        if profile is None:
+            profile = await self._get_latest_profile(user_id, ProfileSource.SYSTEM)
 
         if profile:
             return profile
@@ -62,60 +75,68 @@ class ProfileService:
         user_id: UUID,
         delta_cognition: int,
         delta_affect: int,
-        delta_behavior: int
+        delta_behavior: int,
+        at: Optional[datetime] = None
     ) -> UserProfile:
         """
         应用画像增量（从对话分析结果）
 
-        流程：
-        1. 读取当前 profile
-        2. 加上 delta
-        3. clamp 到 0-100
-        4. 写入新的 ProfileSnapshot (source='system')
+        一条语句完成（app.services.profile_current.apply_profile_delta）：
+        当前画像 x = LEAST(100, GREATEST(0, x + delta)) 并 RETURNING 新值，
+        同一语句追加 ProfileSnapshot (source='system')。同一用户的并发增量在行锁上
+        依次累加，不会丢失。不提交，随调用方事务一起提交；活动统计（profile_at）由调用方记录。
 
         Args:
             user_id: 用户 ID
             delta_cognition: 认知增量 [-100, 100]
             delta_affect: 情感增量 [-100, 100]
             delta_behavior: 行为增量 [-100, 100]
+            at: 更新时间（默认当前时间）
 
         Returns:
             更新后的 UserProfile
         """
-        # 1. 获取当前画像
-        current_profile = await self.get_profile(user_id)
-
-        # 2. 应用增量
-        new_cognition = current_profile.cognition + delta_cognition
-        new_affect = current_profile.affect + delta_affect
-        new_behavior = current_profile.behavior + delta_behavior
-
-        # 3. Clamp 到 0-100
-        new_cognition = max(0, min(100, new_cognition))
-        new_affect = max(0, min(100, new_affect))
-        new_behavior = max(0, min(100, new_behavior))
+        values = await apply_profile_delta(
+            self.db,
+            user_id,
+            delta_cognition,
+            delta_affect,
+            delta_behavior,
+            at=at or datetime.now(timezone.utc),
+            default=self.DEFAULT_COGNITION,
+        )
 
         logger.info(
-            f"Applying delta for user {user_id}: "
-            f"C: {current_profile.cognition} + {delta_cognition} = {new_cognition}, "
-            f"A: {current_profile.affect} + {delta_affect} = {new_affect}, "
-            f"B: {current_profile.behavior} + {delta_behavior} = {new_behavior}"
+            f"Applied delta for user {user_id}: "
+            f"C{delta_cognition:+d} → {values.cognition}, "
+            f"A{delta_affect:+d} → {values.affect}, "
+            f"B{delta_behavior:+d} → {values.behavior}"
         )
 
-        # 4. 创建新快照
-        snapshot = await self._create_snapshot(
-            user_id=user_id,
-            cognition=new_cognition,
-            affect=new_affect,
-            behavior=new_behavior,
-            source=ProfileSource.SYSTEM
+        return UserProfile(
+            cognition=values.cognition,
+            affect=values.affect,
+            behavior=values.behavior,
+            lastUpdate=_utc_iso(values.updated_at)
         )
 
+    @staticmethod
+    def add_delta(
+        profile: UserProfile,
+        delta_cognition: int,
+        delta_affect: int,
+        delta_behavior: int
+    ) -> UserProfile:
+        """
+        在给定画像上加上增量并 clamp 到 0-100（只计算，不写入）
+
+        用于在写入前预估本轮的画像（如构建 prompt）；实际写入以 apply_delta 的返回值为准。
+        """
         return UserProfile(
-            cognition=snapshot.cognition,
-            affect=snapshot.affect,
-            behavior=snapshot.behavior,
-            lastUpdate=snapshot.created_at.isoformat() + "Z"
+            cognition=max(0, min(100, profile.cognition + delta_cognition)),
+            affect=max(0, min(100, profile.affect + delta_affect)),
+            behavior=max(0, min(100, profile.behavior + delta_behavior)),
+            lastUpdate=profile.lastUpdate
         )
 
     async def apply_user_override(
@@ -369,8 +390,10 @@ class ProfileService:
             .values(user_id=real_user_id)
         )
 
-        # 删除幽灵用户
+        # 删除幽灵用户（其统计行、当前画像随外键级联删除），并重算真实用户的活动统计与当前画像
         await self.db.delete(ghost_user)
+        await rebuild_activity_stats(self.db, [real_user_id])
+        await rebuild_current_profiles(self.db, [real_user_id])
         await self.db.commit()
 
         logger.info(
@@ -425,6 +448,18 @@ class ProfileService:
 
         return None
 
+    async def _get_current_profile(self, user_id: UUID) -> Optional[UserProfile]:
+        """获取当前画像（内部方法）"""
+        current = await self.db.get(CurrentProfile, user_id)
+        if current is None:
+            return None
+        return UserProfile(
+            cognition=current.cognition,
+            affect=current.affect,
+            behavior=current.behavior,
+            lastUpdate=_utc_iso(current.updated_at)
+        )
+
     async def _create_snapshot(
         self,
         user_id: UUID,
@@ -433,8 +468,9 @@ class ProfileService:
         behavior: int,
         source: ProfileSource = ProfileSource.SYSTEM
     ) -> ProfileSnapshot:
-        """创建画像快照（内部方法）"""
+        """创建画像快照并提交（内部方法；system 快照同时写入当前画像）"""
         snapshot = ProfileSnapshot(
+            id=uuid4(),
             user_id=user_id,
             cognition=cognition,
             affect=affect,
@@ -444,8 +480,12 @@ class ProfileService:
         )
 
         self.db.add(snapshot)
+        await record_activity(self.db, user_id, profile_at=snapshot.created_at)
+        if source == ProfileSource.SYSTEM:
+            await set_current_profile(
+                self.db, user_id, cognition, affect, behavior, at=snapshot.created_at
+            )
         await self.db.commit()
-        await self.db.refresh(snapshot)
 
         return snapshot
 
@@ -0,0 +1,196 @@
+"""
+Research Bundle - 一致性快照研究数据包导出
+
+逐个调用 CSV 导出端点时，每个文件在各自的事务中查询：学生在线时文件之间互相对不上
+（画像中的消息数与对话文件行数不一致），总耗时也是各查询耗时之和。数据包导出：
+
+- 协调连接以 REPEATABLE READ 开启只读事务并 pg_export_snapshot()，导出结束前保持打开
+- 每个数据集在独立连接中 SET TRANSACTION SNAPSHOT 导入同一快照，并行 COPY 到临时文件
+  （并行度 settings.EXPORT_BUNDLE_PARALLELISM）
+- 先完成的文件先写入 zip（流式写入，不需要 seek），最后写入 manifest.json：
+  快照时间与各文件的行数、字节数
+- 内存占用与数据量无关；临时文件在导出结束或客户端断开后删除
+"""
+import asyncio
+import contextlib
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+import orjson
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.config import settings
+from app.services import research_datasets
+from app.services.data_export import ChunkSink, attachment_response, copy_to_file
+from app.services.research_datasets import Dataset
+
+BUNDLE_MEDIA_TYPE = "application/zip"
+
+# 从临时文件读入 zip 的块大小
+_READ_BLOCK = 1 << 20
+
+_SNAPSHOT_OPTIONS = {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+
+
+@dataclass
+class BundleEntry:
+    """数据包中的一个 CSV 文件"""
+    arcname: str
+    dataset: Dataset
+    path: Optional[Path] = None
+    rows: int = 0
+    size: int = 0
+
+
+async def bundle_entries(conn: AsyncConnection) -> List[BundleEntry]:
+    """
+    数据包内容：四个综合数据集，加上每个有填写记录的量表一个文件
+
+    量表列表在协调连接中查询，与数据集读取同一快照。
+    """
+    datasets = [
+        research_datasets.learner_profiles(),
+        research_datasets.scale_responses(),
+        research_datasets.conversations(),
+        research_datasets.learning_trajectory(),
+    ]
+    entries = [BundleEntry(f"{ds.name}.csv", ds) for ds in datasets]
+
+    result = await conn.execute(
+        text("SELECT DISTINCT template_id::text FROM scale_responses ORDER BY 1")
+    )
+    for (template_id,) in result.all():
+        ds = research_datasets.single_scale_responses(template_id)
+        entries.append(BundleEntry(f"scales/{ds.name}.csv", ds))
+    return entries
+
+
+@contextlib.asynccontextmanager
+async def exported_snapshot() -> AsyncIterator[Tuple[AsyncConnection, str, datetime]]:
+    """
+    开启 REPEATABLE READ 只读事务并导出快照
+
+    Yields:
+        (协调连接, 快照 ID, 快照时间)；退出之前其他连接都可以导入该快照
+    """
+    from app.db.postgres import engine
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(**_SNAPSHOT_OPTIONS)
+        row = (await conn.execute(text("SELECT pg_export_snapshot(), now()"))).one()
+        yield conn, row[0], row[1]
+
+
+async def _export_entry(
+    entry: BundleEntry,
+    index: int,
+    snapshot_id: str,
+    directory: Path,
+    semaphore: asyncio.Semaphore,
+) -> BundleEntry:
+    """在独立连接中导入快照并 COPY 数据集到临时文件"""
+    from app.db.postgres import engine
+
+    async with semaphore:
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(**_SNAPSHOT_OPTIONS)
+            # 导入快照必须是事务中的第一条语句；快照 ID 由服务端生成，SET 不支持参数绑定
+            await conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+            path = directory / f"{index:03d}.csv"
+            try:
+                entry.rows = await copy_to_file(conn, entry.dataset, str(path))
+            except asyncio.CancelledError:
+                # 中途取消：连接处于 COPY 协议中途，不能归还连接池
+                await conn.invalidate()
+                raise
+    entry.path = path
+    entry.size = path.stat().st_size
+    return entry
+
+
+async def _zip_file(
+    archive: zipfile.ZipFile,
+    sink: ChunkSink,
+    arcname: str,
+    path: Path,
+) -> AsyncIterator[bytes]:
+    """把临时文件分块压缩写入 zip，逐块产出 zip 字节（读文件与压缩在线程中执行）"""
+    with open(path, "rb") as source, archive.open(arcname, "w", force_zip64=True) as target:
+        while block := await asyncio.to_thread(source.read, _READ_BLOCK):
+            await asyncio.to_thread(target.write, block)
+            if data := sink.drain():
+                yield data
+    if data := sink.drain():
+        yield data
+
+
+def _manifest(
+    entries: List[BundleEntry],
+    snapshot_at: datetime,
+    generated_at: datetime,
+) -> bytes:
+    return orjson.dumps(
+        {
+            "snapshotTimestamp": snapshot_at,
+            "generatedAt": generated_at,
+            "format": "csv",
+            "timezone": "UTC",
+            "files": [
+                {"name": e.arcname, "dataset": e.dataset.name, "rows": e.rows, "bytes": e.size}
+                for e in entries
+            ],
+        },
+        option=orjson.OPT_INDENT_2,
+    )
+
+
+async def stream_bundle(parallelism: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    导出研究数据包（zip），所有数据集读取同一个数据库快照
+
+    Args:
+        parallelism: 并行查询的连接数（默认 settings.EXPORT_BUNDLE_PARALLELISM）
+
+    Yields:
+        zip 字节：各数据集 CSV（按完成顺序）与 manifest.json
+    """
+    parallelism = parallelism or settings.EXPORT_BUNDLE_PARALLELISM
+    generated_at = datetime.now(timezone.utc)
+
+    sink = ChunkSink()
+    with tempfile.TemporaryDirectory(prefix="research_bundle_") as tmp, \
+            zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        async with exported_snapshot() as (conn, snapshot_id, snapshot_at):
+            entries = await bundle_entries(conn)
+            semaphore = asyncio.Semaphore(parallelism)
+            tasks = [
+                asyncio.create_task(_export_entry(entry, i, snapshot_id, Path(tmp), semaphore))
+                for i, entry in enumerate(entries)
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    entry = await next_done
+                    async for chunk in _zip_file(archive, sink, entry.arcname, entry.path):
+                        yield chunk
+                    entry.path.unlink()
+            finally:
+                # 出错或客户端断开：取消尚未完成的查询，快照事务随协调连接一起结束
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+        archive.writestr("manifest.json", _manifest(entries, snapshot_at, generated_at))
+    # zip 关闭时写出中央目录
+    yield sink.drain()
+
+
+def export_bundle() -> StreamingResponse:
+    """研究数据包下载响应，文件名为 research_bundle_<UTC 日期>.zip"""
+    date_str = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    return attachment_response(stream_bundle(), f"research_bundle_{date_str}.zip", BUNDLE_MEDIA_TYPE)
@@ -0,0 +1,469 @@
+"""
+Research Datasets - 研究数据集定义
+
+每个数据集是一条 SQL 加上可选的逐行转换与输出列计算，与输出格式和传输方式无关，
+由 app.services.data_export 负责流式读取与编码。
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# 输出列计算：(连接, 查询结果列) -> 输出列
+ColumnsHook = Callable[[AsyncConnection, List[str]], Awaitable[List[str]]]
+# COPY 查询构造：连接 -> (SQL, 参数)
+CopyQueryHook = Callable[[AsyncConnection], Awaitable[Tuple[str, Dict[str, Any]]]]
+
+
+@dataclass
+class Dataset:
+    """一个可导出的数据集"""
+    name: str
+    sql: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    # 逐行转换（None 表示直接输出查询列）
+    transform: Optional[Callable[[Mapping[str, Any]], Mapping[str, Any]]] = None
+    # 输出列（None 表示与查询列相同）
+    columns: Optional[ColumnsHook] = None
+    # 主表（用于按表行数估算导出进度）
+    source_table: Optional[str] = None
+    # 内容为 JSON 字符串数组的文本列（列式导出时转为 list<string>）
+    list_columns: Tuple[str, ...] = ()
+    # 完全在 SQL 中完成转换的等价查询，供 COPY 导出使用
+    # （None 时：无 transform 的数据集直接 COPY sql，有 transform 的只能走游标）
+    copy_query: Optional[CopyQueryHook] = None
+
+    @property
+    def copyable(self) -> bool:
+        """是否可以用 COPY ... TO STDOUT 直接导出"""
+        return self.transform is None or self.copy_query is not None
+
+    async def build_copy_query(self, conn: AsyncConnection) -> Tuple[str, Dict[str, Any]]:
+        if self.copy_query is not None:
+            return await self.copy_query(conn)
+        return self.sql, self.params
+
+
+def _user_filter(user_ids: Optional[List[str]], column: str = "u.id") -> tuple[str, Dict[str, Any]]:
+    if not user_ids:
+        return "", {}
+    return f"WHERE {column} = ANY(CAST(:user_ids AS uuid[]))", {"user_ids": user_ids}
+
+
+# ──────────────────────────────────────────────────────────────────────────
+# 学习者画像综合数据集
+# ──────────────────────────────────────────────────────────────────────────
+
+def learner_profiles(user_ids: Optional[List[str]] = None) -> Dataset:
+    """
+    学习者画像综合数据集
+
+    社科研究维度：
+    - 学习者基础信息（匿名 ID、注册时间）
+    - 初始量表得分（认知/情感/行为三维度）
+    - 最新画像得分及变化次数
+    - 对话参与行为指标（会话数、消息数）
+    """
+    where_clause, params = _user_filter(user_ids)
+    sql = f"""
+        SELECT
+            u.id                                                AS user_id,
+            u.student_id                                        AS student_id,
+            u.name                                              AS name,
+            u.email                                             AS email,
+            u.created_at                                        AS registered_at,
+            u.is_active                                         AS is_active,
+            first_ps.cognition                                  AS initial_cognition,
+            first_ps.affect                                     AS initial_affect,
+            first_ps.behavior                                   AS initial_behavior,
+            first_ps.created_at                                 AS initial_profile_at,
+            last_ps.cognition                                   AS current_cognition,
+            last_ps.affect                                      AS current_affect,
+            last_ps.behavior                                    AS current_behavior,
+            last_ps.created_at                                  AS last_profile_update,
+            COALESCE(ps_count.total, 0)                         AS profile_update_count,
+            COALESCE(sess_count.total, 0)                       AS total_sessions,
+            COALESCE(msg_count.total, 0)                        AS total_messages,
+            COALESCE(sr_count.total, 0)                         AS scale_completions
+        FROM users u
+        LEFT JOIN LATERAL (
+            SELECT cognition, affect, behavior, created_at
+            FROM profile_snapshots WHERE user_id = u.id ORDER BY created_at ASC LIMIT 1
+        ) first_ps ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT cognition, affect, behavior, created_at
+            FROM profile_snapshots WHERE user_id = u.id ORDER BY created_at DESC LIMIT 1
+        ) last_ps ON TRUE
+        LEFT JOIN (SELECT user_id, COUNT(*) AS total FROM profile_snapshots GROUP BY user_id) ps_count ON ps_count.user_id = u.id
+        LEFT JOIN (SELECT user_id, COUNT(*) AS total FROM chat_sessions GROUP BY user_id) sess_count ON sess_count.user_id = u.id
+        LEFT JOIN (SELECT user_id, COUNT(*) AS total FROM chat_messages GROUP BY user_id) msg_count ON msg_count.user_id = u.id
+        LEFT JOIN (SELECT user_id, COUNT(*) AS total FROM scale_responses GROUP BY user_id) sr_count ON sr_count.user_id = u.id
+        {where_clause}
+        ORDER BY u.created_at DESC
+    """
+    return Dataset(name="learner_profiles", source_table="users", sql=sql, params=params)
+
+
+# ──────────────────────────────────────────────────────────────────────────
+# 量表响应数据集（各题得分展开为独立列）
+# ──────────────────────────────────────────────────────────────────────────
+
+def _answers(row: Mapping[str, Any]) -> Dict[str, Any]:
+    raw = row.get("raw_answers") or {}
+    if isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except Exception:
+            raw = {}
+    return raw
+
+
+async def _item_keys(conn: AsyncConnection, keys_sql: str, params: Dict[str, Any]) -> List[str]:
+    """所有响应中出现过的题目键（排序）"""
+    result = await conn.execute(text(keys_sql), params)
+    return sorted(row[0] for row in result)
+
+
+def _item_columns(keys_sql: str, params: Dict[str, Any], extra: List[str]) -> ColumnsHook:
+    """
+    输出列 = 查询列（去掉 raw_answers）+ 所有响应中出现过的题目键（排序）+ extra
+
+    流式输出必须先确定表头，因此先用一条 DISTINCT 查询取出题目键全集。
+    """
+    async def columns(conn: AsyncConnection, keys: List[str]) -> List[str]:
+        item_keys = await _item_keys(conn, keys_sql, params)
+        return [k for k in keys if k != "raw_answers"] + item_keys + extra
+    return columns
+
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _item_copy_query(
+    select_sql: str,
+    from_sql: str,
+    keys_sql: str,
+    params: Dict[str, Any],
+    extra_sql: str = "",
+) -> CopyQueryHook:
+    """
+    在 SQL 中展开各题得分的 COPY 查询
+
+    题目键作为绑定参数（answers_json->>:item_N），列名按标识符转义，
+    与游标路径的 _expand_* 输出相同的列。
+    """
+    async def copy_query(conn: AsyncConnection) -> Tuple[str, Dict[str, Any]]:
+        item_keys = await _item_keys(conn, keys_sql, params)
+        item_params = {f"item_{i}": key for i, key in enumerate(item_keys)}
+        item_sql = "".join(
+            f",\n            sr.answers_json->>:item_{i} AS {_quote_ident(key)}"
+            for i, key in enumerate(item_keys)
+        )
+        sql = f"SELECT {select_sql}{item_sql}{extra_sql}\n        {from_sql}"
+        return sql, {**params, **item_params}
+    return copy_query
+
+
+def _expand_scale_row(row: Mapping[str, Any]) -> Dict[str, Any]:
+    """展开各题得分，并计算所用时间（秒）"""
+    out = {k: v for k, v in row.items() if k != "raw_answers"}
+    out.update(_answers(row))
+    started = row.get("started_at")
+    responded = row.get("responded_at")
+    if isinstance(started, datetime) and isinstance(responded, datetime):
+        diff = (responded - started).total_seconds()
+        out["time_spent_seconds"] = int(diff) if diff >= 0 else ""
+    else:
+        out["time_spent_seconds"] = ""
+    return out
+
+
+def _expand_items(row: Mapping[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in row.items() if k != "raw_answers"}
+    out.update(_answers(row))
+    return out
+
+
+_SCALE_COLUMNS_SQL = """
+            sr.id                               AS response_id,
+            u.id                                AS user_id,
+            u.student_id                        AS student_id,
+            u.name                              AS user_name,
+            u.email                             AS user_email,
+            st.name                             AS scale_name,
+            st.id                               AS template_id,
+            sr.started_at                       AS started_at,
+            sr.created_at                       AS responded_at,
+            (sr.scores_json->>'cognition')::float   AS cognition_score,
+            (sr.scores_json->>'affect')::float      AS affect_score,
+            (sr.scores_json->>'behavior')::float    AS behavior_score,
+            (sr.scores_json->>'total_score')::float AS total_score,
+            (sr.scores_json->>'max_score')::float   AS max_score"""
+
+# 与 _expand_scale_row 的 time_spent_seconds 相同：开始时间缺失或晚于提交时间时为空
+_TIME_SPENT_SQL = """,
+            CASE WHEN sr.created_at >= sr.started_at
+                 THEN FLOOR(EXTRACT(EPOCH FROM sr.created_at - sr.started_at))::bigint
+            END                                 AS time_spent_seconds"""
+
+
+def scale_responses(user_ids: Optional[List[str]] = None) -> Dataset:
+    """
+    量表响应数据集
+
+    社科研究维度：
+    - 用户-量表匹配信息
+    - 各题原始得分（item_1 ~ item_N）
+    - 三维度汇总得分（认知/情感/行为）
+    - 填写时间（可用于分析量表完成时机）
+    """
+    where_clause, params = _user_filter(user_ids)
+    from_sql = f"""FROM scale_responses sr
+        JOIN users u ON u.id = sr.user_id
+        JOIN scale_templates st ON st.id = sr.template_id
+        {where_clause}
+        ORDER BY sr.created_at DESC"""
+    sql = f"SELECT {_SCALE_COLUMNS_SQL},\n            sr.answers_json AS raw_answers\n        {from_sql}"
+    keys_sql = f"""
+        SELECT DISTINCT jsonb_object_keys(sr.answers_json)
+        FROM scale_responses sr
+        JOIN users u ON u.id = sr.user_id
+        {where_clause}
+    """
+    return Dataset(
+        name="scale_responses",
+        source_table="scale_responses",
+        sql=sql,
+        params=params,
+        transform=_expand_scale_row,
+        columns=_item_columns(keys_sql, params, ["time_spent_seconds"]),
+        copy_query=_item_copy_query(_SCALE_COLUMNS_SQL, from_sql, keys_sql, params, _TIME_SPENT_SQL),
+    )
+
+
+_SINGLE_SCALE_COLUMNS_SQL = """
+            sr.id                                       AS response_id,
+            u.id                                        AS user_id,
+            u.student_id                                AS student_id,
+            u.name                                      AS user_name,
+            u.email                                     AS user_email,
+            sr.created_at                               AS responded_at,
+            (sr.scores_json->>'cognition')::float       AS cognition_score,
+            (sr.scores_json->>'affect')::float          AS affect_score,
+            (sr.scores_json->>'behavior')::float        AS behavior_score,
+            (sr.scores_json->>'total_score')::float     AS total_score,
+            (sr.scores_json->>'max_score')::float       AS max_score"""
+
+
+def single_scale_responses(template_id: str) -> Dataset:
+    """单个量表的所有用户填写数据（含 user_email + 各题得分展开）"""
+    params = {"tid": template_id}
+    from_sql = """FROM scale_responses sr
+        JOIN users u ON u.id = sr.user_id
+        WHERE sr.template_id = CAST(:tid AS uuid)
+        ORDER BY sr.created_at DESC"""
+    sql = f"SELECT {_SINGLE_SCALE_COLUMNS_SQL},\n            sr.answers_json AS raw_answers\n        {from_sql}"
+    keys_sql = """
+        SELECT DISTINCT jsonb_object_keys(answers_json)
+        FROM scale_responses WHERE template_id = CAST(:tid AS uuid)
+    """
+    return Dataset(
+        name=f"scale_{template_id[:8]}_responses",
+        sql=sql,
+        params=params,
+        transform=_expand_items,
+        columns=_item_columns(keys_sql, params, []),
+        copy_query=_item_copy_query(_SINGLE_SCALE_COLUMNS_SQL, from_sql, keys_sql, params),
+    )
+
+
+# ──────────────────────────────────────────────────────────────────────────
+# 对话与画像轨迹
+# ──────────────────────────────────────────────────────────────────────────
+
+def conversations() -> Dataset:
+    """
+    对话行为数据集（全部消息，流式输出不再限制行数）
+
+    社科研究维度：
+    - 消息级别数据（用户ID、角色、时间）
+    - 消息长度（字符数，反映学习者参与深度）
+    - AI 分析结果中的提取概念（反映知识领域分布）
+    - 时段分布（小时）用于学习行为时间分析
+    """
+    sql = """
+        SELECT
+            cm.id                               AS message_id,
+            u.id                                AS user_id,
+            u.student_id                        AS student_id,
+            u.name                              AS user_name,
+            u.email                             AS user_email,
+            cm.role                             AS role,
+            cm.timestamp                        AS message_time,
+            EXTRACT(HOUR FROM cm.timestamp)::int AS hour_of_day,
+            EXTRACT(DOW FROM cm.timestamp)::int  AS day_of_week,
+            LENGTH(cm.text)                     AS message_length_chars,
+            cm.analysis->>'detectedConcepts'    AS extracted_concepts_raw,
+            COALESCE(jsonb_array_length(cm.analysis->'detectedConcepts'), 0) AS concept_count
+        FROM chat_messages cm
+        JOIN users u ON u.id = cm.user_id
+        ORDER BY cm.timestamp DESC
+    """
+    return Dataset(
+        name="conversation_data",
+        source_table="chat_messages",
+        sql=sql,
+        list_columns=("extracted_concepts_raw",),
+    )
+
+
+def learning_trajectory() -> Dataset:
+    """
+    学习轨迹数据集（全部用户的画像快照时间序列）
+
+    社科研究维度：
+    - 画像三维度随时间的变化
+    - 快照来源（AI 评估 / 用户自评）
+    """
+    sql = """
+        SELECT
+            u.id                                AS user_id,
+            u.student_id                        AS student_id,
+            u.name                              AS user_name,
+            u.email                             AS user_email,
+            ps.cognition                        AS snapshot_cognition,
+            ps.affect                           AS snapshot_affect,
+            ps.behavior                         AS snapshot_behavior,
+            ps.created_at                       AS snapshot_time,
+            ps.source                           AS snapshot_source
+        FROM profile_snapshots ps
+        JOIN users u ON u.id = ps.user_id
+        ORDER BY ps.created_at DESC
+    """
+    return Dataset(name="learning_trajectory", source_table="profile_snapshots", sql=sql)
+
+
+def user_conversations(user_id: str) -> Dataset:
+    """单个用户的完整对话数据（含完整文本，列顺序固定）"""
+    sql = """
+        SELECT
+            cm.id                                                           AS message_id,
+            u.id                                                            AS user_id,
+            u.student_id                                                    AS student_id,
+            u.email                                                         AS user_email,
+            u.name                                                          AS user_name,
+            cm.role                                                         AS role,
+            cm.text                                                         AS message_text,
+            cm.timestamp                                                    AS message_time,
+            LENGTH(cm.text)                                                 AS message_length_chars,
+            EXTRACT(HOUR FROM cm.timestamp)::int                            AS hour_of_day,
+            EXTRACT(DOW FROM cm.timestamp)::int                             AS day_of_week,
+            cm.analysis->>'detectedConcepts'                                AS concepts_raw,
+            COALESCE(jsonb_array_length(cm.analysis->'detectedConcepts'), 0) AS concept_count
+        FROM chat_messages cm
+        JOIN users u ON u.id = cm.user_id
+        WHERE cm.user_id = CAST(:uid AS uuid)
+        ORDER BY cm.timestamp ASC
+    """
+    return Dataset(
+        name=f"user_{user_id[:8]}_conversations",
+        sql=sql,
+        params={"uid": user_id},
+        list_columns=("concepts_raw",),
+    )
+
+
+def user_trajectory(user_id: str) -> Dataset:
+    """
+    单个用户的学习轨迹（画像快照时间序列 + 校准日志，统一列结构）
+
+    两类记录在 SQL 中合并：先画像快照，后校准日志，各自按时间正序。
+    """
+    sql = """
+        SELECT record_type, snapshot_time, source,
+               student_id, user_email, user_name,
+               cognition, affect, behavior,
+               dimension, ai_value, user_value_calib, delta,
+               conflict_level, user_comment, likert_trust
+        FROM (
+            SELECT
+                0                       AS part,
+                'profile_snapshot'      AS record_type,
+                ps.created_at           AS snapshot_time,
+                ps.source::text         AS source,
+                u.student_id            AS student_id,
+                u.email                 AS user_email,
+                u.name                  AS user_name,
+                ps.cognition            AS cognition,
+                ps.affect               AS affect,
+                ps.behavior             AS behavior,
+                NULL::text              AS dimension,
+                NULL::int               AS ai_value,
+                NULL::int               AS user_value_calib,
+                NULL::int               AS delta,
+                NULL::text              AS conflict_level,
+                NULL::text              AS user_comment,
+                NULL::int               AS likert_trust
+            FROM profile_snapshots ps
+            JOIN users u ON u.id = ps.user_id
+            WHERE ps.user_id = CAST(:uid AS uuid)
+            UNION ALL
+            SELECT
+                1,
+                'calibration',
+                cl.timestamp,
+                'user_calibration',
+                NULL, NULL, NULL,
+                NULL, NULL, NULL,
+                cl.dimension::text,
+                cl.system_value,
+                cl.user_value,
+                cl.user_value - cl.system_value,
+                cl.conflict_level::text,
+                cl.user_comment,
+                cl.likert_trust
+            FROM calibration_logs cl
+            WHERE cl.user_id = CAST(:uid AS uuid)
+        ) t
+        ORDER BY part, snapshot_time ASC
+    """
+    return Dataset(name=f"user_{user_id[:8]}_trajectory", sql=sql, params={"uid": user_id})
+
+
+# ──────────────────────────────────────────────────────────────────────────
+# 原始表
+# ──────────────────────────────────────────────────────────────────────────
+
+def table(
+    name: str,
+    where_clause: str = "",
+    params: Optional[Dict[str, Any]] = None,
+    order_clause: str = "",
+    hidden_fields: Iterable[str] = (),
+) -> Dataset:
+    """
+    原始表数据集（SELECT *），去掉 hidden_fields 中的敏感列
+
+    表名、过滤与排序子句须由调用方校验（管理后台的白名单与 build_filter_clause）。
+    敏感列在 Python 中逐行剔除，因此该数据集不走 COPY。
+    """
+    hidden = frozenset(hidden_fields)
+
+    def visible(row: Mapping[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in row.items() if k not in hidden}
+
+    async def columns(conn: AsyncConnection, keys: List[str]) -> List[str]:
+        return [k for k in keys if k not in hidden]
+
+    return Dataset(
+        name=name,
+        source_table=name,
+        sql=f"SELECT * FROM {name} {where_clause} {order_clause}",
+        params=params or {},
+        transform=visible,
+        columns=columns,
+    )
@@ -0,0 +1,166 @@
+"""
+Row Counts - 管理后台的表行数
+
+PostgreSQL 的 COUNT(*) 需要扫描整张表，管理后台每次打开概览 / 数据浏览器都对大表计数。
+这里按以下顺序取行数：
+
+1. 缓存中未过期的精确计数（ROW_COUNT_CACHE_TTL_S 内）
+2. 统计信息估算：pg_class.reltuples 按当前表页数折算（与查询规划器的估算方式相同），
+   表从未 ANALYZE 时退回 pg_stat_user_tables.n_live_tup；同时在后台重新精确计数。
+   估算值低于 ROW_COUNT_EXACT_BELOW 的小表直接精确计数——新建或刚写入的表统计信息
+   常为 0，而小表的 COUNT 很便宜（也不缓存，新写入的行立即可见）
+3. exact=True 时直接精确计数并刷新缓存
+
+返回的 RowCount.estimated 告知调用方该值是否为估算值。
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RowCount:
+    """单张表的行数"""
+    count: int
+    estimated: bool
+
+
+# 按统计信息估算：reltuples / relpages * 当前页数；未 ANALYZE 过（reltuples < 0 或 relpages = 0）时用 n_live_tup
+_ESTIMATE_SQL = """
+    SELECT c.relname,
+           CASE
+               WHEN c.reltuples >= 0 AND c.relpages > 0 THEN
+                   (c.reltuples / c.relpages
+                    * (pg_relation_size(c.oid) / current_setting('block_size')::int))::bigint
+               ELSE COALESCE(s.n_live_tup, 0)
+           END
+    FROM pg_class c
+    JOIN pg_namespace n ON n.oid = c.relnamespace
+    LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+    WHERE n.nspname = 'public' AND c.relkind = 'r' AND c.relname = ANY(:names)
+"""
+
+
+class RowCounter:
+    """
+    表行数服务（带精确计数缓存）
+
+    - count(): 按上述顺序取一组表的行数
+    - 过期表的精确计数在后台任务中执行（同一张表同时只有一个计数任务）
+    """
+
+    def __init__(self, ttl: float = 300.0, exact_below: int = 0):
+        self.ttl = ttl
+        self.exact_below = exact_below
+        # {table: (精确行数, 计数时间 monotonic)}
+        self._exact: Dict[str, tuple] = {}
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def cached(self, table: str) -> Optional[int]:
+        """未过期的缓存精确计数"""
+        entry = self._exact.get(table)
+        if entry is None or time.monotonic() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def invalidate(self, table: Optional[str] = None) -> None:
+        """丢弃缓存（批量删除 / 导入后可调用）"""
+        if table is None:
+            self._exact.clear()
+        else:
+            self._exact.pop(table, None)
+
+    async def count(
+        self,
+        db: AsyncSession,
+        tables: Iterable[str],
+        exact: bool = False,
+    ) -> Dict[str, RowCount]:
+        """
+        获取一组表的行数
+
+        Args:
+            db: 数据库会话
+            tables: 表名（调用方负责白名单校验）
+            exact: 是否强制精确计数
+
+        Returns:
+            {表名: RowCount}
+        """
+        tables = list(tables)
+        counts: Dict[str, RowCount] = {}
+
+        if exact:
+            for table in tables:
+                counts[table] = RowCount(await self._count_exact(db, table), estimated=False)
+            return counts
+
+        stale = []
+        for table in tables:
+            cached = self.cached(table)
+            if cached is not None:
+                counts[table] = RowCount(cached, estimated=False)
+            else:
+                stale.append(table)
+
+        if stale:
+            result = await db.execute(text(_ESTIMATE_SQL), {"names": stale})
+            estimates = {name: int(value) for name, value in result.all()}
+            large = []
+            for table in stale:
+                estimate = estimates.get(table, 0)
+                if estimate < self.exact_below:
+                    counts[table] = RowCount(await self._count_exact(db, table), estimated=False)
+                else:
+                    counts[table] = RowCount(estimate, estimated=True)
+                    large.append(table)
+            self._schedule_refresh(large)
+
+        return counts
+
+    async def _count_exact(self, db: AsyncSession, table: str) -> int:
+        value = await db.scalar(text(f"SELECT COUNT(*) FROM {table}")) or 0
+        # 小表不缓存：每次都重新计数，新写入的行立即可见
+        if value >= self.exact_below:
+            self._exact[table] = (value, time.monotonic())
+        return value
+
+    def _schedule_refresh(self, tables: Iterable[str]) -> None:
+        """在后台精确计数（独立会话，不占用当前请求）"""
+        pending = [t for t in tables if t not in self._refreshing]
+        if not pending:
+            return
+        self._refreshing.update(pending)
+        task = asyncio.create_task(self._refresh(pending), name="row-count-refresh")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, tables: list) -> None:
+        from app.db.postgres import async_session_factory
+
+        try:
+            async with async_session_factory() as session:
+                for table in tables:
+                    await self._count_exact(session, table)
+            logger.debug(f"Refreshed exact row counts: {', '.join(tables)}")
+        except Exception as e:
+            logger.warning(f"Failed to refresh row counts for {tables}: {e}")
+        finally:
+            self._refreshing.difference_update(tables)
+
+
+# 全局实例（单例）
+row_counter = RowCounter(
+    ttl=settings.ROW_COUNT_CACHE_TTL_S,
+    exact_below=settings.ROW_COUNT_EXACT_BELOW,
+)
@@ -0,0 +1,243 @@
+"""
+Session Backfill - 历史消息 session_id 回填
+
+chat_messages.session_id 上线之前写入的消息没有会话 ID。后台任务按用户分批回填：
+
+- 同一用户的消息按时间排序，相邻两条间隔超过 SESSION_GAP 即切分为新会话（窗口函数 LAG）
+- 每段优先复用该时间段内创建、尚无消息的 chat_sessions 行（对话接口此前已按 30 分钟创建会话），
+  没有则新建一行（created_at 为该段第一条消息的时间）
+- 每批一条 UPDATE 写入 session_id 并重建涉及会话的摘要后提交；新建了会话的用户重建活动统计
+- 全部用户处理完后在 system_configs 中记录完成时间，之后启动时不再扫描
+"""
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import orjson
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.sql.chat_session import ChatSession
+from app.models.sql.system_config import SystemConfig
+from app.services.activity_stats import rebuild_activity_stats
+from app.services.chat_sessions import SESSION_GAP, rebuild_session_summaries
+
+logger = logging.getLogger(__name__)
+
+# 会话在第一条消息之前创建（先取会话再保存消息），匹配时允许的提前量
+CREATED_TOLERANCE = timedelta(minutes=1)
+
+DONE_KEY = "message_session_backfill"
+
+_USERS_SQL = """
+    SELECT id FROM users
+    WHERE CAST(:after AS uuid) IS NULL OR id > CAST(:after AS uuid)
+    ORDER BY id
+    LIMIT :limit
+"""
+
+# 未回填的消息按间隔切分：LAG 取上一条时间，累计求和得到段号
+_SEGMENTS_SQL = """
+    SELECT user_id, MIN(timestamp) AS seg_start, MAX(timestamp) AS seg_end
+    FROM (
+        SELECT user_id, timestamp,
+               SUM(is_start) OVER (PARTITION BY user_id ORDER BY timestamp, id) AS seg
+        FROM (
+            SELECT id, user_id, timestamp,
+                   CASE WHEN timestamp - LAG(timestamp) OVER (PARTITION BY user_id ORDER BY timestamp, id)
+                             <= CAST(:gap AS interval)
+                        THEN 0 ELSE 1 END AS is_start
+            FROM chat_messages
+            WHERE user_id = ANY(CAST(:user_ids AS uuid[])) AND session_id IS NULL
+        ) marked
+    ) numbered
+    GROUP BY user_id, seg
+    ORDER BY user_id, seg_start
+"""
+
+# 尚无消息的会话（回填前创建的会话）
+_EMPTY_SESSIONS_SQL = """
+    SELECT s.id, s.user_id, s.created_at
+    FROM chat_sessions s
+    WHERE s.user_id = ANY(CAST(:user_ids AS uuid[]))
+      AND NOT EXISTS (SELECT 1 FROM chat_messages m WHERE m.session_id = s.id)
+    ORDER BY s.user_id, s.created_at
+"""
+
+_ASSIGN_SQL = """
+    UPDATE chat_messages m
+    SET session_id = seg.session_id
+    FROM unnest(
+        CAST(:user_ids AS uuid[]),
+        CAST(:session_ids AS uuid[]),
+        CAST(:starts AS timestamptz[]),
+        CAST(:ends AS timestamptz[])
+    ) AS seg(user_id, session_id, seg_start, seg_end)
+    WHERE m.user_id = seg.user_id
+      AND m.session_id IS NULL
+      AND m.timestamp BETWEEN seg.seg_start AND seg.seg_end
+"""
+
+
+@dataclass
+class Segment:
+    """一段连续对话（间隔不超过 SESSION_GAP 的消息）"""
+    user_id: uuid.UUID
+    start: datetime
+    end: datetime
+    session_id: Optional[uuid.UUID] = None
+
+
+def assign_sessions(
+    segments: Sequence[Segment],
+    sessions: Sequence[Tuple[uuid.UUID, uuid.UUID, datetime]],
+) -> List[Dict]:
+    """
+    为每段分配会话：复用该段时间范围内最早创建的空会话，否则新建
+
+    Args:
+        segments: 对话段（按用户、开始时间排序），session_id 原地填写
+        sessions: 空会话 (id, user_id, created_at)，按用户、创建时间排序
+
+    Returns:
+        需要新建的会话行
+    """
+    available: Dict[uuid.UUID, List[Tuple[uuid.UUID, datetime]]] = {}
+    for session_id, user_id, created_at in sessions:
+        available.setdefault(user_id, []).append((session_id, created_at))
+
+    new_sessions = []
+    for seg in segments:
+        candidates = available.get(seg.user_id, [])
+        # 早于本段的空会话不会再被后面的段用到
+        while candidates and candidates[0][1] < seg.start - CREATED_TOLERANCE:
+            candidates.pop(0)
+        if candidates and candidates[0][1] <= seg.end:
+            seg.session_id = candidates.pop(0)[0]
+        else:
+            seg.session_id = uuid.uuid4()
+            new_sessions.append({"id": seg.session_id, "user_id": seg.user_id, "created_at": seg.start})
+    return new_sessions
+
+
+async def backfill_users(db: AsyncSession, user_ids: List[uuid.UUID]) -> int:
+    """
+    回填一批用户的历史消息 session_id（不提交）
+
+    Returns:
+        切分出的对话段数
+    """
+    ids = [str(uid) for uid in user_ids]
+    result = await db.execute(text(_SEGMENTS_SQL), {"user_ids": ids, "gap": SESSION_GAP})
+    segments = [Segment(user_id, start, end) for user_id, start, end in result.all()]
+    if not segments:
+        return 0
+
+    result = await db.execute(text(_EMPTY_SESSIONS_SQL), {"user_ids": ids})
+    new_sessions = assign_sessions(segments, result.all())
+    if new_sessions:
+        await db.execute(insert(ChatSession), new_sessions)
+
+    await db.execute(text(_ASSIGN_SQL), {
+        "user_ids": [str(s.user_id) for s in segments],
+        "session_ids": [str(s.session_id) for s in segments],
+        "starts": [s.start for s in segments],
+        "ends": [s.end for s in segments],
+    })
+    await rebuild_session_summaries(db, {s.session_id for s in segments})
+    if new_sessions:
+        await rebuild_activity_stats(db, {s["user_id"] for s in new_sessions})
+    return len(segments)
+
+
+class SessionBackfillJob:
+    """
+    一次性后台回填任务
+
+    - start(): 启动后台任务（已完成过则直接结束）
+    - stop(): 停止；下次启动从头按用户扫描（已回填的消息不再匹配，可重复执行）
+    - 失败只记日志，下次启动重试
+    """
+
+    def __init__(self, batch_users: int = 100, pause: float = 0.1):
+        self.batch_users = batch_users
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+        self.users_done = 0
+        self.segments_done = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """启动后台回填（应用启动时调用）"""
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="message-session-backfill")
+
+    async def stop(self) -> None:
+        """停止后台任务（应用关闭时调用）"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run(self) -> int:
+        """
+        按用户 ID 顺序分批回填全部用户，每批一个事务
+
+        Returns:
+            切分出的对话段总数
+        """
+        from app.db.postgres import async_session_factory
+
+        async with async_session_factory() as session:
+            if await session.get(SystemConfig, DONE_KEY) is not None:
+                return 0
+
+        after: Optional[str] = None
+        while True:
+            async with async_session_factory() as session:
+                result = await session.execute(
+                    text(_USERS_SQL), {"after": after, "limit": self.batch_users}
+                )
+                user_ids = [row[0] for row in result.all()]
+                if not user_ids:
+                    await self._mark_done(session)
+                    await session.commit()
+                    break
+                self.segments_done += await backfill_users(session, user_ids)
+                await session.commit()
+            self.users_done += len(user_ids)
+            after = str(user_ids[-1])
+            await asyncio.sleep(self.pause)
+
+        logger.info(
+            f"Message session backfill done: {self.users_done} users, {self.segments_done} segments"
+        )
+        return self.segments_done
+
+    async def _mark_done(self, session: AsyncSession) -> None:
+        value = orjson.dumps({"completedAt": datetime.now(timezone.utc)}).decode()
+        stmt = pg_insert(SystemConfig).values(key=DONE_KEY, value=value)
+        stmt = stmt.on_conflict_do_update(index_elements=[SystemConfig.key], set_={"value": value})
+        await session.execute(stmt)
+
+    async def _run(self) -> None:
+        try:
+            await self.run()
+        except Exception as e:
+            logger.warning(f"Message session backfill failed: {e}")
+
+
+# 全局实例（单例）
+session_backfill = SessionBackfillJob(batch_users=settings.SESSION_BACKFILL_BATCH_USERS)
@@ -8,6 +8,7 @@ import re
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field, ValidationError
 
+from app.core.timing import span
 from app.services.llm_provider import BaseProvider
 from app.services.llm_config import get_analysis_provider
 from app.schemas.chat import ChatAnalysis
@@ -126,7 +127,7 @@ class TextAnalyzer:
             provider: LLM Provider（如不提供则使用默认配置）
         """
         self.provider = provider or get_analysis_provider()
-        logger.info(f"TextAnalyzer initialized with provider: {type(self.provider).__name__}")
+        logger.debug("TextAnalyzer initialized with provider: %s", type(self.provider).__name__)
 
     async def analyze(
         self,
@@ -143,26 +144,26 @@ class TextAnalyzer:
         Returns:
             ChatAnalysis 对象（符合前端契约）
         """
-        logger.info(f"Analyzing message: {user_message[:100]}...")
+        logger.debug("Analyzing message (%d chars)", len(user_message))
 
         # 构建用户提示词（包含上下文）
-        user_prompt = self._build_user_prompt(user_message, recent_messages)
+        messages = self._build_messages(user_message, recent_messages)
 
         try:
             # 调用 LLM 分析
-            llm_response = await self.provider.complete(
-                system_prompt=self.SYSTEM_PROMPT,
-                user_prompt=user_prompt,
-                temperature=0.3,  # 较低温度以获得更稳定的 JSON 输出
-                max_tokens=800,
-            )
+            with span("analysis.llm"):
+                llm_response = await self.provider.chat(
+                    messages=messages,
+                    temperature=0.3,  # 较低温度以获得更稳定的 JSON 输出
+                    max_tokens=800,
+                )
 
             # 解析 LLM 返回的 JSON
             analysis = self._parse_llm_response(llm_response)
 
-            logger.info(
-                f"LLM analysis successful: intent={analysis.intent}, "
-                f"emotion={analysis.emotion}, concepts={len(analysis.detectedConcepts)}"
+            logger.debug(
+                "LLM analysis successful: intent=%s, emotion=%s, concepts=%d",
+                analysis.intent, analysis.emotion, len(analysis.detectedConcepts)
             )
 
             # 转换为前端 Schema（去掉 evidence）
@@ -186,6 +187,22 @@ class TextAnalyzer:
                 delta=ProfileDelta(**analysis["delta"]),
             )
 
+    def _build_messages(
+        self,
+        user_message: str,
+        recent_messages: Optional[List[Dict[str, str]]] = None,
+    ) -> List[Dict[str, str]]:
+        """
+        构建消息列表
+
+        静态 SYSTEM_PROMPT 单独作为第一条 system 消息（所有分析请求共享同一前缀，
+        可命中上游 prompt 缓存），历史和当前消息只出现在最后一条 user 消息中。
+        """
+        return [
+            {"role": "system", "content": self.SYSTEM_PROMPT},
+            {"role": "user", "content": self._build_user_prompt(user_message, recent_messages)},
+        ]
+
     def _build_user_prompt(
         self,
         user_message: str,
@@ -7,15 +7,26 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.core.config import settings
-from app.core.logging import setup_logging
+from app.core.logging import setup_logging, shutdown_logging
+from app.core.context import RequestContextMiddleware
 from app.db.postgres import init_db as init_postgres, engine as postgres_engine, async_session_factory
 from app.db.neo4j import init_db as init_neo4j, close_db as close_neo4j
 from app.api.router import api_router
 from app.api.admin_router import admin_router
 from app.services import llm_config
+from app.services.llm_usage import usage_recorder
+from app.services.activity_rollup import rollup_job
+from app.services.export_jobs import export_jobs
+from app.services.session_backfill import session_backfill
+from app.services.llm_provider import close_shared_clients
+from app.core.timing import ServerTimingMiddleware
+from app.core.metrics import REGISTRY, CONTENT_TYPE, MetricsMiddleware
+from app.db.query_stats import QueryStatsMiddleware
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import ProfilingMiddleware
 
 # 设置日志
 setup_logging()
@@ -54,6 +65,20 @@ async def lifespan(app: FastAPI):
         async with async_session_factory() as session:
             await llm_config.load_from_db(session)
         logger.info("✅ LLM config loaded from DB")
+
+        # 启动 LLM 用量批量写入任务
+        usage_recorder.start()
+
+        # 启动每日活跃度汇总任务
+        if settings.ANALYTICS_ROLLUP_INTERVAL_S > 0:
+            rollup_job.start()
+
+        # 启动后台导出任务的过期清理
+        export_jobs.start()
+
+        # 回填历史消息的 session_id（完成后不再执行）
+        if settings.SESSION_BACKFILL_BATCH_USERS > 0:
+            session_backfill.start()
     except Exception as e:
         component_status["postgres"] = False
         logger.error(f"❌ PostgreSQL connection failed: {e}")
@@ -66,6 +91,10 @@ async def lifespan(app: FastAPI):
         component_status["neo4j"] = False
         logger.error(f"❌ Neo4j connection failed: {e}")
 
+    # 事件循环延迟监控
+    if settings.LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+
     logger.info(f"🌐 Server running at http://{settings.HOST}:{settings.PORT}")
     logger.info(f"📚 API Docs: http://{settings.HOST}:{settings.PORT}/docs")
     logger.info(f"🔧 Environment: {settings.APP_ENV}")
@@ -75,8 +104,15 @@ async def lifespan(app: FastAPI):
 
     # 关闭时清理资源
     logger.info("🛑 Shutting down CogniSync Backend...")
+    await loop_monitor.stop()
+    await usage_recorder.stop()
+    await rollup_job.stop()
+    await export_jobs.stop()
+    await session_backfill.stop()
+    await close_shared_clients()
     await close_neo4j()
     logger.info("✅ Resources cleaned up")
+    shutdown_logging()
 
 
 # 创建 FastAPI 应用
@@ -104,8 +140,30 @@ app.add_middleware(
     allow_credentials=_allow_credentials,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Query-Count", "X-Query-Time-Ms", "X-Profile-Id", "X-Profile-Status", "X-Request-ID"],
 )
 
+# 分阶段计时：每个响应附带 Server-Timing 头（浏览器 DevTools 可直接查看）
+app.add_middleware(ServerTimingMiddleware)
+
+# SQL 统计：按路由归集查询；调试模式下响应头附带 X-Query-Count / X-Query-Time-Ms
+if settings.SQL_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware, add_header=settings.DEBUG)
+
+# 运行指标：请求耗时、状态码、在途请求数（最外层，覆盖完整处理时间）
+app.add_middleware(MetricsMiddleware)
+
+# 请求上下文：request_id（X-Request-ID）供日志注入
+app.add_middleware(RequestContextMiddleware)
+
+# 按需请求剖析（管理员 + X-Profile 头）；关闭时不注册，零开销
+if settings.PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        sample_interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000,
+        min_interval=settings.PROFILE_MIN_INTERVAL_S,
+    )
+
 
 # Health Check Endpoint
 @app.get("/health", tags=["Health"])
@@ -126,6 +184,14 @@ async def health_check():
     )
 
 
+# 运行指标（Prometheus 抓取端点）
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", tags=["Health"], include_in_schema=False)
+    async def metrics():
+        """Prometheus 文本格式的运行指标"""
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
 # 根路径
 @app.get("/", tags=["Root"])
 async def root():
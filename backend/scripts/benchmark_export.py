@@ -0,0 +1,189 @@
+"""
+研究数据集导出基准测试
+
+对同一数据集比较三条导出路径的耗时、输出字节数与 Python 内存峰值（tracemalloc）:
+- legacy: 旧实现（一次取回全部行 → 逐行逐值转换 → csv.DictWriter 写入 StringIO）
+- cursor: 服务端游标分批读取 + 增量 CSV 编码（app.services.data_export.stream_csv）
+- copy:   COPY (...) TO STDOUT WITH CSV，字节直接转发（app.services.data_export.stream_copy）
+
+合成数据（百万级消息，挂在一个基准测试用户下，--cleanup 删除）:
+    poetry run python scripts/benchmark_export.py --seed-messages 1000000
+    poetry run python scripts/benchmark_export.py --dataset conversations --report reports/export.json
+    poetry run python scripts/benchmark_export.py --cleanup
+
+注意：tracemalloc 只统计 Python 分配，asyncpg 的 C 缓冲区不在其中；legacy 路径的峰值约等于整个结果集。
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict
+
+from sqlalchemy import text
+
+from app.db.postgres import engine
+from app.services import research_datasets
+from app.services.data_export import stream_copy, stream_csv
+from app.services.research_datasets import Dataset
+
+BENCH_STUDENT_ID = "bench-export"
+
+DATASETS: Dict[str, Callable[[], Dataset]] = {
+    "conversations": research_datasets.conversations,
+    "scale_responses": research_datasets.scale_responses,
+    "learner_profiles": research_datasets.learner_profiles,
+}
+
+
+# ========== 合成数据 ==========
+
+async def seed_messages(count: int, batch: int = 200_000) -> None:
+    """为基准测试用户插入 count 条合成消息（分批，避免单个超大事务）"""
+    async with engine.begin() as conn:
+        user_id = await conn.scalar(text("""
+            INSERT INTO users (id, student_id, name, role, is_active, has_completed_onboarding, created_at)
+            VALUES (gen_random_uuid(), :sid, 'Export Benchmark', 'learner', TRUE, TRUE, now())
+            ON CONFLICT (student_id) DO UPDATE SET name = EXCLUDED.name
+            RETURNING id
+        """), {"sid": BENCH_STUDENT_ID})
+
+    inserted = 0
+    while inserted < count:
+        n = min(batch, count - inserted)
+        async with engine.begin() as conn:
+            await conn.execute(text("""
+                INSERT INTO chat_messages (id, user_id, role, text, timestamp, analysis)
+                SELECT
+                    gen_random_uuid(),
+                    :uid,
+                    CASE WHEN g % 2 = 0 THEN 'USER' ELSE 'ASSISTANT' END,
+                    repeat('递归函数需要一个终止条件。', 1 + g % 8),
+                    now() - make_interval(secs => g),
+                    jsonb_build_object('detectedConcepts', jsonb_build_array('递归', '栈'))
+                FROM generate_series(:start, :stop) AS g
+            """), {"uid": user_id, "start": inserted, "stop": inserted + n - 1})
+        inserted += n
+        print(f"  seeded {inserted}/{count} messages")
+
+
+async def cleanup() -> None:
+    """删除基准测试用户（消息随外键级联删除）"""
+    async with engine.begin() as conn:
+        await conn.execute(text("DELETE FROM users WHERE student_id = :sid"), {"sid": BENCH_STUDENT_ID})
+    print("🧹 benchmark user removed")
+
+
+# ========== 导出路径 ==========
+
+async def legacy_csv(dataset: Dataset) -> AsyncIterator[bytes]:
+    """旧实现：全部行载入内存后一次性编码"""
+    async with engine.connect() as conn:
+        result = await conn.execute(text(dataset.sql), dataset.params)
+        rows = []
+        for r in result:
+            row = dict(r._mapping)
+            if dataset.transform is not None:
+                row = dict(dataset.transform(row))
+            for k, v in row.items():
+                if isinstance(v, datetime):
+                    row[k] = v.isoformat()
+                elif v is None:
+                    row[k] = ""
+            rows.append(row)
+    output = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(output, fieldnames=rows[0].keys(), extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    yield output.getvalue().encode("utf-8")
+
+
+PATHS: Dict[str, Callable[[Dataset], AsyncIterator[bytes]]] = {
+    "legacy": legacy_csv,
+    "cursor": stream_csv,
+    "copy": stream_copy,
+}
+
+
+async def measure(name: str, dataset: Dataset) -> Dict[str, Any]:
+    """消费一条导出路径的全部输出，记录耗时 / 字节数 / 首块延迟 / 内存峰值"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_chunk_ms = None
+    total_bytes = 0
+    chunks = 0
+    async for chunk in PATHS[name](dataset):
+        if first_chunk_ms is None:
+            first_chunk_ms = (time.perf_counter() - started) * 1000
+        total_bytes += len(chunk)
+        chunks += 1
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "path": name,
+        "seconds": round(elapsed, 3),
+        "first_chunk_ms": round(first_chunk_ms or 0.0, 1),
+        "bytes": total_bytes,
+        "chunks": chunks,
+        "mb_per_s": round(total_bytes / 1e6 / elapsed, 2) if elapsed else None,
+        "python_peak_mb": round(peak / 1e6, 1),
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    if args.cleanup:
+        await cleanup()
+        return {}
+    if args.seed_messages:
+        await seed_messages(args.seed_messages)
+
+    results = []
+    for name in args.paths:
+        dataset = DATASETS[args.dataset]()
+        if name == "copy" and not dataset.copyable:
+            continue
+        for i in range(args.repeat):
+            res = await measure(name, dataset)
+            res["run"] = i + 1
+            results.append(res)
+            print(
+                f"  {name:<7} run {i + 1}: {res['seconds']:>8.2f}s  "
+                f"{res['bytes'] / 1e6:>9.1f} MB  first chunk {res['first_chunk_ms']:>8.1f} ms  "
+                f"peak {res['python_peak_mb']:>8.1f} MB"
+            )
+    await engine.dispose()
+    return {
+        "dataset": args.dataset,
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="研究数据集导出基准测试")
+    parser.add_argument("--dataset", choices=sorted(DATASETS), default="conversations", help="数据集")
+    parser.add_argument("--paths", nargs="+", choices=list(PATHS), default=list(PATHS), help="要比较的导出路径")
+    parser.add_argument("--repeat", type=int, default=1, help="每条路径重复次数")
+    parser.add_argument("--seed-messages", type=int, default=0, help="先插入 N 条合成消息")
+    parser.add_argument("--cleanup", action="store_true", help="删除基准测试用户及其数据后退出")
+    parser.add_argument("--report", type=Path, help="JSON 报告输出路径")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run(args))
+    if args.report and report:
+        args.report.parent.mkdir(parents=True, exist_ok=True)
+        args.report.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+        print(f"📄 report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
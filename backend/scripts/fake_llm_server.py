@@ -0,0 +1,302 @@
+"""
+本地 OpenAI 兼容的 LLM 替身服务
+用于压测和 CI：在无网络环境下真实地走 OpenAICompatibleProvider 的 HTTP 路径
+
+支持：
+- POST /chat/completions（以及 /v1/chat/completions），含 stream=true 的 SSE 流式响应
+- 可配置的首 token 延迟分布、生成速度（tokens/sec）
+- 故障注入：5xx 错误率、429 限流率、卡顿（stall）率
+- usage 字段（含模拟的 prompt 前缀缓存命中数，兼容 OpenAI / DeepSeek 两种格式）
+- GET /stats 查看请求统计，POST /stats/reset 清零
+
+运行方式:
+    poetry run python scripts/fake_llm_server.py --port 8089 --ttft-ms 400 --tokens-per-sec 40
+
+后端指向替身服务:
+    LLM_PROVIDER=openai OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=fake
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.llm_provider import MockProvider
+
+# 老师回复的模拟文本（按需截断/重复到目标 token 数）
+TEACHER_REPLY = (
+    "这个问题问得很好。我们先不急着看答案，你觉得这里的关键变量是什么？"
+    "试着用自己的话说一说它在每一步是怎么变化的，再想想如果换一个输入会发生什么。"
+)
+
+# DeepSeek 上下文缓存以 64 token 为单位命中
+CACHE_BLOCK_TOKENS = 64
+
+
+@dataclass
+class FakeLLMConfig:
+    """替身服务配置"""
+    ttft_ms: float = 300.0                 # 首 token 延迟均值（毫秒）
+    ttft_jitter_ms: float = 100.0          # 首 token 延迟抖动（标准差 / 半宽，取决于分布）
+    latency_dist: str = "lognormal"        # fixed | uniform | normal | lognormal
+    tokens_per_sec: float = 50.0           # 生成速度
+    completion_tokens: int = 80            # 平均输出 token 数（受请求的 max_tokens 限制）
+    error_rate: float = 0.0                # 返回 500 的概率
+    rate_limit_rate: float = 0.0           # 返回 429 的概率
+    retry_after_s: float = 1.0             # 429 响应的 Retry-After
+    stall_rate: float = 0.0                # 卡顿概率（非流式：迟迟不响应；流式：首个分片后停住）
+    stall_seconds: float = 120.0           # 卡顿时长
+    prefix_cache: bool = True              # 是否模拟 prompt 前缀缓存
+    model: str = "fake-llm"
+    seed: Optional[int] = None
+
+
+def count_tokens(text: str) -> int:
+    """粗略估算 token 数：CJK 字符每字 1 token，其余每 4 字符 1 token"""
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class PrefixCache:
+    """按消息边界模拟上游 prompt 前缀缓存（LRU）"""
+
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, None]" = OrderedDict()
+
+    def lookup_and_store(self, messages: List[Dict[str, str]]) -> int:
+        """返回命中缓存的 token 数，并把本次请求的所有前缀写入缓存"""
+        digest = hashlib.sha256()
+        cached_tokens = 0
+        prefix_tokens = 0
+        prefixes = []
+        for msg in messages:
+            digest.update(json.dumps(msg, ensure_ascii=False, sort_keys=True).encode())
+            key = digest.hexdigest()
+            prefix_tokens += count_tokens(msg.get("content", ""))
+            prefixes.append(key)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                cached_tokens = prefix_tokens
+
+        for key in prefixes:
+            self._entries[key] = None
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        return cached_tokens // CACHE_BLOCK_TOKENS * CACHE_BLOCK_TOKENS
+
+
+def create_app(config: Optional[FakeLLMConfig] = None) -> FastAPI:
+    """创建替身服务应用（测试中可直接通过 ASGI 调用）"""
+    config = config or FakeLLMConfig()
+    rng = random.Random(config.seed)
+    cache = PrefixCache()
+    mock = MockProvider(role="fake-server")
+    stats: Counter = Counter()
+
+    app = FastAPI(title="Fake LLM Server")
+    app.state.config = config
+    app.state.stats = stats
+
+    def sample_ttft() -> float:
+        """按配置的分布采样首 token 延迟（秒）"""
+        mean, jitter = config.ttft_ms, config.ttft_jitter_ms
+        if config.latency_dist == "fixed" or jitter <= 0:
+            value = mean
+        elif config.latency_dist == "uniform":
+            value = rng.uniform(mean - jitter, mean + jitter)
+        elif config.latency_dist == "normal":
+            value = rng.gauss(mean, jitter)
+        elif mean <= 0:
+            value = 0.0
+        else:
+            # 对数正态：长尾分布，更接近真实 API 的延迟（按均值和标准差反解参数）
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            value = rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, value) / 1000
+
+    def build_reply(messages: List[Dict[str, str]], max_tokens: int) -> str:
+        """分析类请求返回 MockProvider 的 JSON，对话类请求返回老师回复"""
+        system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+        if "JSON" in system or "json" in system:
+            user_prompt = "\n".join(m["content"] for m in messages if m.get("role") == "user")
+            return json.dumps(mock._generate_mock_response(user_prompt), ensure_ascii=False)
+
+        target = max(1, min(max_tokens, int(rng.gauss(config.completion_tokens, config.completion_tokens / 4))))
+        reply = ""
+        while count_tokens(reply) < target:
+            reply += TEACHER_REPLY
+        return reply[:target]
+
+    def usage_for(messages: List[Dict[str, str]], reply: str) -> Dict[str, Any]:
+        prompt_tokens = sum(count_tokens(m.get("content", "")) for m in messages)
+        cached = cache.lookup_and_store(messages) if config.prefix_cache else 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": count_tokens(reply),
+            "total_tokens": prompt_tokens + count_tokens(reply),
+            "prompt_tokens_details": {"cached_tokens": cached},
+            "prompt_cache_hit_tokens": cached,
+            "prompt_cache_miss_tokens": prompt_tokens - cached,
+        }
+
+    @app.post("/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        max_tokens = int(body.get("max_tokens") or 1000)
+        stream = bool(body.get("stream"))
+        stats["requests"] += 1
+
+        # 故障注入
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"Retry-After": str(config.retry_after_s)},
+                content={"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+            )
+        roll -= config.rate_limit_rate
+        if roll < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse(
+                status_code=500,
+                content={"error": {"message": "Injected upstream failure", "type": "server_error"}},
+            )
+        roll -= config.error_rate
+        stall = roll < config.stall_rate
+        if stall:
+            stats["stalled"] += 1
+
+        reply = build_reply(messages, max_tokens)
+        usage = usage_for(messages, reply)
+        stats["prompt_tokens"] += usage["prompt_tokens"]
+        stats["cached_tokens"] += usage["prompt_tokens_details"]["cached_tokens"]
+        stats["completion_tokens"] += usage["completion_tokens"]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+
+        if not stream:
+            await asyncio.sleep(config.stall_seconds if stall else 0)
+            await asyncio.sleep(sample_ttft() + usage["completion_tokens"] / config.tokens_per_sec)
+            stats["ok"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model") or config.model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def event_stream():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": body.get("model") or config.model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                    **extra,
+                }
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+            await asyncio.sleep(sample_ttft())
+            yield chunk({"role": "assistant", "content": ""})
+
+            # 每个分片约 4 个字符，按 tokens/sec 控制节奏
+            pieces = [reply[i:i + 4] for i in range(0, len(reply), 4)]
+            for index, piece in enumerate(pieces):
+                if stall and index == 1:
+                    await asyncio.sleep(config.stall_seconds)
+                await asyncio.sleep(count_tokens(piece) / config.tokens_per_sec)
+                yield chunk({"content": piece})
+
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                yield chunk(None, usage=usage)
+            yield "data: [DONE]\n\n"
+            stats["ok"] += 1
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.get("/models")
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": config.model, "object": "model", "owned_by": "fake"}]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return {"config": asdict(config), "stats": dict(stats)}
+
+    @app.post("/stats/reset")
+    async def reset_stats():
+        stats.clear()
+        return {"ok": True}
+
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    defaults = FakeLLMConfig()
+    parser = argparse.ArgumentParser(description="OpenAI 兼容的本地 LLM 替身服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--ttft-ms", type=float, default=defaults.ttft_ms, help="首 token 延迟均值（毫秒）")
+    parser.add_argument("--ttft-jitter-ms", type=float, default=defaults.ttft_jitter_ms, help="首 token 延迟抖动（毫秒）")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "normal", "lognormal"], default=defaults.latency_dist)
+    parser.add_argument("--tokens-per-sec", type=float, default=defaults.tokens_per_sec, help="生成速度")
+    parser.add_argument("--completion-tokens", type=int, default=defaults.completion_tokens, help="平均输出 token 数")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="500 错误率 [0-1]")
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="429 限流率 [0-1]")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after_s, help="429 的 Retry-After 秒数")
+    parser.add_argument("--stall-rate", type=float, default=defaults.stall_rate, help="卡顿率 [0-1]")
+    parser.add_argument("--stall-seconds", type=float, default=defaults.stall_seconds, help="卡顿时长（秒）")
+    parser.add_argument("--no-prefix-cache", action="store_true", help="关闭 prompt 前缀缓存模拟")
+    parser.add_argument("--model", default=defaults.model)
+    parser.add_argument("--seed", type=int, default=None, help="随机种子（用于可复现的压测）")
+    return parser.parse_args()
+
+
+def main():
+    import uvicorn
+
+    args = parse_args()
+    config = FakeLLMConfig(
+        ttft_ms=args.ttft_ms,
+        ttft_jitter_ms=args.ttft_jitter_ms,
+        latency_dist=args.latency_dist,
+        tokens_per_sec=args.tokens_per_sec,
+        completion_tokens=args.completion_tokens,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after_s=args.retry_after,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+        prefix_cache=not args.no_prefix_cache,
+        model=args.model,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
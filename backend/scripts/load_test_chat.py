@@ -0,0 +1,440 @@
+"""
+聊天链路端到端压测工具
+
+注册 N 个合成学生，按目标到达率（泊松过程）回放多轮对话（含研究模式的 currentCode / taskPrompt），
+统计各端点与各流水线阶段（解析 Server-Timing 响应头）的吞吐量和 p50 / p95 / p99 延迟，
+输出机器可读的 JSON 报告，可与上一版本的报告对比以发现性能回退。
+
+典型用法（本地 Postgres / Neo4j 容器 + LLM 替身服务）:
+    docker compose -f docker-compose.yml -f docker-compose.loadtest.yml up -d
+    poetry run python scripts/load_test_chat.py --base-url http://localhost:8000 \\
+        --students 50 --rate 5 --duration 120 --report reports/load.json
+
+与基线对比（p95 或吞吐量回退超过阈值时返回非零退出码，便于 CI 使用）:
+    poetry run python scripts/load_test_chat.py ... --baseline reports/baseline.json --max-regression 20
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# ========== 对话脚本 ==========
+
+BUBBLE_SORT_CODE = """def bubble_sort(arr):
+    n = len(arr)
+    for i in range(n):
+        for j in range(0, n - i):
+            if arr[j] > arr[j + 1]:
+                arr[j], arr[j + 1] = arr[j + 1], arr[j]
+    return arr
+"""
+
+BINARY_SEARCH_CODE = """def binary_search(arr, target):
+    left, right = 0, len(arr)
+    while left < right:
+        mid = (left + right) // 2
+        if arr[mid] == target:
+            return mid
+        elif arr[mid] < target:
+            left = mid
+        else:
+            right = mid
+    return -1
+"""
+
+CONVERSATIONS: List[Dict[str, Any]] = [
+    {
+        "name": "neural-networks",
+        "research": False,
+        "turns": [
+            "我想学习神经网络，应该从哪里开始？",
+            "激活函数是做什么用的？",
+            "我对反向传播还是不太理解，能再解释一下吗？",
+            "我觉得梯度下降就是沿着坡往下走，对吗？",
+            "那学习率太大会怎么样？",
+            "懂了",
+            "我的目标是这周把一个简单的全连接网络自己实现出来",
+        ],
+    },
+    {
+        "name": "overfitting",
+        "research": False,
+        "turns": [
+            "什么是过拟合？",
+            "为什么训练集准确率很高测试集却很低？",
+            "正则化是怎么缓解过拟合的？",
+            "我认为 dropout 也是一种正则化",
+            "好的，我明白了",
+        ],
+    },
+    {
+        "name": "research-bubble-sort",
+        "research": True,
+        "taskPrompt": "本节课目标：理解冒泡排序的比较与交换过程，能够独立找出边界错误。",
+        "turns": [
+            ("我的冒泡排序运行时报 IndexError，不知道为什么", BUBBLE_SORT_CODE),
+            ("是不是内层循环的范围有问题？", BUBBLE_SORT_CODE),
+            ("我把 n - i 改成 n - i - 1 了", BUBBLE_SORT_CODE.replace("n - i)", "n - i - 1)")),
+            ("现在能跑了，怎么判断它已经排好序可以提前结束？", BUBBLE_SORT_CODE.replace("n - i)", "n - i - 1)")),
+            ("完成了", BUBBLE_SORT_CODE.replace("n - i)", "n - i - 1)")),
+        ],
+    },
+    {
+        "name": "research-binary-search",
+        "research": True,
+        "taskPrompt": "本节课目标：掌握二分查找的循环不变量，避免死循环。",
+        "turns": [
+            ("我的二分查找有时候会卡住不返回", BINARY_SEARCH_CODE),
+            ("为什么 left = mid 会死循环？", BINARY_SEARCH_CODE),
+            ("我改成 left = mid + 1 了，这样对吗？", BINARY_SEARCH_CODE.replace("left = mid\n", "left = mid + 1\n")),
+            ("我理解了", BINARY_SEARCH_CODE.replace("left = mid\n", "left = mid + 1\n")),
+        ],
+    },
+]
+
+
+# ========== 统计 ==========
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩法百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """延迟分布摘要（毫秒）"""
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 2) if ordered else 0.0,
+        "p50": round(percentile(ordered, 50), 2),
+        "p95": round(percentile(ordered, 95), 2),
+        "p99": round(percentile(ordered, 99), 2),
+        "max": round(ordered[-1], 2) if ordered else 0.0,
+    }
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """解析 Server-Timing 响应头：'analysis;dur=812.3, llm_reply;dur=1503' -> {name: ms}"""
+    timings: Dict[str, float] = {}
+    if not header:
+        return timings
+    for entry in header.split(","):
+        parts = [p.strip() for p in entry.split(";")]
+        if not parts[0]:
+            continue
+        for param in parts[1:]:
+            if param.startswith("dur="):
+                try:
+                    timings[parts[0]] = float(param[4:])
+                except ValueError:
+                    pass
+    return timings
+
+
+@dataclass
+class Recorder:
+    """按端点 / 阶段收集延迟与状态码"""
+    latencies: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    statuses: Dict[str, Counter] = field(default_factory=lambda: defaultdict(Counter))
+    stages: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    arrival_lag_ms: List[float] = field(default_factory=list)
+    enabled: bool = False
+
+    def record(self, endpoint: str, status: str, elapsed_ms: float, server_timing: Optional[str] = None):
+        if not self.enabled:
+            return
+        self.statuses[endpoint][status] += 1
+        if status.startswith("2"):
+            self.latencies[endpoint].append(elapsed_ms)
+            for stage, dur in parse_server_timing(server_timing).items():
+                self.stages[stage].append(dur)
+
+
+# ========== 合成学生 ==========
+
+@dataclass
+class Student:
+    """合成学生：持有 token 与当前对话进度"""
+    student_id: str
+    token: str = ""
+    user_id: str = ""
+    conversation: Dict[str, Any] = field(default_factory=dict)
+    turn: int = 0
+
+
+async def timed_request(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    endpoint: str,
+    method: str,
+    url: str,
+    **kwargs,
+) -> Optional[httpx.Response]:
+    """发送请求并记录耗时与状态（网络错误记为 'error'）"""
+    start = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.record(endpoint, f"error:{type(e).__name__}", (time.perf_counter() - start) * 1000)
+        return None
+    recorder.record(
+        endpoint,
+        str(response.status_code),
+        (time.perf_counter() - start) * 1000,
+        response.headers.get("Server-Timing"),
+    )
+    return response
+
+
+async def register_students(
+    client: httpx.AsyncClient,
+    count: int,
+    run_id: str,
+    concurrency: int,
+) -> List[Student]:
+    """并发注册合成学生（量表模式，注册即生成初始画像）"""
+    semaphore = asyncio.Semaphore(concurrency)
+    students = [Student(student_id=f"lt-{run_id}-{i:05d}") for i in range(count)]
+
+    async def register(student: Student):
+        async with semaphore:
+            response = await client.post("/api/auth/register", json={
+                "student_id": student.student_id,
+                "name": f"压测学生{student.student_id[-5:]}",
+                "password": "loadtest-pass",
+                "mode": "scale",
+            })
+            response.raise_for_status()
+            data = response.json()
+            student.token = data["token"]
+            student.user_id = str(data["user"]["id"])
+
+    await asyncio.gather(*(register(s) for s in students))
+    return students
+
+
+async def run_turn(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    student: Student,
+    rng: random.Random,
+    research_ratio: float,
+):
+    """执行一轮对话；新对话开始时请求问候语，对话结束时刷新会话列表"""
+    headers = {"Authorization": f"Bearer {student.token}"}
+
+    if not student.conversation or student.turn >= len(student.conversation["turns"]):
+        pool = [c for c in CONVERSATIONS if c["research"] == (rng.random() < research_ratio)] or CONVERSATIONS
+        student.conversation = rng.choice(pool)
+        student.turn = 0
+        await timed_request(client, recorder, "GET /api/chat/greeting", "GET", "/api/chat/greeting", headers=headers)
+
+    conversation = student.conversation
+    turn = conversation["turns"][student.turn]
+    message, code = turn if isinstance(turn, tuple) else (turn, None)
+    payload: Dict[str, Any] = {
+        "userId": student.user_id,
+        "message": message,
+        "language": "zh",
+        "isResearchMode": conversation["research"],
+    }
+    if conversation["research"]:
+        payload["currentCode"] = code
+        payload["taskPrompt"] = conversation.get("taskPrompt")
+
+    await timed_request(client, recorder, "POST /api/chat", "POST", "/api/chat", headers=headers, json=payload)
+    student.turn += 1
+
+    if student.turn >= len(conversation["turns"]):
+        await timed_request(client, recorder, "GET /api/chat/sessions", "GET", "/api/chat/sessions", headers=headers)
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    """执行压测并返回报告"""
+    rng = random.Random(args.seed)
+    run_id = uuid.uuid4().hex[:8]
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        print(f"👥 Registering {args.students} synthetic students (run {run_id})...")
+        reg_start = time.perf_counter()
+        students = await register_students(client, args.students, run_id, concurrency=min(args.students, 20))
+        print(f"   done in {time.perf_counter() - reg_start:.1f}s")
+
+        idle: asyncio.Queue = asyncio.Queue()
+        for student in students:
+            idle.put_nowait(student)
+
+        in_flight: set = set()
+
+        async def turn_task(student: Student):
+            try:
+                await run_turn(client, recorder, student, rng, args.research_ratio)
+            finally:
+                idle.put_nowait(student)
+
+        print(f"🚀 Running {args.duration}s at {args.rate} turns/s (warmup {args.warmup}s)...")
+        loop = asyncio.get_running_loop()
+        started_at = datetime.now(timezone.utc)  # 开始发压（预热开始）的时刻
+        started = loop.time()
+        warmup_end = started + args.warmup
+        end = warmup_end + args.duration
+        next_arrival = started
+
+        while True:
+            next_arrival += rng.expovariate(args.rate)
+            if next_arrival >= end:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - loop.time()))
+            if not recorder.enabled and loop.time() >= warmup_end:
+                recorder.enabled = True
+
+            # 所有学生都在等待回复时，到达被推迟：记录推迟时长（压测端饱和信号）
+            wait_start = loop.time()
+            student = await idle.get()
+            if recorder.enabled:
+                recorder.arrival_lag_ms.append((loop.time() - wait_start) * 1000)
+
+            task = asyncio.create_task(turn_task(student))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        measured_end = loop.time()
+        if in_flight:
+            print(f"⏳ Waiting for {len(in_flight)} in-flight turns...")
+            await asyncio.wait(in_flight, timeout=args.timeout)
+        elapsed = max(1e-9, min(measured_end, end) - warmup_end)
+
+        fake_llm_stats = None
+        if args.fake_llm_url:
+            try:
+                fake_llm_stats = (await client.get(f"{args.fake_llm_url.rstrip('/')}/stats")).json().get("stats")
+            except httpx.HTTPError as e:
+                print(f"⚠️ Failed to fetch fake LLM stats: {e}")
+
+    endpoints = {}
+    for endpoint, statuses in sorted(recorder.statuses.items()):
+        total = sum(statuses.values())
+        ok = len(recorder.latencies[endpoint])
+        endpoints[endpoint] = {
+            "requests": total,
+            "errors": total - ok,
+            "errorRate": round((total - ok) / total, 4) if total else 0.0,
+            "throughputRps": round(ok / elapsed, 3),
+            "statuses": dict(statuses),
+            "latencyMs": summarize(recorder.latencies[endpoint]),
+        }
+
+    return {
+        "tool": "load_test_chat",
+        "runId": run_id,
+        "startedAt": started_at.isoformat(),
+        "config": {
+            "baseUrl": args.base_url,
+            "students": args.students,
+            "targetRate": args.rate,
+            "durationS": args.duration,
+            "warmupS": args.warmup,
+            "researchRatio": args.research_ratio,
+            "seed": args.seed,
+        },
+        "measuredDurationS": round(elapsed, 2),
+        "endpoints": endpoints,
+        "stagesMs": {stage: summarize(values) for stage, values in sorted(recorder.stages.items())},
+        "arrivalLagMs": summarize(recorder.arrival_lag_ms),
+        "fakeLlm": fake_llm_stats,
+    }
+
+
+# ========== 报告 ==========
+
+def print_report(report: Dict[str, Any]):
+    """控制台摘要"""
+    print("\n" + "=" * 96)
+    print(f"{'endpoint / stage':40} {'count':>7} {'rps':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    print("-" * 96)
+    for name, ep in report["endpoints"].items():
+        lat = ep["latencyMs"]
+        print(f"{name:40} {ep['requests']:>7} {ep['throughputRps']:>8.2f} {ep['errorRate'] * 100:>6.1f} "
+              f"{lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f}")
+    for name, lat in report["stagesMs"].items():
+        print(f"  · {name:38} {lat['count']:>7} {'':>8} {'':>6} {lat['p50']:>9.1f} {lat['p95']:>9.1f} {lat['p99']:>9.1f}")
+    lag = report["arrivalLagMs"]
+    if lag["p95"] >= 1.0:
+        print(f"\n⚠️ Arrivals delayed (all students busy): p95={lag['p95']:.1f}ms — add --students for open-loop load")
+    print("=" * 96)
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], max_regression_pct: float) -> List[str]:
+    """与基线报告对比 p95 与吞吐量，返回超过阈值的回退项"""
+    regressions = []
+    for name, ep in report["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(name)
+        if not base:
+            continue
+        base_p95, p95 = base["latencyMs"]["p95"], ep["latencyMs"]["p95"]
+        if base_p95 > 0 and (p95 - base_p95) / base_p95 * 100 > max_regression_pct:
+            regressions.append(f"{name} p95 {base_p95:.1f}ms -> {p95:.1f}ms")
+        base_rps, rps = base["throughputRps"], ep["throughputRps"]
+        if base_rps > 0 and (base_rps - rps) / base_rps * 100 > max_regression_pct:
+            regressions.append(f"{name} throughput {base_rps:.2f} -> {rps:.2f} rps")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="聊天链路端到端压测")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="后端地址")
+    parser.add_argument("--students", type=int, default=20, help="合成学生数")
+    parser.add_argument("--rate", type=float, default=2.0, help="目标到达率（对话轮次/秒）")
+    parser.add_argument("--duration", type=float, default=60.0, help="统计时长（秒）")
+    parser.add_argument("--warmup", type=float, default=10.0, help="预热时长（秒，不计入统计）")
+    parser.add_argument("--research-ratio", type=float, default=0.3, help="研究模式对话占比 [0-1]")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单请求超时（秒）")
+    parser.add_argument("--max-connections", type=int, default=200, help="压测端最大连接数")
+    parser.add_argument("--fake-llm-url", default=None, help="LLM 替身服务地址（报告中附带其统计）")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子")
+    parser.add_argument("--report", default=None, help="JSON 报告输出路径")
+    parser.add_argument("--baseline", default=None, help="基线 JSON 报告路径")
+    parser.add_argument("--max-regression", type=float, default=20.0, help="允许的回退百分比")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run_load(args))
+    print_report(report)
+
+    if args.report:
+        path = Path(args.report)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"📄 Report written to {path}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_with_baseline(report, baseline, args.max_regression)
+        if regressions:
+            print("❌ Regressions vs baseline:")
+            for item in regressions:
+                print(f"   - {item}")
+            sys.exit(1)
+        print("✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sess
 from main import app
 from app.db.postgres import get_db
 from app.models.sql.base import Base
+from app.models.sql.user import User
 from app.core.config import settings
 
 # 测试数据库 URL（必须是 PostgreSQL，不支持 SQLite）
@@ -62,6 +63,16 @@ async def test_db():
     app.dependency_overrides.clear()
 
 
+@pytest.fixture
+async def db_user(test_db) -> uuid.UUID:
+    """直接写入一个用户（不经过注册接口，不生成画像 / 统计），返回用户 ID"""
+    async with test_db() as session:
+        user = User(student_id=f"db_{uuid.uuid4().hex[:8]}", name="数据库测试用户")
+        session.add(user)
+        await session.commit()
+        return user.id
+
+
 @pytest.fixture
 async def client(test_db):
     """普通用户测试客户端（无认证）"""
@@ -0,0 +1,99 @@
+"""
+共享的数据库会话替身 - Shared session doubles
+
+单元测试不连接数据库，只检查生成的语句；需要真实执行 SQL 的测试使用 conftest.py 的 test_db。
+
+  db = RecordingSession(result=FakeResult(row=(55, 0, 100, T0)))
+  db = RecordingSession(responses={"LAG(timestamp)": FakeResult(rows=segments)})
+  db.sql(0)  # 第一条语句按 PostgreSQL 方言编译后的文本
+"""
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.sql.elements import TextClause
+
+
+def compile_pg(stmt) -> str:
+    """按 PostgreSQL 方言编译语句；text() 语句保持原文（保留 :name 参数）"""
+    if isinstance(stmt, (str, TextClause)):
+        return str(stmt)
+    return str(stmt.compile(dialect=postgresql.dialect()))
+
+
+class FakeResult:
+    """execute() 的结果替身：rows 供 all() / scalars().all()，row 供 one() / scalar()"""
+
+    def __init__(self, rows=None, row=None, rowcount=0):
+        self._rows = rows or []
+        self._row = row
+        self.rowcount = rowcount
+
+    def all(self):
+        return list(self._rows)
+
+    def scalars(self):
+        return self
+
+    def one(self):
+        return self._row
+
+    def scalar(self):
+        return self._row
+
+    def scalar_one_or_none(self):
+        return self._row
+
+
+class RecordingSession:
+    """
+    AsyncSession 替身：记录执行的语句与参数、暂存的对象，以及 flush / commit 次数
+
+    Args:
+        result: 默认结果
+        responses: {SQL 片段: 结果}，语句包含该片段时返回对应结果（按插入顺序匹配第一个）
+        get_result: get() 的返回值
+    """
+
+    def __init__(self, result=None, responses=None, get_result=None):
+        self.result = result if result is not None else FakeResult()
+        self.responses = responses or {}
+        self.get_result = get_result
+        self.statements = []
+        self.added = []
+        self.flushes = 0
+        self.commits = 0
+
+    def sql(self, index: int) -> str:
+        return compile_pg(self.statements[index][0])
+
+    @property
+    def sqls(self) -> list:
+        return [compile_pg(stmt) for stmt, _ in self.statements]
+
+    def _respond(self, stmt) -> FakeResult:
+        sql = compile_pg(stmt)
+        for fragment, result in self.responses.items():
+            if fragment in sql:
+                return result
+        return self.result
+
+    async def execute(self, stmt, params=None):
+        self.statements.append((stmt, params))
+        return self._respond(stmt)
+
+    async def scalar(self, stmt, params=None):
+        self.statements.append((stmt, params))
+        return self._respond(stmt).scalar()
+
+    async def get(self, model, key):
+        return self.get_result
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def add_all(self, objs):
+        self.added.extend(objs)
+
+    async def flush(self):
+        self.flushes += 1
+
+    async def commit(self):
+        self.commits += 1
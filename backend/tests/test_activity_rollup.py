@@ -0,0 +1,128 @@
+"""
+每日活跃度汇总单元测试
+测试 1-2 不连接数据库：检查区间解析与汇总语句的参数；测试 3 在测试数据库上执行汇总并读取按日 / 按周趋势
+"""
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.api.endpoints.admin.analytics import MAX_RANGE_DAYS, _resolve_range, get_analytics_overview
+from app.models.sql.daily_activity import DailyActiveUser, DailyActivity, DailyConcept
+from app.models.sql.message import ChatMessage, MessageRole
+from app.models.sql.user import User
+from app.services.activity_rollup import refresh_days, utc_today
+from tests.fakes import RecordingSession
+
+
+def test_resolve_range():
+    """
+    测试 1: 默认最近 7 天；倒置或过长的区间返回 400
+    """
+    start, end = _resolve_range(None, None)
+    assert end == utc_today()
+    assert (end - start).days == 6
+
+    start, end = _resolve_range(date(2025, 9, 1), date(2026, 1, 31))
+    assert start == date(2025, 9, 1)
+
+    with pytest.raises(HTTPException) as exc:
+        _resolve_range(date(2025, 9, 2), date(2025, 9, 1))
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException):
+        _resolve_range(date(2020, 1, 1), date(2020, 1, 1) + timedelta(days=MAX_RANGE_DAYS))
+
+    print("✅ Test 1 passed: date range resolution")
+
+
+@pytest.mark.asyncio
+async def test_refresh_days_statements():
+    """
+    测试 2: 重算区间为 5 条集合式语句，时间边界为 UTC 零点（结束日期次日零点，不含）
+    """
+    db = RecordingSession()
+    days = await refresh_days(db, date(2026, 3, 1), date(2026, 3, 7))
+
+    assert days == 7
+    assert len(db.statements) == 5
+    assert "INSERT INTO daily_activity" in db.sql(0)
+    assert "DELETE FROM daily_active_users" in db.sql(1)
+    assert "INSERT INTO daily_active_users" in db.sql(2)
+    assert "DELETE FROM daily_concepts" in db.sql(3)
+    assert "INSERT INTO daily_concepts" in db.sql(4)
+
+    params = db.statements[0][1]
+    assert params["start_ts"] == datetime(2026, 3, 1, tzinfo=timezone.utc)
+    assert params["end_ts"] == datetime(2026, 3, 8, tzinfo=timezone.utc)
+
+    db = RecordingSession()
+    assert await refresh_days(db, date(2026, 3, 7), date(2026, 3, 1)) == 0
+    assert db.statements == []
+
+    print("✅ Test 2 passed: refresh_days issues set-based statements")
+
+
+@pytest.mark.asyncio
+async def test_refresh_days_on_database(test_db, db_user):
+    """
+    测试 3: 真实数据库上按 UTC 日期汇总消息数、活跃用户、新用户与概念数；重复执行结果不变；
+    按周趋势的活跃用户与概念数在周内去重（3 月 1 日为周日，2、3 日属于下一周）
+    """
+    day = date(2026, 3, 1)
+    t0 = datetime(2026, 3, 1, 23, 50, tzinfo=timezone.utc)
+    async with test_db() as db:
+        user = await db.get(User, db_user)
+        user.created_at = t0 - timedelta(hours=1)
+        db.add_all([
+            ChatMessage(user_id=db_user, role=MessageRole.USER, text="递归", timestamp=t0,
+                        analysis={"detectedConcepts": ["递归", "栈"]}),
+            ChatMessage(user_id=db_user, role=MessageRole.ASSISTANT, text="回答", timestamp=t0 + timedelta(minutes=1),
+                        analysis={"detectedConcepts": "递归"}),
+            # 跨过 UTC 零点，计入次日
+            ChatMessage(user_id=db_user, role=MessageRole.USER, text="循环", timestamp=t0 + timedelta(minutes=20),
+                        analysis={"detectedConcepts": ["循环"]}),
+            ChatMessage(user_id=db_user, role=MessageRole.USER, text="循环与递归",
+                        timestamp=t0 + timedelta(days=1, minutes=20),
+                        analysis={"detectedConcepts": ["循环", "递归"]}),
+        ])
+        await db.commit()
+
+        for _ in range(2):
+            assert await refresh_days(db, day, day + timedelta(days=2)) == 3
+            await db.commit()
+
+        rows = (await db.execute(select(DailyActivity).order_by(DailyActivity.day))).scalars().all()
+        assert [(r.day, r.active_users, r.messages, r.new_users, r.concepts) for r in rows] == [
+            (day, 1, 2, 1, 2),
+            (day + timedelta(days=1), 1, 1, 0, 1),
+            (day + timedelta(days=2), 1, 1, 0, 2),
+        ]
+        active = (await db.execute(select(DailyActiveUser).order_by(DailyActiveUser.day))).scalars().all()
+        assert [(a.day, a.user_id, a.messages) for a in active] == [
+            (day, db_user, 2),
+            (day + timedelta(days=1), db_user, 1),
+            (day + timedelta(days=2), db_user, 1),
+        ]
+        concepts = (await db.execute(
+            select(DailyConcept.day, DailyConcept.concept, DailyConcept.mentions)
+            .order_by(DailyConcept.day, DailyConcept.concept)
+        )).all()
+        assert len(concepts) == 5
+        assert (day, "递归", 1) in concepts
+
+        response = await get_analytics_overview(
+            start=day, end=day + timedelta(days=2), granularity="week", db=db
+        )
+        weekly = [
+            (t.date, t.activeUsers, t.totalMessages, t.newUsers, t.concepts)
+            for t in response.data.activityTrend
+        ]
+        # 下一周两天的每日不同概念数之和为 3，去重后为 2
+        assert weekly == [
+            ("2026-02-23", 1, 2, 1, 2),
+            ("2026-03-02", 1, 2, 0, 2),
+        ]
+
+    print("✅ Test 3 passed: daily rollup on PostgreSQL")
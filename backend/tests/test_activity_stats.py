@@ -0,0 +1,104 @@
+"""
+用户活动统计单元测试
+测试 1-3 不连接数据库：捕获 record_activity / rebuild_activity_stats 生成的语句，按 PostgreSQL 方言编译后检查；
+测试 4 在测试数据库（conftest.py 的 test_db）上执行 UPSERT 与重建
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.sql.chat_session import ChatSession
+from app.models.sql.message import ChatMessage, MessageRole
+from app.models.sql.user import User
+from app.models.sql.user_activity import UserActivityStats
+from app.services.activity_stats import rebuild_activity_stats, record_activity
+from tests.fakes import FakeResult, RecordingSession
+
+
+@pytest.mark.asyncio
+async def test_record_activity_upsert():
+    """
+    测试 1: 增量写入为单条 UPSERT，计数累加、时间取较大值
+    """
+    db = RecordingSession(result=FakeResult(rowcount=1))
+    await record_activity(
+        db, uuid.uuid4(), messages=1, active_at=datetime.now(timezone.utc)
+    )
+
+    assert db.flushes == 1
+    assert len(db.statements) == 1
+    sql = db.sql(0)
+    assert "ON CONFLICT (user_id) DO UPDATE" in sql
+    assert "user_activity_stats.message_count + excluded.message_count" in sql
+    assert "greatest(user_activity_stats.last_active_at, excluded.last_active_at)" in sql
+
+    print("✅ Test 1 passed: record_activity issues a single upsert")
+
+
+@pytest.mark.asyncio
+async def test_rebuild_scoped_to_users():
+    """
+    测试 2: 按用户重建时每个子查询都带用户过滤；空列表不执行语句
+    """
+    db = RecordingSession(result=FakeResult(rowcount=1))
+    user_id = uuid.uuid4()
+    count = await rebuild_activity_stats(db, [user_id])
+
+    assert count == 1
+    assert db.statements[0][1] == {"ids": [str(user_id)]}
+    assert db.sql(0).count("ANY(CAST(:ids AS uuid[]))") == 5
+
+    db = RecordingSession(result=FakeResult(rowcount=1))
+    assert await rebuild_activity_stats(db, []) == 0
+    assert db.statements == []
+
+    print("✅ Test 2 passed: rebuild is scoped to the given users")
+
+
+def test_user_collections_not_eager_loaded():
+    """
+    测试 3: 加载用户时不再连带加载无上限的子集合
+    """
+    for name in ("messages", "profile_snapshots", "sessions", "scale_responses"):
+        rel = User.__mapper__.relationships[name]
+        assert rel.lazy == "raise_on_sql"
+        assert rel.passive_deletes is True
+
+    print("✅ Test 3 passed: user collections are lazy")
+
+
+@pytest.mark.asyncio
+async def test_upsert_and_rebuild_on_database(test_db, db_user):
+    """
+    测试 4: 真实数据库上 UPSERT 累加计数、乱序写入时间不倒退；重建结果与明细表一致
+    """
+    t0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+    async with test_db() as db:
+        await record_activity(db, db_user, messages=2, sessions=1, active_at=t0 + timedelta(minutes=5))
+        await record_activity(db, db_user, messages=1, active_at=t0)
+        await db.commit()
+
+        stats = await db.get(UserActivityStats, db_user)
+        assert (stats.message_count, stats.session_count) == (3, 1)
+        assert stats.last_active_at == t0 + timedelta(minutes=5)
+        assert stats.last_profile_at is None
+
+        # 明细与增量不一致时（例如删除了消息），重建以明细为准
+        session = ChatSession(user_id=db_user, created_at=t0)
+        db.add(session)
+        await db.flush()
+        db.add_all([
+            ChatMessage(user_id=db_user, session_id=session.id, role=MessageRole.USER, text="问题", timestamp=t0),
+            ChatMessage(user_id=db_user, session_id=session.id, role=MessageRole.ASSISTANT, text="回答",
+                        timestamp=t0 + timedelta(seconds=3)),
+        ])
+        assert await rebuild_activity_stats(db, [db_user]) == 1
+        assert await rebuild_activity_stats(db) == 1
+        await db.commit()
+
+        await db.refresh(stats)
+        assert (stats.message_count, stats.session_count, stats.scale_response_count) == (2, 1, 0)
+        assert stats.last_active_at == t0 + timedelta(seconds=3)
+
+    print("✅ Test 4 passed: activity stats upsert and rebuild on PostgreSQL")
@@ -0,0 +1,156 @@
+"""
+会话摘要单元测试
+测试 1-3 不连接数据库：验证增量更新语句、集合式重建的过滤条件，以及会话列表只读摘要列并按游标分页；
+测试 4 在测试数据库上乱序写入消息，并与重建结果比对
+"""
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.api.endpoints.chat import get_chat_sessions
+from app.models.sql.chat_session import ChatSession
+from app.models.sql.message import ChatMessage, MessageRole
+from app.services.chat_sessions import (
+    rebuild_session_summaries,
+    record_session_message,
+    snippet,
+)
+from tests.fakes import FakeResult, RecordingSession
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_record_session_message():
+    """
+    测试 1: 一条 UPDATE 更新起止时间（LEAST / GREATEST）、消息数与预览；只有用户消息会设置标题（更早的用户消息替换标题）
+    """
+    session_id = uuid.uuid4()
+    db = RecordingSession()
+
+    user_message = ChatMessage(
+        user_id=uuid.uuid4(), session_id=session_id, role=MessageRole.USER, text="什么是递归" * 10, timestamp=T0
+    )
+    await record_session_message(db, user_message)
+    sql = db.sql(0)
+    assert sql.startswith("UPDATE chat_sessions")
+    assert "least(chat_sessions.started_at" in sql
+    assert "greatest(chat_sessions.last_message_at" in sql
+    assert "message_count=(chat_sessions.message_count +" in sql
+    assert "title=CASE WHEN coalesce(chat_sessions.started_at > " in sql
+
+    reply = ChatMessage(
+        user_id=uuid.uuid4(), session_id=session_id, role=MessageRole.ASSISTANT, text="递归是……",
+        timestamp=T0 + timedelta(seconds=5),
+    )
+    await record_session_message(db, reply)
+    assert "title=" not in db.sql(1)
+
+    assert snippet("a" * 41, 40) == "a" * 40 + "..."
+    assert snippet("short", 40) == "short"
+
+    print("✅ Test 1 passed: incremental session summary update")
+
+
+@pytest.mark.asyncio
+async def test_rebuild_session_summaries_filters():
+    """
+    测试 2: 指定会话按 ID 重建；未指定时只重建尚无摘要的会话；空列表不执行
+    """
+    db = RecordingSession()
+    sid = uuid.uuid4()
+
+    await rebuild_session_summaries(db, [sid])
+    assert "session_id = ANY(CAST(:ids AS uuid[]))" in db.sql(0)
+    params = db.statements[0][1]
+    assert params["ids"] == [str(sid)]
+
+    await rebuild_session_summaries(db)
+    assert "WHERE message_count = 0" in db.sql(1)
+
+    assert await rebuild_session_summaries(db, []) == 0
+    assert len(db.statements) == 2
+
+    print("✅ Test 2 passed: summary rebuild filters")
+
+
+Row = namedtuple(
+    "Row", "id created_at started_at last_message_at message_count title preview"
+)
+
+
+class FakeUser:
+    id = uuid.UUID("aaaaaaaa-0000-4000-8000-000000000000")
+
+
+@pytest.mark.asyncio
+async def test_sessions_endpoint_pagination():
+    """
+    测试 3: 会话列表只查询摘要列，最新的在前；多取一行判断下一页并返回游标；无标题时按开始时间命名
+    """
+    starts = [T0 - timedelta(hours=i) for i in range(3)]
+    rows = [
+        Row(uuid.uuid4(), start, start, start + timedelta(minutes=9), 4,
+            None if i == 1 else f"问题 {i}", "预览")
+        for i, start in enumerate(starts)
+    ]
+    db = RecordingSession(result=FakeResult(rows=rows))
+
+    response = await get_chat_sessions(limit=2, cursor=None, db=db, current_user=FakeUser())
+
+    sql = db.sql(0)
+    assert "chat_messages" not in sql
+    assert "chat_sessions.message_count > " in sql
+    assert "ORDER BY chat_sessions.created_at DESC, chat_sessions.id DESC" in sql
+
+    data = response["data"]
+    assert [s["id"] for s in data["sessions"]] == [str(rows[0].id), str(rows[1].id)]
+    assert data["sessions"][0]["sessionEnd"] == (T0 + timedelta(minutes=9)).isoformat()
+    assert data["sessions"][1]["title"] == f"会话 {rows[1].started_at:%Y-%m-%d %H:%M}"
+    assert data["nextCursor"]
+
+    db = RecordingSession(result=FakeResult(rows=rows[2:]))
+    response = await get_chat_sessions(limit=2, cursor=data["nextCursor"], db=db, current_user=FakeUser())
+    assert "(chat_sessions.created_at, chat_sessions.id) <" in db.sql(0)
+    assert response["data"]["nextCursor"] is None
+
+    print("✅ Test 3 passed: cursor-paginated session summaries")
+
+
+@pytest.mark.asyncio
+async def test_out_of_order_messages_on_database(test_db, db_user):
+    """
+    测试 4: 真实数据库上较早的一轮晚于较新的一轮写入：起止时间不倒退、预览仍为最新消息、
+    标题换为更早的用户消息；结果与从消息表重建一致
+    """
+    async with test_db() as db:
+        session = ChatSession(user_id=db_user, created_at=T0)
+        db.add(session)
+        await db.flush()
+
+        def message(role, content, minutes):
+            return ChatMessage(user_id=db_user, session_id=session.id, role=role, text=content,
+                               timestamp=T0 + timedelta(minutes=minutes))
+
+        later = [message(MessageRole.USER, "什么是栈", 10), message(MessageRole.ASSISTANT, "栈是……", 11)]
+        earlier = [message(MessageRole.USER, "什么是递归", 1), message(MessageRole.ASSISTANT, "递归是……", 2)]
+        for turn in (later, earlier):
+            db.add_all(turn)
+            await record_session_message(db, *turn)
+        await db.commit()
+
+        await db.refresh(session)
+        assert (session.started_at, session.last_message_at) == (T0 + timedelta(minutes=1), T0 + timedelta(minutes=11))
+        assert session.message_count == 4
+        assert (session.title, session.preview) == ("什么是递归", "栈是……")
+
+        assert await rebuild_session_summaries(db, [session.id]) == 1
+        await db.commit()
+        await db.refresh(session)
+        assert (session.started_at, session.last_message_at) == (T0 + timedelta(minutes=1), T0 + timedelta(minutes=11))
+        assert session.message_count == 4
+        assert (session.title, session.preview) == ("什么是递归", "栈是……")
+
+    print("✅ Test 4 passed: out-of-order session summary on PostgreSQL")
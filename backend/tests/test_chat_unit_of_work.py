@@ -0,0 +1,138 @@
+"""
+对话单事务写入单元测试
+测试 1-2 不连接数据库：验证新会话只暂存、本轮写入（含画像增量）一次刷出且只提交一次，以及提交后才写入缓存；
+测试 3 在测试数据库上连续写入两轮
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import event, func, select
+
+import app.api.endpoints.chat as chat_module
+from app.api.endpoints.chat import get_or_create_active_session, save_chat_turn
+from app.models.sql.chat_session import ChatSession
+from app.models.sql.message import ChatMessage, MessageRole
+from app.models.sql.profile import CurrentProfile, ProfileSnapshot
+from app.models.sql.user_activity import UserActivityStats
+from app.schemas.profile import ProfileDelta
+from app.services.conversation_context import ConversationContext, ConversationContextCache
+from tests.fakes import FakeResult, RecordingSession
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_stage_session():
+    """
+    测试 1: 新会话只加入会话（主键、时间在客户端生成），不执行写入、不提交
+    """
+    user_id = uuid.uuid4()
+    db = RecordingSession()
+
+    session, created = await get_or_create_active_session(db, user_id)
+    assert created and session.id is not None and session.created_at is not None
+    assert db.added == [session]
+
+    active = ChatSession(id=uuid.uuid4(), user_id=user_id, created_at=datetime.now(timezone.utc))
+    db.result = FakeResult(row=active)
+    assert (await get_or_create_active_session(db, user_id)) == (active, False)
+    assert all(s.startswith("SELECT") for s in db.sqls)
+    assert db.commits == 0 and db.flushes == 0
+
+    print("✅ Test 1 passed: new session is staged")
+
+
+@pytest.mark.asyncio
+async def test_save_chat_turn_single_commit(monkeypatch):
+    """
+    测试 2: 画像增量一条语句、一次 flush、一条活动统计 UPSERT、一条会话摘要 UPDATE、一次提交；
+    新会话首轮提交后才计入缓存
+    """
+    cache = ConversationContextCache(max_users=10, ttl=600)
+    monkeypatch.setattr(chat_module, "conversation_cache", cache)
+    user_id = uuid.uuid4()
+    context = ConversationContext(
+        user_id=user_id, session_id=uuid.uuid4(), session_created_at=T0, last_message_at=T0,
+        session_pending=True,
+    )
+    messages = [
+        ChatMessage(id=uuid.uuid4(), user_id=user_id, session_id=context.session_id,
+                    role=MessageRole.USER, text="什么是递归", timestamp=T0),
+        ChatMessage(id=uuid.uuid4(), user_id=user_id, session_id=context.session_id,
+                    role=MessageRole.ASSISTANT, text="递归是……", timestamp=T0 + timedelta(seconds=4)),
+    ]
+    db = RecordingSession(result=FakeResult(row=(60, 45, 50, T0)))
+
+    profile = await save_chat_turn(db, context, messages, delta=ProfileDelta(cognition=10, affect=-5))
+
+    assert (profile.cognition, profile.affect, profile.behavior) == (60, 45, 50)
+    assert profile.lastUpdate == "2026-03-01T08:00:00Z"
+    assert db.added == messages
+    assert db.flushes == 1 and db.commits == 1
+    sqls = db.sqls
+    assert len(sqls) == 3
+    assert "INSERT INTO profile_current" in sqls[0]
+    assert sqls[1].startswith("INSERT INTO user_activity_stats")
+    assert sqls[2].startswith("UPDATE chat_sessions")
+    assert "message_count=(chat_sessions.message_count + " in sqls[2]
+    assert "title=CASE WHEN coalesce(chat_sessions.started_at > " in sqls[2]
+
+    assert [m["text"] for m in context.recent_messages()] == ["什么是递归", "递归是……"]
+    assert context.last_message_at == T0 + timedelta(seconds=4)
+    assert not context.session_pending
+    assert cache.get(user_id) is context
+
+    print("✅ Test 2 passed: one flush and one commit per turn")
+
+
+@pytest.mark.asyncio
+async def test_save_chat_turn_on_database(test_db, db_user, monkeypatch):
+    """
+    测试 3: 真实数据库上新会话在首轮提交前不可见；每轮一次提交写入会话、消息、画像（clamp）、
+    快照、活动统计与会话摘要；第二轮复用同一会话
+    """
+    monkeypatch.setattr(chat_module, "conversation_cache", ConversationContextCache(max_users=10, ttl=600))
+
+    async def run_turn(text, delta):
+        async with test_db() as db:
+            commits = []
+            event.listen(db.sync_session, "after_commit", lambda _: commits.append(1))
+            session, created = await get_or_create_active_session(db, db_user)
+            async with test_db() as other:
+                visible = await other.get(ChatSession, session.id)
+            assert (visible is None) == created
+
+            now = datetime.now(timezone.utc)
+            context = ConversationContext(
+                user_id=db_user, session_id=session.id, session_created_at=session.created_at,
+                last_message_at=session.last_message_at or session.created_at, session_pending=created,
+            )
+            messages = [
+                ChatMessage(id=uuid.uuid4(), user_id=db_user, session_id=session.id,
+                            role=MessageRole.USER, text=text, timestamp=now),
+                ChatMessage(id=uuid.uuid4(), user_id=db_user, session_id=session.id,
+                            role=MessageRole.ASSISTANT, text="回答", timestamp=now + timedelta(seconds=2)),
+            ]
+            profile = await save_chat_turn(db, context, messages, delta=delta)
+            assert len(commits) == 1
+            return session.id, created, profile
+
+    first_id, created, profile = await run_turn("什么是递归", ProfileDelta(cognition=60, affect=-70))
+    assert created
+    assert (profile.cognition, profile.affect, profile.behavior) == (100, 0, 50)
+    second_id, created, profile = await run_turn("那栈呢", None)
+    assert second_id == first_id and not created and profile is None
+
+    async with test_db() as db:
+        session = await db.get(ChatSession, first_id)
+        assert (session.message_count, session.title, session.preview) == (4, "什么是递归", "回答")
+        assert await db.scalar(select(func.count()).select_from(ChatMessage)) == 4
+        current = await db.get(CurrentProfile, db_user)
+        assert (current.cognition, current.affect, current.behavior) == (100, 0, 50)
+        assert await db.scalar(select(func.count()).select_from(ProfileSnapshot)) == 1
+        stats = await db.get(UserActivityStats, db_user)
+        assert (stats.message_count, stats.session_count) == (4, 1)
+        assert stats.last_active_at == session.last_message_at
+
+    print("✅ Test 3 passed: chat turns on PostgreSQL")
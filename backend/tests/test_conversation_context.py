@@ -0,0 +1,156 @@
+"""
+对话上下文缓存单元测试
+验证：LRU 淘汰与 TTL 过期、写穿追加与首轮上下文、对话接口命中缓存时不访问数据库，
+以及会话内历史按会话 ID 查询
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.api.endpoints.chat as chat_module
+from app.models.sql.message import ChatMessage, MessageRole
+from app.services.conversation_context import ConversationContext, ConversationContextCache
+from tests.fakes import FakeResult, RecordingSession
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+
+
+def _context(user_id=None, last_message_at=T0):
+    return ConversationContext(
+        user_id=user_id or uuid.uuid4(),
+        session_id=uuid.uuid4(),
+        session_created_at=T0,
+        last_message_at=last_message_at,
+    )
+
+
+def test_lru_and_ttl():
+    """
+    测试 1: 超出容量淘汰最久未使用的用户；加载后超过 TTL 的条目视为未命中；可按用户失效
+    """
+    cache = ConversationContextCache(max_users=2, ttl=60)
+    a, b, c = _context(), _context(), _context()
+    cache.put(a)
+    cache.put(b)
+    assert cache.get(a.user_id) is a  # a 变为最近使用
+    cache.put(c)
+    assert cache.get(b.user_id) is None
+    assert cache.get(a.user_id) is a and cache.get(c.user_id) is c
+
+    a.loaded_at -= 61
+    assert cache.get(a.user_id) is None
+    assert len(cache) == 1
+
+    cache.invalidate(c.user_id)
+    assert len(cache) == 0
+
+    disabled = ConversationContextCache(max_users=0)
+    disabled.put(_context())
+    assert len(disabled) == 0
+
+    print("✅ Test 1 passed: LRU eviction and TTL")
+
+
+def test_append_and_first_turn():
+    """
+    测试 2: 首轮使用最近消息作为历史；追加后改用会话内历史并推进最后消息时间；超过 30 分钟视为会话结束
+    """
+    context = _context()
+    context.fallback = [{"role": "assistant", "text": "上次的回答"}]
+    assert context.is_first_turn
+    assert context.recent_messages() == context.fallback
+
+    context.append("user", "你好", T0 + timedelta(minutes=1))
+    context.append("assistant", "你好！", T0 + timedelta(minutes=2))
+    assert not context.is_first_turn
+    assert [m["text"] for m in context.recent_messages()] == ["你好", "你好！"]
+    assert context.last_message_at == T0 + timedelta(minutes=2)
+
+    assert context.is_active(T0 + timedelta(minutes=31))
+    assert not context.is_active(T0 + timedelta(minutes=33))
+
+    print("✅ Test 2 passed: write-through append")
+
+
+class NoQuerySession:
+    """任何查询都会失败的会话替身"""
+
+    async def execute(self, *args, **kwargs):
+        raise AssertionError("context lookup should not hit the database")
+
+
+@pytest.mark.asyncio
+async def test_chat_context_hit_and_miss(monkeypatch):
+    """
+    测试 3: 缓存命中且会话仍在继续时不访问数据库；未命中时加载会话、历史与上次会话摘要并放入缓存
+    """
+    cache = ConversationContextCache(max_users=10, ttl=600)
+    monkeypatch.setattr(chat_module, "conversation_cache", cache)
+    user_id = uuid.uuid4()
+    now = datetime.now(timezone.utc)
+
+    cached = _context(user_id, last_message_at=now - timedelta(minutes=5))
+    cache.put(cached)
+    assert await chat_module.get_conversation_context(NoQuerySession(), user_id) is cached
+
+    # 会话已超过间隔：回退数据库，开始新会话
+    cached.last_message_at = now - timedelta(hours=2)
+    calls = []
+
+    class Session:
+        id = uuid.uuid4()
+        created_at = now
+        last_message_at = None
+
+    async def cross_session(db, uid):
+        calls.append("previous")
+        return "上次会话涉及的概念：递归"
+
+    async def active_session(db, uid):
+        calls.append("session")
+        return Session, False
+
+    async def session_history(db, session_id):
+        assert session_id == Session.id
+        calls.append("history")
+        return []
+
+    async def recent(db, uid, limit):
+        calls.append("recent")
+        return [{"role": "user", "text": "递归怎么写"}]
+
+    monkeypatch.setattr(chat_module, "get_cross_session_context", cross_session)
+    monkeypatch.setattr(chat_module, "get_or_create_active_session", active_session)
+    monkeypatch.setattr(chat_module, "get_session_history", session_history)
+    monkeypatch.setattr(chat_module, "get_recent_messages", recent)
+
+    context = await chat_module.get_conversation_context(None, user_id)
+    assert calls == ["previous", "session", "history", "recent"]
+    assert context.session_id == Session.id
+    assert context.is_first_turn and context.previous_session
+    assert context.recent_messages() == [{"role": "user", "text": "递归怎么写"}]
+    assert cache.get(user_id) is context
+
+    print("✅ Test 3 passed: cache hit skips database")
+
+
+@pytest.mark.asyncio
+async def test_session_history_by_session_id():
+    """
+    测试 4: 会话内历史按 session_id 过滤（走 (session_id, timestamp) 索引），不再按用户 + 时间范围扫描
+    """
+    session_id = uuid.uuid4()
+    newest_first = [
+        ChatMessage(role=MessageRole.ASSISTANT, text="答", timestamp=T0 + timedelta(seconds=1)),
+        ChatMessage(role=MessageRole.USER, text="问", timestamp=T0),
+    ]
+    db = RecordingSession(result=FakeResult(rows=newest_first))
+
+    history = await chat_module.get_session_history(db, session_id, limit=5)
+    assert history == [{"role": "user", "text": "问"}, {"role": "assistant", "text": "答"}]
+    where = db.sql(0).split("WHERE", 1)[1]
+    assert where.strip().startswith("chat_messages.session_id = %(session_id_1)s")
+    assert "user_id" not in where and "ORDER BY chat_messages.timestamp DESC" in where
+
+    print("✅ Test 4 passed: session history filtered by session id")
@@ -0,0 +1,323 @@
+"""
+流式数据导出单元测试
+使用连接替身验证：表头与逐批编码、量表题目展开、单元格格式、服务端游标参数，以及 COPY 路径；
+以及流式导出开始前校验用户 ID、COPY 与游标两条路径输出相同的 CSV（测试数据库）
+"""
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.dialects.postgresql import asyncpg as asyncpg_dialect
+
+import app.db.postgres as postgres
+from app.api.endpoints.admin.export import _parse_user_ids
+from app.models.sql.message import ChatMessage, MessageRole
+from app.models.sql.user import User
+from app.services import research_datasets
+from app.services.data_export import (
+    CsvEncoder,
+    csv_value,
+    gzip_chunks,
+    stream_copy,
+    stream_csv,
+    stream_json_document,
+    stream_rows,
+)
+
+
+class FakeResult:
+    def __init__(self, rows, keys=None):
+        self._rows = rows
+        self._keys = keys or (list(rows[0].keys()) if rows else [])
+
+    def keys(self):
+        return self._keys
+
+    def mappings(self):
+        return self
+
+    async def partitions(self, size):
+        for i in range(0, len(self._rows), size):
+            yield self._rows[i:i + size]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+
+class FakeConnection:
+    """stream 返回数据行、execute 返回题目键的连接替身"""
+
+    def __init__(self, rows, keys=None, item_keys=()):
+        self.rows = rows
+        self.keys = keys
+        self.item_keys = item_keys
+        self.stream_options = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def stream(self, stmt, params=None, execution_options=None):
+        self.stream_options = execution_options
+        return FakeResult(self.rows, self.keys)
+
+    async def execute(self, stmt, params=None):
+        return FakeResult([(k,) for k in self.item_keys], keys=["key"])
+
+
+class FakeDriver:
+    """asyncpg 连接替身：copy_from_query 按块回调输出"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.copy_args = None
+
+    async def prepare(self, query):
+        # 没有需要格式化的列：COPY 原查询
+        return type("Statement", (), {"get_attributes": lambda self: []})()
+
+    async def copy_from_query(self, query, *args, output, format, header):
+        self.copy_args = (query, args, format, header)
+        for chunk in self.chunks:
+            await output(memoryview(chunk))
+
+
+class FakeCopyConnection(FakeConnection):
+    dialect = asyncpg_dialect.dialect()
+
+    def __init__(self, chunks, item_keys=()):
+        super().__init__([], item_keys=item_keys)
+        self.driver = FakeDriver(chunks)
+        self.executed = []
+
+    async def execute(self, stmt, params=None):
+        self.executed.append(str(stmt))
+        return await super().execute(stmt, params)
+
+    async def get_raw_connection(self):
+        return type("Raw", (), {"driver_connection": self.driver})()
+
+    async def invalidate(self):
+        pass
+
+
+class FakeEngine:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def connect(self):
+        return self.conn
+
+
+async def _collect(dataset, batch_size):
+    return [chunk async for chunk in stream_csv(dataset, batch_size=batch_size)]
+
+
+def test_csv_encoder():
+    """
+    测试 1: 按列顺序编码，时间转 ISO、空值转空字符串，缺失列补空
+    """
+    ts = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+    assert csv_value(ts) == "2026-03-01T08:00:00+00:00"
+    assert csv_value(None) == ""
+    assert csv_value(0) == 0
+
+    encoder = CsvEncoder(["a", "b", "c"])
+    assert encoder.header() == b"a,b,c\n"
+    chunk = encoder.rows([{"a": 1, "b": None}, {"a": "x,y", "b": ts, "c": 3}])
+    assert chunk.decode() == '1,,\n"x,y",2026-03-01T08:00:00+00:00,3\n'
+    # 缓冲区在每批之后清空
+    assert encoder.rows([]) == b""
+
+    print("✅ Test 1 passed: csv encoding")
+
+
+@pytest.mark.asyncio
+async def test_stream_in_batches(monkeypatch):
+    """
+    测试 2: 先输出表头再逐批输出；服务端游标按批大小读取；无数据时仍有表头
+    """
+    rows = [{"message_id": i, "role": "user"} for i in range(5)]
+    conn = FakeConnection(rows)
+    monkeypatch.setattr(postgres, "engine", FakeEngine(conn))
+
+    chunks = await _collect(research_datasets.conversations(), batch_size=2)
+    assert chunks[0] == b"message_id,role\n"
+    assert len(chunks) == 1 + 3
+    assert conn.stream_options == {"yield_per": 2}
+
+    empty = FakeConnection([], keys=["message_id", "role"])
+    monkeypatch.setattr(postgres, "engine", FakeEngine(empty))
+    assert await _collect(research_datasets.conversations(), batch_size=2) == [b"message_id,role\n"]
+
+    print("✅ Test 2 passed: batched streaming")
+
+
+@pytest.mark.asyncio
+async def test_scale_items_expanded(monkeypatch):
+    """
+    测试 3: 量表题目按全集排序展开为列，raw_answers 不输出，追加 time_spent_seconds
+    """
+    started = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+    responded = datetime(2026, 3, 1, 8, 2, tzinfo=timezone.utc)
+    rows = [
+        {"response_id": "r1", "started_at": started, "responded_at": responded,
+         "raw_answers": {"q2": 4, "q1": 5}},
+        {"response_id": "r2", "started_at": None, "responded_at": responded,
+         "raw_answers": '{"q3": 1}'},
+    ]
+    conn = FakeConnection(rows, item_keys=["q3", "q1", "q2"])
+    monkeypatch.setattr(postgres, "engine", FakeEngine(conn))
+
+    dataset = research_datasets.scale_responses(["00000000-0000-0000-0000-000000000001"])
+    assert "CAST(:user_ids AS uuid[])" in dataset.sql
+    body = b"".join(await _collect(dataset, batch_size=10)).decode().splitlines()
+
+    assert body[0] == "response_id,started_at,responded_at,q1,q2,q3,time_spent_seconds"
+    assert body[1].startswith("r1,") and body[1].endswith(",5,4,,120")
+    assert body[2].endswith(",,,1,")
+
+    print("✅ Test 3 passed: scale items expanded")
+
+
+@pytest.mark.asyncio
+async def test_copy_path(monkeypatch):
+    """
+    测试 4: COPY 路径原样转发数据块；量表题目在 SQL 中以绑定参数展开，参数按位置传给 asyncpg
+    """
+    conn = FakeCopyConnection([b"response_id,q1\n", b"r1,5\n"], item_keys=['q"2', "q1"])
+    monkeypatch.setattr(postgres, "engine", FakeEngine(conn))
+
+    uid = "00000000-0000-0000-0000-000000000001"
+    dataset = research_datasets.scale_responses([uid])
+    assert dataset.copyable
+    chunks = [c async for c in stream_copy(dataset)]
+    assert chunks == [b"response_id,q1\n", b"r1,5\n"]
+
+    query, args, fmt, header = conn.driver.copy_args
+    assert "SET LOCAL TimeZone" in conn.executed[0]
+    assert fmt == "csv" and header is True
+    assert 'sr.answers_json->>$1 AS "q""2"' in query
+    assert 'sr.answers_json->>$2 AS "q1"' in query
+    assert "time_spent_seconds" in query and "raw_answers" not in query
+    assert args == ('q"2', "q1", [uid])
+
+    # 无 Python 转换的数据集直接 COPY 原查询
+    flat = research_datasets.conversations()
+    assert flat.copyable
+    assert await flat.build_copy_query(conn) == (flat.sql, {})
+
+    print("✅ Test 4 passed: copy export path")
+
+
+@pytest.mark.asyncio
+async def test_json_outputs(monkeypatch):
+    """
+    测试 5: 原始表导出剔除敏感列；NDJSON 每行一个对象；JSON 文档结构与原响应一致；gzip 可还原
+    """
+    ts = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+    uid = uuid.uuid4()
+    rows = [
+        {"id": uid, "email": "a@example.com", "password": "x", "created_at": ts,
+         "score": Decimal("1.5"), "meta": {"k": [1, 2]}},
+        {"id": uid, "email": None, "password": "y", "created_at": ts,
+         "score": None, "meta": None},
+        {"id": uid, "email": "c@example.com", "password": "z", "created_at": ts,
+         "score": Decimal("2"), "meta": {}},
+    ]
+    monkeypatch.setattr(postgres, "engine", FakeEngine(FakeConnection(rows)))
+    dataset = research_datasets.table(
+        "users", "WHERE email ILIKE :filter_0", {"filter_0": "%a%"}, "ORDER BY created_at DESC",
+        hidden_fields=["password"],
+    )
+    assert dataset.sql.strip() == "SELECT * FROM users WHERE email ILIKE :filter_0 ORDER BY created_at DESC"
+    assert not dataset.copyable
+
+    lines = b"".join([c async for c in stream_rows(dataset, "ndjson", batch_size=2)]).splitlines()
+    first = json.loads(lines[0])
+    assert len(lines) == 3
+    assert first == {
+        "id": str(uid), "email": "a@example.com", "created_at": "2026-03-01T08:00:00+00:00",
+        "score": "1.5", "meta": {"k": [1, 2]},
+    }
+
+    doc = b"".join([c async for c in stream_json_document(dataset, {"table": "users"}, batch_size=2)])
+    parsed = json.loads(doc)
+    assert parsed["table"] == "users"
+    assert parsed["rowCount"] == 3
+    assert [r["email"] for r in parsed["data"]] == ["a@example.com", None, "c@example.com"]
+    assert "password" not in parsed["data"][1]
+
+    async def chunks():
+        yield b"hello "
+        yield b"world"
+    assert gzip.decompress(b"".join([c async for c in gzip_chunks(chunks())])) == b"hello world"
+
+    print("✅ Test 5 passed: ndjson / json / gzip outputs")
+
+
+@pytest.mark.asyncio
+async def test_export_ids_validated_before_streaming(admin_client: AsyncClient):
+    """
+    测试 6: 流式响应发出 200 之前校验用户 ID：非法 user_ids 返回 400，非法路径 user_id 返回 422，
+    不存在的用户返回 404（对话与学习轨迹一致）
+    """
+    uid = uuid.uuid4()
+    assert _parse_user_ids(f" {str(uid).upper()} ,, ") == [str(uid)]
+    assert _parse_user_ids("") is None
+
+    for path in ("learner-profiles", "scale-responses"):
+        response = await admin_client.get(f"/api/admin/export/csv/{path}", params={"user_ids": f"{uid},abc"})
+        assert response.status_code == 400
+        assert "abc" in response.json()["detail"]
+
+    for path in ("/api/admin/export/csv/user/abc", "/api/admin/export/csv/user/abc/trajectory"):
+        assert (await admin_client.get(path)).status_code == 422
+
+    for path in (f"/api/admin/export/csv/user/{uid}", f"/api/admin/export/csv/user/{uid}/trajectory"):
+        assert (await admin_client.get(path)).status_code == 404
+
+    print("✅ Test 6 passed: export ids validated before streaming")
+
+
+@pytest.mark.asyncio
+async def test_copy_matches_cursor(monkeypatch, test_db, db_user):
+    """
+    测试 7: 同一数据集走 COPY 与走游标输出逐字节相同的 CSV（时间、布尔、空值、空字符串、含逗号 / 换行的文本）
+    """
+    t0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+    async with test_db() as db:
+        db.add(User(student_id="copy_2", name="逗号, 与\n换行", email="", is_active=False))
+        db.add_all([
+            ChatMessage(user_id=db_user, role=MessageRole.USER, text='引号 "x"', timestamp=t0),
+            ChatMessage(user_id=db_user, role=MessageRole.ASSISTANT, text="",
+                        timestamp=t0 + timedelta(seconds=1, microseconds=123000)),
+        ])
+        await db.commit()
+    monkeypatch.setattr(postgres, "engine", test_db.kw["bind"])
+
+    users = research_datasets.Dataset(
+        name="users",
+        sql="SELECT student_id, name, email, is_active, has_completed_onboarding, created_at, "
+            "last_active_at, created_at::timestamp AS created_local, created_at::date AS created_day "
+            "FROM users ORDER BY student_id",
+    )
+    for dataset in (users, research_datasets.user_conversations(str(db_user))):
+        assert dataset.copyable
+        via_copy = b"".join([c async for c in stream_copy(dataset)])
+        via_cursor = b"".join([c async for c in stream_csv(dataset)])
+        assert via_copy == via_cursor
+
+    rows = via_copy.decode().splitlines()
+    assert rows[1].split(",")[7] == "2026-03-01T08:00:00+00:00"
+    assert rows[2].split(",")[6] == ""
+    assert rows[2].split(",")[7] == "2026-03-01T08:00:01.123000+00:00"
+    assert ",False," in b"".join([c async for c in stream_copy(users)]).decode()
+
+    print("✅ Test 7 passed: COPY and cursor exports produce the same CSV")
@@ -0,0 +1,153 @@
+"""
+后台导出任务单元测试
+使用导出流替身验证：gzip 结果文件与进度、并发与提交上限、取消，过期清理，以及启动时只删除任务文件
+"""
+import asyncio
+import gzip
+import uuid
+from datetime import timedelta
+
+import pytest
+
+import app.services.export_jobs as export_jobs_module
+from app.services.export_jobs import (
+    CANCELLED,
+    DONE,
+    QUEUED,
+    RUNNING,
+    ExportJobManager,
+    ExportQueueFull,
+)
+from app.services.research_datasets import Dataset
+
+
+def _dataset(name="conversation_data"):
+    return Dataset(name=name, sql="SELECT 1", source_table="chat_messages")
+
+
+async def _until(condition, timeout=2.0):
+    """等待后台任务推进到指定状态（gzip 写入在线程中执行）"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def fake_stream(gate: asyncio.Event = None, batches=2):
+    """每批 10 行；设置 gate 时在第一批之后等待放行"""
+    async def stream_rows(dataset, fmt="csv", batch_size=None, on_batch=None):
+        yield b"id\n"
+        for i in range(batches):
+            yield "".join(f"{i}-{n}\n" for n in range(10)).encode()
+            on_batch(10)
+            if gate is not None:
+                await gate.wait()
+    return stream_rows
+
+
+@pytest.mark.asyncio
+async def test_job_writes_gzip_spool(tmp_path, monkeypatch):
+    """
+    测试 1: 任务完成后结果为 gzip 文件，行数 / 进度正确，过期时间已设置
+    """
+    monkeypatch.setattr(export_jobs_module, "stream_rows", fake_stream())
+    manager = ExportJobManager(spool_dir=str(tmp_path), concurrency=1, ttl=60)
+
+    job = manager.submit(_dataset(), "csv", {"kind": "dataset"}, estimated_rows=40)
+    assert job.status == QUEUED
+    await job._task
+
+    assert job.status == DONE
+    assert job.rows_written == 20
+    assert job.progress == 1.0
+    assert job.filename.startswith("conversation_data_") and job.filename.endswith(".csv.gz")
+    with gzip.open(job.path, "rb") as f:
+        lines = f.read().decode().splitlines()
+    assert lines[0] == "id" and len(lines) == 21
+    assert job.expires_at == job.finished_at + timedelta(seconds=60)
+    assert list(tmp_path.glob("*.part")) == []
+
+    print("✅ Test 1 passed: gzip spool file")
+
+
+@pytest.mark.asyncio
+async def test_concurrency_and_pending_limits(tmp_path, monkeypatch):
+    """
+    测试 2: 超过并发上限的任务排队；排队 + 执行中达到上限时拒绝提交；执行中可报告进度
+    """
+    gate = asyncio.Event()
+    monkeypatch.setattr(export_jobs_module, "stream_rows", fake_stream(gate))
+    manager = ExportJobManager(spool_dir=str(tmp_path), concurrency=1, max_pending=2)
+
+    first = manager.submit(_dataset(), "csv", {}, estimated_rows=40)
+    second = manager.submit(_dataset(), "csv", {})
+    with pytest.raises(ExportQueueFull):
+        manager.submit(_dataset(), "csv", {})
+
+    await _until(lambda: first.rows_written > 0)
+    assert first.status == RUNNING
+    assert first.progress == 0.25
+    assert second.status == QUEUED
+    assert second.progress is None
+
+    gate.set()
+    await asyncio.gather(first._task, second._task)
+    assert first.status == second.status == DONE
+    assert manager.pending_count() == 0
+
+    print("✅ Test 2 passed: concurrency and pending limits")
+
+
+@pytest.mark.asyncio
+async def test_cancel_and_expire(tmp_path, monkeypatch):
+    """
+    测试 3: 删除执行中的任务会取消并清理临时文件；过期任务连同结果文件一起删除
+    """
+    gate = asyncio.Event()
+    monkeypatch.setattr(export_jobs_module, "stream_rows", fake_stream(gate))
+    manager = ExportJobManager(spool_dir=str(tmp_path), concurrency=2, ttl=60)
+
+    running = manager.submit(_dataset(), "csv", {})
+    await _until(lambda: running.rows_written > 0)
+    assert await manager.remove(running.id) is True
+    assert running.status == CANCELLED
+    assert manager.get(running.id) is None
+    assert list(tmp_path.iterdir()) == []
+
+    monkeypatch.setattr(export_jobs_module, "stream_rows", fake_stream())
+    done = manager.submit(_dataset(), "json", {})
+    await done._task
+    path = done.path
+    assert path.exists()
+
+    assert manager.sweep(now=done.finished_at + timedelta(seconds=30)) == 0
+    assert manager.sweep(now=done.finished_at + timedelta(seconds=61)) == 1
+    assert not path.exists()
+    assert manager.get(done.id) is None
+
+    print("✅ Test 3 passed: cancel and expiry")
+
+
+@pytest.mark.asyncio
+async def test_start_removes_only_job_files(tmp_path):
+    """
+    测试 4: 启动时只删除上次遗留的任务文件，运维指定目录中的其他文件与子目录保留
+    """
+    job_id = uuid.uuid4().hex
+    stale = [tmp_path / f"{job_id}.part", tmp_path / f"{job_id}.csv.gz"]
+    kept = [tmp_path / "notes.txt", tmp_path / "backup.csv.gz", tmp_path / f"{job_id}.csv"]
+    for path in stale + kept:
+        path.write_bytes(b"x")
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / f"{job_id}.part").write_bytes(b"x")
+
+    manager = ExportJobManager(spool_dir=str(tmp_path))
+    manager.start()
+    await manager.stop()
+
+    assert not any(path.exists() for path in stale)
+    assert all(path.exists() for path in kept)
+    assert (tmp_path / "data" / f"{job_id}.part").exists()
+
+    print("✅ Test 4 passed: startup keeps unrelated files")
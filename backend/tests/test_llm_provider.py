@@ -0,0 +1,177 @@
+"""
+LLM Provider 单元测试
+测试多轮消息接口、usage 解析、缓存友好的历史窗口，以及通过本地替身服务的 HTTP 路径
+"""
+import json
+import httpx
+import pytest
+from app.services.llm_provider import LLMUsage, LLMRateLimitError, MockProvider, OpenAICompatibleProvider
+from app.api.endpoints.chat import stable_history_window
+from scripts.fake_llm_server import FakeLLMConfig, create_app
+
+
+def test_usage_parsing():
+    """
+    测试 1: 解析不同提供者的 usage 字段（缓存命中数位置不同）
+    """
+    openai_usage = LLMUsage.from_response({
+        "prompt_tokens": 1200,
+        "completion_tokens": 80,
+        "prompt_tokens_details": {"cached_tokens": 1024},
+    })
+    assert openai_usage == LLMUsage(prompt_tokens=1200, completion_tokens=80, cached_tokens=1024)
+
+    deepseek_usage = LLMUsage.from_response({
+        "prompt_tokens": 900,
+        "completion_tokens": 60,
+        "prompt_cache_hit_tokens": 768,
+        "prompt_cache_miss_tokens": 132,
+    })
+    assert deepseek_usage.cached_tokens == 768
+
+    assert LLMUsage.from_response(None) == LLMUsage()
+    assert LLMUsage.from_response({"prompt_tokens": 10}).cached_tokens == 0
+
+    print("✅ Test 1 passed: usage parsing")
+
+
+@pytest.mark.asyncio
+async def test_mock_chat_messages():
+    """
+    测试 2: MockProvider 支持多轮消息，complete() 与 chat() 结果一致
+    """
+    provider = MockProvider()
+
+    via_chat = await provider.chat(messages=[
+        {"role": "system", "content": "sys"},
+        {"role": "assistant", "content": "你好"},
+        {"role": "user", "content": "我不懂反向传播"},
+    ])
+    via_complete = await provider.complete(system_prompt="sys", user_prompt="我不懂反向传播")
+
+    assert via_chat == via_complete
+    assert "help-seeking" in via_chat
+
+    print("✅ Test 2 passed: mock chat messages")
+
+
+def test_stable_history_window():
+    """
+    测试 3: 历史窗口只在超出上限时整块前移，相邻轮次前缀保持一致
+    """
+    history = [{"role": "user", "text": str(i)} for i in range(30)]
+
+    assert stable_history_window(history[:12], max_len=12, step=6) == history[:12]
+
+    # 13、14 条消息时窗口起点相同（只追加）
+    window_13 = stable_history_window(history[:13], max_len=12, step=6)
+    window_14 = stable_history_window(history[:14], max_len=12, step=6)
+    assert window_13[0] == window_14[0] == history[6]
+    assert window_14[:len(window_13)] == window_13
+
+    for n in range(1, 31):
+        window = stable_history_window(history[:n], max_len=12, step=6)
+        assert len(window) <= 12
+        assert window[-1] == history[n - 1]
+
+    print("✅ Test 3 passed: stable history window")
+
+
+class FlakyProvider(MockProvider):
+    """前 N 次调用失败的 Provider（测试重试逻辑）"""
+
+    def __init__(self, failures: int):
+        super().__init__(role="test")
+        self.failures = failures
+        self.calls = 0
+
+    async def _chat(self, messages, temperature, max_tokens):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("upstream error")
+        return await super()._chat(messages, temperature, max_tokens)
+
+
+@pytest.mark.asyncio
+async def test_chat_retries():
+    """
+    测试 4: chat() 内置重试，超出重试次数后抛出最后一次错误
+    """
+    provider = FlakyProvider(failures=1)
+    reply = await provider.complete(system_prompt="sys", user_prompt="你好", max_retries=1, retry_delay=0)
+    assert reply
+    assert provider.calls == 2
+
+    provider = FlakyProvider(failures=2)
+    with pytest.raises(RuntimeError):
+        await provider.complete(system_prompt="sys", user_prompt="你好", max_retries=1, retry_delay=0)
+    assert provider.calls == 2
+
+    print("✅ Test 4 passed: chat retries")
+
+
+def _provider_for(app) -> OpenAICompatibleProvider:
+    """构建直连替身服务（ASGI，无网络）的 OpenAICompatibleProvider"""
+    provider = OpenAICompatibleProvider(base_url="http://fake-llm/v1", api_key="fake", model="fake-llm", role="test")
+    provider.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app))
+    return provider
+
+
+@pytest.mark.asyncio
+async def test_fake_server_completion_and_prefix_cache():
+    """
+    测试 5: 通过替身服务走真实 HTTP 路径，第二轮命中前缀缓存
+    """
+    app = create_app(FakeLLMConfig(ttft_ms=0, tokens_per_sec=1e6, seed=1))
+    provider = _provider_for(app)
+
+    system = {"role": "system", "content": "你是一位老师。" * 40}
+    first = [system, {"role": "user", "content": "什么是梯度下降？"}]
+    reply = await provider.chat(messages=first)
+    assert reply
+    assert provider.last_usage.prompt_tokens > 0
+    assert provider.last_usage.cached_tokens == 0
+
+    second = first + [{"role": "assistant", "content": reply}, {"role": "user", "content": "那学习率呢？"}]
+    await provider.chat(messages=second)
+    assert provider.last_usage.cached_tokens > 0
+    assert provider.last_usage.cached_tokens % 64 == 0
+
+    # 分析类请求（system prompt 要求 JSON）返回 MockProvider 的分析结果
+    analysis = await provider.complete(system_prompt="请以 JSON 格式输出", user_prompt="我不懂反向传播")
+    assert json.loads(analysis)["intent"] == "help-seeking"
+
+    print("✅ Test 5 passed: fake server completion and prefix cache")
+
+
+@pytest.mark.asyncio
+async def test_fake_server_streaming():
+    """
+    测试 6: 流式响应拼接结果与 usage
+    """
+    app = create_app(FakeLLMConfig(ttft_ms=0, tokens_per_sec=1e6, completion_tokens=40, seed=2))
+    provider = _provider_for(app)
+
+    chunks = [c async for c in provider.stream_chat(messages=[{"role": "user", "content": "你好"}])]
+    assert len(chunks) > 1
+    assert provider.last_usage.completion_tokens > 0
+
+    print("✅ Test 6 passed: fake server streaming")
+
+
+@pytest.mark.asyncio
+async def test_fake_server_failure_injection():
+    """
+    测试 7: 429 被识别为限流错误，500 触发重试直至失败
+    """
+    provider = _provider_for(create_app(FakeLLMConfig(rate_limit_rate=1.0, retry_after_s=0)))
+    with pytest.raises(LLMRateLimitError):
+        await provider.complete(system_prompt="sys", user_prompt="你好")
+
+    app = create_app(FakeLLMConfig(error_rate=1.0))
+    provider = _provider_for(app)
+    with pytest.raises(RuntimeError):
+        await provider.complete(system_prompt="sys", user_prompt="你好", max_retries=2, retry_delay=0)
+    assert app.state.stats["errors"] == 3
+
+    print("✅ Test 7 passed: fake server failure injection")
@@ -0,0 +1,147 @@
+"""
+LLM 用量记录单元测试
+验证：批量写入器按批大小 / 时间间隔写入、停止时写完手中的一批与队列剩余记录、队列满时丢弃计数，
+以及 /admin/llm-usage/summary 的汇总（测试数据库）
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from httpx import AsyncClient
+
+from app.models.sql.llm_call_log import LLMCallLog
+from app.services.llm_usage import LLMCallRecord, LLMUsageRecorder
+
+
+def _record(i=0, **kwargs):
+    values = {"role": "assistant", "provider": "mock", "model": "mock", "latency_ms": 100 + i, "outcome": "ok"}
+    values.update(kwargs)
+    return LLMCallRecord(**values)
+
+
+def _capturing(recorder):
+    """用列表替换数据库写入，返回写入的各批"""
+    batches = []
+
+    async def flush(batch):
+        batches.append(list(batch))
+
+    recorder._flush = flush
+    return batches
+
+
+@pytest.mark.asyncio
+async def test_batching():
+    """
+    测试 1: 凑满 batch_size 立即写入；不足一批时等待 flush_interval 后写入；未启动时忽略
+    """
+    recorder = LLMUsageRecorder(batch_size=3, flush_interval=0.1)
+    batches = _capturing(recorder)
+
+    recorder.record(_record())
+    assert recorder.queue_size() == 0
+
+    recorder.start()
+    for i in range(4):
+        recorder.record(_record(i))
+    await asyncio.sleep(0.02)
+    assert [len(b) for b in batches] == [3]
+
+    await asyncio.sleep(0.15)
+    assert [len(b) for b in batches] == [3, 1]
+    await recorder.stop()
+
+    print("✅ Test 1 passed: batching by size and interval")
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_everything():
+    """
+    测试 2: 停止时后台任务正在攒批（已从队列取出），这一批与队列中剩余的记录都会写入；停止后不再接收
+    """
+    recorder = LLMUsageRecorder(batch_size=4, flush_interval=60)
+    batches = _capturing(recorder)
+    recorder.start()
+
+    for i in range(3):
+        recorder.record(_record(i))
+    await asyncio.sleep(0.01)  # 后台任务已取出这 3 条，正在等待凑满一批
+    assert recorder.queue_size() == 0 and batches == []
+    for i in range(3, 6):
+        recorder.record(_record(i))
+
+    await recorder.stop()
+    written = [rec.latency_ms for batch in batches for rec in batch]
+    assert written == [100, 101, 102, 103, 104, 105]
+    assert all(len(batch) <= 4 for batch in batches)
+    assert not recorder.running
+
+    recorder.record(_record(9))
+    assert recorder.queue_size() == 0
+
+    print("✅ Test 2 passed: stop flushes the in-flight batch")
+
+
+@pytest.mark.asyncio
+async def test_queue_full_drops():
+    """
+    测试 3: 队列满时 record() 不阻塞，丢弃并计数；停止时写入队列中的记录
+    """
+    recorder = LLMUsageRecorder(batch_size=10, flush_interval=60, max_queue=2)
+    batches = _capturing(recorder)
+    recorder.start()
+
+    # 后台任务尚未运行，队列只能容纳 2 条
+    for i in range(5):
+        recorder.record(_record(i))
+    assert recorder.dropped == 3
+
+    await recorder.stop()
+    assert [rec.latency_ms for batch in batches for rec in batch] == [100, 101]
+
+    print("✅ Test 3 passed: full queue drops records")
+
+
+@pytest.mark.asyncio
+async def test_usage_summary(admin_client: AsyncClient, test_db, db_user):
+    """
+    测试 4: GET /api/admin/llm-usage/summary 按天 / 用户 / 角色汇总；非法分组返回 400
+    """
+    now = datetime.now(timezone.utc)
+    async with test_db() as db:
+        db.add_all([
+            LLMCallLog(created_at=now - timedelta(minutes=5), user_id=db_user, role="assistant",
+                       provider="mock", model="mock", prompt_tokens=1000, completion_tokens=200,
+                       cached_tokens=800, latency_ms=400, retries=1, outcome="ok"),
+            LLMCallLog(created_at=now - timedelta(minutes=4), user_id=db_user, role="analyzer",
+                       provider="mock", model="mock", prompt_tokens=500, completion_tokens=50,
+                       cached_tokens=0, latency_ms=200, retries=0, outcome="error"),
+            LLMCallLog(created_at=now - timedelta(days=30), role="assistant",
+                       provider="mock", model="mock", prompt_tokens=9999, completion_tokens=0,
+                       cached_tokens=0, latency_ms=100, retries=0, outcome="ok"),
+        ])
+        await db.commit()
+
+    response = await admin_client.get("/api/admin/llm-usage/summary", params={"group_by": "role"})
+    assert response.status_code == 200
+    data = response.json()["data"]
+    total = data["total"]
+    assert (total["calls"], total["errors"], total["retries"]) == (2, 1, 1)
+    assert (total["promptTokens"], total["completionTokens"], total["cachedTokens"]) == (1500, 250, 800)
+    assert total["cacheHitRatio"] == round(800 / 1500, 4)
+    assert total["avgLatencyMs"] == 300.0
+    assert [b["key"] for b in data["buckets"]] == ["assistant", "analyzer"]
+
+    response = await admin_client.get("/api/admin/llm-usage/summary", params={"group_by": "user"})
+    buckets = response.json()["data"]["buckets"]
+    assert [(b["key"], b["label"], b["calls"]) for b in buckets] == [(str(db_user), "数据库测试用户", 2)]
+
+    response = await admin_client.get("/api/admin/llm-usage/summary", params={"role": "analyzer"})
+    data = response.json()["data"]
+    assert data["groupBy"] == "day"
+    assert [b["calls"] for b in data["buckets"]] == [1]
+
+    response = await admin_client.get("/api/admin/llm-usage/summary", params={"group_by": "model"})
+    assert response.status_code == 400
+
+    print("✅ Test 4 passed: usage summary")
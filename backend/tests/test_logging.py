@@ -0,0 +1,61 @@
+"""
+日志管道单元测试
+测试入队不格式化、上下文注入与按 logger 限流
+"""
+import logging
+import queue
+
+from app.core.context import current_request_id
+from app.core.logging import ContextFilter, JSONFormatter, NonBlockingQueueHandler, RateLimitFilter
+
+
+def _record(name: str = "test", level: int = logging.INFO, msg: str = "hello %s", args=("world",)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_queue_handler_defers_formatting():
+    """
+    测试 1: 入队时只合并参数、注入上下文，JSON 序列化留给监听线程；队列满时丢弃计数
+    """
+    log_queue: queue.Queue = queue.Queue(maxsize=1)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+
+    token = current_request_id.set("req-123")
+    try:
+        handler.handle(_record())
+        handler.handle(_record())
+    finally:
+        current_request_id.reset(token)
+
+    queued = log_queue.get_nowait()
+    assert queued.msg == "hello world" and queued.args is None
+    assert queued.request_id == "req-123"
+    assert handler.dropped == 1
+
+    formatted = JSONFormatter().format(queued)
+    assert '"request_id": "req-123"' in formatted
+    assert '"user_id"' in formatted
+
+    print("✅ Test 1 passed: queue handler defers formatting")
+
+
+def test_rate_limit_filter():
+    """
+    测试 2: INFO 超出速率被丢弃（按 logger 独立计数），WARNING 不受限；恢复后注明丢弃条数
+    """
+    limiter = RateLimitFilter(rate=1, burst=2)
+
+    passed = [limiter.filter(_record(name="hot")) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+    assert limiter.filter(_record(name="other"))
+    assert limiter.filter(_record(name="hot", level=logging.WARNING))
+    assert limiter.suppressed_total == 3
+
+    # 令牌恢复后放行，并注明之前丢弃的条数
+    limiter._buckets["hot"][0] = 1
+    record = _record(name="hot")
+    assert limiter.filter(record)
+    assert "suppressed 3" in record.getMessage()
+
+    print("✅ Test 2 passed: rate limit filter")
@@ -0,0 +1,73 @@
+"""
+游标分页单元测试
+验证游标编解码、排序字段校验、分页截取与生成的 keyset 条件
+"""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.dialects import postgresql
+
+from app.api.pagination import decode_cursor, encode_cursor, keyset_after, paginate_rows
+from app.models.sql.message import ChatMessage
+
+
+def test_cursor_round_trip():
+    """
+    测试 1: 游标可还原排序值与 ID；排序字段不符或格式错误时返回 400
+    """
+    ts = datetime(2026, 3, 1, 8, 30, tzinfo=timezone.utc)
+    row_id = uuid.uuid4()
+    cursor = encode_cursor("timestamp", ts, row_id)
+
+    assert "=" not in cursor
+    value, decoded_id = decode_cursor(cursor, "timestamp")
+    assert datetime.fromisoformat(value) == ts
+    assert decoded_id == str(row_id)
+
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, "created_at")
+    assert exc.value.status_code == 400
+
+    with pytest.raises(HTTPException):
+        decode_cursor("not-a-cursor", "timestamp")
+
+    print("✅ Test 1 passed: cursor round trip")
+
+
+def test_paginate_rows():
+    """
+    测试 2: 多取的一行只用于判断是否有下一页；最后一页不返回游标
+    """
+    rows = [(i, f"id-{i}") for i in range(6)]
+
+    page, next_cursor = paginate_rows(rows, 5, "n", lambda r: r)
+    assert page == rows[:5]
+    assert decode_cursor(next_cursor, "n") == (4, "id-4")
+
+    page, next_cursor = paginate_rows(rows[:3], 5, "n", lambda r: r)
+    assert page == rows[:3]
+    assert next_cursor is None
+
+    print("✅ Test 2 passed: page slicing and next cursor")
+
+
+def test_keyset_condition():
+    """
+    测试 3: 降序用 (sort, id) < 游标，升序用 >
+    """
+    cursor = encode_cursor("timestamp", datetime(2026, 3, 1, tzinfo=timezone.utc), uuid.uuid4())
+
+    desc = keyset_after(ChatMessage.timestamp, ChatMessage.id, cursor, "timestamp")
+    sql = str(desc.compile(dialect=postgresql.dialect()))
+    assert "(chat_messages.timestamp, chat_messages.id) <" in sql
+
+    asc = keyset_after(ChatMessage.timestamp, ChatMessage.id, cursor, "timestamp", descending=False)
+    assert "(chat_messages.timestamp, chat_messages.id) >" in str(asc.compile(dialect=postgresql.dialect()))
+
+    bad = encode_cursor("timestamp", "yesterday", uuid.uuid4())
+    with pytest.raises(HTTPException):
+        keyset_after(ChatMessage.timestamp, ChatMessage.id, bad, "timestamp")
+
+    print("✅ Test 3 passed: keyset conditions")
@@ -0,0 +1,140 @@
+"""
+当前画像单元测试
+测试 1-3 不连接数据库：验证画像增量为一条原子语句（UPSERT + CTE 追加快照）、重建的过滤条件，
+以及读取画像走 profile_current 主键、直接写入的 system 快照同步当前画像；
+测试 4 在测试数据库上用两个会话并发应用增量
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+from app.models.sql.profile import CurrentProfile, ProfileSnapshot, ProfileSource
+from app.schemas.profile import UserProfile
+from app.services.profile_current import apply_profile_delta, rebuild_current_profiles
+from app.services.profile_service import ProfileService
+from tests.fakes import FakeResult, RecordingSession
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_apply_delta_single_statement():
+    """
+    测试 1: 增量在一条语句中 UPSERT 当前画像（LEAST / GREATEST 在 SQL 中 clamp）并追加快照，不读取、不提交
+    """
+    user_id = uuid.uuid4()
+    db = RecordingSession(result=FakeResult(row=(55, 0, 100, T0), rowcount=1))
+
+    profile = await ProfileService(db).apply_delta(user_id, 5, -80, 30, at=T0)
+
+    assert len(db.statements) == 1
+    sql, params = db.sql(0), db.statements[0][1]
+    assert "ON CONFLICT (user_id) DO UPDATE" in sql
+    assert "LEAST(100, GREATEST(0, p.cognition + :d_cognition))" in sql
+    assert "INSERT INTO profile_snapshots" in sql and "FROM cur" in sql
+    assert params["user_id"] == str(user_id)
+    assert (params["d_cognition"], params["d_affect"], params["d_behavior"]) == (5, -80, 30)
+    assert params["at"] == T0 and params["default"] == 50
+    assert (profile.cognition, profile.affect, profile.behavior) == (55, 0, 100)
+    assert profile.lastUpdate == "2026-03-01T08:00:00Z"
+    assert db.commits == 0
+
+    # 每次调用生成新的快照 ID
+    await apply_profile_delta(db, user_id, 0, 0, 0, at=T0)
+    assert db.statements[1][1]["snapshot_id"] != params["snapshot_id"]
+
+    print("✅ Test 1 passed: atomic profile delta")
+
+
+@pytest.mark.asyncio
+async def test_rebuild_current_profiles_filters():
+    """
+    测试 2: 指定用户按 ID 重建；未指定时只补齐尚无当前画像的用户；空列表不执行
+    """
+    db = RecordingSession(result=FakeResult(rowcount=1))
+    uid = uuid.uuid4()
+
+    await rebuild_current_profiles(db, [uid])
+    sql, params = db.sql(0), db.statements[0][1]
+    assert "DISTINCT ON (user_id)" in sql and "source = 'SYSTEM'" in sql
+    assert "user_id = ANY(CAST(:ids AS uuid[]))" in sql
+    assert params["ids"] == [str(uid)]
+
+    await rebuild_current_profiles(db)
+    assert "NOT EXISTS (SELECT 1 FROM profile_current" in db.sql(1)
+
+    assert await rebuild_current_profiles(db, []) == 0
+    assert len(db.statements) == 2
+
+    print("✅ Test 2 passed: current profile rebuild filters")
+
+
+@pytest.mark.asyncio
+async def test_read_and_direct_write():
+    """
+    测试 3: 读取画像为主键查询；预估增量只计算不写入；system 快照同步写入当前画像
+    """
+    user_id = uuid.uuid4()
+    current = CurrentProfile(user_id=user_id, cognition=70, affect=40, behavior=20, updated_at=T0)
+    db = RecordingSession(get_result=current)
+    service = ProfileService(db)
+
+    profile = await service.get_profile(user_id)
+    assert (profile.cognition, profile.affect, profile.behavior) == (70, 40, 20)
+    assert db.statements == []
+
+    estimate = ProfileService.add_delta(profile, 40, -50, 0)
+    assert (estimate.cognition, estimate.affect, estimate.behavior) == (100, 0, 20)
+    assert isinstance(estimate, UserProfile) and db.statements == []
+
+    await service._create_snapshot(user_id, 50, 50, 50)
+    assert any("INSERT INTO profile_current" in sql for sql in db.sqls)
+    assert db.commits == 1
+
+    print("✅ Test 3 passed: current profile read and direct write")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_deltas_on_database(test_db, db_user):
+    """
+    测试 4: 同一用户的两个增量在两个会话中并发执行：后者等待前者提交后在其结果上累加（不丢失），
+    各自 clamp，并各追加一条 system 快照；之后按快照重建结果一致
+    """
+    t1 = T0 + timedelta(seconds=1)
+    async with test_db() as first, test_db() as second:
+        values = await apply_profile_delta(first, db_user, 30, -40, 10, at=T0)
+        assert (values.cognition, values.affect, values.behavior) == (80, 10, 60)
+
+        # 第一个事务未提交时，第二个增量阻塞在同一行上
+        pending = asyncio.create_task(apply_profile_delta(second, db_user, 40, -20, 5, at=t1))
+        await asyncio.sleep(0.2)
+        assert not pending.done()
+
+        await first.commit()
+        values = await asyncio.wait_for(pending, timeout=5)
+        await second.commit()
+    assert (values.cognition, values.affect, values.behavior) == (100, 0, 65)
+    assert values.updated_at == t1
+
+    async with test_db() as db:
+        current = await db.get(CurrentProfile, db_user)
+        assert (current.cognition, current.affect, current.behavior) == (100, 0, 65)
+
+        snapshots = (await db.execute(
+            select(ProfileSnapshot).where(ProfileSnapshot.user_id == db_user).order_by(ProfileSnapshot.created_at)
+        )).scalars().all()
+        assert [(s.cognition, s.affect, s.behavior, s.created_at) for s in snapshots] == [
+            (80, 10, 60, T0), (100, 0, 65, t1)
+        ]
+        assert all(s.source == ProfileSource.SYSTEM for s in snapshots)
+
+        await db.delete(current)
+        assert await rebuild_current_profiles(db) == 1
+        await db.commit()
+        current = await db.get(CurrentProfile, db_user)
+        assert (current.cognition, current.affect, current.behavior, current.updated_at) == (100, 0, 65, t1)
+
+    print("✅ Test 4 passed: concurrent profile deltas on PostgreSQL")
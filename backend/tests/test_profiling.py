@@ -0,0 +1,90 @@
+"""
+按需请求剖析单元测试
+测试管理员校验、限流，以及 sample / cprofile 两种剖析结果
+"""
+import marshal
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware, profile_store
+
+
+def _make_app(min_interval: float = 0.0) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware, sample_interval=0.001, min_interval=min_interval)
+
+    @app.get("/slow")
+    async def slow():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            sum(range(1000))
+        return {"ok": True}
+
+    return app
+
+
+@pytest.fixture
+def admin_key(monkeypatch):
+    monkeypatch.setattr(settings, "ADMIN_KEY", "test-admin-key")
+    return "test-admin-key"
+
+
+@pytest.mark.asyncio
+async def test_profile_requires_admin(admin_key):
+    """
+    测试 1: 无 X-Profile 头时不剖析；非管理员请求被拒绝但响应正常
+    """
+    app = _make_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        plain = await client.get("/slow")
+        denied = await client.get("/slow", headers={"X-Profile": "sample", "X-ADMIN-KEY": "wrong"})
+
+    assert plain.status_code == 200 and "x-profile-status" not in plain.headers
+    assert denied.status_code == 200
+    assert denied.headers["x-profile-status"] == "unauthorized"
+    assert "x-profile-id" not in denied.headers
+
+    print("✅ Test 1 passed: profile requires admin")
+
+
+@pytest.mark.asyncio
+async def test_sample_and_cprofile_modes(admin_key):
+    """
+    测试 2: sample 模式输出 folded stacks，cprofile 模式输出可被 pstats 读取的数据
+    """
+    app = _make_app()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        sampled = await client.get("/slow", headers={"X-Profile": "sample", "X-ADMIN-KEY": admin_key})
+        profiled = await client.get("/slow", headers={"X-Profile": "cprofile", "X-ADMIN-KEY": admin_key})
+
+    assert sampled.json() == {"ok": True}
+    folded = profile_store.get(sampled.headers["x-profile-id"])
+    assert folded["mode"] == "sample"
+    assert "slow (test_profiling.py" in folded["content"].decode("utf-8")
+
+    stats = marshal.loads(profile_store.get(profiled.headers["x-profile-id"])["content"])
+    assert any(func[2] == "slow" for func in stats)
+
+    print("✅ Test 2 passed: sample and cprofile modes")
+
+
+@pytest.mark.asyncio
+async def test_profile_rate_limited(admin_key):
+    """
+    测试 3: 最小间隔内的第二次剖析请求被限流
+    """
+    app = _make_app(min_interval=60)
+    headers = {"X-Profile": "sample", "X-ADMIN-KEY": admin_key}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.get("/slow", headers=headers)
+        second = await client.get("/slow", headers=headers)
+
+    assert first.headers["x-profile-status"] == "ok"
+    assert second.headers["x-profile-status"] == "rate-limited"
+    assert second.status_code == 200
+
+    print("✅ Test 3 passed: profile rate limited")
@@ -0,0 +1,72 @@
+"""
+SQL 语句计时单元测试
+使用内存 SQLite 引擎验证 cursor 事件计时、按路由归集与调试响应头
+"""
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import create_engine, text
+
+from app.db import query_stats
+
+
+@pytest.fixture
+def sqlite_engine():
+    engine = create_engine("sqlite://")
+    query_stats.install(engine)
+    query_stats.reset_stats()
+    yield engine
+    engine.dispose()
+    query_stats.reset_stats()
+
+
+@pytest.mark.asyncio
+async def test_queries_attributed_to_route(sqlite_engine):
+    """
+    测试 1: 请求内的语句按路由模板归集，调试模式响应头返回查询数
+    """
+    app = FastAPI()
+    app.add_middleware(query_stats.QueryStatsMiddleware, add_header=True)
+
+    @app.get("/users/{user_id}")
+    def get_user(user_id: int):
+        # 模拟 N+1：每次请求执行 3 条语句
+        with sqlite_engine.connect() as conn:
+            for _ in range(3):
+                conn.execute(text("SELECT 1"))
+        return {"id": user_id}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/users/1")
+        await client.get("/users/2")
+
+    assert response.headers["x-query-count"] == "3"
+    assert float(response.headers["x-query-time-ms"]) >= 0
+
+    routes = {r["route"]: r for r in query_stats.get_route_stats()}
+    assert routes["/users/{user_id}"]["requests"] == 2
+    assert routes["/users/{user_id}"]["queriesPerRequest"] == 3
+
+    top = query_stats.get_statement_stats(sort="count", limit=5)
+    assert top[0]["route"] == "/users/{user_id}"
+    assert top[0]["statement"] == "SELECT 1"
+    assert top[0]["count"] == 6
+
+    print("✅ Test 1 passed: queries attributed to route")
+
+
+def test_background_queries_and_bounded_table(sqlite_engine, monkeypatch):
+    """
+    测试 2: 请求之外的语句记为 <background>；统计表超出上限时淘汰总耗时最小的条目
+    """
+    monkeypatch.setattr(query_stats, "MAX_STATEMENTS", 3)
+
+    with sqlite_engine.connect() as conn:
+        for i in range(5):
+            conn.execute(text(f"SELECT {i}"))
+
+    stats = query_stats.get_statement_stats(limit=10)
+    assert len(stats) == 3
+    assert all(s["route"] == query_stats.NO_ROUTE for s in stats)
+
+    print("✅ Test 2 passed: background queries and bounded table")
@@ -0,0 +1,166 @@
+"""
+研究数据包导出单元测试
+使用连接替身验证：各数据集连接导入同一快照、并行度上限、zip 内容与 manifest，以及流式 zip 可被读回
+"""
+import asyncio
+import io
+import os
+import zipfile
+from datetime import datetime, timezone
+
+import orjson
+import pytest
+
+import app.db.postgres as postgres
+from app.services import research_bundle
+
+SNAPSHOT_ID = "00000003-0000001B-1"
+SNAPSHOT_AT = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+TEMPLATE_IDS = ["11111111-aaaa-4000-8000-000000000000", "22222222-bbbb-4000-8000-000000000000"]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def one(self):
+        return self._rows[0]
+
+    def all(self):
+        return self._rows
+
+
+class FakeConnection:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.options = {}
+        self.closed = False
+        self.invalidated = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+        return False
+
+    async def invalidate(self):
+        self.invalidated = True
+
+    async def execution_options(self, **options):
+        self.options.update(options)
+        return self
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.statements.append(sql)
+        if "pg_export_snapshot" in sql:
+            return FakeResult([(SNAPSHOT_ID, SNAPSHOT_AT)])
+        if "DISTINCT template_id" in sql:
+            return FakeResult([(tid,) for tid in TEMPLATE_IDS])
+        return FakeResult([])
+
+
+class FakeEngine:
+    def __init__(self):
+        self.connections = []
+
+    def connect(self):
+        conn = FakeConnection(self)
+        self.connections.append(conn)
+        return conn
+
+
+@pytest.mark.asyncio
+async def test_bundle_shares_snapshot(monkeypatch):
+    """
+    测试 1: 每个数据集一个连接并首先导入协调连接导出的快照；并行但不超过并行度；
+    协调连接在全部数据集完成后才关闭；zip 含各 CSV 与 manifest（行数、快照时间）
+    """
+    engine = FakeEngine()
+    monkeypatch.setattr(postgres, "engine", engine)
+
+    active = 0
+    peak = 0
+
+    async def copy_to_file(conn, dataset, path):
+        nonlocal active, peak
+        coordinator = engine.connections[0]
+        assert not coordinator.closed
+        assert conn.statements == [f"SET TRANSACTION SNAPSHOT '{SNAPSHOT_ID}'"]
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        rows = len(dataset.name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("name\n" + "".join(f"{dataset.name}\n" for _ in range(rows)))
+        active -= 1
+        return rows
+
+    monkeypatch.setattr(research_bundle, "copy_to_file", copy_to_file)
+
+    chunks = [c async for c in research_bundle.stream_bundle(parallelism=2)]
+    data = b"".join(chunks)
+
+    coordinator, workers = engine.connections[0], engine.connections[1:]
+    assert "pg_export_snapshot" in coordinator.statements[0]
+    assert coordinator.closed
+    assert len(workers) == 4 + len(TEMPLATE_IDS)
+    for conn in [coordinator] + workers:
+        assert conn.options == {"isolation_level": "REPEATABLE READ", "postgresql_readonly": True}
+    assert peak == 2
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    names = set(archive.namelist())
+    assert {
+        "learner_profiles.csv",
+        "scale_responses.csv",
+        "conversation_data.csv",
+        "learning_trajectory.csv",
+        "scales/scale_11111111_responses.csv",
+        "scales/scale_22222222_responses.csv",
+        "manifest.json",
+    } == names
+
+    manifest = orjson.loads(archive.read("manifest.json"))
+    assert manifest["snapshotTimestamp"] == "2026-03-01T08:00:00+00:00"
+    files = {f["name"]: f for f in manifest["files"]}
+    assert [f["name"] for f in manifest["files"]][0] == "learner_profiles.csv"
+    assert files["conversation_data.csv"]["rows"] == len("conversation_data")
+    lines = archive.read("conversation_data.csv").decode().splitlines()
+    assert lines[0] == "name" and len(lines) == len("conversation_data") + 1
+    assert files["conversation_data.csv"]["bytes"] == len(archive.read("conversation_data.csv"))
+
+    print("✅ Test 1 passed: shared snapshot bundle")
+
+
+@pytest.mark.asyncio
+async def test_bundle_failure_cancels_pending(monkeypatch):
+    """
+    测试 2: 某个数据集失败时取消其余查询并删除临时文件，协调连接关闭
+    """
+    engine = FakeEngine()
+    monkeypatch.setattr(postgres, "engine", engine)
+    paths = []
+
+    async def copy_to_file(conn, dataset, path):
+        paths.append(path)
+        if dataset.name == "learner_profiles":
+            raise RuntimeError("boom")
+        await asyncio.sleep(10)
+        return 0
+
+    monkeypatch.setattr(research_bundle, "copy_to_file", copy_to_file)
+
+    with pytest.raises(RuntimeError):
+        async for _ in research_bundle.stream_bundle(parallelism=3):
+            pass
+
+    assert engine.connections[0].closed
+    assert any(conn.invalidated for conn in engine.connections[1:])
+    assert all(conn.closed for conn in engine.connections)
+    assert paths and all(not os.path.exists(p) for p in paths)
+
+    print("✅ Test 2 passed: failure cancels pending queries")
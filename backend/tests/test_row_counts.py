@@ -0,0 +1,78 @@
+"""
+表行数服务单元测试
+使用会话替身验证：精确计数写入缓存、缓存命中不查库、缓存过期时返回估算值并安排后台计数，
+以及估算值很小的表直接精确计数
+"""
+import pytest
+
+from app.services.row_counts import RowCounter
+from tests.fakes import FakeResult, RecordingSession
+
+
+def _session(exact=None, estimates=None):
+    """COUNT(*) 按表名返回精确行数，估算查询返回 (表名, 估算值)"""
+    responses = {f"COUNT(*) FROM {table}": FakeResult(row=value) for table, value in (exact or {}).items()}
+    responses["reltuples"] = FakeResult(rows=list((estimates or {}).items()))
+    return RecordingSession(responses=responses)
+
+
+@pytest.mark.asyncio
+async def test_exact_count_is_cached():
+    """
+    测试 1: exact=True 精确计数并写入缓存；之后的默认请求直接使用缓存
+    """
+    counter = RowCounter(ttl=60)
+    db = _session(exact={"users": 42})
+
+    counts = await counter.count(db, ["users"], exact=True)
+    assert counts["users"].count == 42
+    assert counts["users"].estimated is False
+
+    db.statements.clear()
+    counts = await counter.count(db, ["users"])
+    assert counts["users"].count == 42
+    assert counts["users"].estimated is False
+    assert db.statements == []
+
+    print("✅ Test 1 passed: exact counts are cached")
+
+
+@pytest.mark.asyncio
+async def test_stale_tables_are_estimated():
+    """
+    测试 2: 无缓存的表一次批量估算，标记 estimated 并安排后台精确计数
+    """
+    counter = RowCounter(ttl=0)
+    scheduled = []
+    counter._schedule_refresh = lambda tables: scheduled.extend(tables)
+    db = _session(estimates={"chat_messages": 120000, "users": 300})
+
+    counts = await counter.count(db, ["chat_messages", "users"])
+    assert counts["chat_messages"].count == 120000
+    assert counts["chat_messages"].estimated is True
+    assert counts["users"].estimated is True
+    assert len(db.statements) == 1
+    assert "reltuples" in db.sql(0)
+    assert scheduled == ["chat_messages", "users"]
+
+    print("✅ Test 2 passed: stale tables fall back to estimates")
+
+
+@pytest.mark.asyncio
+async def test_small_tables_are_counted_exactly():
+    """
+    测试 3: 估算值低于阈值的表（含统计信息尚为 0 的新表）直接精确计数且不缓存，只有大表安排后台计数
+    """
+    counter = RowCounter(ttl=60, exact_below=10000)
+    scheduled = []
+    counter._schedule_refresh = lambda tables: scheduled.extend(tables)
+    db = _session(exact={"users": 2}, estimates={"chat_messages": 120000, "users": 0})
+
+    counts = await counter.count(db, ["chat_messages", "users"])
+    assert counts["users"].count == 2
+    assert counts["users"].estimated is False
+    assert counts["chat_messages"].estimated is True
+    assert scheduled == ["chat_messages"]
+    assert counter.cached("users") is None
+
+    print("✅ Test 3 passed: small tables are counted exactly")
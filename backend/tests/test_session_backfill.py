@@ -0,0 +1,169 @@
+"""
+历史消息 session_id 回填单元测试
+测试 1-3 不连接数据库：验证对话段与已有空会话的匹配，以及一批回填的语句与参数；
+测试 4 在测试数据库上执行切分与回填
+"""
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import select
+
+import app.services.session_backfill as backfill_module
+from app.models.sql.chat_session import ChatSession
+from app.models.sql.message import ChatMessage, MessageRole
+from app.models.sql.user_activity import UserActivityStats
+from app.services.session_backfill import Segment, assign_sessions, backfill_users
+from tests.fakes import FakeResult, RecordingSession
+
+T0 = datetime(2026, 3, 1, 8, 0, tzinfo=timezone.utc)
+USER_A = uuid.UUID("aaaaaaaa-0000-4000-8000-000000000000")
+USER_B = uuid.UUID("bbbbbbbb-0000-4000-8000-000000000000")
+
+
+def test_assign_sessions():
+    """
+    测试 1: 复用段内（含创建提前量）最早的空会话；早于段开始的空会话跳过；
+    没有可用会话的段新建会话，创建时间为段开始时间
+    """
+    stale = uuid.uuid4()
+    first = uuid.uuid4()
+    second = uuid.uuid4()
+    segments = [
+        Segment(USER_A, T0, T0 + timedelta(minutes=20)),
+        Segment(USER_A, T0 + timedelta(hours=2), T0 + timedelta(hours=3)),
+        Segment(USER_B, T0, T0 + timedelta(minutes=5)),
+    ]
+    sessions = [
+        (stale, USER_A, T0 - timedelta(days=1)),
+        (first, USER_A, T0 - timedelta(seconds=2)),
+        (second, USER_A, T0 + timedelta(hours=2, minutes=40)),
+    ]
+
+    new_sessions = assign_sessions(segments, sessions)
+
+    assert segments[0].session_id == first
+    assert segments[1].session_id == second
+    assert len(new_sessions) == 1
+    assert new_sessions[0] == {"id": segments[2].session_id, "user_id": USER_B, "created_at": T0}
+
+    print("✅ Test 1 passed: segment to session matching")
+
+
+def _session(segments, sessions):
+    """切分查询返回 segments，空会话查询返回 sessions"""
+    return RecordingSession(responses={
+        "LAG(timestamp)": FakeResult(rows=segments),
+        "NOT EXISTS": FakeResult(rows=sessions),
+    })
+
+
+@pytest.mark.asyncio
+async def test_backfill_users_statements(monkeypatch):
+    """
+    测试 2: 一批用户：切分 → 查空会话 → 新建缺少的会话 → 一条 UPDATE 写入全部段；
+    重建涉及会话的摘要，新建了会话的用户重建活动统计
+    """
+    rebuilt = []
+
+    async def rebuild(db, user_ids):
+        rebuilt.extend(user_ids)
+        return len(user_ids)
+
+    monkeypatch.setattr(backfill_module, "rebuild_activity_stats", rebuild)
+    summarized = []
+
+    async def rebuild_summaries(db, session_ids):
+        summarized.extend(session_ids)
+        return len(session_ids)
+
+    monkeypatch.setattr(backfill_module, "rebuild_session_summaries", rebuild_summaries)
+    existing = uuid.uuid4()
+    db = _session(
+        segments=[
+            (USER_A, T0, T0 + timedelta(minutes=10)),
+            (USER_A, T0 + timedelta(hours=5), T0 + timedelta(hours=5, minutes=1)),
+        ],
+        sessions=[(existing, USER_A, T0)],
+    )
+
+    count = await backfill_users(db, [USER_A, USER_B])
+
+    assert count == 2
+    sqls = db.sqls
+    assert "LAG(timestamp)" in sqls[0]
+    assert db.statements[0][1]["user_ids"] == [str(USER_A), str(USER_B)]
+    assert db.statements[0][1]["gap"] == timedelta(minutes=30)
+    assert "INSERT INTO chat_sessions" in sqls[2]
+    assert len(db.statements[2][1]) == 1
+    assert "UPDATE chat_messages" in sqls[3]
+    params = db.statements[3][1]
+    assert params["session_ids"][0] == str(existing)
+    assert params["starts"] == [T0, T0 + timedelta(hours=5)]
+    assert rebuilt == [USER_A]
+    assert set(summarized) == {uuid.UUID(sid) for sid in params["session_ids"]}
+
+    print("✅ Test 2 passed: batch backfill statements")
+
+
+@pytest.mark.asyncio
+async def test_backfill_users_without_segments():
+    """
+    测试 3: 没有未回填的消息时只执行切分查询
+    """
+    db = _session(segments=[], sessions=[])
+    assert await backfill_users(db, [USER_A]) == 0
+    assert len(db.statements) == 1
+
+    print("✅ Test 3 passed: nothing to backfill")
+
+
+@pytest.mark.asyncio
+async def test_backfill_users_on_database(test_db, db_user):
+    """
+    测试 4: 真实数据库上按 30 分钟间隔切分：第一段复用已有空会话，第二段新建会话；
+    已有 session_id 的消息不变；会话摘要与活动统计随之重建；再次执行无事可做
+    """
+    async with test_db() as db:
+        existing = ChatSession(user_id=db_user, created_at=T0 - timedelta(seconds=2))
+        assigned = ChatSession(user_id=db_user, created_at=T0 + timedelta(days=1))
+        db.add_all([existing, assigned])
+        await db.flush()
+        times = [T0, T0 + timedelta(minutes=10), T0 + timedelta(minutes=35), T0 + timedelta(hours=5)]
+        messages = [
+            ChatMessage(user_id=db_user, role=MessageRole.USER, text=f"消息 {i}", timestamp=ts)
+            for i, ts in enumerate(times)
+        ]
+        kept = ChatMessage(user_id=db_user, session_id=assigned.id, role=MessageRole.USER, text="已分配",
+                           timestamp=T0 + timedelta(days=1))
+        db.add_all(messages + [kept])
+        await db.commit()
+
+        assert await backfill_users(db, [db_user]) == 2
+        await db.commit()
+
+        rows = (await db.execute(
+            select(ChatMessage.text, ChatMessage.session_id)
+            .where(ChatMessage.user_id == db_user)
+            .order_by(ChatMessage.timestamp)
+        )).all()
+        session_ids = [sid for _, sid in rows]
+        assert session_ids[:3] == [existing.id] * 3
+        assert session_ids[3] not in (None, existing.id, assigned.id)
+        assert session_ids[4] == assigned.id
+
+        created = await db.get(ChatSession, session_ids[3])
+        assert created.created_at == T0 + timedelta(hours=5)
+        assert (created.message_count, created.title) == (1, "消息 3")
+        await db.refresh(existing)
+        assert (existing.message_count, existing.started_at, existing.last_message_at) == (
+            3, T0, T0 + timedelta(minutes=35)
+        )
+        assert existing.preview == "消息 2"
+
+        stats = await db.get(UserActivityStats, db_user)
+        assert (stats.message_count, stats.session_count) == (5, 3)
+
+        assert await backfill_users(db, [db_user]) == 0
+
+    print("✅ Test 4 passed: backfill on PostgreSQL")
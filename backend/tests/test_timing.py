@@ -0,0 +1,69 @@
+"""
+分阶段计时单元测试
+测试 span 累计、直方图分位数估算，以及 ServerTimingMiddleware 输出的响应头
+"""
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.core.timing import (
+    ServerTimingMiddleware,
+    StageHistogram,
+    current_timings,
+    get_stage_stats,
+    record_duration,
+    span,
+)
+
+
+def test_histogram_quantiles():
+    """
+    测试 1: 直方图按桶上界估算分位数
+    """
+    histogram = StageHistogram()
+    assert histogram.quantile(0.5) == 0.0
+
+    for _ in range(90):
+        histogram.observe(8)
+    for _ in range(10):
+        histogram.observe(400)
+
+    snapshot = histogram.snapshot()
+    assert snapshot["count"] == 100
+    assert snapshot["p50Ms"] == 10
+    assert snapshot["p95Ms"] == 500
+    assert snapshot["meanMs"] == pytest.approx(47.2)
+
+    print("✅ Test 1 passed: histogram quantiles")
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header():
+    """
+    测试 2: 请求内的 span 写入 Server-Timing 头，同名阶段累加
+    """
+    app = FastAPI()
+    app.add_middleware(ServerTimingMiddleware)
+
+    @app.get("/work")
+    async def work():
+        with span("test.stage"):
+            pass
+        record_duration("test.manual", 5.0)
+        record_duration("test.manual", 5.0)
+        return current_timings().as_dict()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/work")
+
+    header = response.headers["server-timing"]
+    assert "test.stage;dur=" in header
+    assert "test.manual;dur=10.0" in header
+    assert "total;dur=" in header
+    assert response.json()["test.manual"] == 10.0
+    assert get_stage_stats()["test.manual"]["count"] >= 2
+
+    # 请求上下文之外只记直方图
+    assert current_timings() is None
+
+    print("✅ Test 2 passed: server timing header")
@@ -333,6 +333,7 @@ export async function getChatGreeting(
 }
 
 export interface ChatSession {
+  id: string;
   sessionStart: string;
   sessionEnd: string;
   title: string;
@@ -347,36 +348,42 @@ export interface SessionMessage {
   timestamp: string;
 }
 
+export interface ChatSessionPage {
+  sessions: ChatSession[];
+  nextCursor: string | null;
+}
+
 /**
- * 获取用户历史对话会话列表
+ * 获取用户历史对话会话列表（最新的在前，每页最多 50 个）
+ * 传入上一页返回的 nextCursor 获取下一页；nextCursor 为 null 表示没有更多
  */
-export async function getChatSessions(): Promise<ChatSession[]> {
+export async function getChatSessions(cursor?: string | null): Promise<ChatSessionPage> {
   try {
+    const params = new URLSearchParams();
+    if (cursor) params.set('cursor', cursor);
+    const query = params.toString();
     const response = await fetch(
-      `${API_BASE_URL}/api/chat/sessions`,
+      `${API_BASE_URL}/api/chat/sessions${query ? `?${query}` : ''}`,
       { method: 'GET', headers: getHeaders(true) }
     );
     if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
     const result = await response.json();
-    return result.data?.sessions || [];
+    return {
+      sessions: result.data?.sessions || [],
+      nextCursor: result.data?.nextCursor ?? null,
+    };
   } catch (error) {
     console.error('Failed to get chat sessions:', error);
-    return [];
+    return { sessions: [], nextCursor: null };
   }
 }
 
 /**
  * 获取特定会话的消息记录
  */
-export async function getSessionMessages(
-  sessionStart: string,
-  sessionEnd: string
-): Promise<SessionMessage[]> {
+export async function getSessionMessages(session: ChatSession): Promise<SessionMessage[]> {
   try {
-    const params = new URLSearchParams({
-      sessionStart,
-      sessionEnd,
-    });
+    const params = new URLSearchParams({ sessionId: session.id });
     const response = await fetch(
       `${API_BASE_URL}/api/chat/sessions/messages?${params.toString()}`,
       { method: 'GET', headers: getHeaders(true) }
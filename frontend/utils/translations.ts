@@ -37,6 +37,7 @@ export const translations = {
     newConversation: "开启新对话",
     noHistory: "暂无历史对话",
     messagesCount: "条消息",
+    loadMore: "加载更多",
     viewSession: "查看会话",
     currentSession: "当前会话",
 
@@ -194,6 +195,7 @@ export const translations = {
     newConversation: "New Conversation",
     noHistory: "No previous conversations",
     messagesCount: "messages",
+    loadMore: "Load more",
     viewSession: "View Session",
     currentSession: "Current Session",
 
@@ -2,7 +2,7 @@ import React, { useState, useRef, useEffect } from 'react';
 import { ChatMessage, Language, UserProfile } from '../types';
 import { Send, Bot, User, Sparkles, AlertCircle, History, Plus, X, Clock, MessageSquare, ChevronDown, ChevronUp } from 'lucide-react';
 import { translations } from '../utils/translations';
-import { sendChatMessage, getChatGreeting, getChatSessions, getSessionMessages, ChatSession, SessionMessage } from '../services/api';
+import { sendChatMessage, getChatGreeting, getChatSessions, getSessionMessages, ChatSession, ChatSessionPage, SessionMessage } from '../services/api';
 
 interface Props {
   messages: ChatMessage[];
@@ -37,6 +37,8 @@ export const Chat: React.FC<Props> = ({
   const [historyExpanded, setHistoryExpanded] = useState(true);
   const [sessions, setSessions] = useState<ChatSession[]>([]);
   const [sessionsLoading, setSessionsLoading] = useState(false);
+  const [sessionsCursor, setSessionsCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedSession, setSelectedSession] = useState<{ session: ChatSession; messages: SessionMessage[] } | null>(null);
 
   // Fetch greeting on first load
@@ -59,18 +61,34 @@ export const Chat: React.FC<Props> = ({
   // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [userId]);
 
-  // Load history sessions
+  // Load history sessions (first page; older pages via "load more")
+  const applyFirstPage = ({ sessions, nextCursor }: ChatSessionPage) => {
+    setSessions(sessions);
+    setSessionsCursor(nextCursor);
+  };
+
   useEffect(() => {
     if (userId) {
       setSessionsLoading(true);
       getChatSessions()
-        .then(setSessions)
+        .then(applyFirstPage)
         .finally(() => setSessionsLoading(false));
     }
   }, [userId]);
 
   const refreshSessions = () => {
-    if (userId) getChatSessions().then(setSessions);
+    if (userId) getChatSessions().then(applyFirstPage);
+  };
+
+  const loadMoreSessions = () => {
+    if (!sessionsCursor || loadingMore) return;
+    setLoadingMore(true);
+    getChatSessions(sessionsCursor)
+      .then(({ sessions: older, nextCursor }) => {
+        setSessions(prev => [...prev, ...older]);
+        setSessionsCursor(nextCursor);
+      })
+      .finally(() => setLoadingMore(false));
   };
 
   useEffect(() => {
@@ -123,7 +141,7 @@ export const Chat: React.FC<Props> = ({
   };
 
   const handleViewSession = async (session: ChatSession) => {
-    const msgs = await getSessionMessages(session.sessionStart, session.sessionEnd);
+    const msgs = await getSessionMessages(session);
     setSelectedSession({ session, messages: msgs });
   };
 
@@ -337,7 +355,7 @@ export const Chat: React.FC<Props> = ({
               <span className="text-sm font-semibold" style={{ color: textPrimary }}>{t.chatHistory}</span>
               {sessions.length > 0 && (
                 <span className="text-xs px-1.5 py-0.5 rounded-full" style={{ backgroundColor: bgMuted, color: textMuted }}>
-                  {sessions.length}
+                  {sessions.length}{sessionsCursor ? '+' : ''}
                 </span>
               )}
             </div>
@@ -387,9 +405,9 @@ export const Chat: React.FC<Props> = ({
                       <p className="text-xs" style={{ color: textMuted }}>{t.noHistory}</p>
                     </div>
                   )}
-                  {sessions.map((session, idx) => (
+                  {sessions.map((session) => (
                     <button
-                      key={idx}
+                      key={session.id}
                       onClick={() => handleViewSession(session)}
                       className="w-full text-left rounded-lg p-2.5 space-y-1 hover:opacity-80 transition-all duration-150 active:scale-[0.98]"
                       style={{ backgroundColor: bgMuted, border: cardBorder }}
@@ -411,6 +429,16 @@ export const Chat: React.FC<Props> = ({
                       </span>
                     </button>
                   ))}
+                  {!sessionsLoading && sessionsCursor && (
+                    <button
+                      onClick={loadMoreSessions}
+                      disabled={loadingMore}
+                      className="w-full text-center rounded-lg py-2 text-xs hover:opacity-80 transition-opacity disabled:opacity-50"
+                      style={{ color: textMuted, border: cardBorder }}
+                    >
+                      {loadingMore ? t.loading : t.loadMore}
+                    </button>
+                  )}
                 </div>
               )}
             </div>